@@ -1,6 +1,6 @@
 from .tracing.setup import setup_tracing
-from .tracing.session import enable_session_tracking, set_session_id
-from agensight.tracing.config import configure_tracing, get_mode, set_mode, set_project_id
+from .tracing.session import enable_session_tracking, set_session_id, set_session_details
+from agensight.tracing.config import configure_tracing, get_mode, is_exported_mode, set_mode, set_project_id
 from .integrations import instrument_openai
 from .integrations import instrument_anthropic 
 from .tracing.decorators import trace, span
@@ -61,6 +61,8 @@ def init(name="default", mode="local", auto_instrument_llms=True, session=None,
         "console": "console",
         "memory": "memory",
         "db": "db",
+        "otlp": "otlp",
+        "ingest": "ingest",
         "prod": "prod",
         "dev": "dev"
     }
@@ -83,6 +85,7 @@ def init(name="default", mode="local", auto_instrument_llms=True, session=None,
     if session_id:
         enable_session_tracking()
         set_session_id(session_id)
+        set_session_details(session_name, user_id)
 
         if get_mode() in ["prod", "dev"]:
             try:
@@ -107,15 +110,15 @@ def init(name="default", mode="local", auto_instrument_llms=True, session=None,
                 )
             except Exception:
                 pass
-        else:
+        elif not is_exported_mode():
+            # In otlp and ingest modes the session row arrives with the spans.
             try:
-                from agensight.tracing.db import get_db
-                conn = get_db()
-                conn.execute(
-                    "INSERT OR IGNORE INTO sessions (id, started_at, session_name, user_id, metadata) VALUES (?, ?, ?, ?, ?)",
-                    (session_id, time.time(), session_name, user_id, json.dumps({}))
-                )
-                conn.commit()
+                from agensight.tracing.db import writer
+                with writer() as conn:
+                    conn.execute(
+                        "INSERT OR IGNORE INTO sessions (id, started_at, session_name, user_id, metadata) VALUES (?, ?, ?, ?, ?)",
+                        (session_id, time.time(), session_name, user_id, json.dumps({}))
+                    )
             except Exception:
                 pass
 
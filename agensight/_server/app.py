@@ -13,14 +13,20 @@ from .routes.config import config_router, config_bp
 from .routes.trace import trace_router, trace_bp
 from .routes.prompt import prompt_router, prompt_bp
 from .routes.metrics import metrics_router
+from .routes.analytics import analytics_router
+from .routes.live import live_router
+from .routes.search import search_router
+from .routes.otlp import otlp_router
 from fastapi.responses import FileResponse
+from .utils.compression import CompressionMiddleware
+from .utils.responses import FastJSONResponse
 # Import data migration utility
 from .migration_util import import_mock_data
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 # Create FastAPI app
-app = FastAPI(title="AgenSight API",debug=True)
+app = FastAPI(title="AgenSight API",debug=True, default_response_class=FastJSONResponse)
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -28,7 +34,10 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+# gzip or brotli for bodies above AGENSIGHT_COMPRESS_MIN_BYTES
+app.add_middleware(CompressionMiddleware)
 class NoCacheStaticFiles(StaticFiles):
     async def get_response(self, path, scope):
         response = await super().get_response(path, scope)
@@ -41,6 +50,11 @@ app.include_router(config_router, prefix="/api")
 app.include_router(trace_router, prefix="/api")
 app.include_router(prompt_router, prefix="/api")
 app.include_router(metrics_router, prefix="/api")
+app.include_router(analytics_router, prefix="/api")
+app.include_router(live_router, prefix="/api")
+app.include_router(search_router, prefix="/api")
+# OTLP exporters post to the standard path, outside /api
+app.include_router(otlp_router)
 # Create Flask app for backward compatibility
 flask_app = Flask(__name__)
 flask_app.register_blueprint(config_bp)
@@ -102,7 +116,27 @@ async def startup_event():
         logger.info(f"Configuration initialized with {len(config.get('agents', []))} agents")
     except Exception as e:
         logger.error(f"Error initializing configuration: {str(e)}")
+    # Bring traces.db and eval.db up to the current schema version
+    try:
+        from agensight.tracing.db import init_schema
+        from agensight.eval.storage.db import init_evals_schema
+        logger.info(f"traces.db at schema version {init_schema()}")
+        logger.info(f"eval.db at schema version {init_evals_schema()}")
+    except Exception as e:
+        logger.error(f"Error migrating trace databases: {str(e)}")
+    # Prune old traces in the background if AGENSIGHT_RETENTION_* is set
+    try:
+        from agensight.tracing.retention import start_retention
+        if start_retention():
+            logger.info("Trace retention enabled")
+    except Exception as e:
+        logger.error(f"Error starting trace retention: {str(e)}")
     logger.info("Server startup complete")
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Write out spans still queued by the OTLP receiver"""
+    from agensight.tracing.otlp import shutdown_ingestor
+    shutdown_ingestor(timeout=30)
 @app.get("/debug/data")
 async def debug_data():
     """Debug endpoint to check data import"""
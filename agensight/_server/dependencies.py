@@ -0,0 +1,23 @@
+"""
+FastAPI dependencies shared by the route modules.
+
+``trace_db`` and ``eval_db`` lend a route a pooled read-only connection for
+the duration of one request and return it to the pool afterwards. These
+pools are separate from the exporter's writer, so dashboard reads never
+queue behind span ingestion.
+"""
+import sqlite3
+from typing import Iterator
+
+import agensight.eval.storage.db as eval_storage
+import agensight.tracing.db as trace_storage
+
+
+def trace_db() -> Iterator[sqlite3.Connection]:
+    with trace_storage.read_only_reader() as conn:
+        yield conn
+
+
+def eval_db() -> Iterator[sqlite3.Connection]:
+    with eval_storage.read_only_reader() as conn:
+        yield conn
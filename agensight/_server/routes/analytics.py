@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+import sqlite3
+import time
+
+from ..dependencies import trace_db
+from agensight.tracing.sketches import DURATION, query_percentiles
+
+analytics_router = APIRouter(tags=["analytics"])
+
+DEFAULT_WINDOW_SECONDS = 3600
+TOKEN_KINDS = ("total", "prompt", "completion")
+
+
+def _parse_quantiles(quantiles: str) -> List[float]:
+    try:
+        values = [float(q) for q in quantiles.split(",") if q.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="quantiles must be comma-separated numbers")
+    if not values or any(not 0 <= q <= 1 for q in values):
+        raise HTTPException(status_code=400, detail="quantiles must be between 0 and 1")
+    return values
+
+
+def _time_range(since: Optional[float], until: Optional[float]):
+    until = until if until is not None else time.time()
+    since = since if since is not None else until - DEFAULT_WINDOW_SECONDS
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    return since, until
+
+
+@analytics_router.get("/analytics/latency")
+def latency_percentiles(
+    since: Optional[float] = Query(None, description="Unix time; defaults to one hour before until"),
+    until: Optional[float] = Query(None, description="Unix time; defaults to now"),
+    bucket: Optional[int] = Query(None, ge=1, description="Bucket width in seconds; omit for one bucket"),
+    span_name: Optional[str] = Query(None),
+    model: Optional[str] = Query(None),
+    quantiles: str = Query("0.5,0.9,0.99"),
+    conn: sqlite3.Connection = Depends(trace_db),
+):
+    """
+    Span duration percentiles (seconds) per time bucket, span name and model.
+
+    Answered from pre-aggregated sketches, so the cost does not grow with the
+    number of stored spans. Values are within 1% of the exact percentile.
+    """
+    since, until = _time_range(since, until)
+    try:
+        rows = query_percentiles(conn, [DURATION], since, until, _parse_quantiles(quantiles), bucket, span_name, model)
+    except sqlite3.DatabaseError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    for row in rows:
+        row.update(row.pop(DURATION))
+    return rows
+
+
+@analytics_router.get("/analytics/tokens")
+def token_percentiles(
+    since: Optional[float] = Query(None, description="Unix time; defaults to one hour before until"),
+    until: Optional[float] = Query(None, description="Unix time; defaults to now"),
+    bucket: Optional[int] = Query(None, ge=1, description="Bucket width in seconds; omit for one bucket"),
+    span_name: Optional[str] = Query(None),
+    model: Optional[str] = Query(None),
+    quantiles: str = Query("0.5,0.9,0.99"),
+    conn: sqlite3.Connection = Depends(trace_db),
+):
+    """
+    Total, prompt and completion token percentiles of LLM spans per time
+    bucket, span name and model.
+    """
+    since, until = _time_range(since, until)
+    metrics = [f"{kind}_tokens" for kind in TOKEN_KINDS]
+    try:
+        return query_percentiles(conn, metrics, since, until, _parse_quantiles(quantiles), bucket, span_name, model)
+    except sqlite3.DatabaseError as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import asyncio
+import json
+
+import agensight.tracing.db as trace_storage
+from agensight.tracing.live import Subscription, SpanTailer, broker
+
+live_router = APIRouter(tags=["live"])
+
+# Seconds between comments that keep idle connections open through proxies.
+KEEP_ALIVE_SECONDS = 15.0
+
+# Picks up spans exported by other processes. The exporter publishes
+# directly when it runs inside the server.
+tailer = SpanTailer(trace_storage.read_only_reader)
+
+
+def _event(name: str, data) -> str:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+@live_router.get("/live")
+async def live_spans(
+    request: Request,
+    session_id: Optional[str] = Query(None),
+    trace_id: Optional[str] = Query(None),
+):
+    """
+    Server-Sent Events stream of spans stored after the client connected.
+
+    Each ``span`` event carries one span's summary columns. A ``reset`` event
+    means the client fell behind and spans were dropped; refetch the trace or
+    session before relying on further events.
+    """
+    subscription = broker.subscribe(Subscription(asyncio.get_running_loop(), session_id, trace_id))
+    tailer.start()
+
+    async def stream():
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    span = await asyncio.wait_for(subscription.queue.get(), KEEP_ALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                if subscription.overflowed:
+                    while not subscription.queue.empty():
+                        subscription.queue.get_nowait()
+                    subscription.overflowed = False
+                    yield _event("reset", {"session_id": session_id, "trace_id": trace_id})
+                    continue
+                yield _event("span", span)
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from starlette.concurrency import run_in_threadpool
+import gzip
+import zlib
+
+from agensight.tracing.otlp import IngestQueueFull, OTLPUnavailable, decode_request, encode_response, get_ingestor
+
+otlp_router = APIRouter(tags=["otlp"])
+
+PROTOBUF_CONTENT_TYPE = "application/x-protobuf"
+JSON_CONTENT_TYPE = "application/json"
+
+# Seconds a client should wait before retrying when the writer is behind.
+RETRY_AFTER_SECONDS = 1
+
+
+def _decompress(body: bytes, encoding: str) -> bytes:
+    if encoding in ("", "identity"):
+        return body
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "deflate":
+        return zlib.decompress(body)
+    raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {encoding}")
+
+
+@otlp_router.post("/v1/traces")
+async def receive_traces(request: Request):
+    """
+    OTLP/HTTP trace receiver, protobuf or JSON, optionally gzip-compressed.
+
+    Spans are queued for the server's single writer and stored within
+    ``AGENSIGHT_INGEST_MAX_DELAY`` seconds. Answers 503 with ``Retry-After``
+    while the queue is full; OTLP exporters retry those.
+    """
+    content_type = request.headers.get("content-type", PROTOBUF_CONTENT_TYPE).split(";")[0].strip().lower()
+    if content_type not in (PROTOBUF_CONTENT_TYPE, JSON_CONTENT_TYPE):
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Type: {content_type}")
+    json_body = content_type == JSON_CONTENT_TYPE
+
+    body = await request.body()
+    try:
+        body = _decompress(body, request.headers.get("content-encoding", "").strip().lower())
+        # Parsing a large export takes a while; keep it off the event loop.
+        spans = await run_in_threadpool(decode_request, body, json_body)
+    except OTLPUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except (OSError, EOFError, zlib.error, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid OTLP request: {e}")
+
+    try:
+        get_ingestor().submit(spans)
+    except IngestQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+    return Response(content=encode_response(json_body), media_type=content_type)
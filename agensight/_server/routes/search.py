@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from typing import List, Optional
+import sqlite3
+
+from ..dependencies import trace_db
+from ..utils.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_offset_cursor, encode_offset_cursor
+from agensight.tracing.search import SEARCH_SOURCES, SearchUnavailable, match_expression, search_messages
+
+search_router = APIRouter(tags=["search"])
+
+DEFAULT_SEARCH_PAGE_SIZE = 20
+
+
+@search_router.get("/search")
+def search(
+    response: Response,
+    q: str = Query(..., min_length=1, description="Words that must all appear in the message"),
+    kind: Optional[List[str]] = Query(None, description="prompt, completion or tool; repeat for several"),
+    session_id: Optional[str] = Query(None),
+    trace_id: Optional[str] = Query(None),
+    raw: bool = Query(False, description="Treat q as an FTS5 query (phrases, OR, NOT, prefix*)"),
+    limit: int = Query(DEFAULT_SEARCH_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description=f"Value of the previous page's {NEXT_CURSOR_HEADER} header"),
+    conn: sqlite3.Connection = Depends(trace_db),
+):
+    """
+    Prompts, completions and tool calls containing ``q``, best match first,
+    each with a snippet that has the matches wrapped in ``<mark>`` tags.
+    """
+    unknown = set(kind or ()) - set(SEARCH_SOURCES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown kind: {', '.join(sorted(unknown))}")
+    query = q if raw else match_expression(q)
+    if not query:
+        raise HTTPException(status_code=400, detail="q must contain a search term")
+    offset = decode_offset_cursor(cursor)
+
+    try:
+        hits = search_messages(conn, query, kind, session_id, trace_id, limit + 1, offset)
+    except SearchUnavailable:
+        raise HTTPException(status_code=501, detail="Full-text search requires SQLite with FTS5")
+    except sqlite3.OperationalError as e:
+        if raw and "fts5" in str(e):
+            raise HTTPException(status_code=400, detail=f"Invalid search query: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    except sqlite3.DatabaseError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if len(hits) > limit:
+        hits = hits[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_offset_cursor(offset + limit)
+    return hits
@@ -1,15 +1,25 @@
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from typing import Dict, List, Optional, Any
 from flask import Blueprint, jsonify, request
 from opentelemetry.trace import SpanKind
 
-from agensight.tracing.db import get_db
+import agensight.tracing.db as trace_storage
+from agensight.utils.sqlite_pool import chunks, placeholders
+from agensight.tracing.span_classifier import is_llm_record
+from agensight.tracing.timeline import DEFAULT_WIDTH, MIN_BAR_PIXELS, build_timeline
+from agensight.tracing.trace_tree import TraceTree
 from agensight.tracing.utils import transform_trace_to_agent_view
+from agensight.tracing.view_cache import trace_version
 import sqlite3
 import json
+import os
 
 from ..data_source import data_source
+from ..dependencies import trace_db
+from ..utils.conditional import cached_view
+from ..utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, keyset_condition, paginate
+from ..utils.ranges import byte_range, partial_response
+from ..utils.responses import stream_rows
 from ..models import SpanDetails
 import logging
 
@@ -18,14 +28,39 @@ trace_bp = Blueprint('trace', __name__)
 logger = logging.getLogger(__name__)
 
 
+# Columns returned by the list endpoints unless ``full=true`` is passed.
+SESSION_LIST_COLUMNS = "id, name, session_name, user_id, started_at, ended_at"
+TRACE_LIST_COLUMNS = "id, session_id, name, started_at, ended_at, ended_at - started_at AS duration, total_tokens"
+
+# Widest chart a timeline is laid out for, in pixels.
+MAX_TIMELINE_WIDTH = 10000
+
+
+def _timeline_window(bounds, start: Optional[float], end: Optional[float]):
+    """The requested window, defaulting to ``bounds`` (first start, last end)."""
+    start = bounds[0] if start is None else start
+    end = bounds[1] if end is None else end
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    # A single instantaneous span still needs a window with some width.
+    return start, max(end, start + 1e-6)
+
+
 @trace_router.get("/sessions", tags=["sessions"])
 def list_sessions(
+    response: Response,
     user_id: Optional[str] = Query(None),
     session_name: Optional[str] = Query(None),
+    since: Optional[float] = Query(None, description="Only sessions started at or after this Unix time"),
+    until: Optional[float] = Query(None, description="Only sessions started before this Unix time"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description=f"Value of the previous page's {NEXT_CURSOR_HEADER} header"),
+    full: bool = Query(False, description="Return every column instead of the list projection"),
+    conn: sqlite3.Connection = Depends(trace_db),
 ):
     try:
-        conn = get_db()
-        query = "SELECT * FROM sessions WHERE 1=1"
+        columns = "*" if full else SESSION_LIST_COLUMNS
+        query = f"SELECT {columns} FROM sessions WHERE 1=1"
         params = []
 
         if user_id:
@@ -34,18 +69,27 @@ def list_sessions(
         if session_name:
             query += " AND session_name LIKE ?"
             params.append(f"%{session_name}%")
-
-        query += " ORDER BY started_at DESC"
-        rows = conn.execute(query, params).fetchall()
-        return [dict(row) for row in rows]
+        if since is not None:
+            query += " AND started_at >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND started_at < ?"
+            params.append(until)
+
+        condition, cursor_params = keyset_condition(cursor)
+        query += condition + " ORDER BY started_at DESC, id DESC LIMIT ?"
+        rows = conn.execute(query, params + cursor_params + [limit + 1]).fetchall()
+        page, next_cursor = paginate(rows, limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return page
 
     except sqlite3.DatabaseError as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @trace_router.get("/sessions/{session_id}", tags=["sessions"])
-def get_session(session_id: str):
+def get_session(session_id: str, conn: sqlite3.Connection = Depends(trace_db)):
     try:
-        conn = get_db()
         row = conn.execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Session not found")
@@ -55,20 +99,103 @@ def get_session(session_id: str):
 
 @trace_router.get("/sessions/{session_id}/traces", tags=["sessions"])
 def get_traces_for_session(session_id: str):
+    return stream_rows(
+        trace_storage.read_only_reader,
+        "SELECT * FROM traces WHERE session_id = ? ORDER BY started_at DESC", (session_id,)
+    )
+
+
+@trace_router.get("/sessions/{session_id}/timeline", tags=["sessions"])
+def get_session_timeline(
+    session_id: str,
+    start: Optional[float] = Query(None, description="Window start (Unix time); defaults to the first trace"),
+    end: Optional[float] = Query(None, description="Window end (Unix time); defaults to the end of the last trace"),
+    width: int = Query(DEFAULT_WIDTH, ge=1, le=MAX_TIMELINE_WIDTH, description="Chart width in pixels"),
+    min_px: float = Query(MIN_BAR_PIXELS, gt=0, le=100, description="Narrower traces are merged"),
+    conn: sqlite3.Connection = Depends(trace_db),
+):
+    """
+    The session's traces laid out for a chart ``width`` pixels wide. Runs of
+    traces too short to draw come back as aggregate bars; request their
+    ``expand`` window to zoom in.
+    """
     try:
-        conn = get_db()
-        rows = conn.execute("SELECT * FROM traces WHERE session_id = ? ORDER BY started_at DESC", (session_id,)).fetchall()
-        return [dict(row) for row in rows]
+        bounds = conn.execute(
+            "SELECT MIN(started_at), MAX(COALESCE(ended_at, started_at)) FROM traces WHERE session_id = ?",
+            (session_id,)
+        ).fetchone()
+        if bounds[0] is None:
+            raise HTTPException(status_code=404, detail="Session has no traces")
+        start, end = _timeline_window(bounds, start, end)
+        rows = conn.execute('''
+            SELECT id, NULL AS parent_id, name, started_at, ended_at, ended_at - started_at AS duration, total_tokens
+            FROM traces
+            WHERE session_id = ? AND started_at <= ? AND COALESCE(ended_at, started_at) >= ?
+        ''', (session_id, end, start)).fetchall()
+        items = build_timeline([dict(row) for row in rows], start, end, width, min_px, item_type="trace")
+        return {"session_id": session_id, "start": start, "end": end, "width": width,
+                "trace_count": len(rows), "items": items}
     except sqlite3.DatabaseError as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @trace_router.get("/traces")
-def list_traces():
+def list_traces(
+    response: Response,
+    session_id: Optional[str] = Query(None),
+    name: Optional[str] = Query(None, description="Substring of the trace name"),
+    since: Optional[float] = Query(None, description="Only traces started at or after this Unix time"),
+    until: Optional[float] = Query(None, description="Only traces started before this Unix time"),
+    min_duration: Optional[float] = Query(None, description="Seconds"),
+    min_tokens: Optional[int] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description=f"Value of the previous page's {NEXT_CURSOR_HEADER} header"),
+    full: bool = Query(False, description="Return every column instead of the list projection"),
+    conn: sqlite3.Connection = Depends(trace_db),
+):
     try:
-        conn = get_db()
-        rows = conn.execute("SELECT * FROM traces ORDER BY started_at DESC").fetchall()
-        return [dict(row) for row in rows]
+        columns = "*, ended_at - started_at AS duration" if full else TRACE_LIST_COLUMNS
+        query = f"SELECT {columns} FROM traces WHERE 1=1"
+        params = []
+
+        if session_id:
+            query += " AND session_id = ?"
+            params.append(session_id)
+        if name:
+            query += " AND name LIKE ?"
+            params.append(f"%{name}%")
+        if since is not None:
+            query += " AND started_at >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND started_at < ?"
+            params.append(until)
+        if min_duration is not None:
+            query += " AND ended_at - started_at >= ?"
+            params.append(min_duration)
+        if min_tokens is not None:
+            query += " AND total_tokens >= ?"
+            params.append(min_tokens)
+
+        condition, cursor_params = keyset_condition(cursor)
+        query += condition + " ORDER BY started_at DESC, id DESC LIMIT ?"
+        rows = conn.execute(query, params + cursor_params + [limit + 1]).fetchall()
+        page, next_cursor = paginate(rows, limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return page
+    except sqlite3.DatabaseError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@trace_router.get("/traces/{trace_id}")
+def get_trace(trace_id: str, conn: sqlite3.Connection = Depends(trace_db)):
+    """Full trace row, for views that need more than the list projection."""
+    try:
+        row = conn.execute("SELECT *, ended_at - started_at AS duration FROM traces WHERE id = ?", (trace_id,)).fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail="Trace not found")
+        return dict(row)
     except sqlite3.DatabaseError as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -80,115 +207,383 @@ logging.basicConfig(
     format="%(levelname)s [%(name)s] %(message)s"
 )
 
+# Rows written before span ids were taken from OpenTelemetry hold random
+# UUIDs with a random parent_id, so their tree can only be guessed from
+# insertion order.
+def _is_legacy_span_id(span_id: str) -> bool:
+    return len(span_id) != 16
+
+
+def _is_llm_child(child: Dict[str, Any], attributes: Dict[str, Any]) -> bool:
+    return child.get("kind") == str(SpanKind.CLIENT) or is_llm_record(child["name"], attributes)
+
+
+def _last_llm_child(children: List[Dict[str, Any]], attributes_of) -> Optional[Dict[str, Any]]:
+    """The LLM call among ``children`` that ended last; the later-started one on a tie."""
+    calls = [child for child in children if _is_llm_child(child, attributes_of(child))]
+    return max(reversed(calls), key=lambda c: c["ended_at"] or 0) if calls else None
+
+
+def _row_attributes(row) -> Dict[str, Any]:
+    try:
+        attributes = json.loads(row["attributes"] or "{}")
+    except ValueError:
+        return {}
+    return attributes if isinstance(attributes, dict) else {}
+
+
+def _find_llm_child(conn, span: Dict[str, Any]):
+    """The LLM call whose messages stand in for an INTERNAL span's own."""
+    if _is_legacy_span_id(span["id"]):
+        return conn.execute(
+            "SELECT * FROM spans WHERE rowid < ? ORDER BY rowid DESC LIMIT 1", (span["rowid"],)
+        ).fetchone()
+    children = conn.execute(
+        "SELECT * FROM spans WHERE parent_id = ? ORDER BY started_at", (span["id"],)
+    ).fetchall()
+    return _last_llm_child([dict(child) for child in children], _row_attributes)
+
+
+def _previous_rows(conn, rowids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """``_find_llm_child`` for many legacy spans at once, keyed by their rowid."""
+    previous = {}
+    for chunk in chunks(rowids):
+        rows = conn.execute(f'''
+            SELECT anchor.rowid AS anchor_rowid, prev.*
+            FROM spans AS anchor
+            JOIN spans AS prev ON prev.rowid = (SELECT MAX(rowid) FROM spans WHERE rowid < anchor.rowid)
+            WHERE anchor.rowid IN ({placeholders(chunk)})
+        ''', chunk).fetchall()
+        for row in rows:
+            row = dict(row)
+            previous[row.pop("anchor_rowid")] = row
+    return previous
+
+
+MESSAGE_TABLES = ("prompts", "completions", "tools")
+
+# Column of each message table holding the message body, and its other columns.
+CONTENT_COLUMNS = {"prompts": "content", "completions": "content", "tools": "arguments"}
+MESSAGE_COLUMNS = {
+    "prompts": "id, span_id, role, message_index",
+    "completions": "id, span_id, role, finish_reason, total_tokens, prompt_tokens, completion_tokens",
+    "tools": "id, span_id, name",
+}
+
+# Characters of each message body sent inline by the trace and span detail
+# views; the rest is fetched from /span/{id}/content. 0 sends whole bodies.
+PREVIEW_CHARS = int(os.getenv("AGENSIGHT_PREVIEW_CHARS", "1000"))
+# Tool arguments are JSON the agent view parses and compares, so they are
+# never cut.
+PREVIEW_TABLES = ("prompts", "completions")
+
+
+def _message_select(table: str, preview_chars: int) -> str:
+    body = CONTENT_COLUMNS[table]
+    size = f"COALESCE(length(CAST({body} AS BLOB)), 0) AS {body}_bytes"
+    if not preview_chars:
+        return f"{MESSAGE_COLUMNS[table]}, {body}, {size}, 0 AS truncated"
+    limit = int(preview_chars)
+    # Cut in SQL so whole bodies are never copied out of SQLite.
+    return (f"{MESSAGE_COLUMNS[table]}, substr({body}, 1, {limit}) AS {body}, {size}, "
+            f"COALESCE(length({body}) > {limit}, 0) AS truncated")
+
+
+def _fetch_span_messages(conn, span_ids: List[str], preview_chars: int = 0) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+    """
+    Prompts, completions and tools of every span in ``span_ids``, one query
+    per table. With ``preview_chars`` each prompt and completion is cut to
+    that many characters; ``content_bytes`` and ``truncated`` say how much
+    was left out.
+    """
+    messages = {span_id: {table: [] for table in MESSAGE_TABLES} for span_id in span_ids}
+    ids = list(messages)
+    for table in MESSAGE_TABLES:
+        columns = _message_select(table, preview_chars if table in PREVIEW_TABLES else 0)
+        for chunk in chunks(ids):
+            rows = conn.execute(
+                f"SELECT {columns} FROM {table} WHERE span_id IN ({placeholders(chunk)}) ORDER BY id", chunk
+            )
+            for row in rows:
+                message = dict(row)
+                message["truncated"] = bool(message["truncated"])
+                messages[row["span_id"]][table].append(message)
+    return messages
+
+
+def _model_from_attributes(attributes) -> str:
+    try:
+        attrs = json.loads(attributes) if isinstance(attributes, str) else attributes
+        return (
+            attrs.get("gen_ai.request.model") or
+            attrs.get("gen_ai.anthropic.model") or
+            attrs.get("gen_ai.request.model_name") or
+            "unknown"
+        )
+    except Exception:
+        return "unknown"
+
+
+def _span_details(conn, span: Dict[str, Any], preview_chars: int = 0) -> Dict[str, List[Dict[str, Any]]]:
+    child_row = _find_llm_child(conn, span) if span.get("kind") == str(SpanKind.INTERNAL) else None
+    child_id = child_row["id"] if child_row else None
+    messages = _fetch_span_messages(conn, [span["id"]] + ([child_id] if child_id else []), preview_chars)
+
+    result = messages[span["id"]]
+    if child_id:
+        child = messages[child_id]
+        if any(child.values()):
+            result = {table: child[table] or result[table] for table in MESSAGE_TABLES}
+    return result
+
+
 @trace_router.get("/span/{span_id}/details")
-def get_span_details(span_id: str):
+def get_span_details(
+    span_id: str,
+    request: Request,
+    preview_chars: int = Query(PREVIEW_CHARS, ge=0),
+    conn: sqlite3.Connection = Depends(trace_db),
+):
     try:
-        conn = get_db()
 
-        # Get the current span with rowid
         span_row = conn.execute("SELECT rowid, * FROM spans WHERE id = ?", (span_id,)).fetchone()
         if not span_row:
             raise HTTPException(status_code=404, detail="Span not found")
 
         span = dict(span_row)
-        rowid = span["rowid"]
-        span_kind = span.get("kind")
+        trace_id = span["trace_id"]
+        return cached_view(
+            request, "span_details", f"{span_id}:{preview_chars}", trace_id, trace_version(conn, trace_id),
+            lambda: _span_details(conn, span, preview_chars),
+        )
+
+    except HTTPException:
+        raise
+    except sqlite3.DatabaseError as e:     
+        raise HTTPException(status_code=500, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Fetch current span data
-        prompts = conn.execute("SELECT * FROM prompts WHERE span_id = ?", (span_id,)).fetchall()
-        completions = conn.execute("SELECT * FROM completions WHERE span_id = ?", (span_id,)).fetchall()
-        tools = conn.execute("SELECT * FROM tools WHERE span_id = ?", (span_id,)).fetchall()
 
-        if span_kind == str(SpanKind.INTERNAL):
-            prev_span_row = conn.execute("SELECT * FROM spans WHERE rowid = ?", (rowid - 1,)).fetchone()
-            if prev_span_row:
-                prev_span = dict(prev_span_row)
-                prev_span_id = prev_span["id"]
+CONTENT_KINDS = ("attributes",) + MESSAGE_TABLES
 
-                prev_prompts = conn.execute("SELECT * FROM prompts WHERE span_id = ?", (prev_span_id,)).fetchall()
-                prev_completions = conn.execute("SELECT * FROM completions WHERE span_id = ?", (prev_span_id,)).fetchall()
-                prev_tools = conn.execute("SELECT * FROM tools WHERE span_id = ?", (prev_span_id,)).fetchall()
 
+@trace_router.get("/span/{span_id}/content/{kind}")
+def get_span_content(
+    span_id: str,
+    kind: str,
+    request: Request,
+    id: Optional[int] = Query(None, description="Message id, for prompts, completions and tools"),
+    offset: Optional[int] = Query(None, ge=0),
+    length: Optional[int] = Query(None, ge=1),
+    conn: sqlite3.Connection = Depends(trace_db),
+):
+    """
+    Whole span attributes or one message body, or a byte range of it from
+    ``offset``/``length`` or a ``Range`` header.
+    """
+    if kind not in CONTENT_KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown content kind '{kind}'")
+    if kind == "attributes":
+        where, params, media_type = "FROM spans WHERE id = ?", (span_id,), "application/json"
+    else:
+        if id is None:
+            raise HTTPException(status_code=400, detail="id is required for message content")
+        where, params, media_type = f"FROM {kind} WHERE id = ? AND span_id = ?", (id, span_id), "text/plain; charset=utf-8"
+    column = CONTENT_COLUMNS.get(kind, kind)
+    try:
+        row = conn.execute(f"SELECT COALESCE(length(CAST({column} AS BLOB)), 0) {where}", params).fetchone()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Content not found")
+        total = row[0]
+        requested = byte_range(total, offset, length, request.headers.get("range"))
+        start, end = requested or (0, total)
+        # substr counts bytes, from 1, on a BLOB.
+        body = conn.execute(
+            f"SELECT substr(CAST({column} AS BLOB), ?, ?) {where}", (start + 1, end - start) + params
+        ).fetchone()[0]
+        return partial_response(bytes(body or b""), total, requested, media_type)
+    except sqlite3.DatabaseError as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-                if prev_prompts or prev_completions or prev_tools:
-                    prompts = prev_prompts or prompts
-                    completions = prev_completions or completions
-                    tools = prev_tools or tools
 
+SPAN_TREE_COLUMNS = "id, trace_id, parent_id, name, started_at, ended_at, duration, kind, status"
 
-        return {
-            "prompts": [dict(p) for p in prompts],
-            "completions": [dict(c) for c in completions],
-            "tools": [dict(t) for t in tools]
-        }
 
-    except sqlite3.DatabaseError as e:     
+@trace_router.get("/span/{span_id}/children")
+def get_span_children(span_id: str):
+    return stream_rows(
+        trace_storage.read_only_reader,
+        f"SELECT {SPAN_TREE_COLUMNS} FROM spans WHERE parent_id = ? ORDER BY started_at", (span_id,)
+    )
+
+
+@trace_router.get("/span/{span_id}/subtree")
+def get_span_subtree(span_id: str):
+    """The span and all of its descendants, each with its depth below ``span_id``."""
+    # The span itself is one of the subtree's rows, so an empty result is a
+    # missing span; no second connection is needed to check for it.
+    try:
+        return stream_rows(trace_storage.read_only_reader, f'''
+            WITH RECURSIVE subtree(id, depth) AS (
+                SELECT id, 0 FROM spans WHERE id = ?
+                UNION ALL
+                SELECT spans.id, subtree.depth + 1 FROM spans JOIN subtree ON spans.parent_id = subtree.id
+            )
+            SELECT {SPAN_TREE_COLUMNS}, depth FROM spans JOIN subtree USING (id)
+            ORDER BY started_at
+        ''', (span_id,), not_found="Span not found")
+    except sqlite3.DatabaseError as e:
         raise HTTPException(status_code=500, detail=str(e))
-    except Exception as e:
+
+
+@trace_router.get("/span/{span_id}/ancestors")
+def get_span_ancestors(span_id: str, conn: sqlite3.Connection = Depends(trace_db)):
+    """Parent chain of a span, nearest parent first."""
+    try:
+        rows = conn.execute(f'''
+            WITH RECURSIVE ancestors(id, distance) AS (
+                SELECT parent_id, 1 FROM spans WHERE id = ?
+                UNION ALL
+                SELECT spans.parent_id, ancestors.distance + 1 FROM spans JOIN ancestors ON spans.id = ancestors.id
+                WHERE spans.parent_id IS NOT NULL
+            )
+            SELECT {SPAN_TREE_COLUMNS}, distance FROM spans JOIN ancestors USING (id)
+            ORDER BY distance
+        ''', (span_id,)).fetchall()
+        return [dict(row) for row in rows]
+    except sqlite3.DatabaseError as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@trace_router.get("/traces/{trace_id}/timeline")
+def get_trace_timeline(
+    trace_id: str,
+    start: Optional[float] = Query(None, description="Window start (Unix time); defaults to the first span"),
+    end: Optional[float] = Query(None, description="Window end (Unix time); defaults to the end of the last span"),
+    width: int = Query(DEFAULT_WIDTH, ge=1, le=MAX_TIMELINE_WIDTH, description="Chart width in pixels"),
+    min_px: float = Query(MIN_BAR_PIXELS, gt=0, le=100, description="Narrower spans are merged"),
+    conn: sqlite3.Connection = Depends(trace_db),
+):
+    """
+    Spans of a trace overlapping the window, laid out for a chart ``width``
+    pixels wide: parents before children, with runs of sibling spans too
+    short to draw merged into aggregate bars. The response grows with the
+    width, not with the number of spans; expand an aggregate with
+    ``/traces/{trace_id}/timeline/expand``.
+    """
+    try:
+        bounds = conn.execute(
+            "SELECT MIN(started_at), MAX(COALESCE(ended_at, started_at)) FROM spans WHERE trace_id = ?", (trace_id,)
+        ).fetchone()
+        if bounds[0] is None:
+            raise HTTPException(status_code=404, detail="Trace has no spans")
+        start, end = _timeline_window(bounds, start, end)
+        rows = conn.execute(f'''
+            SELECT {SPAN_TREE_COLUMNS} FROM spans
+            WHERE trace_id = ? AND started_at <= ? AND COALESCE(ended_at, started_at) >= ?
+        ''', (trace_id, end, start)).fetchall()
+        items = build_timeline([dict(row) for row in rows], start, end, width, min_px)
+        return {"trace_id": trace_id, "start": start, "end": end, "width": width,
+                "span_count": len(rows), "items": items}
+    except sqlite3.DatabaseError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@trace_router.get("/traces/{trace_id}/timeline/expand")
+def expand_trace_timeline(
+    trace_id: str,
+    start: float = Query(..., description="The aggregate's expand.start"),
+    end: float = Query(..., description="The aggregate's expand.end"),
+    parent_id: Optional[str] = Query(None, description="The aggregate's expand.parent_id"),
+    width: int = Query(DEFAULT_WIDTH, ge=1, le=MAX_TIMELINE_WIDTH, description="Chart width in pixels"),
+    min_px: float = Query(MIN_BAR_PIXELS, gt=0, le=100, description="Narrower spans are merged"),
+    conn: sqlite3.Connection = Depends(trace_db),
+):
+    """
+    An aggregate bar's spans laid out across the full ``width``: the children
+    of ``parent_id`` starting inside the window, with their descendants.
+    Without ``parent_id`` (a run of top-level spans) this is the trace
+    timeline for the window.
+    """
+    if parent_id is None:
+        return get_trace_timeline(trace_id, start, end, width, min_px, conn)
+    try:
+        start, end = _timeline_window((start, end), start, end)
+        # The window ends where the aggregate's last member ends, which is
+        # where a back-to-back sibling outside it starts.
+        rows = conn.execute(f'''
+            WITH RECURSIVE subtree(id) AS (
+                SELECT id FROM spans
+                WHERE trace_id = ? AND parent_id = ? AND started_at >= ?
+                  AND (started_at < ? OR COALESCE(ended_at, started_at) <= ?)
+                UNION ALL
+                SELECT spans.id FROM spans JOIN subtree ON spans.parent_id = subtree.id
+                WHERE spans.trace_id = ?
+            )
+            SELECT {SPAN_TREE_COLUMNS} FROM spans JOIN subtree USING (id)
+        ''', (trace_id, parent_id, start, end, end, trace_id)).fetchall()
+        items = build_timeline([dict(row) for row in rows], start, end, width, min_px, parent_id=parent_id)
+        return {"trace_id": trace_id, "parent_id": parent_id, "start": start, "end": end, "width": width,
+                "span_count": len(rows), "items": items}
+    except sqlite3.DatabaseError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _structured_trace(conn, trace_id: str, preview_chars: int = 0) -> Dict[str, Any]:
+    spans = conn.execute("SELECT rowid, * FROM spans WHERE trace_id = ? ORDER BY started_at", (trace_id,)).fetchall()
+    spans = [dict(s) for s in spans]
+
+    span_details_by_id = {}
+    span_id_replacements = {}
+
+    tree = TraceTree.from_rows(spans)
+    internal = str(SpanKind.INTERNAL)
+    legacy_previous = _previous_rows(conn, [
+        span["rowid"] for span in spans
+        if span.get("kind") == internal and _is_legacy_span_id(span["id"])
+    ])
+
+    for span in spans:
+        if span.get("kind") != internal:
+            continue
+
+        # An agent step's prompts and completions live on the LLM call it made
+        if _is_legacy_span_id(span["id"]):
+            child = legacy_previous.get(span["rowid"])
+        else:
+            child = _last_llm_child(tree.children(span["id"]), lambda c: tree.attributes(c["id"]))
+        if child:
+            span_id_replacements[span["id"]] = child["id"]
+            span["model_used"] = _model_from_attributes(
+                tree.attributes(child["id"]) if child["id"] in tree else child["attributes"]
+            )
+
+    messages = _fetch_span_messages(
+        conn, [span_id_replacements.get(span["id"], span["id"]) for span in spans], preview_chars
+    )
+    for span in spans:
+        span_details_by_id[span["id"]] = messages[span_id_replacements.get(span["id"], span["id"])]
+
+    return transform_trace_to_agent_view(spans, span_details_by_id, tree)
 
 
 @trace_router.get("/traces/{trace_id}/spans")
-def get_structured_trace(trace_id: str):
+def get_structured_trace(
+    trace_id: str,
+    request: Request,
+    preview_chars: int = Query(PREVIEW_CHARS, ge=0),
+    conn: sqlite3.Connection = Depends(trace_db),
+):
     try:
-        conn = get_db()
-        spans = conn.execute("SELECT rowid, * FROM spans WHERE trace_id = ? ORDER BY started_at", (trace_id,)).fetchall()
-        spans = [dict(s) for s in spans]
-
-        span_details_by_id = {}
-        span_id_replacements = {}
-
-        for idx, span in enumerate(spans):
-            original_span_id = span["id"]
-            rowid = span["rowid"]
-            kind = span.get("kind")
-
-            if kind == str(SpanKind.INTERNAL):
-                logger.info(f"🔁 INTERNAL span → Checking previous row for span ID {original_span_id}")
-                prev_span_row = conn.execute(
-                    "SELECT * FROM spans WHERE rowid < ? ORDER BY rowid DESC LIMIT 1", (rowid,)
-                ).fetchone()
-                if prev_span_row:
-                    prev_span_id = prev_span_row["id"]
-                    spans[idx]["id"] = prev_span_id  # ✅ Replace early
-                    logger.info(f"   ↪ Replacing span ID {original_span_id} with previous span ID {prev_span_id}")
-
-                    # Extract model
-                    try:
-                        prev_attrs = json.loads(prev_span_row["attributes"])
-                        model = (
-                            prev_attrs.get("gen_ai.request.model") or
-                            prev_attrs.get("gen_ai.anthropic.model") or
-                            prev_attrs.get("gen_ai.request.model_name") or
-                            "unknown"
-                        )
-                    except Exception:
-                        model = "unknown"
-
-                    logger.info(f"🧠 Model used for INTERNAL span {original_span_id} (from {prev_span_id}): {model}")
-                    span["model_used"] = model
-
-
-        for span in spans:
-            effective_span_id = span_id_replacements.get(span["id"], span["id"])
-            prompts = conn.execute("SELECT * FROM prompts WHERE span_id = ?", (effective_span_id,)).fetchall()
-            completions = conn.execute("SELECT * FROM completions WHERE span_id = ?", (effective_span_id,)).fetchall()
-            tools = conn.execute("SELECT * FROM tools WHERE span_id = ?", (effective_span_id,)).fetchall()
-
-            span_details_by_id[span["id"]] = {
-                "prompts": [dict(p) for p in prompts],
-                "completions": [dict(c) for c in completions],
-                "tools": [dict(t) for t in tools],
-            }
-
-        structured = transform_trace_to_agent_view(spans, span_details_by_id)
-        return JSONResponse(content=structured)
+        return cached_view(
+            request, "structured_trace", f"{trace_id}:{preview_chars}", trace_id, trace_version(conn, trace_id),
+            lambda: _structured_trace(conn, trace_id, preview_chars),
+        )
 
     except sqlite3.DatabaseError as e:
         logger.error(f"❌ SQLite error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         logger.exception(f"❌ Unexpected error in get_structured_trace")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
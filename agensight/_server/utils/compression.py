@@ -0,0 +1,159 @@
+"""
+Negotiated response compression.
+
+``CompressionMiddleware`` compresses text and JSON bodies of at least
+``AGENSIGHT_COMPRESS_MIN_BYTES`` with brotli when the client accepts it and
+the optional ``brotli`` package is installed, and with gzip otherwise.
+Streamed bodies are compressed chunk by chunk and flushed after each one, so
+they still reach the client incrementally. Server-Sent Events, responses
+that already carry a ``Content-Encoding`` and partial (206) responses pass
+through untouched. A strong ``ETag`` on a compressed body gets the encoding
+appended, so the two representations never share one.
+"""
+import os
+import zlib
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("AGENSIGHT_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+# Brotli's higher qualities are far too slow to run per request.
+BROTLI_QUALITY = 4
+
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/javascript", "application/xml", "image/svg+xml",
+)
+# Status codes whose bodies are left alone.
+UNCOMPRESSED_STATUS = (204, 206, 304)
+# Appended inside a strong ETag's quotes when its body is compressed, since
+# each encoding is a different representation.
+ETAG_SUFFIXES = ("-br", "-gzip")
+
+
+def _accepted(accept_encoding: str) -> Dict[str, float]:
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """``"br"``, ``"gzip"`` or None for an ``Accept-Encoding`` header value."""
+    accepted = _accepted(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    candidates = (("br", "gzip") if brotli is not None else ("gzip",))
+    best = max(candidates, key=lambda name: accepted.get(name, wildcard))
+    return best if accepted.get(best, wildcard) > 0 else None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compress and flush, so everything so far can be decoded."""
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+class _Responder:
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self._send = send
+        self._encoding = encoding
+        self._minimum_size = minimum_size
+        self._start = None
+        self._compressor: Optional[_Compressor] = None
+        self._passthrough = False
+
+    def _should_compress(self, headers: MutableHeaders, body: bytes, more_body: bool) -> bool:
+        content_type = headers.get("content-type", "")
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        headers.add_vary_header("Accept-Encoding")
+        if "content-encoding" in headers or self._start["status"] in UNCOMPRESSED_STATUS:
+            return False
+        return more_body or len(body) >= self._minimum_size
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk shows how large it is.
+            self._start = message
+            return
+        if self._passthrough or self._start is None:
+            await self._send(message)
+            return
+        if self._compressor is None:
+            headers = MutableHeaders(raw=self._start["headers"])
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if (message["type"] != "http.response.body"
+                    or headers.get("content-type", "").startswith("text/event-stream")
+                    or not self._should_compress(headers, body, more_body)):
+                self._passthrough = True
+                await self._send(self._start)
+                await self._send(message)
+                return
+            self._compressor = _Compressor(self._encoding)
+            headers["Content-Encoding"] = self._encoding
+            etag = headers.get("etag")
+            if etag and etag.endswith('"') and not etag.startswith("W/"):
+                headers["ETag"] = etag[:-1] + "-" + self._encoding + '"'
+            if more_body:
+                del headers["Content-Length"]
+                await self._send(self._start)
+                await self._send({"type": "http.response.body", "body": self._compressor.chunk(body), "more_body": True})
+            else:
+                compressed = self._compressor.finish(body)
+                headers["Content-Length"] = str(len(compressed))
+                await self._send(self._start)
+                await self._send({"type": "http.response.body", "body": compressed})
+            return
+        if message.get("more_body", False):
+            data = self._compressor.chunk(message.get("body", b""))
+            if data:
+                await self._send({"type": "http.response.body", "body": data, "more_body": True})
+        else:
+            await self._send({"type": "http.response.body", "body": self._compressor.finish(message.get("body", b""))})
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _Responder(send, encoding, self.minimum_size))
@@ -0,0 +1,59 @@
+"""
+Conditional GET for per-trace views.
+
+``cached_view`` answers with 304 when the request's ``If-None-Match`` holds
+the view's current ETag. Otherwise it serves the body from
+``agensight.tracing.view_cache`` or renders it. ``Cache-Control: no-cache``
+makes browsers revalidate every time, which costs one index lookup.
+"""
+from typing import Any, Callable, Hashable, Optional
+
+from fastapi import Request, Response
+
+from agensight.tracing.view_cache import TraceVersion, make_etag, view_cache
+
+from .compression import ETAG_SUFFIXES
+from .responses import dumps
+
+CACHE_CONTROL = "no-cache"
+
+
+def _opaque_tag(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    # A compressed body's ETag carries its encoding; see CompressionMiddleware.
+    for suffix in ETAG_SUFFIXES:
+        if tag.endswith(suffix + '"'):
+            return tag[:-len(suffix) - 1] + '"'
+    return tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of ``etag`` against an ``If-None-Match`` value."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(_opaque_tag(tag) == etag for tag in if_none_match.split(","))
+
+
+def cached_view(request: Request, view: str, key: str, trace_id: str, version: TraceVersion,
+                render: Callable[[], Any]) -> Response:
+    """
+    ``render()``'s result for ``key`` as JSON, or 304 if the client has it.
+
+    Only views of completed traces are kept in the cache; one still being
+    written to would be replaced within seconds.
+    """
+    etag = make_etag(view, key, version)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    cache_key: Hashable = (view, key)
+    body = view_cache.get(cache_key, etag)
+    if body is None:
+        body = dumps(render())
+        if version.completed:
+            view_cache.put(cache_key, trace_id, etag, body)
+    return Response(content=body, media_type="application/json", headers=headers)
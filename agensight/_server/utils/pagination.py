@@ -0,0 +1,75 @@
+"""
+Keyset (cursor) pagination for list endpoints ordered by ``started_at DESC, id DESC``.
+
+A cursor is the ``(started_at, id)`` of the last row on a page, encoded as an
+opaque URL-safe string. The next page is everything strictly after it in
+that order, which SQLite answers from an index on ``(started_at, id)``
+without skipping over earlier rows the way ``OFFSET`` does.
+"""
+import base64
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = int(os.getenv("AGENSIGHT_API_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = 1000
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(started_at: Optional[float], row_id: str) -> str:
+    raw = json.dumps([started_at, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[float], str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        started_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if started_at is not None:
+            started_at = float(started_at)
+        return started_at, str(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_condition(cursor: Optional[str]) -> Tuple[str, List[Any]]:
+    """SQL condition (and params) selecting the rows after ``cursor``."""
+    if not cursor:
+        return "", []
+    started_at, row_id = decode_cursor(cursor)
+    if started_at is None:
+        # NULL start times sort last in DESC order. Every writer sets
+        # started_at, so rows without one are not worth an index-defeating OR.
+        return " AND started_at IS NULL AND id < ?", [row_id]
+    # A row-value comparison is answered with one range seek on (started_at, id).
+    return " AND (started_at, id) < (?, ?)", [started_at, row_id]
+
+
+def encode_offset_cursor(offset: int) -> str:
+    """Cursor for ranked lists, such as search results, that have no keyset order."""
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_offset_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = int(json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))["offset"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return offset
+
+
+def paginate(rows: Sequence[Any], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Trim a ``limit + 1`` row fetch to one page and the cursor of the next one."""
+    page = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit and page:
+        next_cursor = encode_cursor(page[-1].get("started_at"), page[-1]["id"])
+    return page, next_cursor
@@ -0,0 +1,68 @@
+"""
+Single byte ranges for content endpoints.
+
+``byte_range`` resolves either explicit ``offset``/``length`` query
+parameters or a ``Range: bytes=...`` header against a body's size.
+``partial_response`` builds the 200, 206 or 416 response for a body whose
+requested slice has already been read. Multi-range and malformed ``Range``
+headers are ignored, as RFC 9110 allows, and the whole body is sent.
+"""
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Response
+
+
+def _parse_range_header(header: str, total: int) -> Optional[Tuple[int, int]]:
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return None
+    try:
+        if not first:
+            # bytes=-N is the last N bytes.
+            suffix = int(last)
+            if suffix <= 0:
+                return None
+            return max(0, total - suffix), total
+        start = int(first)
+        end = int(last) + 1 if last else total
+    except ValueError:
+        return None
+    # An open range starting at or past the end is unsatisfiable, not invalid.
+    if start < 0 or (last and end <= start):
+        return None
+    return start, min(end, total)
+
+
+def byte_range(total: int, offset: Optional[int] = None, length: Optional[int] = None,
+               range_header: Optional[str] = None) -> Optional[Tuple[int, int]]:
+    """
+    ``(start, end)`` of the requested slice, end exclusive, or None for the
+    whole body. Raises 416 when the slice starts past the end.
+    """
+    if offset is not None or length is not None:
+        start = offset or 0
+        end = total if length is None else min(total, start + length)
+    elif range_header:
+        parsed = _parse_range_header(range_header, total)
+        if parsed is None:
+            return None
+        start, end = parsed
+    else:
+        return None
+    if start >= total and (start > 0 or total > 0):
+        raise HTTPException(status_code=416, detail="Range not satisfiable",
+                            headers={"Content-Range": f"bytes */{total}"})
+    return start, end
+
+
+def partial_response(body: bytes, total: int, span: Optional[Tuple[int, int]], media_type: str) -> Response:
+    """200 with the whole ``body``, or 206 when ``span`` selects part of it."""
+    headers = {"Accept-Ranges": "bytes"}
+    if span is None or span == (0, total):
+        return Response(content=body, media_type=media_type, headers=headers)
+    start, end = span
+    headers["Content-Range"] = f"bytes {start}-{end - 1}/{total}"
+    return Response(content=body, status_code=206, media_type=media_type, headers=headers)
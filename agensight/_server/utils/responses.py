@@ -0,0 +1,83 @@
+"""
+JSON encoding for API responses.
+
+``dumps`` uses orjson when it is installed and the stdlib encoder otherwise.
+``FastJSONResponse`` is the app's default response class; routes that
+return large bodies should return one directly, since FastAPI otherwise runs
+the result through ``jsonable_encoder`` first, which costs more than the
+encoding itself.
+
+``stream_rows`` sends a query's rows as a JSON array a chunk at a time, so
+neither the full list of dicts nor the full body is ever held in memory.
+The query runs and its first chunk is read before the response starts, so a
+failing query still gets an error status; a failure while reading a later
+chunk can only cut the body short, since the 200 has already been sent.
+"""
+import json
+import os
+from typing import Any, Callable, ContextManager, Iterator, Optional, Sequence, Union
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Rows encoded per chunk of a streamed response.
+STREAM_CHUNK_ROWS = int(os.getenv("AGENSIGHT_STREAM_CHUNK_ROWS", "500"))
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode("utf-8", errors="replace")
+    return str(value)
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(content: Any) -> bytes:
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _array_chunks(open_connection: Callable[[], ContextManager], sql: str, params: Sequence) -> Iterator[Union[bool, bytes]]:
+    # The connection is opened here rather than taken from the request's
+    # dependency, which may be handed back before the body is sent.
+    with open_connection() as conn:
+        cursor = conn.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        rows = cursor.fetchmany(STREAM_CHUNK_ROWS)
+        # Whether there are any rows, before anything is sent.
+        yield bool(rows)
+        yield b"["
+        separator = b""
+        while rows:
+            yield separator + dumps([dict(zip(columns, row)) for row in rows])[1:-1]
+            separator = b","
+            rows = cursor.fetchmany(STREAM_CHUNK_ROWS)
+        yield b"]"
+
+
+def stream_rows(open_connection: Callable[[], ContextManager], sql: str, params: Sequence = (),
+                not_found: Optional[str] = None) -> StreamingResponse:
+    """Stream the rows of ``sql`` as a JSON array of objects.
+
+    Raises the query's ``sqlite3.DatabaseError`` here rather than mid-body.
+    With ``not_found`` set, no rows is a 404 with that detail instead of ``[]``.
+    """
+    chunks = _array_chunks(open_connection, sql, params)
+    found = next(chunks)
+    if not found and not_found is not None:
+        chunks.close()
+        raise HTTPException(status_code=404, detail=not_found)
+    return StreamingResponse(chunks, media_type="application/json")
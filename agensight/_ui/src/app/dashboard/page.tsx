@@ -50,7 +50,8 @@ import {
   ConfigVersion,
 } from '@/lib/services/config';
 import { updateAgent } from '@/lib/services/agents';
-import { getAllTraces } from '@/lib/services/traces';
+import { getTracesPage } from '@/lib/services/traces';
+import { useListPages } from '@/hooks/use-list-pages';
 import type { Connection } from '@/lib/fallbackConfigs';
 import Image from 'next/image';
 import { MetricsTable } from '@/components/metrics-table';
@@ -233,21 +234,17 @@ export default function Dashboard() {
 
   // Use React Query for traces
   const {
-    data: tracesData,
+    rows: tracesData,
     isLoading: tracesQueryLoading,
-    error: tracesError,
+    hasNextPage: hasMoreTraces,
+    fetchNextPage: fetchMoreTraces,
+    isFetchingNextPage: fetchingMoreTraces,
     refetch: refetchTraces,
-  } = useQuery({
-    queryKey: ['traces'],
-    queryFn: getAllTraces,
-    enabled: activeTab === 'traces',
-  });
+  } = useListPages(['traces'], getTracesPage, activeTab === 'traces');
 
   // Update traces state when data changes
   useEffect(() => {
-    if (tracesData) {
-      setTraces(tracesData);
-    }
+    setTraces(tracesData);
   }, [tracesData]);
 
   // Replace existing fetch function with mutation call
@@ -535,7 +532,12 @@ export default function Dashboard() {
                   </div>
                 ) : traces && traces.length > 0 ? (
                   <div className="flex-1 flex flex-col h-full">
-                    <TracesTable data={traces} />
+                    <TracesTable
+                      data={traces}
+                      hasMore={hasMoreTraces}
+                      loadingMore={fetchingMoreTraces}
+                      onLoadMore={() => fetchMoreTraces()}
+                    />
                   </div>
                 ) : (
                   <div className="text-center flex items-center justify-center h-full">
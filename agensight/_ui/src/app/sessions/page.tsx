@@ -1,11 +1,12 @@
 'use client';
 
 import {
-  getAllSessions,
+  getSessionsPage,
   getSingleSessionTraces,
   getSpans,
 } from '@/lib/services/traces';
-import { useQuery } from '@tanstack/react-query';
+import { useListPages } from '@/hooks/use-list-pages';
+import { useLiveList } from '@/hooks/use-live-spans';
 import React, { useCallback, useMemo } from 'react';
 import { ReactTable } from '@/components/ReactTable';
 import { ColumnDef } from '@tanstack/react-table';
@@ -18,18 +19,18 @@ import {
 } from '@/components/ui/tooltip';
 import { IconInfoCircle } from '@tabler/icons-react';
 import SessionDetailsSheet from '@/components/session/session-details-sheet';
+import { Button } from '@/components/ui/button';
 import { useState, useEffect } from 'react';
 
 export default function Sessions() {
   const {
-    data: sessionsData,
+    rows: sessionsData,
     isLoading: sessionsLoading,
-    error: sessionsError,
-    refetch: refetchSessions,
-  } = useQuery({
-    queryKey: ['config-sessions'],
-    queryFn: getAllSessions,
-  });
+    hasNextPage,
+    fetchNextPage,
+    isFetchingNextPage,
+  } = useListPages(['config-sessions'], getSessionsPage);
+  useLiveList(['config-sessions'], getSessionsPage, (span) => span.session_id);
 
   const router = useRouter();
   const [page, setPage] = React.useState(0);
@@ -142,6 +143,17 @@ export default function Sessions() {
           setSheetOpen(true);
         }}
       />
+      {hasNextPage && (
+        <div className="flex justify-center mt-4">
+          <Button
+            variant="outline"
+            onClick={() => fetchNextPage()}
+            disabled={isFetchingNextPage}
+          >
+            {isFetchingNextPage ? 'Loading...' : 'Load more sessions'}
+          </Button>
+        </div>
+      )}
       {/* Sidesheet for session details */}
       <SessionDetailsSheet
         session={selectedSession}
@@ -1,8 +1,9 @@
 'use client'
 
 import { TracesTable } from '@/components/traces-table';
-import { getAllTraces } from '@/lib/services/traces';
-import { useQuery } from '@tanstack/react-query';
+import { getTracesPage } from '@/lib/services/traces';
+import { useListPages } from '@/hooks/use-list-pages';
+import { useLiveList } from '@/hooks/use-live-spans';
 import Image from 'next/image';
 import React from 'react'
 import { Header } from '../../components/Header';
@@ -13,15 +14,14 @@ function Traces() {
   const { open } = useSidebar();
   // Use React Query for traces
   const {
-    data: tracesData,
+    rows: tracesData,
     isLoading: tracesQueryLoading,
-    error: tracesError,
-    refetch: refetchTraces,
-  } = useQuery({
-    queryKey: ['traces'],
-    queryFn: getAllTraces,
-
-  });
+    hasNextPage,
+    fetchNextPage,
+    isFetchingNextPage,
+  } = useListPages(['traces'], getTracesPage);
+  // New traces and the end times of running ones show up as they are stored.
+  useLiveList(['traces'], getTracesPage, (span) => span.trace_id);
 
   return (
     <div className={`flex flex-col h-full ${open ? 'ml-0' : 'ml-18'}`}>
@@ -35,7 +35,12 @@ function Traces() {
             </div>
           ) : tracesData && tracesData.length > 0 ? (
             <div className="flex-1 flex flex-col h-full">
-              <TracesTable data={tracesData} />
+              <TracesTable
+                data={tracesData}
+                hasMore={hasNextPage}
+                loadingMore={isFetchingNextPage}
+                onLoadMore={() => fetchNextPage()}
+              />
             </div>
           ) : (
             <div className="text-center flex items-center justify-center h-full">
@@ -1,5 +1,8 @@
 import {GanttChartProps,ToolCall,Span,GanttChartVisualizerProps} from "@/types/type"
-import { useState, useEffect, useMemo } from "react";
+import { useState, useEffect, useMemo, useRef } from "react";
+import { useQuery } from "@tanstack/react-query";
+import { expandTimelineAggregate, getTraceTimeline, TimelineItem } from "@/lib/services/traces";
+import { barPosition, timeMarks, useChartWidth, useTimelineZoom } from "@/hooks/use-timeline";
 import { Button } from "@/components/ui/button";
 import { IconArrowLeft } from "@tabler/icons-react";
 
@@ -375,209 +378,179 @@ export function GanttChart({ spans, trace }: GanttChartProps) {
 
 
 
-  export function GanttChartVisualizer({ spans, trace, onSelectSpan, onSelectTool, selectedSpanId }: GanttChartVisualizerProps) {
-    const [focusedSpanIndex, setFocusedSpanIndex] = useState<number>(-1);
-    
-    console.log({spans, trace, onSelectSpan, onSelectTool, selectedSpanId})
+  // Deterministic colour per span name, so a name keeps its colour across
+  // refreshes and zooms.
+  const NAME_COLORS = [
+    "#FF5733", "#33FF57", "#3357FF", "#FF33A8", "#33FFF5",
+    "#FFD133", "#8C33FF", "#33FFBD", "#FF3333", "#3333FF"
+  ];
+
+  function colorForName(name: string): string {
+    let hash = 0;
+    for (let i = 0; i < name.length; i++) {
+      hash = (hash * 31 + name.charCodeAt(i)) | 0;
+    }
+    return NAME_COLORS[Math.abs(hash) % NAME_COLORS.length];
+  }
+
+  function itemTitle(item: TimelineItem): string {
+    if (item.type === "aggregate") {
+      const names = Object.entries(item.names).map(([name, count]) => `${name} ×${count}`).join(", ");
+      return `${item.span_count} spans, ${item.total_duration.toFixed(2)}s in total (${names}). Click to zoom in.`;
+    }
+    const nested = item.hidden_descendants > 0 ? ` (+${item.hidden_descendants} nested)` : "";
+    return `${item.name}: ${Number(item.duration ?? 0).toFixed(2)}s${nested}`;
+  }
+
+  // The trace's spans as laid out by the server for the chart's width. Spans
+  // too short to draw arrive merged into aggregate bars; clicking one lays
+  // just its window out again at full width.
+  export function GanttChartVisualizer({ traceId, spans, onSelectSpan, selectedSpanId }: GanttChartVisualizerProps) {
+    const containerRef = useRef<HTMLDivElement>(null);
+    const width = useChartWidth(containerRef);
+    const [focusedIndex, setFocusedIndex] = useState<number>(-1);
+    const [expandError, setExpandError] = useState<string | null>(null);
+
+    const { data: timeline, isLoading } = useQuery({
+      queryKey: ["trace-timeline", traceId, width],
+      queryFn: () => getTraceTimeline(traceId, width),
+    });
+    const zoom = useTimelineZoom(timeline);
+    const current = zoom.current;
+    const items = current?.items ?? [];
+
+    // Only the structured trace's agent spans have details to show.
+    const agentsById = useMemo(() => new Map(spans.map(span => [span.span_id, span])), [spans]);
+
+    const activate = async (item: TimelineItem) => {
+      if (item.type === "aggregate") {
+        try {
+          setExpandError(null);
+          zoom.push(await expandTimelineAggregate(traceId, item, width));
+          setFocusedIndex(-1);
+        } catch (error) {
+          setExpandError(error instanceof Error ? error.message : "Could not load these spans");
+        }
+        return;
+      }
+      const agent = agentsById.get(item.id);
+      if (agent) onSelectSpan(agent);
+    };
 
     // Handle keyboard navigation
     useEffect(() => {
       const handleKeyDown = (e: KeyboardEvent) => {
-        if (!spans.length) return;
-        
-        const allSpans = [...spans];
-        
+        if (!items.length) return;
         switch (e.key) {
           case 'ArrowUp':
             e.preventDefault();
-            setFocusedSpanIndex(prev => {
-              const newIndex = prev <= 0 ? allSpans.length - 1 : prev - 1;
-              return newIndex;
-            });
+            setFocusedIndex(prev => prev <= 0 ? items.length - 1 : prev - 1);
             break;
           case 'ArrowDown':
             e.preventDefault();
-            setFocusedSpanIndex(prev => {
-              const newIndex = prev >= allSpans.length - 1 ? 0 : prev + 1;
-              return newIndex;
-            });
+            setFocusedIndex(prev => prev >= items.length - 1 ? 0 : prev + 1);
             break;
           case 'Enter':
-            if (focusedSpanIndex >= 0 && focusedSpanIndex < allSpans.length) {
-              onSelectSpan(allSpans[focusedSpanIndex]);
+            if (focusedIndex >= 0 && focusedIndex < items.length) {
+              activate(items[focusedIndex]);
             }
             break;
           case 'Escape':
-            // Clear selection (handled by parent)
+            if (zoom.zoomed) zoom.back();
             break;
         }
       };
       
       window.addEventListener('keydown', handleKeyDown);
       return () => window.removeEventListener('keydown', handleKeyDown);
-    }, [spans, focusedSpanIndex, onSelectSpan]);
-    
-    // Generate processed timeline data
-    const timelineData = useMemo(() => {
-      if (!spans.length || !trace) return null;
-      
-      // Find the earliest start time and latest end time
-      const startTime = Math.min(...spans.map(span => span.start_time));
-      const endTime = Math.max(...spans.map(span => span.end_time));
-      
-      // Calculate total duration for scaling
-      const totalDuration = endTime - startTime;
-      
-      // Generate time marks (5 evenly spaced time points)
-      const timeMarks = [];
-      for (let i = 0; i <= 5; i++) {
-        const time = startTime + (i * totalDuration / 5);
-        timeMarks.push(new Date(time * 1000).toLocaleTimeString([], {
-          hour: '2-digit',
-          minute: '2-digit',
-          second: '2-digit'
-        }));
-      }
-      
-      // Generate a unique color for each span
-      const spanColors: Record<string, string> = {};
-      
-      // Predefined vibrant colors to cycle through
-      const colorPalette = [
-        "#FF5733", "#33FF57", "#3357FF", "#FF33A8", "#33FFF5",
-        "#FFD133", "#8C33FF", "#FF5733", "#33FFBD", "#FF3333",
-        "#33FF33", "#3333FF", "#FF33FF", "#33FFFF", "#FFFF33"
-      ];
-      
-      // Assign colors to each span - randomly but consistently based on span ID
-      spans.forEach((span, index) => {
-        // Use modulo to cycle through colors for more spans than colors
-        const baseColor = colorPalette[index % colorPalette.length];
-        
-        // Slightly vary the color to make each unique
-        const r = parseInt(baseColor.slice(1, 3), 16);
-        const g = parseInt(baseColor.slice(3, 5), 16);
-        const b = parseInt(baseColor.slice(5, 7), 16);
-        
-        // Apply a slight random variation to ensure uniqueness
-        const variation = Math.floor(Math.random() * 30) - 15;
-        const newR = Math.min(255, Math.max(0, r + variation));
-        const newG = Math.min(255, Math.max(0, g + variation));
-        const newB = Math.min(255, Math.max(0, b + variation));
-        
-        spanColors[span.span_id] = `rgb(${newR}, ${newG}, ${newB})`;
-      });
-      
-      // Function to get color for a specific span
-      const getColorForSpan = (spanId: string): string => {
-        return spanColors[spanId] || "#10B981"; // Default green if not found
-      };
-      
-      return {
-        startTime,
-        endTime,
-        totalDuration,
-        timeMarks,
-        spanColors,
-        getColorForSpan
-      };
-    }, [spans, trace]);
-    
-    // If no data, show loading or empty state
-    if (!timelineData) {
+    }, [items, focusedIndex, zoom.zoomed]);
+
+    const legend = useMemo(
+      () => Array.from(new Set(items.flatMap(item => item.type === "aggregate" ? [] : [item.name as string]))).slice(0, 10),
+      [items]
+    );
+
+    // The container is always rendered so its width can be measured.
+    if (isLoading || !current || items.length === 0) {
       return (
-        <div className="h-full flex items-center justify-center text-muted-foreground">
-          <p>No timeline data available</p>
+        <div ref={containerRef} className="h-full w-full flex items-center justify-center text-muted-foreground">
+          <p>{isLoading ? "Loading timeline..." : "No timeline data available"}</p>
         </div>
       );
     }
-    
-    // Map spans by actor (categorized as user or agent)
-    const userSpans = spans.filter(span => span.name.toLowerCase().includes("user") || span.name.toLowerCase().includes("input"));
-    const agentSpans = spans.filter(span => !userSpans.includes(span));
-    
+
+    const marks = timeMarks(current);
+
     return (
-      <div className="h-full w-full flex flex-col">
+      <div ref={containerRef} className="h-full w-full flex flex-col">
+        {zoom.zoomed && (
+          <div className="flex items-center gap-2 mb-1">
+            <Button
+              variant="ghost"
+              size="sm"
+              className="h-6 px-2 text-xs flex items-center gap-1"
+              onClick={() => zoom.back()}
+            >
+              <IconArrowLeft size={12} />
+              <span>Back</span>
+            </Button>
+            <span className="text-xs text-muted-foreground">Zoomed in</span>
+          </div>
+        )}
+        {expandError && <div className="text-xs text-destructive mb-1">{expandError}</div>}
+
         {/* Time axis */}
         <div className="flex justify-between mb-1 text-xs text-muted-foreground sticky top-0 bg-background z-10 pb-0.5" suppressHydrationWarning>
-          {timelineData.timeMarks.map((mark, i) => (
+          {marks.map((mark, i) => (
             <div key={i} suppressHydrationWarning>{mark}</div>
           ))}
         </div>
         
         {/* Chart container */}
         <div className="flex-1 relative">
-          {/* Scrollable content area */}
           <div className="h-full overflow-y-auto">
-            {/* Grid lines and spans container */}
             <div className="relative min-h-full">
               {/* Vertical grid lines */}
-              {timelineData.timeMarks.map((_, i) => (
+              {marks.map((_, i) => (
                 <div 
                   key={i} 
                   className="absolute top-0 bottom-0 border-r border-dashed border-muted-foreground/20" 
                   style={{ left: `${(i / 5) * 100}%` }}
                 />
               ))}
-              
-              {/* Rows for user spans */}
-              {userSpans.map((span, i) => {
-                const isUserFocused = focusedSpanIndex === spans.indexOf(span);
-                const isSelected = selectedSpanId === span.span_id;
-                
+
+              <div className="space-y-0">
+              {items.map((item, i) => {
+                const isFocused = focusedIndex === i;
+                const isAggregate = item.type === "aggregate";
+                const isSelected = !isAggregate && selectedSpanId === item.id;
+                const position = barPosition(item.started_at, item.ended_at, current);
+                const label = isAggregate ? `${item.count} short spans` : item.name;
+
                 return (
                   <div 
-                    key={`user-${span.span_id}`} 
-                    className={`flex items-center ${isUserFocused ? 'bg-muted/30 -mx-4 px-4' : ''} mb-0.5`}
+                    key={isAggregate ? `aggregate-${item.parent_id}-${item.started_at}` : item.id}
+                    className={`flex items-center ${isFocused ? 'bg-muted/30 -mx-4 px-4' : ''} h-5 mb-3`}
                     tabIndex={0}
-                    onFocus={() => setFocusedSpanIndex(spans.indexOf(span))}
+                    onFocus={() => setFocusedIndex(i)}
                   >
-                    <div className="w-32 text-right pr-3 text-sm">user</div>
-                    <div className="flex-1 relative h-5">
-                      <div 
-                        className={`absolute h-full rounded-sm hover:h-7 hover:-top-1 transition-all duration-75 cursor-pointer ${isSelected ? 'ring-2 ring-primary' : ''}`}
-                        style={{
-                          backgroundColor: timelineData.getColorForSpan(span.span_id),
-                          left: `${((span.start_time - timelineData.startTime) / timelineData.totalDuration) * 100}%`,
-                          width: `${(span.duration / timelineData.totalDuration) * 100}%`,
-                          minWidth: "8px",
-                          zIndex: 10
-                        }}
-                        title={`${span.name}: ${span.duration.toFixed(2)}s`}
-                        onClick={() => onSelectSpan(span)}
-                      />
+                    <div
+                      className="w-32 text-right pr-3 text-sm truncate"
+                      style={{ paddingLeft: `${item.depth * 8}px` }}
+                    >
+                      {label}
                     </div>
-                  </div>
-                );
-              })}
-              
-              {/* Rows for agent spans */}
-              <div className="mt-5 space-y-0">
-              {agentSpans.map((span, i) => {
-                const isAgentFocused = focusedSpanIndex === spans.indexOf(span);
-                const isSelected = selectedSpanId === span.span_id;
-                
-                return (
-                  <div 
-                    key={`agent-${span.span_id}`} 
-                      className={`flex items-center ${isAgentFocused ? 'bg-muted/30 -mx-4 px-4' : ''} h-5 my-0 py-0 mb-3 ${i < agentSpans.length - 1 ? 'border-b border-dotted border-muted-foreground/20 pb-3' : ''}`}
-                    tabIndex={0}
-                    onFocus={() => setFocusedSpanIndex(spans.indexOf(span))}
-                  >
-                    <div className="w-32 text-right pr-3 text-sm truncate">{span.name}</div>
-                      <div className="flex-1 relative h-5">
-                      {/* For each agent span */}
+                    <div className="flex-1 relative h-5">
                       <div 
-                          className={`absolute h-full rounded-sm hover:h-7 hover:-top-1 transition-all duration-75 cursor-pointer ${isSelected ? 'ring-2 ring-primary' : ''}`}
+                        className={`absolute h-full rounded-sm hover:h-7 hover:-top-1 transition-all duration-75 cursor-pointer ${isSelected ? 'ring-2 ring-primary' : ''} ${isAggregate ? 'border border-dashed border-muted-foreground bg-muted-foreground/40' : ''}`}
                         style={{
-                          backgroundColor: timelineData.getColorForSpan(span.span_id),
-                          left: `${((span.start_time - timelineData.startTime) / timelineData.totalDuration) * 100}%`,
-                          width: `${(span.duration / timelineData.totalDuration) * 100}%`,
+                          ...position,
+                          backgroundColor: isAggregate ? undefined : colorForName(item.name),
                           minWidth: "8px",
                           zIndex: 10
                         }}
-                        title={`${span.name}: ${span.duration.toFixed(2)}s`}
-                        onClick={() => onSelectSpan(span)}
+                        title={itemTitle(item)}
+                        onClick={() => activate(item)}
                       />
                     </div>
                   </div>
@@ -590,15 +563,13 @@ export function GanttChart({ spans, trace }: GanttChartProps) {
         
         {/* Legend */}
         <div className="mt-2 flex flex-wrap gap-3 py-2 text-xs border-t">
-          {/* Show span types in the legend */}
-          {agentSpans.map(span => (
-            span.name !== "Assistant" && 
-            <div key={`legend-${span.span_id}`} className="flex items-center gap-1">
-              <span className="w-3 h-3 rounded-full block" style={{ backgroundColor: timelineData.getColorForSpan(span.span_id) }}></span>
-              <span className="text-xs">{span.name}</span>
+          {legend.map(name => (
+            <div key={`legend-${name}`} className="flex items-center gap-1">
+              <span className="w-3 h-3 rounded-full block" style={{ backgroundColor: colorForName(name) }}></span>
+              <span className="text-xs">{name}</span>
             </div>
           ))}
         </div>
       </div>
     );
-  }
\ No newline at end of file
+  }
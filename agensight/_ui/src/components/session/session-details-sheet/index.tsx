@@ -3,7 +3,8 @@
 import type React from "react"
 
 import { useState, useEffect } from "react"
-import { useQuery } from "@tanstack/react-query"
+import { useQueries, useQuery, useQueryClient } from "@tanstack/react-query"
+import { useLiveSpans } from "@/hooks/use-live-spans"
 import { useRouter } from "next/navigation"
 import { Sheet, SheetContent, SheetHeader, SheetTitle, SheetTrigger } from "@/components/ui/sheet"
 import { Tabs, TabsList, TabsTrigger, TabsContent } from "@/components/ui/tabs"
@@ -50,25 +51,46 @@ function SessionDetailsSheet({
     enabled: !!session?.id && sheetOpen,
   });
 
-  // Fetch all spans for all traces in parallel
-  const { data: tracesWithSpans, isLoading: loadingTracesWithSpans } = useQuery({
-    queryKey: ["session-traces-with-spans", traces?.map((t: any) => t.id)],
-    enabled: !!traces && traces.length > 0,
-    queryFn: async () => {
-      if (!traces) return [];
-      const results = await Promise.all(
-        traces.map(async (trace: any) => {
-          try {
-            const traceData = await getTraceById(trace.id);
-            // Prefer traceData.spans, fallback to traceData.agents
-            return { ...trace, spans: traceData.spans || traceData.agents || [] };
-          } catch {
-            return { ...trace, spans: [] };
-          }
-        })
-      );
-      return results;
+  // The structured trace of every trace in the session, one query each so
+  // a live update refetches only the trace it belongs to
+  const traceQueries = useQueries({
+    queries: (traces || []).map((trace: any) => ({
+      queryKey: ["trace", trace.id],
+      queryFn: () => getTraceById(trace.id),
+      enabled: sheetOpen,
+    })),
+  });
+
+  // New traces and spans of this session show up as they are stored.
+  const queryClient = useQueryClient();
+  useLiveSpans(
+    { sessionId: session?.id },
+    (spans) => {
+      const known = new Set((traces || []).map((trace: any) => trace.id));
+      queryClient.invalidateQueries({ queryKey: ["session-timeline", session?.id] });
+      new Set(spans.map((span) => span.trace_id)).forEach((traceId) => {
+        if (known.has(traceId)) {
+          queryClient.invalidateQueries({ queryKey: ["trace", traceId] });
+          queryClient.invalidateQueries({ queryKey: ["trace-timeline", traceId] });
+        } else {
+          queryClient.invalidateQueries({ queryKey: ["session-traces", session?.id] });
+        }
+      });
+    },
+    () => {
+      queryClient.invalidateQueries({ queryKey: ["session-traces", session?.id] });
+      queryClient.invalidateQueries({ queryKey: ["session-timeline", session?.id] });
+      queryClient.invalidateQueries({ queryKey: ["trace-timeline"] });
+      (traces || []).forEach((trace: any) => queryClient.invalidateQueries({ queryKey: ["trace", trace.id] }));
     },
+    !!session?.id && sheetOpen
+  );
+
+  const loadingTracesWithSpans = traceQueries.some((query) => query.isLoading);
+  // Prefer traceData.spans, fallback to traceData.agents
+  const tracesWithSpans = traces?.map((trace: any, i: number) => {
+    const traceData = traceQueries[i]?.data;
+    return { ...trace, spans: traceData?.spans || traceData?.agents || [] };
   });
 
   // Session duration calculation
@@ -119,35 +141,16 @@ function SessionDetailsSheet({
   // Use selectedTraceId or default to firstTraceId
   const activeTraceId = selectedTraceId || firstTraceId
 
-  // Fetch the structured trace for the selected trace
-  const { data: traceData, isLoading: loadingTraceData } = useQuery({
-    queryKey: ["trace-by-id", activeTraceId],
-    queryFn: () => (activeTraceId ? getTraceById(activeTraceId) : null),
-    enabled: !!activeTraceId && sheetOpen,
-  })
+  // The structured trace for the selected trace
+  const activeTraceQuery = traceQueries[(traces || []).findIndex((trace: any) => trace.id === activeTraceId)];
+  const traceData = activeTraceQuery?.data;
+  const loadingTraceData = activeTraceQuery?.isLoading ?? false;
 
-  // Fetch all trace details for chat view (for Terminal Logs tab)
-  const {
-    data: allTraceDetails,
-    isLoading: loadingAllTraceDetails,
-    error: errorAllTraceDetails,
-  } = useQuery({
-    queryKey: ["all-trace-details", traces?.map((t: any) => t.id)],
-    enabled: !!traces && traces.length > 0 && sheetOpen,
-    queryFn: async () => {
-      if (!traces) return [];
-      const results = await Promise.all(
-        traces.map(async (trace: any) => {
-          try {
-            return await getTraceById(trace.id);
-          } catch (err) {
-            return { id: trace.id, trace_input: "N/A", trace_output: "N/A" };
-          }
-        })
-      );
-      return results;
-    },
-  });
+  // All trace details for chat view (for Terminal Logs tab)
+  const loadingAllTraceDetails = loadingTracesWithSpans;
+  const allTraceDetails = traces?.map((trace: any, i: number) =>
+    traceQueries[i]?.data || { id: trace.id, trace_input: "N/A", trace_output: "N/A" }
+  );
 
   // Fetch details for the selected span
   const { data: spanDetailsData, isLoading: loadingSpanDetails } = useQuery({
@@ -330,12 +333,12 @@ function SessionDetailsSheet({
                   {/* Right side: Gantt Chart */}
                   <div className="w-1/2 flex flex-col">
                     <div className="bg-slate-900 rounded-lg flex-1 w-full flex flex-col overflow-hidden">
-                      {loadingTraces || loadingTracesWithSpans ? (
+                      {loadingTraces ? (
                         <Skeleton className="h-full w-full rounded-lg bg-slate-800" />
-                      ) : tracesWithSpans && tracesWithSpans.length > 0 ? (
+                      ) : traces && traces.length > 0 ? (
                         <div className="max-h-[500px] overflow-y-auto">
                           <SessionGanttChart
-                            traces={tracesWithSpans}
+                            sessionId={session.id}
                             selectedTraceId={selectedTraceId}
                             selectedSpanId={selectedSpanId}
                             onSelectTrace={(traceId) => {
@@ -2,39 +2,223 @@
 
 import type React from "react"
 
-import { useRef, useState, useEffect, useMemo } from "react"
+import { useRef, useState, useEffect } from "react"
+import { useQuery } from "@tanstack/react-query"
 import { ChevronRight, ChevronDown } from "lucide-react"
 import { TooltipProvider, Tooltip, TooltipTrigger, TooltipContent } from "@/components/ui/tooltip"
+import {
+  expandTimelineAggregate,
+  getSessionTimeline,
+  getTraceTimeline,
+  Timeline,
+  TimelineAggregate,
+  TimelineItem,
+} from "@/lib/services/traces"
+import { barPosition, useChartWidth, useTimelineZoom } from "@/hooks/use-timeline"
 
-// Types for trace and span
-interface SpanType {
-  span_id: string
-  name: string
-  duration: number
-  start_time: number
-  end_time: number
-  type?: string
-  [key: string]: any
-}
+const ERROR_STATUS = "StatusCode.ERROR"
 
-interface TraceType {
-  id: string
-  name?: string
-  spans: SpanType[]
-  started_at?: number
-  [key: string]: any
-}
+// Narrowest layout asked of the server for one trace's spans, in pixels.
+const MIN_TRACE_WIDTH = 100
 
 interface SessionGanttChartProps {
-  traces: TraceType[]
+  sessionId: string
   selectedTraceId: string | null
   selectedSpanId: string | null
   onSelectTrace: (traceId: string) => void
   onSelectSpan: (spanId: string, traceId: string) => void
 }
 
+const formatTime = (ts: number) =>
+  new Date(ts * 1000).toLocaleTimeString([], {
+    hour: "2-digit",
+    minute: "2-digit",
+    second: "2-digit",
+    hour12: false,
+  })
+
+const formatDuration = (s: number) => {
+  if (s < 1) return `${Math.round(s * 1000)}ms`
+  if (s < 60) return `${s.toFixed(2)}s`
+  const m = Math.floor(s / 60)
+  const sec = Math.round(s % 60)
+  return `${m}m ${sec}s`
+}
+
+// Get color for span type
+const getSpanColor = (type?: string) => {
+  switch (type?.toLowerCase()) {
+    case "agent":
+      return "#3b82f6" // Blue
+    case "llm":
+      return "#38bdf8" // Light blue
+    case "tool":
+      return "#facc15" // Yellow
+    case "task":
+      return "#4ade80" // Green
+    case "operation":
+      return "#4ade80" // Green
+    case "error":
+      return "#ef4444" // Red
+    case "session":
+      return "#ffffff" // White
+    default:
+      return "#a78bfa" // Purple
+  }
+}
+
+// Get background color for span type (lighter version)
+const getSpanBackgroundColor = (type?: string) => {
+  switch (type?.toLowerCase()) {
+    case "agent":
+      return "rgba(59, 130, 246, 0.2)" // Blue
+    case "llm":
+      return "rgba(56, 189, 248, 0.2)" // Light blue
+    case "tool":
+      return "rgba(250, 204, 21, 0.2)" // Yellow
+    case "task":
+      return "rgba(74, 222, 128, 0.2)" // Green
+    case "operation":
+      return "rgba(74, 222, 128, 0.2)" // Green
+    case "error":
+      return "rgba(239, 68, 68, 0.2)" // Red
+    case "session":
+      return "rgba(255, 255, 255, 0.2)" // White
+    default:
+      return "rgba(167, 139, 250, 0.2)" // Purple
+  }
+}
+
+const spanType = (item: Record<string, any>) => {
+  if (item.status === ERROR_STATUS) return "error"
+  return item.kind === "SpanKind.CLIENT" ? "llm" : "agent"
+}
+
+// A run of rows too short to draw on their own; clicking it zooms in.
+function AggregateBar({ item, window, onExpand }: {
+  item: TimelineAggregate
+  window: Timeline
+  onExpand: (item: TimelineAggregate) => void
+}) {
+  const names = Object.entries(item.names).map(([name, count]) => `${name} ×${count}`).join(", ")
+  return (
+    <TooltipProvider delayDuration={0}>
+      <Tooltip>
+        <TooltipTrigger asChild>
+          <div
+            className="relative h-6 rounded cursor-pointer gantt-span-box border border-dashed border-slate-500"
+            style={{
+              marginLeft: barPosition(item.started_at, item.ended_at, window).left,
+              width: barPosition(item.started_at, item.ended_at, window).width,
+              minWidth: "36px",
+              backgroundColor: "rgba(148, 163, 184, 0.2)",
+            }}
+            onClick={(e) => {
+              e.stopPropagation()
+              onExpand(item)
+            }}
+          >
+            <div className="flex items-center h-full px-2">
+              <span className="text-xs text-white truncate">{item.count} more</span>
+            </div>
+          </div>
+        </TooltipTrigger>
+        <TooltipContent side="right" align="center" className="bg-slate-900 text-white border border-slate-700 shadow-lg">
+          <div className="font-medium">{item.span_count} items, {formatDuration(item.total_duration)} in total</div>
+          <div className="text-slate-300">{names}</div>
+          {item.error_count > 0 && <div className="text-red-400">{item.error_count} failed</div>}
+          <div className="text-slate-400">Click to zoom in</div>
+        </TooltipContent>
+      </Tooltip>
+    </TooltipProvider>
+  )
+}
+
+// One trace's spans, laid out by the server for the width of its bar.
+function TraceSpans({ traceId, width, selectedSpanId, onSelectSpan }: {
+  traceId: string
+  width: number
+  selectedSpanId: string | null
+  onSelectSpan: (spanId: string, traceId: string) => void
+}) {
+  const { data: timeline, isLoading } = useQuery({
+    queryKey: ["trace-timeline", traceId, width],
+    queryFn: () => getTraceTimeline(traceId, width),
+  })
+  const zoom = useTimelineZoom(timeline)
+  const current = zoom.current
+
+  if (isLoading) return <div className="text-xs text-slate-500 px-2">Loading spans...</div>
+  if (!current) return null
+
+  return (
+    <div className="flex flex-col gap-1">
+      {zoom.zoomed && (
+        <button className="text-xs text-slate-400 hover:text-white text-left" onClick={() => zoom.back()}>
+          ← Back
+        </button>
+      )}
+      {current.items.map((item: TimelineItem) => {
+        if (item.type === "aggregate") {
+          return (
+            <AggregateBar
+              key={`aggregate-${item.parent_id}-${item.started_at}`}
+              item={item}
+              window={current}
+              onExpand={(aggregate) =>
+                expandTimelineAggregate(traceId, aggregate, width)
+                  .then(zoom.push)
+                  .catch((error) => console.error("Failed to expand spans:", error))
+              }
+            />
+          )
+        }
+        const isSelectedSpan = item.id === selectedSpanId
+        const position = barPosition(item.started_at, item.ended_at, current)
+        const type = spanType(item)
+        return (
+          <TooltipProvider key={item.id} delayDuration={0}>
+            <Tooltip>
+              <TooltipTrigger asChild>
+                <div
+                  className={`relative h-6 rounded cursor-pointer gantt-span-box ${isSelectedSpan ? "ring-1 ring-white" : ""}`}
+                  style={{
+                    marginLeft: position.left,
+                    width: position.width,
+                    minWidth: "36px",
+                    backgroundColor: getSpanBackgroundColor(type),
+                    borderLeft: `2px solid ${getSpanColor(type)}`,
+                  }}
+                  onClick={() => onSelectSpan(item.id, traceId)}
+                >
+                  <div className="flex items-center h-full px-2">
+                    <span className="text-xs text-white truncate">{item.name}</span>
+                  </div>
+                </div>
+              </TooltipTrigger>
+              <TooltipContent
+                side="right"
+                align="center"
+                className="bg-slate-900 text-white border border-slate-700 shadow-lg"
+              >
+                <div className="font-medium">{item.name}</div>
+                <div className="text-slate-300">Type: {type}</div>
+                <div className="text-slate-300">Duration: {formatDuration((item.ended_at ?? item.started_at) - item.started_at)}</div>
+                {item.hidden_descendants > 0 && <div className="text-slate-400">{item.hidden_descendants} nested spans</div>}
+              </TooltipContent>
+            </Tooltip>
+          </TooltipProvider>
+        )
+      })}
+    </div>
+  )
+}
+
+// The session's traces as laid out by the server for the chart's width.
+// Runs of traces too short to draw arrive as aggregate bars, and only
+// expanded traces fetch their spans, so long sessions stay cheap to draw.
 export const SessionGanttChart = ({
-  traces,
+  sessionId,
   selectedTraceId,
   selectedSpanId,
   onSelectTrace,
@@ -52,6 +236,15 @@ export const SessionGanttChart = ({
   });
   // (All drag logic removed)
 
+  // The content is at least 1100px wide and scrolls sideways past that.
+  const width = Math.max(1100, useChartWidth(containerRef, 1100))
+  const { data: timeline, isLoading } = useQuery({
+    queryKey: ["session-timeline", sessionId, width],
+    queryFn: () => getSessionTimeline(sessionId, width),
+  })
+  const zoom = useTimelineZoom(timeline)
+  const current = zoom.current
+
   useEffect(() => {
     const checkScroll = () => {
       const container = containerRef.current;
@@ -74,110 +267,24 @@ export const SessionGanttChart = ({
     };
   }, []);
 
-  // Memoize sorted traces to prevent recalculation on every render
-  const sortedTraces = useMemo(() => {
-    return [...traces].sort((a, b) => {
-      const aStart = a.started_at || Math.min(...(a.spans.length ? a.spans.map((s) => s.start_time) : [0]))
-      const bStart = b.started_at || Math.min(...(b.spans.length ? b.spans.map((s) => s.start_time) : [0]))
-      return aStart - bStart
-    })
-  }, [traces])
-
-  // Memoize all spans to prevent recalculation
-  const allSpans = useMemo(() => sortedTraces.flatMap((t) => t.spans), [sortedTraces])
-
-  // Initialize all traces as expanded only when traces change
-  useEffect(() => {
-    if (traces.length > 0) {
-      const initialExpandState = traces.reduce(
-        (acc, trace) => {
-          acc[trace.id] = true
-          return acc
-        },
-        {} as Record<string, boolean>,
-      )
-      setExpandedTraces(initialExpandState)
-    }
-  }, [traces]) // Only depend on the original traces prop, not the derived sortedTraces
-
-  // Early return if no spans
-  if (allSpans.length === 0) {
-    return (
-      <div className="w-full h-full flex items-center justify-center text-zinc-400">No timeline data available</div>
-    )
-  }
-
-  // Calculate session timeline
-  const sessionStart = Math.min(...allSpans.map((s) => s.start_time))
-  const sessionEnd = Math.max(...allSpans.map((s) => s.end_time))
+  const sessionStart = current?.start ?? 0
+  const sessionEnd = current?.end ?? 0
   const sessionDuration = sessionEnd - sessionStart || 1
 
-  // Format time and duration
-  const formatTime = (ts: number) =>
-    new Date(ts * 1000).toLocaleTimeString([], {
-      hour: "2-digit",
-      minute: "2-digit",
-      second: "2-digit",
-      hour12: false,
-    })
-
-  const formatDuration = (s: number) => {
-    if (s < 1) return `${Math.round(s * 1000)}ms`
-    if (s < 60) return `${s.toFixed(2)}s`
-    const m = Math.floor(s / 60)
-    const sec = Math.round(s % 60)
-    return `${m}m ${sec}s`
-  }
-
-  // Get color for span type
-  const getSpanColor = (type?: string) => {
-    switch (type?.toLowerCase()) {
-      case "agent":
-        return "#3b82f6" // Blue
-      case "llm":
-        return "#38bdf8" // Light blue
-      case "tool":
-        return "#facc15" // Yellow
-      case "task":
-        return "#4ade80" // Green
-      case "operation":
-        return "#4ade80" // Green
-      case "error":
-        return "#ef4444" // Red
-      case "session":
-        return "#ffffff" // White
-      default:
-        return "#a78bfa" // Purple
-    }
-  }
+  // Only the selected trace starts out expanded; each expanded trace fetches its spans.
+  const isTraceExpanded = (traceId: string) => expandedTraces[traceId] ?? traceId === selectedTraceId
 
-  // Get background color for span type (lighter version)
-  const getSpanBackgroundColor = (type?: string) => {
-    switch (type?.toLowerCase()) {
-      case "agent":
-        return "rgba(59, 130, 246, 0.2)" // Blue
-      case "llm":
-        return "rgba(56, 189, 248, 0.2)" // Light blue
-      case "tool":
-        return "rgba(250, 204, 21, 0.2)" // Yellow
-      case "task":
-        return "rgba(74, 222, 128, 0.2)" // Green
-      case "operation":
-        return "rgba(74, 222, 128, 0.2)" // Green
-      case "error":
-        return "rgba(239, 68, 68, 0.2)" // Red
-      case "session":
-        return "rgba(255, 255, 255, 0.2)" // White
-      default:
-        return "rgba(167, 139, 250, 0.2)" // Purple
-    }
+  const zoomInto = (aggregate: TimelineAggregate) => {
+    getSessionTimeline(sessionId, width, { start: aggregate.expand.start, end: aggregate.expand.end })
+      .then(zoom.push)
+      .catch((error) => console.error("Failed to zoom into the session timeline:", error))
   }
 
   // Toggle trace expansion
   const toggleTraceExpansion = (traceId: string) => {
     setExpandedTraces((prev) => ({
       ...prev,
-      [traceId]: !prev[traceId],
+      [traceId]: !isTraceExpanded(traceId),
     }))
   }
 
@@ -296,19 +403,36 @@ export const SessionGanttChart = ({
 
             {/* Traces and spans */}
             <div className="relative z-10">
-              {sortedTraces.map((trace, traceIndex) => {
-                if (!trace.spans?.length) return null
+              {zoom.zoomed && (
+                <button className="text-xs text-slate-400 hover:text-white mb-2" onClick={() => zoom.back()}>
+                  ← Back to the whole session
+                </button>
+              )}
+              {isLoading ? (
+                <div className="text-zinc-400 px-4">Loading timeline...</div>
+              ) : !current || current.items.length === 0 ? (
+                <div className="text-zinc-400 px-4">No timeline data available</div>
+              ) : current.items.map((trace: TimelineItem, traceIndex: number) => {
+                if (trace.type === "aggregate") {
+                  return (
+                    <div key={`aggregate-${trace.started_at}`} className="mb-6">
+                      <AggregateBar item={trace} window={current} onExpand={zoomInto} />
+                    </div>
+                  )
+                }
 
-                const traceStart = Math.min(...trace.spans.map((s) => s.start_time))
-                const traceEnd = Math.max(...trace.spans.map((s) => s.end_time))
-                const traceDuration = traceEnd - traceStart
-                const isExpanded = expandedTraces[trace.id] || false
+                const traceDuration = (trace.ended_at ?? trace.started_at) - trace.started_at
+                const isExpanded = isTraceExpanded(trace.id)
                 const isSelected = trace.id === selectedTraceId
 
                 // Calculate position relative to session timeline
-                const traceLeftPos = ((traceStart - sessionStart) / sessionDuration) * 100
-                const traceWidthPos = ((traceEnd - traceStart) / sessionDuration) * 100;
+                const position = barPosition(trace.started_at, trace.ended_at, current)
+                const traceWidthPos = parseFloat(position.width)
                 const traceName = trace.name || `Trace ${traceIndex + 1}`;
+                const traceWidth = Math.max(
+                  MIN_TRACE_WIDTH,
+                  Math.round((width * traceWidthPos) / 100 / MIN_TRACE_WIDTH) * MIN_TRACE_WIDTH
+                )
 
               return (
                 <div key={trace.id} className="mb-6">
@@ -329,20 +453,14 @@ export const SessionGanttChart = ({
                     </button>
                     <div className="text-xs font-medium">{traceName}</div>
                   </div>
-                  {/* Trace timeline bar and span row in a relative container */}
-                  {/* Trace timeline bar and span row in a relative container with dynamic height */}
-                  <div
-                    className="relative w-full mb-2"
-                    style={{
-                      height: isExpanded ? `calc(40px + ${Math.max(trace.spans.length, 1) * 28}px)` : '40px',
-                    }}
-                  >
+                  {/* Trace timeline bar, with its spans below it when expanded */}
+                  <div className="relative w-full mb-2" style={{ minHeight: '40px' }}>
                     {/* Trace bar */}
                     <div
                       className={`absolute h-8 rounded gantt-span-box ${isSelected ? "ring-1 ring-white" : ""}`}
                       style={{
-                        left: `${traceLeftPos}%`,
-                        width: `${Math.max(traceWidthPos, 0.5)}%`,
+                        left: position.left,
+                        width: position.width,
                         minWidth: '100px',
                         backgroundColor: getSpanBackgroundColor("agent"),
                         borderLeft: `2px solid ${getSpanColor("agent")}`,
@@ -353,62 +471,26 @@ export const SessionGanttChart = ({
                     >
                       {traceWidthPos > 5 && (
                         <div className="absolute inset-0 flex items-center px-2 cursor-pointer">
-                          <span className="text-xs text-white truncate">{traceName}: {formatDuration(trace.spans.length > 0 ? trace.spans[trace.spans.length - 1].end_time - trace.spans[0].start_time : 0)}</span>
+                          <span className="text-xs text-white truncate">{traceName}: {formatDuration(traceDuration)}</span>
                         </div>
                       )}
                     </div>
-                    {/* Span row absolutely positioned under the trace bar */}
                     {isExpanded && (
                       <div
-                        className="flex flex-col gap-1 mb-2"
+                        className="mb-2"
                         style={{
-                          position: 'absolute',
-                          left: `${traceLeftPos}%`,
-                          width: `${Math.max(traceWidthPos, 0.5)}%`,
+                          marginLeft: position.left,
+                          width: position.width,
                           minWidth: '100px',
-                          top: '40px', // directly below the bar
+                          paddingTop: '40px', // directly below the bar
                         }}
                       >
-                        {trace.spans.map((span) => {
-                          const spanStart = Math.min(...trace.spans.map((s) => s.start_time));
-                          const spanEnd = Math.max(...trace.spans.map((s) => s.end_time));
-                          const spanDuration = spanEnd - spanStart || 1;
-                          const spanLeft = ((span.start_time - spanStart) / spanDuration) * 100;
-                          const spanWidth = ((span.end_time - span.start_time) / spanDuration) * 100;
-                          const isSelectedSpan = span.span_id === selectedSpanId;
-                          return (
-                            <TooltipProvider key={span.span_id} delayDuration={0}>
-                              <Tooltip>
-                                <TooltipTrigger asChild>
-                                  <div
-                                    className={`relative h-6 rounded cursor-pointer gantt-span-box ${isSelectedSpan ? "ring-1 ring-white" : ""}`}
-                                    style={{
-                                      marginLeft: `${spanLeft}%`,
-                                      width: `${Math.max(spanWidth, 0.5)}%`,
-                                      minWidth: '36px',
-                                      backgroundColor: getSpanBackgroundColor(span.type),
-                                      borderLeft: `2px solid ${getSpanColor(span.type)}`,
-                                    }}
-                                    onClick={() => onSelectSpan(span.span_id, trace.id)}
-                                  >
-                                    <div className="flex items-center h-full px-2">
-                                      <span className="text-xs text-white truncate">{span.name}</span>
-                                    </div>
-                                  </div>
-                                </TooltipTrigger>
-                                <TooltipContent
-                                  side="right"
-                                  align="center"
-                                  className="bg-slate-900 text-white border border-slate-700 shadow-lg"
-                                >
-                                  <div className="font-medium">{span.name}</div>
-                                  <div className="text-slate-300">Type: {span.type || "Unknown"}</div>
-                                  <div className="text-slate-300">Duration: {formatDuration(span.end_time - span.start_time)}</div>
-                                </TooltipContent>
-                              </Tooltip>
-                            </TooltipProvider>
-                          );
-                        })}
+                        <TraceSpans
+                          traceId={trace.id}
+                          width={traceWidth}
+                          selectedSpanId={selectedSpanId}
+                          onSelectSpan={onSelectSpan}
+                        />
                       </div>
                     )}
                   </div>
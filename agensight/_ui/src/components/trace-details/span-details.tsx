@@ -4,6 +4,7 @@ import React from "react";
 import { IconMessageCircle, IconMessageDots, IconRobot, IconUser } from "@tabler/icons-react";
 import { Card, CardContent } from "@/components/ui/card";
 import { Span } from "@/types/type";
+import { getSpanContent } from "@/lib/services/traces";
 
 export interface SpanDetailsProps {
   span: Span;
@@ -14,6 +15,51 @@ export const SpanDetailsView: React.FC<SpanDetailsProps> = ({
   span,
   isLoading,
 }) => {
+  // Whole bodies of messages that arrived as previews, by "kind-id".
+  const [fullContent, setFullContent] = React.useState<Record<string, string>>({});
+  // Bodies being fetched, and why the last fetch failed, by the same key.
+  const [loadingContent, setLoadingContent] = React.useState<Record<string, boolean>>({});
+  const [contentErrors, setContentErrors] = React.useState<Record<string, string>>({});
+
+  const loadFullContent = async (kind: "prompts" | "completions", message: { id: number; span_id: string }) => {
+    const key = `${kind}-${message.id}`;
+    setLoadingContent((loading) => ({ ...loading, [key]: true }));
+    setContentErrors((errors) => ({ ...errors, [key]: "" }));
+    try {
+      const content = await getSpanContent({ span_id: message.span_id, kind, id: message.id });
+      setFullContent((loaded) => ({ ...loaded, [key]: content }));
+    } catch (error) {
+      console.error("Failed to load full content:", error);
+      setContentErrors((errors) => ({
+        ...errors,
+        [key]: error instanceof Error ? error.message : "Failed to load full content",
+      }));
+    } finally {
+      setLoadingContent((loading) => ({ ...loading, [key]: false }));
+    }
+  };
+
+  const renderLoadFull = (kind: "prompts" | "completions", message: { id: number; span_id: string; truncated?: boolean; content_bytes?: number }) => {
+    const key = `${kind}-${message.id}`;
+    if (!message.truncated || fullContent[key] !== undefined) return null;
+    return (
+      <div className="border-t">
+        {contentErrors[key] && (
+          <div className="px-3 pt-2 text-xs text-red-500">{contentErrors[key]}</div>
+        )}
+        <button
+          className="w-full px-3 py-2 text-xs text-muted-foreground hover:text-foreground disabled:opacity-50"
+          disabled={loadingContent[key]}
+          onClick={() => loadFullContent(kind, message)}
+        >
+          {loadingContent[key]
+            ? "Loading full content..."
+            : `${contentErrors[key] ? "Retry" : "Show full content"} (${Math.ceil((message.content_bytes || 0) / 1024)} KB)`}
+        </button>
+      </div>
+    );
+  };
+
   if (isLoading) {
     return (
       <div className="flex items-center justify-center h-32">
@@ -86,13 +132,14 @@ export const SpanDetailsView: React.FC<SpanDetailsProps> = ({
                                 };
                               </script>
                             </head>
-                            <body>${prompt.content.replace(/</g, "&lt;").replace(/>/g, "&gt;")}</body>
+                            <body>${(fullContent[`prompts-${prompt.id}`] ?? prompt.content).replace(/</g, "&lt;").replace(/>/g, "&gt;")}</body>
                           </html>
                         `}
                         style={{width: "100%", border: "none"}}
                         className="min-h-[100px]"
                         title="Prompt content"
                       />
+                      {renderLoadFull("prompts", prompt)}
                     </div>
                   </div>
                 </div>
@@ -166,13 +213,14 @@ export const SpanDetailsView: React.FC<SpanDetailsProps> = ({
                                 };
                               </script>
                             </head>
-                            <body>${completion.content.replace(/</g, "&lt;").replace(/>/g, "&gt;")}</body>
+                            <body>${(fullContent[`completions-${completion.id}`] ?? completion.content).replace(/</g, "&lt;").replace(/>/g, "&gt;")}</body>
                           </html>
                         `}
                         style={{width: "100%", border: "none"}}
                         className="min-h-[100px]"
                         title="Completion content"
                       />
+                      {renderLoadFull("completions", completion)}
                     </div>
                   </div>
                 </div>
@@ -19,7 +19,8 @@ import {
 } from "@tabler/icons-react";
 import { getTraceById, getSpanDetailsById } from "@/lib/services/traces";
 import { getSpanMetrics } from "@/lib/services/metrics";
-import { useQuery } from "@tanstack/react-query";
+import { useQuery, useQueryClient } from "@tanstack/react-query";
+import { useLiveSpans } from "@/hooks/use-live-spans";
 import { Span, SpanDetails, ToolCall, TraceDetailPageProps } from "@/types/type";
 import { GanttChartVisualizer } from "@/components/GannChart";
 import { TraceDetailSkeleton } from "../skeletons/trace-details-skeleton";
@@ -92,6 +93,14 @@ function TraceDetailPage({ id, name, latency, router, total_tokens }: TraceDetai
     queryKey: ['trace', id],
     queryFn: () => getTraceById(id)
   });
+  // Spans of a running trace show up as they are stored; the structured
+  // trace is built on the server, so refetch this trace alone.
+  const queryClient = useQueryClient();
+  const refreshTrace = () => {
+    queryClient.invalidateQueries({ queryKey: ['trace', id] });
+    queryClient.invalidateQueries({ queryKey: ['trace-timeline', id] });
+  };
+  useLiveSpans({ traceId: id }, refreshTrace, refreshTrace);
   
   // Process trace data when it changes
   useEffect(() => {
@@ -116,9 +125,13 @@ function TraceDetailPage({ id, name, latency, router, total_tokens }: TraceDetai
         if (traceData.agents && Array.isArray(traceData.agents)) {
           setSpans(traceData.agents);
         
-          // Set the first span as selected by default if available
+          // Keep the selection across live refreshes, else select the first span
           if (traceData.agents.length > 0) {
-            setSelectedSpan(traceData.agents[0]);
+            setSelectedSpan(prev =>
+              prev && traceData.agents.some((agent: Span) => agent.span_id === prev.span_id)
+                ? prev
+                : traceData.agents[0]
+            );
           }
         }
       } catch (err) {
@@ -439,8 +452,8 @@ function TraceDetailPage({ id, name, latency, router, total_tokens }: TraceDetai
                           >
                             <div className="h-full overflow-y-auto">
                               <GanttChartVisualizer
+                                traceId={id}
                                 spans={spans}
-                                trace={trace}
                                 onSelectSpan={(span) =>
                                   setSelectedGanttSpan(span)
                                 }
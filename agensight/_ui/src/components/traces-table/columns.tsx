@@ -3,7 +3,9 @@ import { ColumnDef } from "@tanstack/react-table";
 import { useSortable } from "@dnd-kit/sortable";
 import { IconGripVertical } from "@tabler/icons-react";
 import { Button } from "@/components/ui/button";
+import { useQuery } from "@tanstack/react-query";
 import { TraceItem } from "@/hooks/use-trace-column";
+import { getTraceRow } from "@/lib/services/traces";
 
 // Create a separate component for the drag handle
 export function DragHandle({ id }: { id: number }) {
@@ -25,6 +27,56 @@ export function DragHandle({ id }: { id: number }) {
   );
 }
 
+// The list projection leaves metadata out, so each visible row loads its own
+function TraceMetadata({ traceId }: { traceId: string }) {
+  const { data: trace, isLoading } = useQuery({
+    queryKey: ["trace-row", traceId],
+    queryFn: () => getTraceRow(traceId),
+  });
+
+  if (isLoading) {
+    return (
+      <div className="w-full text-sm text-muted-foreground overflow-hidden text-ellipsis px-2">
+        ...
+      </div>
+    );
+  }
+
+  try {
+    const metadata = JSON.parse(trace.metadata);
+    const priorityKeys = ["status", "priority", "user_id"];
+    const keysToShow = Object.keys(metadata)
+      .filter(key => priorityKeys.includes(key))
+      .slice(0, 3);
+    
+    if (keysToShow.length === 0) {
+      return (
+        <div className="w-full text-sm text-muted-foreground overflow-hidden text-ellipsis px-2">
+          No metadata
+        </div>
+      );
+    }
+    
+    return (
+      <div className="w-full text-sm overflow-hidden px-2">
+        <div className="flex flex-wrap gap-1">
+          {keysToShow.map(key => (
+            <div key={key} className="text-xs bg-muted px-2 py-1 rounded">
+              {key}: {String(metadata[key])}
+            </div>
+          ))}
+        </div>
+      </div>
+    );
+  } catch (e) {
+    return (
+      <div className="w-full text-sm text-muted-foreground overflow-hidden text-ellipsis px-2">
+        Invalid metadata
+      </div>
+    );
+  }
+}
+
 export const columns: ColumnDef<TraceItem>[] = [
   {
     accessorKey: "id",
@@ -94,41 +146,7 @@ export const columns: ColumnDef<TraceItem>[] = [
   {
     accessorKey: "metadata",
     header: "Metadata",
-    cell: ({ row }) => {
-      try {
-        const metadata = JSON.parse(row.original.metadata);
-        const priorityKeys = ["status", "priority", "user_id"];
-        const keysToShow = Object.keys(metadata)
-          .filter(key => priorityKeys.includes(key))
-          .slice(0, 3);
-        
-        if (keysToShow.length === 0) {
-          return (
-            <div className="w-full text-sm text-muted-foreground overflow-hidden text-ellipsis px-2">
-              No metadata
-            </div>
-          );
-        }
-        
-        return (
-          <div className="w-full text-sm overflow-hidden px-2">
-            <div className="flex flex-wrap gap-1">
-              {keysToShow.map(key => (
-                <div key={key} className="text-xs bg-muted px-2 py-1 rounded">
-                  {key}: {String(metadata[key])}
-                </div>
-              ))}
-            </div>
-          </div>
-        );
-      } catch (e) {
-        return (
-          <div className="w-full text-sm text-muted-foreground overflow-hidden text-ellipsis px-2">
-            Invalid metadata
-          </div>
-        );
-      }
-    },
+    cell: ({ row }) => <TraceMetadata traceId={String(row.original.id)} />,
     size: 220,
   },
 ]; 
\ No newline at end of file
@@ -85,10 +85,22 @@ function DraggableRow({ row, onRowClick }: { row: Row<TraceItem>; onRowClick: (i
 
 export function TracesTable({
   data: initialData,
+  hasMore = false,
+  loadingMore = false,
+  onLoadMore,
 }: {
   data: TraceItem[];
+  // More traces exist on the server than the pages loaded so far
+  hasMore?: boolean;
+  loadingMore?: boolean;
+  onLoadMore?: () => void;
 }) {
   const [data, setData] = useState(() => initialData);
+
+  // Pick up pages loaded later and live updates
+  React.useEffect(() => {
+    setData(initialData);
+  }, [initialData]);
   
   // Initialize table with the useTraceColumn hook, passing both data and columns
   const { table } = useTraceColumn({
@@ -275,7 +287,18 @@ export function TracesTable({
                 <div className="flex items-center justify-center text-base font-medium">
                   Page {table.getState().pagination.pageIndex + 1} of{" "}
                   {table.getPageCount()}
+                  {hasMore && "+"}
                 </div>
+                {hasMore && onLoadMore && (
+                  <Button
+                    variant="outline"
+                    className="h-8 text-base"
+                    onClick={onLoadMore}
+                    disabled={loadingMore}
+                  >
+                    {loadingMore ? "Loading..." : "Load more"}
+                  </Button>
+                )}
                 <div className="flex items-center gap-2">
                   <Button
                     variant="outline"
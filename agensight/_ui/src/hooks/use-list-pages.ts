@@ -0,0 +1,24 @@
+import * as React from "react"
+import { QueryKey, useInfiniteQuery } from "@tanstack/react-query"
+import { ListPage } from "@/lib/services/traces"
+
+// A list endpoint loaded one page at a time, newest first. `rows` holds
+// every page fetched so far; `fetchNextPage` appends the next one.
+export function useListPages(
+  queryKey: QueryKey,
+  fetchPage: (cursor: string | null) => Promise<ListPage>,
+  enabled: boolean = true
+) {
+  const query = useInfiniteQuery({
+    queryKey,
+    queryFn: ({ pageParam }) => fetchPage(pageParam),
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage) => lastPage.nextCursor,
+    enabled,
+  })
+  const rows = React.useMemo(
+    () => query.data?.pages.flatMap((page) => page.rows) ?? [],
+    [query.data]
+  )
+  return { ...query, rows }
+}
@@ -0,0 +1,97 @@
+import * as React from "react"
+import { InfiniteData, QueryKey, useQueryClient } from "@tanstack/react-query"
+import { ListPage, LiveSpan, subscribeToLiveSpans } from "@/lib/services/traces"
+
+// Milliseconds to gather a burst of spans into a single update.
+const REFRESH_DELAY = 1000
+
+// Hand spans matching `filter` to `onSpans` in batches as they are stored,
+// instead of waiting for the cached data to go stale. `onReset` runs when
+// the server dropped events for this client; the caller should refetch.
+export function useLiveSpans(
+  filter: { sessionId?: string; traceId?: string },
+  onSpans: (spans: LiveSpan[]) => void,
+  onReset: () => void,
+  enabled: boolean = true
+) {
+  // Latest callbacks, without reopening the stream when they change
+  const handlers = React.useRef({ onSpans, onReset })
+  handlers.current = { onSpans, onReset }
+
+  React.useEffect(() => {
+    if (!enabled) return
+    let pending: LiveSpan[] = []
+    let timer: ReturnType<typeof setTimeout> | null = null
+    const receive = (span: LiveSpan) => {
+      pending.push(span)
+      if (timer) return
+      timer = setTimeout(() => {
+        timer = null
+        const spans = pending
+        pending = []
+        handlers.current.onSpans(spans)
+      }, REFRESH_DELAY)
+    }
+    const reset = () => {
+      pending = []
+      handlers.current.onReset()
+    }
+    const close = subscribeToLiveSpans(filter, receive, reset)
+    return () => {
+      close()
+      if (timer) clearTimeout(timer)
+    }
+  }, [filter.sessionId, filter.traceId, enabled])
+}
+
+// Keep a list loaded with useListPages current. Rows already loaded take
+// the new spans' end times; spans of a row that is not loaded yet (a new
+// trace or session) refetch only the first page and prepend what is new.
+export function useLiveList(
+  queryKey: QueryKey,
+  fetchPage: (cursor: string | null) => Promise<ListPage>,
+  rowIdOf: (span: LiveSpan) => string | null,
+  enabled: boolean = true
+) {
+  const queryClient = useQueryClient()
+
+  const onSpans = (spans: LiveSpan[]) => {
+    const data = queryClient.getQueryData<InfiniteData<ListPage>>(queryKey)
+    if (!data) return
+    const ends = new Map<string, number>()
+    spans.forEach((span) => {
+      const id = rowIdOf(span)
+      if (id) ends.set(id, Math.max(ends.get(id) ?? 0, span.ended_at))
+    })
+    const loaded = new Set(data.pages.flatMap((page) => page.rows.map((row) => row.id)))
+
+    queryClient.setQueryData<InfiniteData<ListPage>>(queryKey, (old) => old && {
+      ...old,
+      pages: old.pages.map((page) => ({
+        ...page,
+        rows: page.rows.map((row) => {
+          const ended_at = ends.get(row.id)
+          if (ended_at === undefined || ended_at <= row.ended_at) return row
+          const updated = { ...row, ended_at }
+          if ("duration" in row) updated.duration = ended_at - row.started_at
+          return updated
+        }),
+      })),
+    }))
+
+    if (Array.from(ends.keys()).some((id) => !loaded.has(id))) {
+      fetchPage(null).then((first) => {
+        queryClient.setQueryData<InfiniteData<ListPage>>(queryKey, (old) => {
+          if (!old || old.pages.length === 0) return old
+          const present = new Set(old.pages.flatMap((page) => page.rows.map((row) => row.id)))
+          const added = first.rows.filter((row) => !present.has(row.id))
+          if (added.length === 0) return old
+          const [head, ...rest] = old.pages
+          return { ...old, pages: [{ ...head, rows: [...added, ...head.rows] }, ...rest] }
+        })
+      }).catch((error) => console.error("Failed to fetch new rows:", error))
+    }
+  }
+
+  useLiveSpans({}, onSpans, () => queryClient.invalidateQueries({ queryKey }), enabled)
+}
@@ -0,0 +1,61 @@
+import * as React from "react"
+import { Timeline } from "@/lib/services/traces"
+
+// Chart widths are rounded to this many pixels, so resizing asks the server
+// for a new layout only when the width changes noticeably.
+const WIDTH_STEP = 100
+
+// Width in pixels of the chart `ref` points at, for requesting its layout.
+export function useChartWidth(ref: React.RefObject<HTMLElement | null>, fallback: number = 1000): number {
+  const [width, setWidth] = React.useState(fallback)
+
+  React.useEffect(() => {
+    const element = ref.current
+    if (!element) return
+    const measure = () => {
+      if (element.clientWidth > 0) {
+        setWidth(Math.max(WIDTH_STEP, Math.round(element.clientWidth / WIDTH_STEP) * WIDTH_STEP))
+      }
+    }
+    measure()
+    const observer = new ResizeObserver(measure)
+    observer.observe(element)
+    return () => observer.disconnect()
+  }, [ref])
+
+  return width
+}
+
+// Windows the user zoomed into by clicking aggregate bars, innermost last.
+// `current` is the innermost one, or `base` when not zoomed in.
+export function useTimelineZoom(base: Timeline | undefined) {
+  const [stack, setStack] = React.useState<Timeline[]>([])
+  return {
+    current: stack.length > 0 ? stack[stack.length - 1] : base,
+    zoomed: stack.length > 0,
+    push: (timeline: Timeline) => setStack((previous) => [...previous, timeline]),
+    back: () => setStack((previous) => previous.slice(0, -1)),
+  }
+}
+
+// Left offset and width, in percent of the window, of a bar on `timeline`.
+export function barPosition(startedAt: number, endedAt: number | null, timeline: Timeline) {
+  const span = timeline.end - timeline.start || 1
+  const left = ((startedAt - timeline.start) / span) * 100
+  const width = (((endedAt ?? startedAt) - startedAt) / span) * 100
+  return { left: `${Math.max(0, left)}%`, width: `${Math.max(width, 0.2)}%` }
+}
+
+// Five evenly spaced clock times across the window, for the axis.
+export function timeMarks(timeline: Timeline): string[] {
+  const marks = []
+  for (let i = 0; i <= 5; i++) {
+    const time = timeline.start + (i * (timeline.end - timeline.start)) / 5
+    marks.push(new Date(time * 1000).toLocaleTimeString([], {
+      hour: "2-digit",
+      minute: "2-digit",
+      second: "2-digit",
+    }))
+  }
+  return marks
+}
@@ -11,21 +11,25 @@ export interface ToolCall {
 
 export interface Prompt {
   content: string;
+  content_bytes?: number;
   id: number;
   message_index: number;
   role: string;
   span_id: string;
+  truncated?: boolean;
 }
 
 export interface Completion {
   completion_tokens: number;
   content: string;
+  content_bytes?: number;
   finish_reason: string;
   id: number;
   prompt_tokens: number;
   role: string;
   span_id: string;
   total_tokens: number;
+  truncated?: boolean;
 }
 
 export interface SpanDetails {
@@ -99,40 +103,54 @@ export async function getSpanDetailsById(spanId: string): Promise<SpanDetails> {
   throw new Error('Failed to fetch span details');
 }
 
-// For future expansion - if you ever need to fetch all traces
-export async function getAllTraces(): Promise<any[]> {
+// List endpoints return one page at a time, newest first; the next page's
+// cursor comes back in the X-Next-Cursor header until there are no more.
+// Tables load the next page only when the user asks for it.
+export const LIST_PAGE_SIZE = 100;
+
+export interface ListPage {
+  rows: any[];
+  nextCursor: string | null;
+}
+
+async function fetchListPage(path: string, cursor: string | null): Promise<ListPage> {
+  const query = new URLSearchParams({ limit: String(LIST_PAGE_SIZE) });
+  if (cursor) query.set("cursor", cursor);
+  const response = await fetch(`${API_BASE_URL}${path}?${query.toString()}`);
+  if (!response.ok) {
+    throw new Error(`Error fetching ${path}: ${response.statusText}`);
+  }
+  return { rows: await response.json(), nextCursor: response.headers.get("X-Next-Cursor") };
+}
+
+// One page of traces in the list projection; see getTraceRow for the rest
+export async function getTracesPage(cursor: string | null = null): Promise<ListPage> {
   try {
-    const response = await fetch(`${API_BASE_URL}/traces`);
-    
-    if (!response.ok) {
-      throw new Error(`Error fetching traces`);
-    }
-    
-    const data = await response.json();
-    return data;
+    return await fetchListPage("/traces", cursor);
   } catch (error) {
-    console.log(`Failed to fetch all traces:`, error);
+    console.log(`Failed to fetch traces:`, error);
     throw error;
   }
-  
-  return [];
-} 
+}
 
-export async function getAllSessions(): Promise<any[]> {
+export async function getSessionsPage(cursor: string | null = null): Promise<ListPage> {
   try {
-    const response = await fetch(`${API_BASE_URL}/sessions`);
-
-    if (!response.ok) {
-      throw new Error(`Error fetching sessions: ${response.statusText}`);
-    }
-
-    return await response.json();
+    return await fetchListPage("/sessions", cursor);
   } catch (error) {
     console.error('Failed to fetch sessions:', error);
     throw error;
   }
 }
 
+// The full row of one trace, metadata included
+export async function getTraceRow(id: string): Promise<any> {
+  const response = await fetch(`${API_BASE_URL}/traces/${id}`);
+  if (!response.ok) {
+    throw new Error(`Error fetching trace: ${response.statusText}`);
+  }
+  return await response.json();
+}
+
 export async function getSingleSessionTraces(sessionId: string): Promise<any[]> {
   try {
     const response = await fetch(`${API_BASE_URL}/sessions/${sessionId}/traces`);
@@ -184,4 +202,122 @@ export async function getSpanDetails(
     console.error('Failed to fetch spans:', error);
     throw error;
   }
-}
\ No newline at end of file
+}
+export interface LiveSpan {
+  id: string;
+  trace_id: string;
+  parent_id: string | null;
+  name: string;
+  started_at: number;
+  ended_at: number;
+  duration: number;
+  kind: string;
+  status: string;
+  session_id: string | null;
+}
+
+// Receive spans as they are stored instead of refetching whole lists.
+// `onReset` is called when the server dropped events for a slow client.
+// Returns a function that closes the stream.
+export function subscribeToLiveSpans(
+  filter: { sessionId?: string; traceId?: string },
+  onSpan: (span: LiveSpan) => void,
+  onReset?: () => void
+): () => void {
+  const params = new URLSearchParams();
+  if (filter.sessionId) params.set("session_id", filter.sessionId);
+  if (filter.traceId) params.set("trace_id", filter.traceId);
+  const source = new EventSource(`${API_BASE_URL}/live?${params.toString()}`);
+  source.addEventListener("span", (event) => onSpan(JSON.parse((event as MessageEvent).data)));
+  source.addEventListener("reset", () => onReset?.());
+  return () => source.close();
+}
+
+export interface TimelineAggregate {
+  type: "aggregate";
+  parent_id: string | null;
+  depth: number;
+  started_at: number;
+  ended_at: number;
+  count: number;
+  span_count: number;
+  error_count: number;
+  total_duration: number;
+  names: Record<string, number>;
+  expand: { parent_id: string | null; start: number; end: number };
+}
+
+export type TimelineItem =
+  | (Record<string, any> & { type: "span" | "trace"; id: string; depth: number; hidden_descendants: number })
+  | TimelineAggregate;
+
+export interface Timeline {
+  start: number;
+  end: number;
+  width: number;
+  items: TimelineItem[];
+}
+
+async function fetchTimeline(path: string, params: Record<string, string | number | null | undefined>): Promise<Timeline> {
+  const query = new URLSearchParams();
+  Object.entries(params).forEach(([key, value]) => {
+    if (value !== null && value !== undefined) query.set(key, String(value));
+  });
+  const response = await fetch(`${API_BASE_URL}${path}?${query.toString()}`);
+  if (!response.ok) {
+    throw new Error(`Error fetching timeline: ${response.statusText}`);
+  }
+  return await response.json();
+}
+
+// Spans laid out for a chart `width` pixels wide; spans too short to draw
+// arrive merged into aggregate bars, so huge traces stay cheap to render.
+export function getTraceTimeline(
+  traceId: string,
+  width: number,
+  window: { start?: number; end?: number } = {}
+): Promise<Timeline> {
+  return fetchTimeline(`/traces/${traceId}/timeline`, { width, ...window });
+}
+
+export function expandTimelineAggregate(
+  traceId: string,
+  aggregate: TimelineAggregate,
+  width: number
+): Promise<Timeline> {
+  return fetchTimeline(`/traces/${traceId}/timeline/expand`, { width, ...aggregate.expand });
+}
+
+export function getSessionTimeline(
+  sessionId: string,
+  width: number,
+  window: { start?: number; end?: number } = {}
+): Promise<Timeline> {
+  return fetchTimeline(`/sessions/${sessionId}/timeline`, { width, ...window });
+}
+
+// Where to fetch the rest of a message body that the trace or span detail
+// view cut to a preview (`truncated` messages, `*_ref` fields).
+export interface ContentRef {
+  span_id: string;
+  kind: "attributes" | "prompts" | "completions" | "tools";
+  id?: number;
+  bytes?: number;
+}
+
+// A whole message body or span attributes, or `length` bytes of it from
+// `offset` (byte offsets, so a slice may end inside a UTF-8 character).
+export async function getSpanContent(
+  ref: ContentRef,
+  range: { offset?: number; length?: number } = {}
+): Promise<string> {
+  const query = new URLSearchParams();
+  if (ref.id !== undefined) query.set("id", String(ref.id));
+  if (range.offset !== undefined) query.set("offset", String(range.offset));
+  if (range.length !== undefined) query.set("length", String(range.length));
+  const response = await fetch(`${API_BASE_URL}/span/${ref.span_id}/content/${ref.kind}?${query.toString()}`);
+  if (!response.ok) {
+    throw new Error(`Error fetching span content: ${response.statusText}`);
+  }
+  return await response.text();
+}
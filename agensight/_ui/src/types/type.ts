@@ -10,21 +10,25 @@ export interface ToolCall {
 
 export interface Prompt {
   content: string;
+  content_bytes?: number;
   id: number;
   message_index: number;
   role: string;
   span_id: string;
+  truncated?: boolean;
 }
 
 export interface Completion {
   completion_tokens: number;
   content: string;
+  content_bytes?: number;
   finish_reason: string;
   id: number;
   prompt_tokens: number;
   role: string;
   span_id: string;
   total_tokens: number;
+  truncated?: boolean;
 }
 
 export interface SpanDetails {
@@ -64,8 +68,9 @@ export interface GanttChartProps {
 
 // GanttChartVisualizer component - only handles the visual representation
 export interface GanttChartVisualizerProps {
+  traceId: string;
+  // The structured trace's agent spans, which clicking a bar selects
   spans: Span[];
-  trace: TraceItem | null;
   onSelectSpan: (span: Span) => void;
   onSelectTool: (tool: ToolCall) => void;
   selectedSpanId?: string;
@@ -1,20 +1,44 @@
-import sqlite3
+import atexit
 import uuid
 import json
 import datetime
 from pathlib import Path
+from agensight.utils.sqlite_pool import SQLitePool, connect, SERVER_POOL_SIZE
+from agensight.utils.migrations import run_migrations
 
 DB_FILE = Path(__file__).parent / "eval.db"
 
+_pool = SQLitePool(DB_FILE)
+atexit.register(_pool.close)
+
+# Read-only connections for the dashboard API, kept apart from the exporter's.
+_read_only_pool = SQLitePool(DB_FILE, size=SERVER_POOL_SIZE, read_only=True)
+atexit.register(_read_only_pool.close)
+
 def get_db():
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Open a standalone connection. Prefer ``writer()`` / ``reader()``."""
+    return connect(DB_FILE)
+
+def writer():
+    """Shared writer connection; the ``with`` block is one transaction."""
+    return _pool.writer()
+
+def reader():
+    """Borrow a pooled connection for queries."""
+    return _pool.reader()
+
+def read_only_reader():
+    """Borrow a read-only connection from the API server's pool."""
+    return _read_only_pool.reader()
 
 def init_evals_schema():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.executescript('''                         
+    with writer() as conn:
+        return run_migrations(conn, MIGRATIONS)
+
+# Append new migrations at the end with the next version number; never edit
+# one that has already shipped.
+MIGRATIONS = [
+    (1, "evaluations table", ('''
         CREATE TABLE IF NOT EXISTS evaluations(
             id TEXT PRIMARY KEY,
             parentId TEXT,
@@ -35,7 +59,32 @@ def init_evals_schema():
             createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             isMetricAnnotation INTEGER
-        );                          
-    ''')
-    conn.commit()
-    conn.close()
\ No newline at end of file
+        )
+    ''',)),
+    (2, "indexes for parent, metric and time lookups", (
+        "CREATE INDEX IF NOT EXISTS idx_evaluations_parent_metric ON evaluations (parentId, metricName, createdAt)",
+        "CREATE INDEX IF NOT EXISTS idx_evaluations_metric ON evaluations (metricName)",
+        "CREATE INDEX IF NOT EXISTS idx_evaluations_created ON evaluations (createdAt)",
+    )),
+    (3, "per-metric score rollups", ('''
+        CREATE TABLE IF NOT EXISTS evaluation_rollups(
+            metricName TEXT NOT NULL,
+            source TEXT NOT NULL,
+            projectId TEXT NOT NULL,
+            parentType TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            scored INTEGER NOT NULL DEFAULT 0,
+            scoreSum REAL NOT NULL DEFAULT 0,
+            minScore REAL,
+            maxScore REAL,
+            PRIMARY KEY (metricName, source, projectId, parentType)
+        )
+    ''', '''
+        INSERT OR REPLACE INTO evaluation_rollups
+            (metricName, source, projectId, parentType, count, scored, scoreSum, minScore, maxScore)
+        SELECT COALESCE(metricName, ''), COALESCE(source, ''), COALESCE(projectId, ''), COALESCE(parentType, ''),
+               COUNT(*), COUNT(score), COALESCE(SUM(score), 0), MIN(score), MAX(score)
+        FROM evaluations
+        GROUP BY 1, 2, 3, 4
+    ''')),
+]
@@ -2,10 +2,53 @@ import sqlite3
 import uuid
 from typing import Dict, List, Optional, Any
 from pathlib import Path
-from .db import get_db
+from .db import writer, reader
+from .metrics_queries import ROLLUP_DIMENSIONS
+from agensight.utils.sqlite_pool import chunks, placeholders
 import json
 
 
+def _add_to_rollup(conn, metric_name, source, project_id, parent_type, score):
+    """Fold one new evaluation into its ``evaluation_rollups`` row."""
+    conn.execute('''
+    INSERT INTO evaluation_rollups
+        (metricName, source, projectId, parentType, count, scored, scoreSum, minScore, maxScore)
+    VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?)
+    ON CONFLICT (metricName, source, projectId, parentType) DO UPDATE SET
+        count = count + 1,
+        scored = scored + excluded.scored,
+        scoreSum = scoreSum + excluded.scoreSum,
+        minScore = COALESCE(MIN(minScore, excluded.minScore), minScore, excluded.minScore),
+        maxScore = COALESCE(MAX(maxScore, excluded.maxScore), maxScore, excluded.maxScore)
+    ''', (
+        metric_name or "", source or "", project_id or "", parent_type or "",
+        0 if score is None else 1, score or 0, score, score
+    ))
+
+
+def _rollup_key(conn, eval_id):
+    row = conn.execute(
+        f"SELECT {', '.join(ROLLUP_DIMENSIONS)} FROM evaluations WHERE id = ?", (eval_id,)
+    ).fetchone()
+    return tuple(value or "" for value in row) if row else None
+
+
+def _rebuild_rollups(conn, keys):
+    """Recompute rollup rows from scratch; min/max cannot be undone incrementally."""
+    match = " AND ".join(f"COALESCE({column}, '') = ?" for column in ROLLUP_DIMENSIONS)
+    for key in set(k for k in keys if k is not None):
+        conn.execute(
+            "DELETE FROM evaluation_rollups WHERE " + " AND ".join(f"{c} = ?" for c in ROLLUP_DIMENSIONS), key
+        )
+        conn.execute(f'''
+        INSERT INTO evaluation_rollups
+            (metricName, source, projectId, parentType, count, scored, scoreSum, minScore, maxScore)
+        SELECT ?, ?, ?, ?, COUNT(*), COUNT(score), COALESCE(SUM(score), 0), MIN(score), MAX(score)
+        FROM evaluations WHERE {match}
+        HAVING COUNT(*) > 0
+        ''', key + key)
+
+
 def insert_evaluation(
     metric_name: str,
     score: float,
@@ -30,8 +73,6 @@ def insert_evaluation(
     Returns:
         str: The ID of the inserted evaluation
     """
-    conn = get_db()
-    cursor = conn.cursor()
     eval_id = str(uuid.uuid4())
     
     # Convert tags list to string representation if provided
@@ -40,20 +81,19 @@ def insert_evaluation(
     # Convert meta dict to JSON string if provided
     meta_json = json.dumps(meta) if meta else "{}"
     
-    cursor.execute('''
-    INSERT INTO evaluations (
-        id, parentId, parentType, projectId, metricName, score, reason,
-        version, humanFeedback, humanFeedbackReason, source, model,
-        modelVersion, type, tags, meta, isMetricAnnotation
-    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        eval_id, parent_id, parent_type, project_id, metric_name, score, reason,
-        version, human_feedback, human_feedback_reason, source, model,
-        model_version, eval_type, tags_str, meta_json, is_metric_annotation
-    ))
-    
-    conn.commit()
-    conn.close()
+    with writer() as conn:
+        conn.execute('''
+        INSERT INTO evaluations (
+            id, parentId, parentType, projectId, metricName, score, reason,
+            version, humanFeedback, humanFeedbackReason, source, model,
+            modelVersion, type, tags, meta, isMetricAnnotation
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            eval_id, parent_id, parent_type, project_id, metric_name, score, reason,
+            version, human_feedback, human_feedback_reason, source, model,
+            model_version, eval_type, tags_str, meta_json, is_metric_annotation
+        ))
+        _add_to_rollup(conn, metric_name, source, project_id, parent_type, score)
     
     return eval_id
 
@@ -64,13 +104,8 @@ def get_evaluation_by_id(eval_id: str) -> Optional[Dict[str, Any]]:
     Returns:
         Optional[Dict[str, Any]]: The evaluation data as a dictionary, or None if not found
     """
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM evaluations WHERE id = ?', (eval_id,))
-    row = cursor.fetchone()
-    
-    conn.close()
+    with reader() as conn:
+        row = conn.execute('SELECT * FROM evaluations WHERE id = ?', (eval_id,)).fetchone()
     
     if row:
         return dict(row)
@@ -89,24 +124,23 @@ def update_evaluation(
     if not kwargs:
         return False
     
-    conn = get_db()
-    cursor = conn.cursor()
-    
     # Build SET clause for SQL update
     set_clause = ', '.join(f'{k} = ?' for k in kwargs.keys())
     values = list(kwargs.values())
     values.append(eval_id)
     
     # Update the record
-    cursor.execute(f'''
-    UPDATE evaluations
-    SET {set_clause}, updatedAt = CURRENT_TIMESTAMP
-    WHERE id = ?
-    ''', values)
-    
-    success = cursor.rowcount > 0
-    conn.commit()
-    conn.close()
+    with writer() as conn:
+        affects_rollup = "score" in kwargs or any(k in ROLLUP_DIMENSIONS for k in kwargs)
+        old_key = _rollup_key(conn, eval_id) if affects_rollup else None
+        cursor = conn.execute(f'''
+        UPDATE evaluations
+        SET {set_clause}, updatedAt = CURRENT_TIMESTAMP
+        WHERE id = ?
+        ''', values)
+        success = cursor.rowcount > 0
+        if success and affects_rollup:
+            _rebuild_rollups(conn, [old_key, _rollup_key(conn, eval_id)])
     
     return success
 
@@ -117,16 +151,80 @@ def delete_evaluation(eval_id: str) -> bool:
     Returns:
         bool: True if the deletion was successful, False otherwise
     """
-    conn = get_db()
-    cursor = conn.cursor()
+    with writer() as conn:
+        key = _rollup_key(conn, eval_id)
+        cursor = conn.execute('DELETE FROM evaluations WHERE id = ?', (eval_id,))
+        success = cursor.rowcount > 0
+        if success:
+            _rebuild_rollups(conn, [key])
     
-    cursor.execute('DELETE FROM evaluations WHERE id = ?', (eval_id,))
+    return success
+
+def _remove_from_rollups(conn, where, params):
+    """
+    Subtract the evaluations matching ``where`` from their rollup rows.
+
+    Returns the keys whose min or max score is among the removed ones; those
+    rows must be rebuilt once the evaluations are gone.
+    """
+    dims = ", ".join(f"COALESCE({column}, '')" for column in ROLLUP_DIMENSIONS)
+    match = " AND ".join(f"{column} = ?" for column in ROLLUP_DIMENSIONS)
+    removed = conn.execute(f'''
+    SELECT {dims}, COUNT(*), COUNT(score), COALESCE(SUM(score), 0), MIN(score), MAX(score)
+    FROM evaluations WHERE {where} GROUP BY {dims}
+    ''', params).fetchall()
+    stale = []
+    for row in removed:
+        key = tuple(row[:4])
+        count, scored, score_sum, min_score, max_score = tuple(row[4:])
+        rollup = conn.execute(f"SELECT minScore, maxScore FROM evaluation_rollups WHERE {match}", key).fetchone()
+        if rollup is None:
+            continue
+        if (min_score is not None and rollup["minScore"] is not None and min_score <= rollup["minScore"]) or \
+                (max_score is not None and rollup["maxScore"] is not None and max_score >= rollup["maxScore"]):
+            stale.append(key)
+            continue
+        conn.execute(
+            f"UPDATE evaluation_rollups SET count = count - ?, scored = scored - ?, scoreSum = scoreSum - ? WHERE {match}",
+            (count, scored, score_sum) + key
+        )
+    return stale
+
+
+def _delete_where(conn, where, params) -> int:
+    stale = _remove_from_rollups(conn, where, params)
+    cursor = conn.execute(f"DELETE FROM evaluations WHERE {where}", params)
+    _rebuild_rollups(conn, stale)
+    conn.execute("DELETE FROM evaluation_rollups WHERE count <= 0")
+    return cursor.rowcount
+
+
+def delete_evaluations_for_parents(parent_ids: List[str]) -> int:
+    """
+    Delete the evaluations of the given spans and traces.
     
-    success = cursor.rowcount > 0
-    conn.commit()
-    conn.close()
+    Returns:
+        int: The number of evaluations deleted
+    """
+    deleted = 0
+    with writer() as conn:
+        for chunk in chunks(list(parent_ids)):
+            deleted += _delete_where(conn, f"parentId IN ({placeholders(chunk)})", list(chunk))
+    return deleted
+
+def delete_evaluations_before(cutoff: float, limit: int = 1000) -> int:
+    """
+    Delete up to ``limit`` of the oldest evaluations created before the Unix time ``cutoff``.
     
-    return success
+    Returns:
+        int: The number of evaluations deleted
+    """
+    with writer() as conn:
+        return _delete_where(
+            conn,
+            "id IN (SELECT id FROM evaluations WHERE createdAt < datetime(?, 'unixepoch') ORDER BY createdAt LIMIT ?)",
+            [cutoff, limit]
+        )
 
 def get_evaluations(
     project_id: Optional[str] = None,
@@ -141,9 +239,6 @@ def get_evaluations(
     Returns:
         List[Dict[str, Any]]: List of evaluations as dictionaries
     """
-    conn = get_db()
-    cursor = conn.cursor()
-    
     query = 'SELECT * FROM evaluations WHERE 1=1'
     params = []
     
@@ -162,9 +257,7 @@ def get_evaluations(
     query += ' ORDER BY createdAt DESC LIMIT ? OFFSET ?'
     params.extend([limit, offset])
     
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    
-    conn.close()
+    with reader() as conn:
+        rows = conn.execute(query, params).fetchall()
     
     return [dict(row) for row in rows]
\ No newline at end of file
@@ -0,0 +1,109 @@
+"""
+Read queries behind the ``/api/metrics`` endpoints.
+
+Every statement is a fixed SQL string with ``?`` parameters, so each filter
+combination compiles once per connection and is then served from sqlite3's
+statement cache. Summaries and unfiltered-by-parent totals come from the
+``evaluation_rollups`` table, which ``insert_evaluation`` keeps current, so
+they cost O(metrics) rather than O(evaluations).
+"""
+import json
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+
+# Rollup rows store NULL dimensions as '' so they can be part of the key.
+ROLLUP_DIMENSIONS = ("metricName", "source", "projectId", "parentType")
+
+# (connection, table) pairs known to exist. The API's connections are pooled
+# for the life of the process, so this skips the sqlite_master probe on all
+# but the first request. Only positive answers are cached: a missing table
+# may still be created by a migration.
+_known_tables = set()
+
+
+def table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    key = (id(conn), table)
+    if key in _known_tables:
+        return True
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+    if row:
+        _known_tables.add(key)
+    return bool(row)
+
+
+def _where(filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    clauses, params = [], []
+    for column, value in filters.items():
+        if value:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def _decode(row: sqlite3.Row) -> Dict[str, Any]:
+    metric = dict(row)
+    if isinstance(metric.get("meta"), str):
+        try:
+            metric["meta"] = json.loads(metric["meta"])
+        except ValueError:
+            pass
+    return metric
+
+
+def list_evaluations(
+    conn: sqlite3.Connection,
+    parent_id: Optional[str] = None,
+    parent_type: Optional[str] = None,
+    metric_name: Optional[str] = None,
+    source: Optional[str] = None,
+    project_id: Optional[str] = None,
+    limit: int = 10,
+    offset: int = 0,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """One page of evaluations, newest first, and the total matching count."""
+    dimensions = {"metricName": metric_name, "source": source, "projectId": project_id, "parentType": parent_type}
+    where, params = _where({"parentId": parent_id, **dimensions})
+
+    rows = conn.execute(
+        f"SELECT * FROM evaluations{where} ORDER BY createdAt DESC LIMIT ? OFFSET ?", params + [limit, offset]
+    ).fetchall()
+
+    if parent_id:
+        # Narrowed by the (parentId, metricName, createdAt) index.
+        total = conn.execute(f"SELECT COUNT(*) FROM evaluations{where}", params).fetchone()[0]
+    else:
+        rollup_where, rollup_params = _where(dimensions)
+        total = conn.execute(
+            f"SELECT COALESCE(SUM(count), 0) FROM evaluation_rollups{rollup_where}", rollup_params
+        ).fetchone()[0]
+
+    return [_decode(row) for row in rows], total
+
+
+def get_evaluation(conn: sqlite3.Connection, eval_id: str) -> Optional[Dict[str, Any]]:
+    row = conn.execute("SELECT * FROM evaluations WHERE id = ?", (eval_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def metrics_summary(
+    conn: sqlite3.Connection,
+    metric_name: Optional[str] = None,
+    source: Optional[str] = None,
+    project_id: Optional[str] = None,
+    parent_type: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Count and average/min/max score per metric name."""
+    where, params = _where({"metricName": metric_name, "source": source, "projectId": project_id, "parentType": parent_type})
+    rows = conn.execute(f'''
+        SELECT
+            NULLIF(metricName, '') AS metricName,
+            SUM(count) AS count,
+            SUM(scoreSum) / NULLIF(SUM(scored), 0) AS average_score,
+            MIN(minScore) AS min_score,
+            MAX(maxScore) AS max_score
+        FROM evaluation_rollups{where}
+        GROUP BY metricName
+        HAVING SUM(count) > 0
+        ORDER BY metricName
+    ''', params).fetchall()
+    return [dict(row) for row in rows]
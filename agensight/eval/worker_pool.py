@@ -0,0 +1,166 @@
+"""
+Background worker pool for span-attached metric evaluation.
+
+Judge-model calls take seconds, so exporters hand them to this pool instead of
+running them on the OpenTelemetry export thread. The queue is bounded; when it
+is full a submission is either dropped or blocks the caller, depending on the
+overflow policy.
+"""
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_WORKERS = int(os.getenv("AGENSIGHT_EVAL_WORKERS", "2"))
+DEFAULT_QUEUE_SIZE = int(os.getenv("AGENSIGHT_EVAL_QUEUE_SIZE", "1000"))
+DEFAULT_OVERFLOW = os.getenv("AGENSIGHT_EVAL_OVERFLOW", "drop")
+
+OVERFLOW_POLICIES = ("drop", "block")
+
+_STOP = object()
+
+
+class EvaluationWorkerPool:
+    """
+    Bounded queue drained by a fixed number of daemon threads.
+
+    Args:
+        workers: Number of worker threads.
+        max_queue: Maximum number of items waiting or running.
+        overflow: ``"drop"`` discards new work when the queue is full,
+            ``"block"`` waits for space (up to ``block_timeout`` seconds, or
+            forever if it is ``None``) and drops only if that expires.
+        block_timeout: How long ``"block"`` waits for space.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_queue: int = DEFAULT_QUEUE_SIZE,
+                 overflow: str = DEFAULT_OVERFLOW, block_timeout: Optional[float] = None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}, got {overflow!r}")
+        self.workers = max(1, workers)
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self._queue: "queue.Queue" = queue.Queue()
+        self._slots = threading.BoundedSemaphore(max(1, max_queue))
+        self._threads = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._counters = {"queued": 0, "completed": 0, "failed": 0, "dropped": 0}
+
+    def _start(self):
+        with self._lock:
+            if self._threads or self._closed:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"agensight-eval-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def submit(self, fn: Callable, *args: Any, **kwargs: Any) -> bool:
+        """Queue ``fn(*args, **kwargs)``. Returns False if the work was dropped."""
+        if self._closed:
+            self._count("dropped")
+            return False
+        self._start()
+
+        if self.overflow == "block":
+            has_slot = self._slots.acquire(timeout=self.block_timeout)
+        else:
+            has_slot = self._slots.acquire(blocking=False)
+        if not has_slot:
+            self._count("dropped")
+            return False
+
+        self._count("queued")
+        self._queue.put((fn, args, kwargs))
+        return True
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                fn, args, kwargs = item
+                try:
+                    fn(*args, **kwargs)
+                    self._count("completed")
+                except Exception as e:
+                    print(f"Error in evaluation worker: {e}")
+                    self._count("failed")
+                finally:
+                    self._slots.release()
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for queued, completed, failed and dropped work, plus current backlog."""
+        with self._lock:
+            counters = dict(self._counters)
+        counters["pending"] = self._queue.qsize()
+        return counters
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until every queued item has run, or until ``timeout`` seconds pass.
+        Returns False if work was still outstanding when the timeout expired.
+        """
+        if timeout is None:
+            self._queue.join()
+            return True
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def shutdown(self, wait: bool = True, timeout: Optional[float] = None):
+        """
+        Stop accepting work and stop the workers once the queue drains.
+        With ``wait``, ``timeout`` bounds the whole shutdown, not each worker.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            threads = list(self._threads)
+        for _ in threads:
+            self._queue.put(_STOP)
+        if wait:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            for thread in threads:
+                thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+
+_pool: Optional[EvaluationWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_evaluation_pool() -> EvaluationWorkerPool:
+    """Process-wide pool, created on first use from the AGENSIGHT_EVAL_* settings."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool._closed:
+            _pool = EvaluationWorkerPool()
+        return _pool
+
+
+def configure_evaluation_pool(workers: int = DEFAULT_WORKERS, max_queue: int = DEFAULT_QUEUE_SIZE,
+                              overflow: str = DEFAULT_OVERFLOW,
+                              block_timeout: Optional[float] = None) -> EvaluationWorkerPool:
+    """Replace the process-wide pool; the previous one finishes its backlog in the background."""
+    global _pool
+    new_pool = EvaluationWorkerPool(workers, max_queue, overflow, block_timeout)
+    with _pool_lock:
+        old_pool, _pool = _pool, new_pool
+    if old_pool is not None:
+        old_pool.shutdown(wait=False)
+    return new_pool
@@ -0,0 +1,112 @@
+"""
+Cold archival of expired trace data as compressed Parquet files.
+
+Needs the optional ``pyarrow`` dependency (``pip install agensight[archive]``).
+Each call writes one file per table under
+``<directory>/<table>/<YYYY-MM-DD>/part-<ns>.parquet``, so a whole table can
+be read back as one dataset with pyarrow, pandas or DuckDB.
+"""
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+from agensight.utils.sqlite_pool import chunks, placeholders
+
+ARCHIVE_DIR = os.getenv("AGENSIGHT_ARCHIVE_DIR") or None
+ARCHIVE_COMPRESSION = os.getenv("AGENSIGHT_ARCHIVE_COMPRESSION", "zstd")
+
+# SQLite declared type -> Arrow type name; anything else is archived as text.
+ARROW_TYPES = {"INTEGER": "int64", "REAL": "float64", "TEXT": "string"}
+
+
+class ArchiveUnavailable(Exception):
+    """pyarrow is not installed."""
+
+
+def require_pyarrow():
+    """The ``pyarrow`` module, with its Parquet and IPC submodules loaded."""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ArchiveUnavailable("Parquet and Arrow output requires pyarrow: pip install 'agensight[archive]'")
+    return pyarrow
+
+
+def arrow_schema(conn: sqlite3.Connection, table: str):
+    """Arrow schema from the table's declared column types."""
+    pa = require_pyarrow()
+    fields = []
+    for column in conn.execute(f"PRAGMA table_info({table})"):
+        type_name = ARROW_TYPES.get((column["type"] or "").upper(), "string")
+        fields.append(pa.field(column["name"], getattr(pa, type_name)()))
+    return pa.schema(fields)
+
+
+def rows_to_arrow(rows: Sequence[sqlite3.Row], schema):
+    """Build an Arrow table, falling back to text for columns with mixed types."""
+    pa = require_pyarrow()
+    arrays = []
+    fields = []
+    for field in schema:
+        values = [row[field.name] for row in rows]
+        try:
+            arrays.append(pa.array(values, type=field.type))
+            fields.append(field)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # SQLite does not enforce declared types.
+            arrays.append(pa.array([None if v is None else str(v) for v in values], type=pa.string()))
+            fields.append(pa.field(field.name, pa.string()))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def write_parquet(table, path: Union[str, Path], compression: str = ARCHIVE_COMPRESSION):
+    pa = require_pyarrow()
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write beside the target and rename, so readers never see half a file.
+    partial = path.with_name(path.name + ".partial")
+    pa.parquet.write_table(table, partial, compression=compression)
+    os.replace(partial, path)
+
+
+def _select(conn: sqlite3.Connection, table: str, column: str, ids: Sequence[str]) -> List[sqlite3.Row]:
+    rows: List[sqlite3.Row] = []
+    for chunk in chunks(ids):
+        rows.extend(conn.execute(f"SELECT * FROM {table} WHERE {column} IN ({placeholders(chunk)})", chunk))
+    return rows
+
+
+def archive_rows(
+    conn: sqlite3.Connection,
+    trace_ids: Sequence[str],
+    span_ids: Sequence[str],
+    directory: Optional[Union[str, Path]] = ARCHIVE_DIR,
+) -> Dict[str, int]:
+    """
+    Write the traces, spans and message rows about to be deleted to Parquet.
+
+    Returns the number of rows archived per table. Raises
+    ``ArchiveUnavailable`` without pyarrow and ``OSError`` if a file cannot
+    be written; callers must not delete the rows in either case.
+    """
+    require_pyarrow()
+    selections = {
+        "traces": _select(conn, "traces", "id", trace_ids),
+        "spans": _select(conn, "spans", "id", span_ids),
+    }
+    for table in ("prompts", "completions", "tools"):
+        selections[table] = _select(conn, table, "span_id", span_ids)
+
+    day = time.strftime("%Y-%m-%d", time.gmtime())
+    part = f"part-{time.time_ns()}.parquet"
+    counts = {}
+    for table, rows in selections.items():
+        if not rows:
+            continue
+        write_parquet(rows_to_arrow(rows, arrow_schema(conn, table)), Path(directory) / table / day / part)
+        counts[table] = len(rows)
+    return counts
@@ -0,0 +1,352 @@
+"""
+Columnar export of the local trace and evaluation stores for offline analysis.
+
+``export_dataset`` streams traces, spans, prompts, completions, tools and
+evaluations into Parquet or Arrow IPC files, one dataset directory per
+table, partitioned by the UTC day each trace started::
+
+    <out>/spans/date=2024-05-01/part-0.parquet
+
+Traces are read in ``(started_at, id)`` order a batch at a time, and each
+batch's spans, messages and evaluations are fetched by key, so memory use
+depends on the batch size rather than the size of the store. Span rows
+carry typed columns taken from the attributes JSON (model, LLM flag, token
+counts), so analysis does not have to parse it. Evaluations are exported
+with the trace their span belongs to.
+
+Needs the optional ``pyarrow`` dependency (``pip install agensight[archive]``).
+"""
+import itertools
+import json
+import shutil
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import agensight.eval.storage.db as eval_storage
+import agensight.tracing.db as trace_storage
+from agensight.eval.storage.metrics_queries import table_exists
+from agensight.tracing.archive import ARCHIVE_COMPRESSION, require_pyarrow
+from agensight.tracing.sketches import model_from_attrs
+from agensight.tracing.span_classifier import is_llm_record
+from agensight.tracing.utils import extract_token_counts_from_attrs
+from agensight.utils.sqlite_pool import chunks, placeholders
+
+EXPORT_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+EXPORT_TABLES = ("traces", "spans", "prompts", "completions", "tools", "evaluations")
+# Traces per batch; their spans and messages are held in memory together.
+EXPORT_BATCH_SIZE = 500
+# Partition for traces without a start time.
+UNKNOWN_PARTITION = "unknown"
+
+_TIMESTAMP = "timestamp"
+
+# table -> [(column, type)]; evaluations take their columns from eval.db.
+_COLUMNS = {
+    "traces": [
+        ("id", "string"), ("session_id", "string"), ("name", "string"),
+        ("started_at", _TIMESTAMP), ("ended_at", _TIMESTAMP), ("duration", "float64"),
+        ("total_tokens", "int64"), ("metadata", "string"),
+    ],
+    "spans": [
+        ("id", "string"), ("trace_id", "string"), ("session_id", "string"), ("parent_id", "string"),
+        ("name", "string"), ("started_at", _TIMESTAMP), ("ended_at", _TIMESTAMP), ("duration", "float64"),
+        ("kind", "string"), ("status", "string"), ("is_llm", "bool_"), ("model", "string"),
+        ("prompt_tokens", "int64"), ("completion_tokens", "int64"), ("total_tokens", "int64"),
+        ("attributes", "string"),
+    ],
+    "prompts": [
+        ("id", "int64"), ("span_id", "string"), ("trace_id", "string"), ("role", "string"),
+        ("content", "string"), ("message_index", "int64"),
+    ],
+    "completions": [
+        ("id", "int64"), ("span_id", "string"), ("trace_id", "string"), ("role", "string"),
+        ("content", "string"), ("finish_reason", "string"), ("prompt_tokens", "int64"),
+        ("completion_tokens", "int64"), ("total_tokens", "int64"),
+    ],
+    "tools": [
+        ("id", "int64"), ("span_id", "string"), ("trace_id", "string"), ("name", "string"),
+        ("arguments", "string"),
+    ],
+}
+
+# SQLite declared type -> Arrow type for the evaluations table.
+_EVAL_TYPES = {"INTEGER": "int64", "REAL": "float64"}
+
+
+def _arrow_type(pa, name: str):
+    if name == _TIMESTAMP:
+        return pa.timestamp("us", tz="UTC")
+    return getattr(pa, name)()
+
+
+def _schema(pa, columns: Sequence) -> Any:
+    return pa.schema([pa.field(name, _arrow_type(pa, type_name)) for name, type_name in columns])
+
+
+def _evaluation_columns(conn) -> List:
+    columns = [
+        (row["name"], _EVAL_TYPES.get((row["type"] or "").upper(), "string"))
+        for row in conn.execute("PRAGMA table_info(evaluations)")
+    ]
+    return columns + [("trace_id", "string")]
+
+
+def _to_arrow(pa, rows: List[Dict[str, Any]], schema):
+    """Arrow table with exactly ``schema``; values SQLite stored with another type are coerced or nulled."""
+    arrays = []
+    for field in schema:
+        values = [row.get(field.name) for row in rows]
+        if pa.types.is_timestamp(field.type):
+            values = [_datetime(v) for v in values]
+        try:
+            arrays.append(pa.array(values, type=field.type))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+            arrays.append(pa.array([_coerce(pa, v, field.type) for v in values], type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _datetime(value) -> Optional[datetime]:
+    try:
+        return datetime.fromtimestamp(float(value), timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+
+
+def _coerce(pa, value, arrow_type):
+    if value is None:
+        return None
+    if pa.types.is_string(arrow_type):
+        return str(value)
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if pa.types.is_integer(arrow_type):
+        return int(number) if number.is_integer() else None
+    if pa.types.is_boolean(arrow_type):
+        return bool(number)
+    return number
+
+
+class _DatasetWriter:
+    """Writes one table's partitions, one file open at a time."""
+
+    def __init__(self, pa, root: Path, table: str, schema, fmt: str, compression: str, partitioned: bool):
+        self.pa = pa
+        self.directory = root / table
+        self.schema = schema
+        self.fmt = fmt
+        self.compression = compression
+        self.partitioned = partitioned
+        self.rows = 0
+        self._partition = None
+        self._writer = None
+        self._sink = None
+        self._path: Optional[Path] = None
+        self._parts: Dict[str, int] = {}
+
+    def write(self, partition: str, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        # Without partitioning every day goes into the one open file.
+        if self._writer is None or (self.partitioned and partition != self._partition):
+            self.close()
+            self._open(partition)
+        self._writer.write_table(_to_arrow(self.pa, rows, self.schema))
+        self.rows += len(rows)
+
+    def _open(self, partition: str):
+        directory = self.directory / f"date={partition}" if self.partitioned else self.directory
+        directory.mkdir(parents=True, exist_ok=True)
+        part = self._parts.get(str(directory), 0)
+        self._parts[str(directory)] = part + 1
+        self._partition = partition
+        self._path = directory / f"part-{part}{EXPORT_FORMATS[self.fmt]}"
+        # Written beside the target and renamed on close, so readers never
+        # pick up half a file.
+        partial = self._path.with_name(self._path.name + ".partial")
+        if self.fmt == "parquet":
+            self._writer = self.pa.parquet.ParquetWriter(partial, self.schema, compression=self.compression)
+        else:
+            self._sink = self.pa.OSFile(str(partial), "wb")
+            options = self.pa.ipc.IpcWriteOptions(compression=self.compression)
+            self._writer = self.pa.ipc.new_file(self._sink, self.schema, options=options)
+
+    def close(self, keep: bool = True):
+        if self._writer is None:
+            return
+        self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+        partial = self._path.with_name(self._path.name + ".partial")
+        if keep:
+            partial.replace(self._path)
+        else:
+            partial.unlink()
+        self._writer = self._sink = None
+
+
+def _partition(started_at: Optional[float]) -> str:
+    if started_at is None:
+        return UNKNOWN_PARTITION
+    return time.strftime("%Y-%m-%d", time.gmtime(started_at))
+
+
+def _trace_batches(since: Optional[float], until: Optional[float], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Traces in ``(started_at, id)`` order, read with keyset pagination."""
+    columns = "id, session_id, name, started_at, ended_at, ended_at - started_at AS duration, total_tokens, metadata"
+    if since is None and until is None:
+        last_id = ""
+        while True:
+            with trace_storage.reader() as conn:
+                rows = conn.execute(
+                    f"SELECT {columns} FROM traces WHERE started_at IS NULL AND id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+            yield [dict(row) for row in rows]
+
+    where, params = "started_at IS NOT NULL", []
+    if since is not None:
+        where += " AND started_at >= ?"
+        params.append(since)
+    if until is not None:
+        where += " AND started_at < ?"
+        params.append(until)
+    cursor = None
+    while True:
+        keyset = " AND (started_at, id) > (?, ?)" if cursor else ""
+        with trace_storage.reader() as conn:
+            rows = conn.execute(
+                f"SELECT {columns} FROM traces WHERE {where}{keyset} ORDER BY started_at, id LIMIT ?",
+                params + list(cursor or ()) + [batch_size]
+            ).fetchall()
+        if not rows:
+            return
+        cursor = (rows[-1]["started_at"], rows[-1]["id"])
+        yield [dict(row) for row in rows]
+
+
+def _select_in(conn, sql: str, ids: Sequence[str]) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    for chunk in chunks(list(ids)):
+        rows.extend(dict(row) for row in conn.execute(sql.format(ids=placeholders(chunk)), chunk))
+    return rows
+
+
+def _span_row(span: Dict[str, Any], session_id: Optional[str], include_attributes: bool) -> Dict[str, Any]:
+    try:
+        attrs = json.loads(span["attributes"]) if span["attributes"] else {}
+    except ValueError:
+        attrs = {}
+    if not isinstance(attrs, dict):
+        attrs = {}
+    is_llm = is_llm_record(span["name"], attrs)
+    tokens = extract_token_counts_from_attrs(attrs) if is_llm else {}
+    span.update(
+        session_id=session_id,
+        is_llm=is_llm,
+        model=model_from_attrs(attrs) or None,
+        prompt_tokens=tokens.get("prompt"),
+        completion_tokens=tokens.get("completion"),
+        total_tokens=tokens.get("total"),
+    )
+    if not include_attributes:
+        span["attributes"] = None
+    return span
+
+
+def export_dataset(
+    out_dir: Union[str, Path],
+    fmt: str = "parquet",
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    tables: Iterable[str] = EXPORT_TABLES,
+    partition_by_day: bool = True,
+    include_attributes: bool = True,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    compression: str = ARCHIVE_COMPRESSION,
+    overwrite: bool = False,
+) -> Dict[str, int]:
+    """
+    Export traces started in ``[since, until)`` (Unix times; None for no
+    bound) and everything under them to ``out_dir``.
+
+    ``fmt`` is ``"parquet"`` or ``"arrow"`` (Arrow IPC file format). Existing
+    table directories under ``out_dir`` raise ``FileExistsError`` unless
+    ``overwrite`` is set. Returns the number of rows written per table.
+    """
+    pa = require_pyarrow()
+
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"fmt must be one of {', '.join(EXPORT_FORMATS)}")
+    tables = list(tables)
+    unknown = set(tables) - set(EXPORT_TABLES)
+    if unknown:
+        raise ValueError(f"Unknown tables: {', '.join(sorted(unknown))}")
+
+    root = Path(out_dir)
+    for table in tables:
+        directory = root / table
+        if directory.exists() and any(directory.iterdir()):
+            if not overwrite:
+                raise FileExistsError(f"{directory} already exists; pass overwrite=True to replace it")
+            shutil.rmtree(directory)
+
+    if "evaluations" in tables:
+        with eval_storage.reader() as conn:
+            if table_exists(conn, "evaluations"):
+                eval_columns = _evaluation_columns(conn)
+            else:
+                tables.remove("evaluations")
+
+    writers = {}
+    for table in tables:
+        columns = eval_columns if table == "evaluations" else _COLUMNS[table]
+        writers[table] = _DatasetWriter(pa, root, table, _schema(pa, columns), fmt, compression, partition_by_day)
+
+    completed = False
+    try:
+        for batch in _trace_batches(since, until, batch_size):
+            for partition, group in itertools.groupby(batch, key=lambda t: _partition(t["started_at"])):
+                _export_traces(list(group), partition, writers, include_attributes)
+        completed = True
+    finally:
+        for writer in writers.values():
+            writer.close(keep=completed)
+    return {table: writer.rows for table, writer in writers.items()}
+
+
+def _export_traces(traces: List[Dict[str, Any]], partition: str, writers: Dict[str, _DatasetWriter],
+                   include_attributes: bool):
+    trace_ids = [trace["id"] for trace in traces]
+    session_by_trace = {trace["id"]: trace["session_id"] for trace in traces}
+    if "traces" in writers:
+        writers["traces"].write(partition, traces)
+
+    with trace_storage.reader() as conn:
+        spans = _select_in(conn, "SELECT * FROM spans WHERE trace_id IN ({ids}) ORDER BY trace_id, started_at", trace_ids)
+        trace_by_span = {span["id"]: span["trace_id"] for span in spans}
+        span_ids = list(trace_by_span)
+        if "spans" in writers:
+            writers["spans"].write(partition, [
+                _span_row(span, session_by_trace.get(span["trace_id"]), include_attributes) for span in spans
+            ])
+        for table in ("prompts", "completions", "tools"):
+            if table not in writers:
+                continue
+            rows = _select_in(conn, f"SELECT * FROM {table} WHERE span_id IN ({{ids}}) ORDER BY id", span_ids)
+            for row in rows:
+                row["trace_id"] = trace_by_span.get(row["span_id"])
+            writers[table].write(partition, rows)
+
+    if "evaluations" in writers:
+        with eval_storage.reader() as conn:
+            rows = _select_in(conn, "SELECT * FROM evaluations WHERE parentId IN ({ids})", span_ids + trace_ids)
+        for row in rows:
+            row["trace_id"] = trace_by_span.get(row["parentId"], row["parentId"])
+        writers["evaluations"].write(partition, rows)
@@ -1,5 +1,9 @@
 import os
 
+# Modes whose spans reach traces.db through another process (the ingest
+# daemon or an OTLP receiver), so the traced process must not write it.
+EXPORTED_MODES = ("otlp", "ingest")
+
 config = {
     "exporter": os.getenv("TRACE_EXPORTER", "console"),
     "session_tracking": os.getenv("TRACE_SESSION_ENABLED", "false").lower() == "true",
@@ -16,6 +20,9 @@ def get_mode():
 def set_mode(value):
     config["mode"] = value
 
+def is_exported_mode():
+    return get_mode() in EXPORTED_MODES
+
 def get_project_id():
     return config.get("project_id")
 
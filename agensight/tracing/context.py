@@ -1,4 +1,8 @@
 from contextvars import ContextVar
 
 trace_input = ContextVar("trace_input", default=None)
-trace_output = ContextVar("trace_output", default=None)
\ No newline at end of file
+trace_output = ContextVar("trace_output", default=None)
+
+# Set by the @trace decorator for the duration of the traced call
+current_trace_id = ContextVar("current_trace_id", default=None)
+current_trace_name = ContextVar("current_trace_name", default=None)
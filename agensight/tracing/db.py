@@ -1,25 +1,58 @@
-import sqlite3
+import atexit
 from pathlib import Path
+from agensight.utils.sqlite_pool import SQLitePool, connect, SERVER_POOL_SIZE
+from agensight.utils.migrations import run_migrations
 
 DB_FILE = Path(__file__).parent / "traces.db"
 
+_pool = SQLitePool(DB_FILE)
+atexit.register(_pool.close)
+
+# Read-only connections for the dashboard API, kept apart from the exporter's.
+_read_only_pool = SQLitePool(DB_FILE, size=SERVER_POOL_SIZE, read_only=True)
+atexit.register(_read_only_pool.close)
+
 def get_db():
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Open a standalone connection. Prefer ``writer()`` / ``reader()``."""
+    return connect(DB_FILE)
+
+def writer():
+    """Shared writer connection; the ``with`` block is one transaction."""
+    return _pool.writer()
+
+def reader():
+    """Borrow a pooled connection for queries."""
+    return _pool.reader()
+
+def read_only_reader():
+    """Borrow a read-only connection from the API server's pool."""
+    return _read_only_pool.reader()
 
 def init_schema():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.executescript('''
+    with writer() as conn:
+        version = run_migrations(conn, MIGRATIONS)
+        _ensure_message_search(conn)
+        return version
+
+def _add_session_columns(conn):
+    # 🛠️ Add missing columns if they don't exist (for existing installations)
+    existing_cols = [row["name"] for row in conn.execute("PRAGMA table_info(sessions);")]
+    if "session_name" not in existing_cols:
+        conn.execute("ALTER TABLE sessions ADD COLUMN session_name TEXT")
+    if "user_id" not in existing_cols:
+        conn.execute("ALTER TABLE sessions ADD COLUMN user_id TEXT")
+
+_BASE_TABLES = (
+    '''
     CREATE TABLE IF NOT EXISTS sessions (
         id TEXT PRIMARY KEY,
         name TEXT,
         started_at REAL,
         ended_at REAL,
         metadata TEXT
-    );
-
+    )
+    ''',
+    '''
     CREATE TABLE IF NOT EXISTS traces (
         id TEXT PRIMARY KEY,
         session_id TEXT,
@@ -28,8 +61,9 @@ def init_schema():
         ended_at REAL,
         metadata TEXT,
         total_tokens INTEGER
-    );
-
+    )
+    ''',
+    '''
     CREATE TABLE IF NOT EXISTS spans (
         id TEXT PRIMARY KEY,
         trace_id TEXT,
@@ -41,8 +75,9 @@ def init_schema():
         kind TEXT,
         status TEXT,
         attributes TEXT
-    );
-
+    )
+    ''',
+    '''
     CREATE TABLE IF NOT EXISTS prompts (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         span_id TEXT,
@@ -50,8 +85,9 @@ def init_schema():
         content TEXT,
         message_index INTEGER,
         FOREIGN KEY(span_id) REFERENCES spans(id)
-    );
-
+    )
+    ''',
+    '''
     CREATE TABLE IF NOT EXISTS completions (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         span_id TEXT,
@@ -62,23 +98,71 @@ def init_schema():
         prompt_tokens INTEGER,
         completion_tokens INTEGER,
         FOREIGN KEY(span_id) REFERENCES spans(id)
-    );
-
+    )
+    ''',
+    '''
     CREATE TABLE IF NOT EXISTS tools (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         span_id TEXT,
         name TEXT,
         arguments TEXT,
         FOREIGN KEY(span_id) REFERENCES spans(id)
-    );
-                         
+    )
+    ''',
+)
+
+def _create_base_schema(conn):
+    for statement in _BASE_TABLES:
+        conn.execute(statement)
+    _add_session_columns(conn)
+
+def _create_span_sketches(conn):
+    from agensight.tracing.sketches import backfill_span_sketches
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS span_sketches (
+            metric TEXT NOT NULL,
+            bucket_start REAL NOT NULL,
+            span_name TEXT NOT NULL,
+            model TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            sketch TEXT NOT NULL,
+            PRIMARY KEY (metric, bucket_start, span_name, model)
+        )
     ''')
+    backfill_span_sketches(conn)
 
-    # 🛠️ Add missing columns if they don't exist (for existing installations)
-    existing_cols = [row["name"] for row in cursor.execute("PRAGMA table_info(sessions);")]
-    if "session_name" not in existing_cols:
-        cursor.execute("ALTER TABLE sessions ADD COLUMN session_name TEXT")
-    if "user_id" not in existing_cols:
-        cursor.execute("ALTER TABLE sessions ADD COLUMN user_id TEXT")
-    conn.commit()
-    conn.close()
\ No newline at end of file
+def _create_message_search(conn):
+    from agensight.tracing.search import create_message_search
+    create_message_search(conn)
+
+def _ensure_message_search(conn):
+    # Migration 5 is recorded even when SQLite lacks FTS5, so search is
+    # retried on every start and enabled once FTS5 becomes available.
+    from agensight.tracing.search import create_message_search, has_message_search
+    if not has_message_search(conn):
+        create_message_search(conn)
+
+# Append new migrations at the end with the next version number; never edit
+# one that has already shipped.
+MIGRATIONS = [
+    (1, "base tables", _create_base_schema),
+    (2, "indexes for trace, span and message lookups", (
+        "CREATE INDEX IF NOT EXISTS idx_spans_trace_started ON spans (trace_id, started_at)",
+        "CREATE INDEX IF NOT EXISTS idx_spans_parent ON spans (parent_id)",
+        "CREATE INDEX IF NOT EXISTS idx_prompts_span ON prompts (span_id, message_index)",
+        "CREATE INDEX IF NOT EXISTS idx_completions_span ON completions (span_id)",
+        "CREATE INDEX IF NOT EXISTS idx_tools_span_name ON tools (span_id, name)",
+        "CREATE INDEX IF NOT EXISTS idx_traces_session_started ON traces (session_id, started_at)",
+        "CREATE INDEX IF NOT EXISTS idx_traces_started ON traces (started_at)",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_started ON sessions (started_at)",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions (user_id)",
+    )),
+    (3, "keyset pagination indexes on (started_at, id)", (
+        "DROP INDEX IF EXISTS idx_traces_started",
+        "DROP INDEX IF EXISTS idx_sessions_started",
+        "CREATE INDEX IF NOT EXISTS idx_traces_started_id ON traces (started_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_started_id ON sessions (started_at, id)",
+    )),
+    (4, "latency and token quantile sketches", _create_span_sketches),
+    (5, "full-text search over prompts, completions and tools", _create_message_search),
+]
@@ -4,20 +4,17 @@ import time
 import uuid
 import contextvars
 from typing import Callable, Optional, Dict, Any, List, Union
-from agensight.tracing.session import enable_session_tracking, set_session_id
+from agensight.tracing.session import enable_session_tracking, set_session_id, set_session_details
 from agensight.tracing import get_tracer
-from agensight.tracing.session import is_session_enabled, get_session_id
-from agensight.tracing.context import trace_input, trace_output
-from agensight.tracing.db import get_db
-from agensight.tracing.config import get_mode, get_project_id
+from agensight.tracing.session import is_session_enabled, get_session_id, get_session_attributes
+from agensight.tracing.context import trace_input, trace_output, current_trace_id, current_trace_name
+from agensight.tracing.db import writer
+from agensight.tracing.config import get_mode, get_project_id, is_exported_mode
 from agensight.eval.metrics.base import BaseMetric
 from opentelemetry import trace as ot_trace
 from opentelemetry.trace.status import Status, StatusCode
 
 import time, json
-# Global contextvars
-current_trace_id = contextvars.ContextVar("current_trace_id", default=None)
-current_trace_name = contextvars.ContextVar("current_trace_name", default=None)
 
 def trace(name: Optional[str] = None, session: Optional[Union[str, dict]] = None, **default_attributes):
     def decorator(func: Callable):
@@ -41,6 +38,7 @@ def trace(name: Optional[str] = None, session: Optional[Union[str, dict]] = None
             if session_id:
                 enable_session_tracking()
                 set_session_id(session_id)
+                set_session_details(session_name, user_id)
 
                 mode = get_mode()
                 if mode in ["prod", "dev"]:
@@ -67,34 +65,48 @@ def trace(name: Optional[str] = None, session: Optional[Union[str, dict]] = None
                         )
                     except Exception:
                         pass
-                else:
+                elif not is_exported_mode():
                     try:
-                        conn = get_db()
-                        conn.execute(
-                            "INSERT OR IGNORE INTO sessions (id, started_at, session_name, user_id, metadata) VALUES (?, ?, ?, ?, ?)",
-                            (session_id, time.time(), session_name, user_id, json.dumps({}))
-                        )
-                        conn.commit()
+                        with writer() as conn:
+                            conn.execute(
+                                "INSERT OR IGNORE INTO sessions (id, started_at, session_name, user_id, metadata) VALUES (?, ?, ?, ?, ?)",
+                                (session_id, time.time(), session_name, user_id, json.dumps({}))
+                            )
                     except Exception:
                         pass
 
             current_trace_id.set(trace_id)
             current_trace_name.set(trace_name)
 
+            if is_exported_mode():
+                # traces.db belongs to the receiving process here, so the
+                # session and trace rows travel as attributes of a root span.
+                attributes = {
+                    "trace_id": trace_id,
+                    "trace.name": trace_name,
+                    "trace.metadata": json.dumps(default_attributes or {}),
+                }
+                if is_session_enabled():
+                    attributes.update(get_session_attributes())
+                with ot_trace.get_tracer("default").start_as_current_span(trace_name, attributes=attributes):
+                    result = func(*args, **kwargs)
+                trace_input.set(None)
+                trace_output.set(None)
+                return result
+
             started_at = time.time()
             result = func(*args, **kwargs)
             ended_at = time.time()
 
             if get_mode() != "prod":
                 try:
-                    conn = get_db()
                     metadata = json.dumps(default_attributes or {})
                     session_id = get_session_id() if is_session_enabled() else None
-                    conn.execute(
-                        "INSERT OR IGNORE INTO traces (id, name, started_at, ended_at, session_id, metadata) VALUES (?, ?, ?, ?, ?, ?)",
-                        (trace_id, trace_name, started_at, ended_at, session_id, metadata)
-                    )
-                    conn.commit()
+                    with writer() as conn:
+                        conn.execute(
+                            "INSERT OR IGNORE INTO traces (id, name, started_at, ended_at, session_id, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                            (trace_id, trace_name, started_at, ended_at, session_id, metadata)
+                        )
                 except Exception:
                     pass
 
@@ -193,7 +205,7 @@ def span(
             if trace_name:
                 attributes["trace.name"] = trace_name
             if is_session_enabled():
-                attributes["session.id"] = get_session_id()
+                attributes.update(get_session_attributes())
             
 
             # Add metrics to the span
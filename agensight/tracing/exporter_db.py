@@ -1,204 +1,216 @@
 import json
-import re
-import uuid
 from collections import defaultdict
 from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
-from agensight.tracing.db import get_db
-from agensight.tracing.utils import parse_normalized_io_for_span
+from agensight.tracing.db import writer
+from agensight.utils.sqlite_pool import chunks, placeholders
+from agensight.tracing.utils import parse_normalized_io_for_span, _make_io_from_openai_attrs, extract_token_counts_from_attrs
+from agensight.tracing.live import LIVE_SPAN_COLUMNS, broker
+from agensight.tracing.retention import start_retention
+from agensight.tracing.sketches import SketchBatch, model_from_attrs
+from agensight.tracing.span_classifier import is_llm_span
+from agensight.tracing.trace_tree import TraceTree, otel_span_id
+from agensight.tracing.view_cache import view_cache
 from agensight.eval.evaluate import process_all_metrics_dynamically
+from agensight.eval.worker_pool import get_evaluation_pool
 
+# Seconds to wait for queued span evaluations when the exporter shuts down.
+EVAL_SHUTDOWN_TIMEOUT = 30.0
 
-TOKEN_PATTERNS = [
-    r'"total_tokens":\s*(\d+)',
-    r'"completion_tokens":\s*(\d+)',
-    r'"prompt_tokens":\s*(\d+)',
-    r"'total_tokens':\s*(\d+)",
-    r"'completion_tokens':\s*(\d+)",
-    r"'prompt_tokens':\s*(\d+)"
-]
-
-def extract_token_counts_from_attrs(attrs, span_id, span_name):
-    tokens = {
-        "total": attrs.get("llm.usage.total_tokens") or attrs.get("gen_ai.usage.total_tokens"),
-        "prompt": attrs.get("gen_ai.usage.prompt_tokens"),
-        "completion": attrs.get("gen_ai.usage.completion_tokens")
-    }
-
-    for key, value in attrs.items():
-        if isinstance(value, (int, float)) and 'token' in key.lower():
-            if 'prompt' in key and tokens["prompt"] is None:
-                tokens["prompt"] = value
-            elif 'compl' in key and tokens["completion"] is None:
-                tokens["completion"] = value
-            elif 'total' in key and tokens["total"] is None:
-                tokens["total"] = value
-
-    for key, value in attrs.items():
-        if isinstance(value, str):
-            try:
-                parsed = json.loads(value) if '{' in value or '[' in value else None
-                if isinstance(parsed, dict):
-                    for k, v in parsed.items():
-                        if 'token' in k.lower() and isinstance(v, (int, float)):
-                            if 'prompt' in k.lower() and tokens["prompt"] is None:
-                                tokens["prompt"] = v
-                            elif 'compl' in k.lower() and tokens["completion"] is None:
-                                tokens["completion"] = v
-                            elif 'total' in k.lower() and tokens["total"] is None:
-                                tokens["total"] = v
-            except Exception:
-                pass
-
-            for pattern in TOKEN_PATTERNS:
-                match = re.search(pattern, value)
-                if match:
-                    val = int(match.group(1))
-                    if 'prompt' in pattern and tokens["prompt"] is None:
-                        tokens["prompt"] = val
-                    elif 'compl' in pattern and tokens["completion"] is None:
-                        tokens["completion"] = val
-                    elif 'total' in pattern and tokens["total"] is None:
-                        tokens["total"] = val
-
-    if tokens["total"] is None and tokens["prompt"] is not None and tokens["completion"] is not None:
-        tokens["total"] = tokens["prompt"] + tokens["completion"]
-    elif tokens["prompt"] is None and tokens["total"] is not None and tokens["completion"] is not None:
-        tokens["prompt"] = tokens["total"] - tokens["completion"]
-    elif tokens["completion"] is None and tokens["total"] is not None and tokens["prompt"] is not None:
-        tokens["completion"] = tokens["total"] - tokens["prompt"]
-
-    return tokens
-
-def _make_io_from_openai_attrs(attrs, span_id, span_name):
-    prompts, completions = [], []
-    i = 0
-    while f"gen_ai.prompt.{i}.role" in attrs or f"gen_ai.prompt.{i}.content" in attrs:
-        prompts.append({
-            "role": attrs.get(f"gen_ai.prompt.{i}.role", "user"),
-            "content": attrs.get(f"gen_ai.prompt.{i}.content", "")
-        })
-        i += 1
-
-    if not prompts:
-        fallback = attrs.get("gen_ai.input") or next(
-            (attrs[k] for k in attrs if "prompt" in k.lower()), "[Input not found]"
-        )
-        prompts = [{"role": "user", "content": str(fallback)}]
 
-    output = next(
-        (attrs.get(k) for k in attrs if "completion" in k.lower() and ".content" in k),
-        attrs.get("gen_ai.completion.0.content", "")
+def _row(*values):
+    """A row SQLite can bind. Span attributes and message contents may be
+    sequences or structured content, which would fail the whole batch's
+    ``executemany``; those are stored as JSON text."""
+    return tuple(
+        value if value is None or isinstance(value, (str, int, float, bytes)) else json.dumps(value, default=str)
+        for value in values
     )
 
-    tokens = extract_token_counts_from_attrs(attrs, span_id, span_name)
 
-    completions.append({
-        "role": attrs.get("gen_ai.completion.0.role", "assistant"),
-        "content": output,
-        "finish_reason": attrs.get("gen_ai.completion.0.finish_reason"),
-        "completion_tokens": tokens["completion"],
-        "prompt_tokens": tokens["prompt"],
-        "total_tokens": tokens["total"]
-    })
+def _tokens(value) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
 
-    return json.dumps({"prompts": prompts, "completions": completions})
 
 class DBSpanExporter(SpanExporter):
-    def export(self, spans):            
-        conn = get_db()
-        total_tokens_by_trace = defaultdict(int)
-        span_map = {format(span.get_span_context().span_id, "016x"): span for span in spans}
+    def __init__(self):
+        # No-op unless an AGENSIGHT_RETENTION_* limit is configured.
+        start_retention()
+
+    def export(self, spans):
+        pending_metrics = []
+        live_spans = [] if broker.has_subscribers() else None
+        with writer() as conn:
+            trace_ids = self._export(conn, spans, pending_metrics, live_spans)
+        # Cached views of these traces are stale now that the batch is committed.
+        view_cache.invalidate_traces(trace_ids)
+
+        # Only committed spans reach live tail subscribers.
+        if live_spans:
+            broker.publish(live_spans)
+
+        # Judge-model calls can take seconds, so they run on the evaluation
+        # worker pool rather than on the span export thread.
+        pool = get_evaluation_pool()
+        for attrs, span_id, trace_id, span_name in pending_metrics:
+            pool.submit(process_all_metrics_dynamically, attrs, span_id, trace_id, span_name)
+
+        return SpanExportResult.SUCCESS
 
+    def shutdown(self):
+        # The pool is shared with other exporters and the OTLP receiver, so
+        # wait for queued evaluations to finish without stopping it.
+        get_evaluation_pool().join(timeout=EVAL_SHUTDOWN_TIMEOUT)
+
+    def _export(self, conn, spans, pending_metrics, live_spans=None):
+        session_rows = {}
+        session_by_span = {}
+        trace_rows = []
+        span_rows = []
+        prompt_rows = []
+        completion_rows = []
+        tools_by_span = defaultdict(dict)  # span_id -> {tool name: arguments}
+        total_tokens_by_trace = defaultdict(int)
+        llm_children = []
+        sketches = SketchBatch()
+
+        # Span ids come from the OpenTelemetry context, so a batch that is
+        # exported twice must not add its messages and tools twice.
+        tree = TraceTree.from_otel_spans(spans)
+        batch_ids = list(tree.nodes)
+        seen = set()
+        for chunk in chunks(batch_ids):
+            rows = conn.execute(f"SELECT id FROM spans WHERE id IN ({placeholders(chunk)})", chunk)
+            seen.update(row[0] for row in rows)
+
+        # Spans without an AgenSight trace id inherit one from any span in
+        # the same OpenTelemetry trace.
+        trace_id_by_otel = {}
         for span in spans:
+            if span.attributes.get("trace_id"):
+                trace_id_by_otel.setdefault(span.get_span_context().trace_id, span.attributes["trace_id"])
+
+        # Parents are written before their children.
+        for span in tree.topological():
+            span_id = otel_span_id(span)
+            if span_id in seen:
+                continue
             ctx = span.get_span_context()
             attrs = dict(span.attributes)
-            trace_id = attrs.get("trace_id") or str(uuid.uuid4())
-            span_id = str(uuid.uuid4())
-            parent_id = str(uuid.uuid4()) if span.parent else None
+            trace_id = attrs.get("trace_id") or trace_id_by_otel.get(ctx.trace_id) or format(ctx.trace_id, "032x")
+            parent_id = tree.parent_ids[span_id]
             start = span.start_time / 1e9
             end = span.end_time / 1e9
             duration = end - start
 
-            is_llm = any(k in str(attrs) or k in span.name.lower() for k in ["llm", "openai", "gen_ai", "completion"])
+            is_llm = is_llm_span(span, attrs)
             if "gen_ai.normalized_input_output" not in attrs and is_llm:
                 attrs["gen_ai.normalized_input_output"] = _make_io_from_openai_attrs(attrs, span_id, span.name)
 
-            try:
-                if parent_id is None:
-                    conn.execute(
-                        "INSERT OR IGNORE INTO traces (id, name, started_at, ended_at, session_id, metadata) VALUES (?, ?, ?, ?, ?, ?)",
-                        (trace_id, attrs.get("trace.name", span.name), start, end, attrs.get("session.id"), json.dumps({}))
-                    )
-
-                conn.execute(
-                    "INSERT INTO spans (id, trace_id, parent_id, name, started_at, ended_at, duration, kind, status, attributes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                    (
-                        span_id, trace_id, parent_id, span.name, start, end, duration,
-                        str(span.kind), str(span.status.status_code), json.dumps(attrs)
-                    )
-                )
-            except Exception:
-                continue
+            sketches.add_span(
+                span.name, start, duration, model_from_attrs(attrs),
+                extract_token_counts_from_attrs(attrs) if is_llm else None
+            )
+
+            span_rows.append(_row(
+                span_id, trace_id, parent_id, span.name, start, end, duration,
+                str(span.kind), str(span.status.status_code), json.dumps(attrs, default=str)
+            ))
+
+            # Spans exported from another process (ingest or otlp mode) carry
+            # the session and trace details the decorators would have written.
+            session_id = _row(attrs.get("session.id"))[0]
+            if session_id:
+                session_by_span[span_id] = session_id
+                session_rows.setdefault(session_id, _row(
+                    session_id, start, attrs.get("session.name"), attrs.get("session.user_id"), json.dumps({})
+                ))
+
+            if parent_id is None:
+                trace_rows.append(_row(
+                    trace_id, attrs.get("trace.name", span.name), start, end, session_id,
+                    attrs.get("trace.metadata", json.dumps({}))
+                ))
+
+            if "openai.chat" in span.name.lower() and parent_id:
+                llm_children.append((span_id, parent_id))
 
             try:
                 nio = attrs.get("gen_ai.normalized_input_output")
                 if nio:
                     prompts, completions = parse_normalized_io_for_span(span_id, nio)
                     for p in prompts:
-                        conn.execute("INSERT INTO prompts (span_id, role, content, message_index) VALUES (?, ?, ?, ?)",
-                                     (p["span_id"], p["role"], p["content"], p["message_index"]))
+                        prompt_rows.append(_row(p["span_id"], p["role"], p["content"], p["message_index"]))
                     for c in completions:
-                        conn.execute("INSERT INTO completions (span_id, role, content, finish_reason, total_tokens, prompt_tokens, completion_tokens) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                                     (
-                                         c["span_id"], c["role"], c["content"], c["finish_reason"],
-                                         c["total_tokens"], c["prompt_tokens"], c["completion_tokens"]
-                                     ))
-                        if c["total_tokens"]:
-                            total_tokens_by_trace[trace_id] += int(c["total_tokens"])
+                        completion_rows.append(_row(
+                            c["span_id"], c["role"], c["content"], c["finish_reason"],
+                            c["total_tokens"], c["prompt_tokens"], c["completion_tokens"]
+                        ))
+                        tokens = _tokens(c["total_tokens"])
+                        if tokens:
+                            total_tokens_by_trace[trace_id] += tokens
             except Exception:
                 pass
 
-            try:
-                # Use the metrics configuration from the span
-                process_all_metrics_dynamically(attrs, span_id, trace_id, span.name)
-            except Exception as e:
-                print(f"Error in direct evaluation using configs for span {span_id}: {e}")
-                pass
-
-            try:
-                for i in range(5):
-                    name = attrs.get(f"gen_ai.completion.0.tool_calls.{i}.name")
-                    if not name:
-                        break
-                    args = attrs.get(f"gen_ai.completion.0.tool_calls.{i}.arguments")
-                    cursor = conn.execute("SELECT id FROM tools WHERE span_id = ? AND name = ?", (span_id, name))
-                    if not cursor.fetchone():
-                        conn.execute("INSERT INTO tools (span_id, name, arguments) VALUES (?, ?, ?)",
-                                     (span_id, name, args))
-            except Exception:
-                pass
-
-        for span in spans:
-            ctx = span.get_span_context()
-            attrs = dict(span.attributes)
-            span_id = format(ctx.span_id, "016x")
-            trace_id = attrs.get("trace_id") or format(ctx.trace_id, "032x")
-
-            if "openai.chat" in span.name.lower() and span.parent:
-                parent_id = format(span.parent.span_id, "016x")
-                cursor = conn.execute("SELECT name, arguments FROM tools WHERE span_id = ?", (span_id,))
-                tools = cursor.fetchall()
-                for name, args in tools:
-                    cursor = conn.execute("SELECT id FROM tools WHERE span_id = ? AND name = ?", (parent_id, name))
-                    if not cursor.fetchone():
-                        conn.execute("INSERT INTO tools (span_id, name, arguments) VALUES (?, ?, ?)",
-                                     (parent_id, name, args))
-
+            if "metrics.configs" in attrs:
+                pending_metrics.append((attrs, span_id, trace_id, span.name))
+
+            for i in range(5):
+                name = attrs.get(f"gen_ai.completion.0.tool_calls.{i}.name")
+                if not name:
+                    break
+                tools_by_span[span_id].setdefault(name, attrs.get(f"gen_ai.completion.0.tool_calls.{i}.arguments"))
+
+        # Tool calls made by an LLM child are also recorded on its parent span.
+        for span_id, parent_id in llm_children:
+            for name, args in list(tools_by_span.get(span_id, {}).items()):
+                tools_by_span[parent_id].setdefault(name, args)
+
+        tool_rows = [
+            _row(span_id, name, args)
+            for span_id, tools in tools_by_span.items()
+            for name, args in tools.items()
+        ]
+
+        conn.executemany(
+            "INSERT OR IGNORE INTO sessions (id, started_at, session_name, user_id, metadata) VALUES (?, ?, ?, ?, ?)",
+            list(session_rows.values())
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO traces (id, name, started_at, ended_at, session_id, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+            trace_rows
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO spans (id, trace_id, parent_id, name, started_at, ended_at, duration, kind, status, attributes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            span_rows
+        )
+        conn.executemany(
+            "INSERT INTO prompts (span_id, role, content, message_index) VALUES (?, ?, ?, ?)",
+            prompt_rows
+        )
+        conn.executemany(
+            "INSERT INTO completions (span_id, role, content, finish_reason, total_tokens, prompt_tokens, completion_tokens) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            completion_rows
+        )
+        conn.executemany("INSERT INTO tools (span_id, name, arguments) VALUES (?, ?, ?)", tool_rows)
+        conn.executemany(
+            "UPDATE traces SET total_tokens=? WHERE id=?",
+            [(total, trace_id) for trace_id, total in total_tokens_by_trace.items()]
+        )
         try:
-            for trace_id, total in total_tokens_by_trace.items():
-                conn.execute("UPDATE traces SET total_tokens=? WHERE id=?", (total, trace_id))
-            conn.commit()
-        except Exception:
-            pass
-
-        return SpanExportResult.SUCCESS
+            sketches.flush(conn)
+        except Exception as e:
+            # Percentile analytics are best-effort; never lose spans over them.
+            print(f"Failed to update span sketches: {e}")
+
+        if live_spans is not None and span_rows:
+            # The traces row of a running trace is written only when its root
+            # span ends, so the session comes from the spans themselves.
+            session_by_trace = {row[0]: row[4] for row in trace_rows if row[4]}
+            for row in span_rows:
+                session_id = session_by_span.get(row[0]) or session_by_trace.get(row[1])
+                live_spans.append(dict(zip(LIVE_SPAN_COLUMNS, row[:9] + (session_id,))))
+
+        return {row[1] for row in span_rows}
@@ -1,15 +1,22 @@
 import json
+import os
 import requests
 import uuid
 from collections import defaultdict
 from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
 from agensight.tracing.utils import parse_normalized_io_for_span
 from agensight.tracing.utils import _make_io_from_openai_attrs
+from agensight.tracing.span_classifier import is_llm_span
+from agensight.tracing.trace_tree import TraceTree
 from agensight.tracing.config import get_project_id, get_mode
 from agensight.tracing.decorators import current_trace_id, current_trace_name
+from agensight.tracing.transport import BatchTransport, encode_record
 
 # BASE_URL = "https://vqes5twkl5.execute-api.ap-south-1.amazonaws.com/dev/api/v1/logs/create"
-BASE_URL = "https://1vrnlwnych.execute-api.ap-south-1.amazonaws.com/prod/api/v1/logs/create"
+BASE_URL = os.getenv(
+    "AGENSIGHT_LOGS_URL",
+    "https://1vrnlwnych.execute-api.ap-south-1.amazonaws.com/prod/api/v1/logs/create"
+)
 
 def post_to_lambda(endpoint: str, data: dict):
     try:
@@ -27,32 +34,42 @@ def post_to_lambda(endpoint: str, data: dict):
 class ProdSpanExporter(SpanExporter):
     project_id = get_project_id()
 
+    def __init__(self, transport: BatchTransport = None):
+        self.transport = transport or BatchTransport(
+            BASE_URL,
+            headers=lambda: {"Authorization": f"Bearer {get_project_id()}"}
+        )
+
     def export(self, spans):
+        records = []
+
+        def post(record_type, data):
+            records.append(encode_record(record_type, data))
+            return True
+
+        try:
+            self._export(spans, post)
+        finally:
+            self.transport.send(records)
+        return SpanExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.transport.flush()
+
+    def shutdown(self):
+        self.transport.shutdown()
+
+    def _export(self, spans, post):
         trace_inserted = set()
         total_tokens_by_trace = defaultdict(int)
         span_map = {}
 
-        span_parent_map = {
-            format(span.get_span_context().span_id, "016x"): (
-                format(span.parent.span_id, "016x") if span.parent else None
-            )
-            for span in spans
-        }
+        tree = TraceTree.from_otel_spans(spans)
 
-        def get_depth(span):
-            sid = format(span.get_span_context().span_id, "016x")
-            depth = 0
-            while sid and span_parent_map.get(sid):
-                sid = span_parent_map.get(sid)
-                depth += 1
-            return depth
+        otel_to_uuid_map = {span_id: str(uuid.uuid4()) for span_id in tree.nodes}
 
-        otel_to_uuid_map = {
-            format(span.get_span_context().span_id, "016x"): str(uuid.uuid4())
-            for span in spans
-        }
-
-        sorted_spans = sorted(spans, key=get_depth)
+        # Parents go first so the remote side sees a trace before its spans.
+        sorted_spans = tree.topological()
 
         for span in sorted_spans:
             try:
@@ -87,7 +104,7 @@ class ProdSpanExporter(SpanExporter):
                     if not hasattr(self, "_session_inserted"):
                         self._session_inserted = set()
                     if session_id not in self._session_inserted:
-                        post_to_lambda("session", {
+                        post("session", {
                             "id": session_id,
                             "project_id": self.project_id,
                             "started_at": start,
@@ -100,7 +117,7 @@ class ProdSpanExporter(SpanExporter):
 
                 if trace_id not in trace_inserted and span.parent is None:
                     try:
-                        trace_success = post_to_lambda("trace", {
+                        trace_success = post("trace", {
                             "id": trace_id,
                             "project_id": self.project_id,
                             "name": trace_name,
@@ -128,7 +145,7 @@ class ProdSpanExporter(SpanExporter):
                         attrs["trace_id"] = trace_id
                         span_map[otel_span_id]["trace_id"] = trace_id
 
-                    span_success = post_to_lambda("span", {
+                    span_success = post("span", {
                         "id": span_id,
                         "project_id": self.project_id,
                         "trace_id": trace_id,
@@ -148,8 +165,7 @@ class ProdSpanExporter(SpanExporter):
                     continue
 
                 try:
-                    is_llm = any(k in str(attrs) or k in span.name.lower() for k in ["llm", "openai", "gen_ai", "completion"])
-                    if "gen_ai.normalized_input_output" not in attrs and is_llm:
+                    if "gen_ai.normalized_input_output" not in attrs and is_llm_span(span, attrs):
                         attrs["gen_ai.normalized_input_output"] = _make_io_from_openai_attrs(attrs, span_id, span.name)
 
                     nio = attrs.get("gen_ai.normalized_input_output")
@@ -158,7 +174,7 @@ class ProdSpanExporter(SpanExporter):
 
                         for p in prompts:
                             try:
-                                post_to_lambda("prompt", {
+                                post("prompt", {
                                     "span_id": p["span_id"],
                                     "role": p["role"],
                                     "content": p["content"],
@@ -169,7 +185,7 @@ class ProdSpanExporter(SpanExporter):
 
                         for c in completions:
                             try:
-                                post_to_lambda("completion", {
+                                post("completion", {
                                     "span_id": c["span_id"],
                                     "role": c["role"],
                                     "content": c["content"],
@@ -191,7 +207,7 @@ class ProdSpanExporter(SpanExporter):
                         if not name:
                             break
                         args = attrs.get(f"gen_ai.completion.0.tool_calls.{i}.arguments")
-                        post_to_lambda("tool", {
+                        post("tool", {
                             "span_id": span_id,
                             "name": name,
                             "arguments": args
@@ -204,11 +220,10 @@ class ProdSpanExporter(SpanExporter):
 
         for trace_id, total in total_tokens_by_trace.items():
             try:
-                post_to_lambda("trace/update", {
+                post("trace/update", {
                     "id": trace_id,
                     "total_tokens": total
                 })
             except Exception:
                 continue
 
-        return SpanExportResult.SUCCESS
@@ -25,6 +25,14 @@ def get_exporter(exporter_type: str):
     elif exporter_type == "db":
         return DBSpanExporter()
 
+    elif exporter_type == "otlp":
+        from .otlp import otlp_http_exporter
+        return otlp_http_exporter()
+
+    elif exporter_type == "ingest":
+        from .ingest import IngestSpanExporter
+        return IngestSpanExporter()
+
     elif exporter_type == "prod":
         from .exporter_prod import ProdSpanExporter
         return ProdSpanExporter()
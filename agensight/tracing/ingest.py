@@ -0,0 +1,362 @@
+"""
+Single-writer ingestion daemon for multi-process applications.
+
+``agensight ingest`` runs an ``IngestDaemon``: it owns ``traces.db`` and
+accepts span batches from local processes over a Unix domain socket,
+merging them through a ``SpanIngestor`` into one transaction per batch.
+Processes that call ``agensight.init(mode="ingest")`` export through
+``IngestSpanExporter`` instead of opening the database themselves. Batches
+the daemon cannot take (it is down, or its queue is full) go to a local
+spool and are sent again once it answers.
+
+Wire format, one frame per batch::
+
+    b"AS" | version (1 byte) | flags (1 byte) | length (4 bytes, big-endian) | payload
+
+The payload is a JSON array of spans, zlib-compressed when ``flags`` has
+``FLAG_ZLIB`` set. Each span is an array of the fields the store keeps::
+
+    [name, trace_id, span_id, parent_span_id, kind, status_code,
+     status_description, start_time, end_time, attributes]
+
+with ids as lower-case hex and times in Unix nanoseconds. The daemon answers
+every frame with a single status byte (``REPLY_*``).
+"""
+import json
+import os
+import signal
+import socket
+import socketserver
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import List, Optional, Union
+
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from opentelemetry.trace import SpanContext, SpanKind, Status, StatusCode, TraceFlags
+
+from agensight.tracing.otlp import IngestQueueFull, SpanIngestor
+from agensight.tracing.spool import Spool, open_spool
+from agensight.tracing.transport import DRAIN_BATCH, backoff_delay
+
+INGEST_SOCKET = os.getenv("AGENSIGHT_INGEST_SOCKET", os.path.join(tempfile.gettempdir(), "agensight-ingest.sock"))
+# Shared by every client process on the host; the spool's size cap holds
+# across all of them.
+INGEST_SPOOL_FILE = Path(os.getenv("AGENSIGHT_INGEST_SPOOL_PATH", str(Path(__file__).parent / "ingest-spool.db")))
+# Seconds a client waits for the daemon to answer a frame.
+INGEST_TIMEOUT = float(os.getenv("AGENSIGHT_INGEST_TIMEOUT", "5.0"))
+# Seconds between attempts at sending spooled batches.
+INGEST_RETRY_INTERVAL = float(os.getenv("AGENSIGHT_INGEST_RETRY_INTERVAL", "2.0"))
+
+MAGIC = b"AS"
+VERSION = 1
+FRAME_HEADER = struct.Struct("!2sBBI")
+FLAG_ZLIB = 0x01
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+# Payloads smaller than this are not worth compressing.
+COMPRESS_MIN_BYTES = 1024
+
+REPLY_OK = b"\x00"
+REPLY_BUSY = b"\x01"
+REPLY_INVALID = b"\x02"
+
+
+def encode_spans(spans: List[ReadableSpan]) -> bytes:
+    """One frame carrying ``spans``."""
+    rows = []
+    for span in spans:
+        ctx = span.get_span_context()
+        rows.append([
+            span.name,
+            format(ctx.trace_id, "032x"),
+            format(ctx.span_id, "016x"),
+            format(span.parent.span_id, "016x") if span.parent else None,
+            span.kind.value,
+            span.status.status_code.value,
+            span.status.description,
+            span.start_time,
+            span.end_time,
+            dict(span.attributes or {}),
+        ])
+    payload = json.dumps(rows, separators=(",", ":"), default=str).encode("utf-8")
+    flags = 0
+    if len(payload) >= COMPRESS_MIN_BYTES:
+        payload = zlib.compress(payload, 1)
+        flags |= FLAG_ZLIB
+    return FRAME_HEADER.pack(MAGIC, VERSION, flags, len(payload)) + payload
+
+
+def decode_spans(payload: bytes, flags: int = 0) -> List[ReadableSpan]:
+    """Spans from a frame payload; raises ``ValueError`` if it is malformed."""
+    try:
+        if flags & FLAG_ZLIB:
+            payload = zlib.decompress(payload)
+        rows = json.loads(payload)
+        sampled = TraceFlags(TraceFlags.SAMPLED)
+        spans = []
+        for name, trace_id, span_id, parent_id, kind, code, description, start, end, attributes in rows:
+            trace_id = int(trace_id, 16)
+            code = StatusCode(code)
+            spans.append(ReadableSpan(
+                name=name,
+                context=SpanContext(trace_id, int(span_id, 16), is_remote=False, trace_flags=sampled),
+                parent=SpanContext(trace_id, int(parent_id, 16), is_remote=True, trace_flags=sampled) if parent_id else None,
+                # JSON turns attribute sequences into lists; OpenTelemetry uses tuples.
+                attributes={k: tuple(v) if isinstance(v, list) else v for k, v in attributes.items()},
+                kind=SpanKind(kind),
+                status=Status(code, description) if code is StatusCode.ERROR else Status(code),
+                start_time=start,
+                end_time=end,
+            ))
+        return spans
+    except (zlib.error, TypeError, AttributeError) as e:
+        raise ValueError(f"Malformed span batch: {e}") from e
+
+
+def _read_exactly(stream, size: int) -> Optional[bytes]:
+    data = stream.read(size)
+    return data if data is not None and len(data) == size else None
+
+
+class _FrameHandler(socketserver.StreamRequestHandler):
+    """Reads frames from one client connection until it closes."""
+
+    def handle(self):
+        ingestor = self.server.ingestor
+        while True:
+            header = _read_exactly(self.rfile, FRAME_HEADER.size)
+            if header is None:
+                return
+            magic, version, flags, length = FRAME_HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION or length > MAX_FRAME_BYTES:
+                # The stream cannot be resynchronized.
+                self.wfile.write(REPLY_INVALID)
+                return
+            payload = _read_exactly(self.rfile, length)
+            if payload is None:
+                return
+            try:
+                spans = decode_spans(payload, flags)
+            except ValueError as e:
+                print(f"Rejected span batch: {e}")
+                self.wfile.write(REPLY_INVALID)
+                continue
+            try:
+                ingestor.submit(spans)
+            except IngestQueueFull:
+                self.wfile.write(REPLY_BUSY)
+                continue
+            self.wfile.write(REPLY_OK)
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class IngestDaemon:
+    """Accepts span batches on ``socket_path`` and writes them to the local store."""
+
+    def __init__(self, socket_path: Union[str, Path] = INGEST_SOCKET, ingestor: Optional[SpanIngestor] = None):
+        self.socket_path = str(socket_path)
+        self._remove_stale_socket()
+        if ingestor is None:
+            from agensight.tracing.db import init_schema
+            from agensight.eval.storage.db import init_evals_schema
+            init_schema()
+            init_evals_schema()
+            ingestor = SpanIngestor()
+        self.ingestor = ingestor
+        self._server = _UnixServer(self.socket_path, _FrameHandler)
+        self._server.ingestor = ingestor
+        os.chmod(self.socket_path, 0o660)
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            # Left behind by a daemon that did not shut down cleanly.
+            os.unlink(self.socket_path)
+            return
+        finally:
+            probe.close()
+        raise RuntimeError(f"An ingest daemon is already listening on {self.socket_path}")
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def shutdown(self, timeout: Optional[float] = None):
+        """Stop accepting batches, then write out everything already queued."""
+        self._server.shutdown()
+        self._server.server_close()
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+        self.ingestor.shutdown(timeout)
+
+
+def run_daemon(socket_path: Union[str, Path] = INGEST_SOCKET):
+    """Serve until SIGINT or SIGTERM, then flush and exit."""
+    daemon = IngestDaemon(socket_path)
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever() to return, so it cannot run
+        # on the thread that is serving.
+        threading.Thread(target=daemon._server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"Ingesting spans on {daemon.socket_path}")
+    daemon.serve_forever()
+    daemon.shutdown()
+    print(f"Ingest daemon stopped after writing {daemon.ingestor.stats['written']} spans")
+
+
+class IngestSpanExporter(SpanExporter):
+    """
+    Sends span batches to the ingest daemon, spooling them when it is
+    unavailable. A background thread resends spooled batches with
+    exponential backoff, including ones left by earlier processes.
+    """
+
+    def __init__(self, socket_path: Union[str, Path] = INGEST_SOCKET, timeout: float = INGEST_TIMEOUT,
+                 spool: Optional[Spool] = None, retry_interval: float = INGEST_RETRY_INTERVAL):
+        self.socket_path = str(socket_path)
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self._spool = spool
+        self._sock: Optional[socket.socket] = None
+        self._sock_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+        self._down_until = 0.0
+        self._failures = 0
+        # Batches left over from a previous run are sent once the daemon answers.
+        if self._spool is not None or INGEST_SPOOL_FILE.exists():
+            self._ensure_thread()
+
+    @property
+    def spool(self) -> Spool:
+        with self._lock:
+            if self._spool is None:
+                self._spool = open_spool(INGEST_SPOOL_FILE)
+            return self._spool
+
+    def _ensure_thread(self):
+        # Threads do not survive fork, so each worker process starts its own.
+        if self._thread_pid != os.getpid() and not self._stopped.is_set():
+            self._thread = threading.Thread(target=self._run, name="agensight-ingest-client", daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def _connect(self) -> socket.socket:
+        # A connection inherited across fork is shared with the parent.
+        if self._sock is None or self._sock_pid != os.getpid():
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._sock, self._sock_pid = sock, os.getpid()
+        return self._sock
+
+    def _send(self, frame: bytes) -> Optional[bytes]:
+        """The daemon's reply, or None if it could not be reached."""
+        with self._lock:
+            try:
+                sock = self._connect()
+                sock.sendall(frame)
+                reply = sock.recv(1)
+                if not reply:
+                    raise ConnectionResetError("Ingest daemon closed the connection")
+                return reply
+            except OSError:
+                if self._sock is not None and self._sock_pid == os.getpid():
+                    self._sock.close()
+                self._sock = None
+                return None
+
+    def _mark_down(self):
+        self._failures += 1
+        self._down_until = time.time() + backoff_delay(self._failures, base=self.retry_interval / 2,
+                                                       cap=self.retry_interval * 30)
+
+    def export(self, spans):
+        if not spans:
+            return SpanExportResult.SUCCESS
+        frame = encode_spans(spans)
+        if time.time() >= self._down_until:
+            reply = self._send(frame)
+            if reply == REPLY_OK:
+                self._failures = 0
+                return SpanExportResult.SUCCESS
+            if reply == REPLY_INVALID:
+                print(f"Ingest daemon rejected a batch of {len(spans)} spans")
+                return SpanExportResult.FAILURE
+            self._mark_down()
+        self.spool.append([frame])
+        self._ensure_thread()
+        return SpanExportResult.SUCCESS
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.flush_spool()
+            except Exception as e:
+                print(f"Sending spooled spans failed: {e}")
+            self._wakeup.wait(self.retry_interval)
+            self._wakeup.clear()
+
+    def flush_spool(self) -> bool:
+        """Send spooled batches that are due; False if the daemon did not take them all."""
+        if self._spool is None and not INGEST_SPOOL_FILE.exists():
+            return True
+        spool = self.spool
+        while True:
+            claimed = spool.claim(DRAIN_BATCH, lease=self.timeout * 2)
+            if not claimed:
+                return True
+            for payload_id, attempts, frame in claimed:
+                reply = self._send(frame)
+                if reply in (REPLY_OK, REPLY_INVALID):
+                    # An invalid batch would be rejected again.
+                    spool.ack(payload_id)
+                    continue
+                retry_at = time.time() + backoff_delay(attempts, base=self.retry_interval,
+                                                       cap=self.retry_interval * 30)
+                spool.retry_at(payload_id, retry_at)
+                spool.reschedule([other for other, _, _ in claimed if other > payload_id], retry_at)
+                self._mark_down()
+                return False
+            self._failures = 0
+            self._down_until = 0.0
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        try:
+            return self.flush_spool()
+        except Exception:
+            return False
+
+    def shutdown(self):
+        """Try the spool once more; whatever is left stays on disk for the next run."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread_pid == os.getpid():
+            self._thread.join(self.timeout)
+        self.force_flush()
+        with self._lock:
+            if self._sock is not None and self._sock_pid == os.getpid():
+                self._sock.close()
+            self._sock = None
@@ -0,0 +1,161 @@
+"""
+In-process pub/sub for newly stored spans, feeding the live tail endpoint.
+
+``DBSpanExporter`` publishes each committed batch to the process-wide
+``broker``. When the exporter runs in another process (the usual setup,
+with the dashboard started by ``agensight view``), a ``SpanTailer`` in the
+server process reads rows added since its last poll by rowid and publishes
+them instead. Either way a subscriber only ever receives new spans, never
+the history. The broker drops ids it has already delivered, so both sources
+can run in one process.
+"""
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+LIVE_POLL_INTERVAL = float(os.getenv("AGENSIGHT_LIVE_POLL_INTERVAL", "0.5"))
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+# Recently published span ids, to skip the second copy of a span seen by
+# both the exporter hook and the tailer.
+_RECENT_IDS = 10000
+
+LIVE_SPAN_COLUMNS = (
+    "id", "trace_id", "parent_id", "name", "started_at", "ended_at", "duration", "kind", "status", "session_id"
+)
+
+
+class Subscription:
+    """Events for one client, delivered into an asyncio queue on its loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, session_id: Optional[str] = None,
+                 trace_id: Optional[str] = None):
+        self.loop = loop
+        self.session_id = session_id
+        self.trace_id = trace_id
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def wants(self, span: Dict[str, Any]) -> bool:
+        if self.trace_id and span.get("trace_id") != self.trace_id:
+            return False
+        if self.session_id and span.get("session_id") != self.session_id:
+            return False
+        return True
+
+    def _put(self, span: Dict[str, Any]):
+        try:
+            self.queue.put_nowait(span)
+        except asyncio.QueueFull:
+            # A slow client misses spans; it is told to refetch instead.
+            self.overflowed = True
+
+
+class SpanBroker:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscription] = []
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def subscribe(self, subscription: Subscription) -> Subscription:
+        with self._lock:
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def publish(self, spans: Iterable[Dict[str, Any]]):
+        """Deliver spans to every matching subscriber; safe from any thread."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+            fresh = []
+            for span in spans:
+                if span["id"] in self._recent:
+                    continue
+                self._recent[span["id"]] = None
+                fresh.append(span)
+            while len(self._recent) > _RECENT_IDS:
+                self._recent.popitem(last=False)
+        for subscription in subscribers:
+            matching = [span for span in fresh if subscription.wants(span)]
+            if not matching:
+                continue
+            try:
+                for span in matching:
+                    subscription.loop.call_soon_threadsafe(subscription._put, span)
+            except RuntimeError:
+                # The subscriber's event loop has closed.
+                self.unsubscribe(subscription)
+
+
+broker = SpanBroker()
+
+
+class SpanTailer:
+    """
+    Publish spans written by other processes, found by rowid.
+
+    The polling thread runs only while the broker has subscribers; call
+    ``start`` after each ``subscribe``.
+    """
+
+    def __init__(self, reader: Callable, target: SpanBroker = broker, interval: float = LIVE_POLL_INTERVAL):
+        self.reader = reader
+        self.target = target
+        self.interval = interval
+        self._last_rowid: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="agensight-live-tail", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            with self._lock:
+                if not self.target.has_subscribers():
+                    # Nobody is listening; the next subscriber starts a new
+                    # thread, which only sees spans from then on.
+                    self._thread = None
+                    self._last_rowid = None
+                    return
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Live span tail failed: {e}")
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
+
+    def poll(self):
+        with self.reader() as conn:
+            if self._last_rowid is None:
+                self._last_rowid = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM spans").fetchone()[0]
+                return
+            while True:
+                rows = conn.execute(f'''
+                    SELECT spans.rowid AS row_number, {", ".join("spans." + c for c in LIVE_SPAN_COLUMNS[:-1])},
+                           COALESCE(json_extract(spans.attributes, '$."session.id"'), traces.session_id) AS session_id
+                    FROM spans LEFT JOIN traces ON traces.id = spans.trace_id
+                    WHERE spans.rowid > ? ORDER BY spans.rowid LIMIT 1000
+                ''', (self._last_rowid,)).fetchall()
+                if not rows:
+                    return
+                self._last_rowid = rows[-1]["row_number"]
+                self.target.publish([{c: row[c] for c in LIVE_SPAN_COLUMNS} for row in rows])
+                if len(rows) < 1000:
+                    return
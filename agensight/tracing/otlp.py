@@ -0,0 +1,310 @@
+"""
+OTLP/HTTP trace ingestion into the local store.
+
+``decode_request`` turns the body of an OTLP ``ExportTraceServiceRequest``
+(protobuf or JSON) into SDK ``ReadableSpan`` objects. ``SpanIngestor`` hands
+them to one ``DBSpanExporter`` on a single thread, merging spans from every
+request into batches of up to ``AGENSIGHT_INGEST_MAX_BATCH`` per commit. Any
+number of processes can export to the server's ``/v1/traces`` without
+contending for the ``traces.db`` write lock.
+
+``otlp_http_exporter`` is the client side: the ``"otlp"`` exporter mode.
+Both ends need the optional ``opentelemetry-proto`` and
+``opentelemetry-exporter-otlp-proto-http`` packages.
+"""
+import base64
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import Event, ReadableSpan
+from opentelemetry.sdk.util.instrumentation import InstrumentationScope
+from opentelemetry.trace import SpanContext, SpanKind, Status, StatusCode, TraceFlags
+
+OTLP_ENDPOINT = os.getenv("AGENSIGHT_OTLP_ENDPOINT", "http://localhost:5001/v1/traces")
+# Spans written per transaction.
+INGEST_MAX_BATCH = int(os.getenv("AGENSIGHT_INGEST_MAX_BATCH", "2048"))
+# Seconds a span may wait for its batch to fill.
+INGEST_MAX_DELAY = float(os.getenv("AGENSIGHT_INGEST_MAX_DELAY", "0.2"))
+# Spans held in memory before requests are refused with 503.
+INGEST_QUEUE_SIZE = int(os.getenv("AGENSIGHT_INGEST_QUEUE_SIZE", "100000"))
+# Attempts at writing a batch before its spans are dropped.
+INGEST_ATTEMPTS = 3
+
+# OTLP enum values -> SDK enums. OTLP counts SPAN_KIND_UNSPECIFIED as 0.
+SPAN_KINDS = {
+    1: SpanKind.INTERNAL,
+    2: SpanKind.SERVER,
+    3: SpanKind.CLIENT,
+    4: SpanKind.PRODUCER,
+    5: SpanKind.CONSUMER,
+}
+STATUS_CODES = {0: StatusCode.UNSET, 1: StatusCode.OK, 2: StatusCode.ERROR}
+
+# OTLP/JSON encodes these as hex strings rather than protobuf's base64.
+_HEX_ID_FIELDS = ("traceId", "spanId", "parentSpanId", "trace_id", "span_id", "parent_span_id")
+
+
+class OTLPUnavailable(Exception):
+    """The OTLP protobuf packages are not installed."""
+
+
+class IngestQueueFull(Exception):
+    """The writer is behind; the client should retry later."""
+
+
+def _trace_service():
+    try:
+        from opentelemetry.proto.collector.trace.v1 import trace_service_pb2
+    except ImportError:
+        raise OTLPUnavailable("OTLP ingestion requires opentelemetry-proto: pip install 'agensight[otlp]'")
+    return trace_service_pb2
+
+
+def _hex_ids_to_base64(value):
+    """Rewrite OTLP/JSON hex ids the way ``json_format`` expects bytes fields."""
+    if isinstance(value, list):
+        return [_hex_ids_to_base64(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    converted = {}
+    for key, item in value.items():
+        if key in _HEX_ID_FIELDS and isinstance(item, str) and item:
+            item = base64.b64encode(bytes.fromhex(item)).decode("ascii")
+        converted[key] = _hex_ids_to_base64(item)
+    return converted
+
+
+def _any_value(value):
+    which = value.WhichOneof("value")
+    if which is None:
+        return None
+    if which == "array_value":
+        return tuple(_any_value(item) for item in value.array_value.values)
+    if which == "kvlist_value":
+        return json.dumps(_attributes(value.kvlist_value.values))
+    if which == "bytes_value":
+        return base64.b64encode(value.bytes_value).decode("ascii")
+    return getattr(value, which)
+
+
+def _attributes(key_values) -> Dict:
+    return {kv.key: _any_value(kv.value) for kv in key_values}
+
+
+def _span(span, resource: Resource, scope: InstrumentationScope) -> Optional[ReadableSpan]:
+    trace_id = int.from_bytes(span.trace_id, "big")
+    span_id = int.from_bytes(span.span_id, "big")
+    if not trace_id or not span_id:
+        return None
+    flags = TraceFlags(TraceFlags.SAMPLED)
+    parent = None
+    if span.parent_span_id:
+        parent = SpanContext(trace_id, int.from_bytes(span.parent_span_id, "big"), is_remote=True, trace_flags=flags)
+    code = STATUS_CODES.get(span.status.code, StatusCode.UNSET)
+    # The SDK only keeps a description on errors.
+    status = Status(code, span.status.message or None) if code is StatusCode.ERROR else Status(code)
+    return ReadableSpan(
+        name=span.name,
+        context=SpanContext(trace_id, span_id, is_remote=False, trace_flags=flags),
+        parent=parent,
+        resource=resource,
+        attributes=_attributes(span.attributes),
+        events=[Event(e.name, _attributes(e.attributes), e.time_unix_nano) for e in span.events],
+        kind=SPAN_KINDS.get(span.kind, SpanKind.INTERNAL),
+        status=status,
+        start_time=span.start_time_unix_nano,
+        end_time=span.end_time_unix_nano,
+        instrumentation_scope=scope,
+    )
+
+
+def decode_request(body: bytes, json_body: bool = False) -> List[ReadableSpan]:
+    """
+    Spans in an ``ExportTraceServiceRequest`` body. Spans without a valid
+    trace or span id are left out.
+
+    Raises ``OTLPUnavailable`` without opentelemetry-proto and ``ValueError``
+    on a malformed body.
+    """
+    trace_service_pb2 = _trace_service()
+    from google.protobuf import json_format, message
+
+    request = trace_service_pb2.ExportTraceServiceRequest()
+    try:
+        if json_body:
+            document = json.loads(body or b"{}")
+            if not isinstance(document, dict):
+                raise ValueError("Expected a JSON object")
+            json_format.ParseDict(_hex_ids_to_base64(document), request, ignore_unknown_fields=True)
+        else:
+            request.ParseFromString(body)
+    except (json_format.ParseError, message.DecodeError) as e:
+        raise ValueError(str(e)) from e
+
+    spans = []
+    for resource_spans in request.resource_spans:
+        resource = Resource(_attributes(resource_spans.resource.attributes))
+        for scope_spans in resource_spans.scope_spans:
+            scope = InstrumentationScope(scope_spans.scope.name, scope_spans.scope.version or None)
+            for span in scope_spans.spans:
+                readable = _span(span, resource, scope)
+                if readable is not None:
+                    spans.append(readable)
+    return spans
+
+
+def encode_response(json_body: bool = False) -> bytes:
+    """An empty ``ExportTraceServiceResponse``, meaning every span was accepted."""
+    if json_body:
+        return b"{}"
+    return _trace_service().ExportTraceServiceResponse().SerializeToString()
+
+
+class SpanIngestor:
+    """
+    Queues decoded spans and writes them through one exporter on a single
+    thread, a batch per transaction.
+
+    ``submit`` never blocks; it raises ``IngestQueueFull`` once
+    ``max_queued`` spans are waiting so that clients back off and retry.
+    """
+
+    def __init__(self, exporter=None, max_batch: int = INGEST_MAX_BATCH,
+                 max_delay: float = INGEST_MAX_DELAY, max_queued: int = INGEST_QUEUE_SIZE):
+        if exporter is None:
+            from agensight.tracing.exporter_db import DBSpanExporter
+            exporter = DBSpanExporter()
+        self.exporter = exporter
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_queued = max_queued
+        self.stats = {"received": 0, "written": 0, "batches": 0, "dropped": 0}
+        self._queue: Deque[ReadableSpan] = deque()
+        self._oldest: Optional[float] = None
+        self._writing = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="agensight-ingest", daemon=True)
+        self._thread.start()
+
+    def submit(self, spans: List[ReadableSpan]):
+        if not spans:
+            return
+        with self._cond:
+            if self._closed:
+                raise IngestQueueFull("Span ingestion is shutting down")
+            if len(self._queue) + len(spans) > self.max_queued:
+                raise IngestQueueFull(f"{len(self._queue)} spans are waiting to be written")
+            if not self._queue:
+                self._oldest = time.monotonic()
+            self._queue.extend(spans)
+            self.stats["received"] += len(spans)
+            self._cond.notify()
+
+    def _next_batch(self) -> Optional[List[ReadableSpan]]:
+        with self._cond:
+            while True:
+                if self._queue:
+                    wait = self._oldest + self.max_delay - time.monotonic()
+                    if len(self._queue) >= self.max_batch or wait <= 0 or self._closed:
+                        break
+                    self._cond.wait(wait)
+                elif self._closed:
+                    return None
+                else:
+                    self._cond.wait()
+            count = min(len(self._queue), self.max_batch)
+            batch = [self._queue.popleft() for _ in range(count)]
+            self._oldest = time.monotonic() if self._queue else None
+            self._writing = len(batch)
+            return batch
+
+    def _write(self, batch: List[ReadableSpan]):
+        for attempt in range(INGEST_ATTEMPTS):
+            try:
+                self.exporter.export(batch)
+                self.stats["written"] += len(batch)
+                self.stats["batches"] += 1
+                return
+            except Exception as e:
+                if attempt == INGEST_ATTEMPTS - 1:
+                    self.stats["dropped"] += len(batch)
+                    print(f"Dropping {len(batch)} ingested spans: {e}")
+                else:
+                    time.sleep(0.1 * 2 ** attempt)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._write(batch)
+            with self._cond:
+                self._writing = 0
+                self._cond.notify_all()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._queue) + self._writing
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything submitted so far is written; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._writing:
+                # Skip the batching delay for what is queued, again after each
+                # batch since taking one restarts the delay for the rest.
+                if self._queue:
+                    self._oldest = float("-inf")
+                    self._cond.notify_all()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def shutdown(self, timeout: Optional[float] = None):
+        """Write out the queue, then stop the writer thread and the exporter."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        self.exporter.shutdown()
+
+
+_ingestor: Optional[SpanIngestor] = None
+_ingestor_lock = threading.Lock()
+
+
+def get_ingestor() -> SpanIngestor:
+    """The process-wide ingestor, started on first use."""
+    global _ingestor
+    with _ingestor_lock:
+        if _ingestor is None:
+            _ingestor = SpanIngestor()
+    return _ingestor
+
+
+def shutdown_ingestor(timeout: Optional[float] = None):
+    global _ingestor
+    with _ingestor_lock:
+        ingestor, _ingestor = _ingestor, None
+    if ingestor is not None:
+        ingestor.shutdown(timeout)
+
+
+def otlp_http_exporter(endpoint: Optional[str] = None):
+    """Client-side exporter that sends spans to an AgenSight server's ``/v1/traces``."""
+    try:
+        from opentelemetry.exporter.otlp.proto.http import Compression
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        raise OTLPUnavailable(
+            "The otlp exporter requires opentelemetry-exporter-otlp-proto-http: pip install 'agensight[otlp]'"
+        )
+    return OTLPSpanExporter(endpoint=endpoint or OTLP_ENDPOINT, compression=Compression.Gzip)
@@ -0,0 +1,303 @@
+"""
+Retention for the local trace and evaluation stores.
+
+A ``RetentionPolicy`` bounds ``traces.db`` by trace age, trace count and
+on-disk size. Whatever it expires is deleted oldest first, a chunk of traces
+per transaction with a pause in between, so span ingestion keeps getting the
+write lock. A trace takes its spans, prompts, completions, tools and
+evaluations with it, plus its session once no trace refers to it. With an
+archive directory the chunk is written to Parquet before it is deleted, and
+left alone if that fails. The archive is written from a read transaction, so
+ingestion is not held up while Parquet is encoded.
+
+After pruning, freed pages are returned to the filesystem with incremental
+vacuum. That needs ``auto_vacuum=INCREMENTAL``, which new databases get from
+``connect``. Older ones are converted once by ``vacuum`` (``agensight prune
+--vacuum``), which rewrites the whole file.
+
+``start_retention`` runs ``prune`` every ``AGENSIGHT_RETENTION_INTERVAL``
+seconds on a daemon thread when any limit is configured.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import agensight.eval.storage.db as eval_storage
+import agensight.tracing.db as trace_storage
+from agensight.eval.storage.db_operations import delete_evaluations_before, delete_evaluations_for_parents
+from agensight.tracing.archive import ARCHIVE_DIR, archive_rows
+from agensight.tracing.view_cache import view_cache
+from agensight.utils.sqlite_pool import chunks, placeholders
+
+RETENTION_DAYS = float(os.getenv("AGENSIGHT_RETENTION_DAYS", "0"))
+RETENTION_MAX_TRACES = int(os.getenv("AGENSIGHT_RETENTION_MAX_TRACES", "0"))
+RETENTION_MAX_BYTES = int(os.getenv("AGENSIGHT_RETENTION_MAX_BYTES", "0"))
+RETENTION_INTERVAL = float(os.getenv("AGENSIGHT_RETENTION_INTERVAL", "600"))
+# Traces deleted per transaction.
+RETENTION_CHUNK = int(os.getenv("AGENSIGHT_RETENTION_CHUNK", "200"))
+# Pages handed back to the filesystem per incremental vacuum step.
+VACUUM_PAGES = int(os.getenv("AGENSIGHT_VACUUM_PAGES", "1000"))
+
+# Seconds between chunks, during which ingestion can take the write lock.
+CHUNK_PAUSE = 0.05
+
+MESSAGE_TABLES = ("prompts", "completions", "tools")
+
+
+class RetentionPolicy:
+    """Limits on the trace store; 0 (or None) disables a limit."""
+
+    def __init__(
+        self,
+        max_age_days: float = RETENTION_DAYS,
+        max_traces: int = RETENTION_MAX_TRACES,
+        max_bytes: int = RETENTION_MAX_BYTES,
+        archive_dir: Optional[str] = ARCHIVE_DIR,
+    ):
+        self.max_age_days = max_age_days or 0
+        self.max_traces = max_traces or 0
+        self.max_bytes = max_bytes or 0
+        self.archive_dir = archive_dir
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_age_days or self.max_traces or self.max_bytes)
+
+    def cutoff(self, now: Optional[float] = None) -> Optional[float]:
+        """Unix time before which data expires by age, or None."""
+        if not self.max_age_days:
+            return None
+        return (now or time.time()) - self.max_age_days * 86400
+
+
+def used_bytes(conn: sqlite3.Connection) -> int:
+    """Bytes of the database file in use, not counting free pages."""
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return page_size * (page_count - free_pages)
+
+
+def expired_trace_ids(conn: sqlite3.Connection, policy: RetentionPolicy, limit: int,
+                      now: Optional[float] = None) -> List[str]:
+    """Up to ``limit`` of the oldest traces the policy expires."""
+    oldest = "SELECT id FROM traces ORDER BY started_at, id LIMIT ?"
+    cutoff = policy.cutoff(now)
+    if cutoff is not None:
+        rows = conn.execute(
+            "SELECT id FROM traces WHERE started_at < ? ORDER BY started_at, id LIMIT ?", (cutoff, limit)
+        ).fetchall()
+        if rows:
+            return [row[0] for row in rows]
+    if policy.max_traces:
+        excess = conn.execute("SELECT COUNT(*) FROM traces").fetchone()[0] - policy.max_traces
+        if excess > 0:
+            return [row[0] for row in conn.execute(oldest, (min(excess, limit),))]
+    if policy.max_bytes:
+        used = used_bytes(conn)
+        if used > policy.max_bytes:
+            # Delete about as many traces as the excess takes up, judged by
+            # the average trace, rather than a whole chunk at a time.
+            count = conn.execute("SELECT COUNT(*) FROM traces").fetchone()[0]
+            if count:
+                needed = math.ceil((used - policy.max_bytes) / (used / count))
+                return [row[0] for row in conn.execute(oldest, (max(1, min(needed, limit)),))]
+    return []
+
+
+def expired_orphan_span_ids(conn: sqlite3.Connection, cutoff: float, limit: int) -> List[str]:
+    """Spans older than ``cutoff`` whose trace row was never written."""
+    rows = conn.execute('''
+        SELECT id FROM spans
+        WHERE started_at < ? AND NOT EXISTS (SELECT 1 FROM traces WHERE traces.id = spans.trace_id)
+        LIMIT ?
+    ''', (cutoff, limit))
+    return [row[0] for row in rows]
+
+
+def trace_span_ids(conn: sqlite3.Connection, trace_ids: List[str]) -> List[str]:
+    span_ids = []
+    for chunk in chunks(trace_ids):
+        span_ids.extend(row[0] for row in conn.execute(
+            f"SELECT id FROM spans WHERE trace_id IN ({placeholders(chunk)})", chunk
+        ))
+    return span_ids
+
+
+def delete_traces(conn: sqlite3.Connection, trace_ids: List[str], span_ids: Optional[List[str]] = None,
+                  archive_dir: Optional[str] = None) -> Tuple[List[str], Dict[str, int]]:
+    """
+    Delete traces, their spans and messages, and sessions left without traces.
+
+    Pass ``span_ids`` to delete those spans too (or instead, with no trace
+    ids). Archives everything first when ``archive_dir`` is set. Call inside
+    a writer transaction. Returns every deleted span id and the number of
+    rows deleted per table.
+    """
+    span_ids = list(dict.fromkeys(list(span_ids or []) + trace_span_ids(conn, trace_ids)))
+
+    if archive_dir:
+        archive_rows(conn, trace_ids, span_ids, archive_dir)
+
+    counts = {table: 0 for table in MESSAGE_TABLES + ("spans", "traces", "sessions")}
+    for chunk in chunks(span_ids):
+        for table in MESSAGE_TABLES:
+            counts[table] += conn.execute(
+                f"DELETE FROM {table} WHERE span_id IN ({placeholders(chunk)})", chunk
+            ).rowcount
+        counts["spans"] += conn.execute(f"DELETE FROM spans WHERE id IN ({placeholders(chunk)})", chunk).rowcount
+
+    for chunk in chunks(trace_ids):
+        session_ids = [row[0] for row in conn.execute(
+            f"SELECT DISTINCT session_id FROM traces WHERE id IN ({placeholders(chunk)}) AND session_id IS NOT NULL",
+            chunk
+        )]
+        counts["traces"] += conn.execute(f"DELETE FROM traces WHERE id IN ({placeholders(chunk)})", chunk).rowcount
+        if session_ids:
+            counts["sessions"] += conn.execute(f'''
+                DELETE FROM sessions WHERE id IN ({placeholders(session_ids)})
+                AND NOT EXISTS (SELECT 1 FROM traces WHERE traces.session_id = sessions.id)
+            ''', session_ids).rowcount
+    return span_ids, counts
+
+
+def incremental_vacuum(writer: Callable, pages: int = VACUUM_PAGES,
+                       stop: Optional[threading.Event] = None) -> int:
+    """Return free pages to the filesystem in steps; a no-op without incremental auto-vacuum."""
+    freed = 0
+    while not (stop and stop.is_set()):
+        with writer() as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                return freed
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not before:
+                break
+            # executescript steps the pragma to completion; execute() would
+            # free a single page.
+            conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+            freed += before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        time.sleep(CHUNK_PAUSE)
+    with writer() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    return freed
+
+
+def vacuum(writer: Callable):
+    """Rewrite the database with incremental auto-vacuum. Blocks writers while it runs."""
+    with writer() as conn:
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+
+def prune(policy: Optional[RetentionPolicy] = None, chunk_size: int = RETENTION_CHUNK,
+          stop: Optional[threading.Event] = None, now: Optional[float] = None) -> Dict[str, int]:
+    """
+    Apply ``policy`` once to both stores and compact them; returns what was
+    removed. Both stores must already be migrated, as ``start_retention``
+    does.
+    """
+    policy = policy or RetentionPolicy()
+    totals = {"traces": 0, "spans": 0, "evaluations": 0, "freed_pages": 0}
+    if not policy.enabled:
+        return totals
+    cutoff = policy.cutoff(now)
+
+    def stopped():
+        return stop is not None and stop.is_set()
+
+    def delete_chunk(select):
+        with trace_storage.reader() as conn:
+            trace_ids, span_ids = select(conn)
+            if not trace_ids and not span_ids:
+                return False
+            span_ids = list(dict.fromkeys(span_ids + trace_span_ids(conn, trace_ids)))
+            if policy.archive_dir:
+                archive_rows(conn, trace_ids, span_ids, policy.archive_dir)
+        with trace_storage.writer() as conn:
+            if policy.archive_dir:
+                # Spans exported to these traces since the archive was written.
+                archived = set(span_ids)
+                late = [span_id for span_id in trace_span_ids(conn, trace_ids) if span_id not in archived]
+                if late:
+                    archive_rows(conn, [], late, policy.archive_dir)
+            span_ids, counts = delete_traces(conn, trace_ids, span_ids)
+        view_cache.invalidate_traces(trace_ids)
+        totals["traces"] += counts["traces"]
+        totals["spans"] += counts["spans"]
+        # eval.db is a separate file; evaluations of deleted spans are
+        # unreachable, so losing these on a crash only leaves them for later.
+        totals["evaluations"] += delete_evaluations_for_parents(trace_ids + span_ids)
+        time.sleep(CHUNK_PAUSE)
+        return True
+
+    while not stopped() and delete_chunk(lambda conn: (expired_trace_ids(conn, policy, chunk_size, now), [])):
+        pass
+    if cutoff is not None:
+        while not stopped() and delete_chunk(lambda conn: ([], expired_orphan_span_ids(conn, cutoff, chunk_size))):
+            pass
+        while not stopped():
+            deleted = delete_evaluations_before(cutoff, chunk_size)
+            totals["evaluations"] += deleted
+            if deleted < chunk_size:
+                break
+            time.sleep(CHUNK_PAUSE)
+        with trace_storage.writer() as conn:
+            conn.execute("DELETE FROM span_sketches WHERE bucket_start < ?", (cutoff,))
+
+    for writer in (trace_storage.writer, eval_storage.writer):
+        totals["freed_pages"] += incremental_vacuum(writer, stop=stop)
+    return totals
+
+
+class RetentionWorker:
+    """Runs ``prune`` every ``interval`` seconds on a daemon thread."""
+
+    def __init__(self, policy: Optional[RetentionPolicy] = None, interval: float = RETENTION_INTERVAL):
+        self.policy = policy or RetentionPolicy()
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="agensight-retention", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                totals = prune(self.policy, stop=self._stop)
+                if totals["traces"] or totals["spans"] or totals["evaluations"]:
+                    print(f"Retention removed {totals['traces']} traces, {totals['spans']} spans "
+                          f"and {totals['evaluations']} evaluations")
+            except Exception as e:
+                # Typically a failed archive; nothing was deleted for that chunk.
+                print(f"Retention sweep failed: {e}")
+            self._stop.wait(self.interval)
+
+    def shutdown(self, timeout: Optional[float] = None):
+        self._stop.set()
+        self._thread.join(timeout)
+
+
+_worker: Optional[RetentionWorker] = None
+_worker_lock = threading.Lock()
+
+
+def start_retention(policy: Optional[RetentionPolicy] = None) -> Optional[RetentionWorker]:
+    """Start the process-wide retention worker if any limit is configured."""
+    global _worker
+    policy = policy or RetentionPolicy()
+    if not policy.enabled:
+        return None
+    with _worker_lock:
+        if _worker is None:
+            # The exporter may run without the server ever having migrated
+            # eval.db; sweeps rely on both schemas.
+            trace_storage.init_schema()
+            eval_storage.init_evals_schema()
+            _worker = RetentionWorker(policy).start()
+    return _worker
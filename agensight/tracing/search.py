@@ -0,0 +1,173 @@
+"""
+Full-text search over prompt and completion content and tool calls.
+
+Each message table has an FTS5 index that uses the table itself as its
+external content, so the text is not stored twice. Triggers on the message
+tables keep the indexes in step with every insert, update and delete the
+exporter makes. A search matches all three indexes, ranks the hits by
+BM25 and returns a highlighted snippet for each hit on the requested page.
+"""
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from agensight.utils.sqlite_pool import placeholders
+
+SNIPPET_START = "<mark>"
+SNIPPET_END = "</mark>"
+SNIPPET_TOKENS = 16
+
+# Matches ranked per kind, newest first. A term found in most messages would
+# otherwise have every match scored before the first page comes back.
+SEARCH_RANK_WINDOW = int(os.getenv("AGENSIGHT_SEARCH_RANK_WINDOW", "10000"))
+
+# kind -> (message table, FTS table, indexed columns, role expression)
+SEARCH_SOURCES = {
+    "prompt": ("prompts", "prompts_fts", ("content",), "m.role"),
+    "completion": ("completions", "completions_fts", ("content",), "m.role"),
+    "tool": ("tools", "tools_fts", ("name", "arguments"), "NULL"),
+}
+
+
+class SearchUnavailable(Exception):
+    """The SQLite library was built without FTS5."""
+
+
+def has_message_search(conn: sqlite3.Connection) -> bool:
+    """True once every FTS5 index exists."""
+    names = [fts for _, fts, _, _ in SEARCH_SOURCES.values()]
+    count = conn.execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders(names)})", names
+    ).fetchone()[0]
+    return count == len(names)
+
+
+def create_message_search(conn: sqlite3.Connection):
+    """Create the FTS5 indexes and their triggers, and index existing rows."""
+    for table, fts, columns, _ in SEARCH_SOURCES.values():
+        cols = ", ".join(columns)
+        new_values = ", ".join(f"new.{c}" for c in columns)
+        old_values = ", ".join(f"old.{c}" for c in columns)
+        try:
+            conn.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"{cols}, content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+            )
+        except sqlite3.OperationalError as e:
+            if "fts5" not in str(e):
+                raise
+            print(f"Full-text search disabled: {e}")
+            return
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_values});
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_values});
+            END
+        ''')
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+
+def match_expression(text: str) -> str:
+    """
+    FTS5 query matching every word of ``text``.
+
+    Words are quoted, so punctuation and FTS5 operators in user input are
+    searched for literally instead of raising a syntax error.
+    """
+    terms = ['"' + term.replace('"', '""') + '"' for term in text.split()]
+    return " AND ".join(terms)
+
+
+def _filters(trace_id: Optional[str], session_id: Optional[str]) -> Tuple[str, str, List[Any]]:
+    joins, where, params = "", "", []
+    if trace_id or session_id:
+        joins = " JOIN {table} AS m ON m.id = {fts}.rowid JOIN spans ON spans.id = m.span_id"
+    if trace_id:
+        where += " AND spans.trace_id = ?"
+        params.append(trace_id)
+    if session_id:
+        joins += " JOIN traces ON traces.id = spans.trace_id"
+        where += " AND traces.session_id = ?"
+        params.append(session_id)
+    return joins, where, params
+
+
+def search_messages(
+    conn: sqlite3.Connection,
+    query: str,
+    kinds: Optional[Iterable[str]] = None,
+    session_id: Optional[str] = None,
+    trace_id: Optional[str] = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Messages matching the FTS5 ``query``, best match first.
+
+    Each hit has its kind (prompt, completion or tool), message id, span,
+    trace and session ids, role or tool name, a snippet with matches wrapped
+    in ``SNIPPET_START``/``SNIPPET_END``, and its BM25 score (lower is
+    better). Only the newest ``SEARCH_RANK_WINDOW`` matches of each kind are
+    ranked. Raises ``SearchUnavailable`` without FTS5 and
+    ``sqlite3.OperationalError`` for a malformed query.
+    """
+    kinds = list(kinds) if kinds else list(SEARCH_SOURCES)
+    joins, where, filter_params = _filters(trace_id, session_id)
+    try:
+        # Rank ids and scores first; snippets are only built for the page.
+        ranked: List[Tuple[float, str, int]] = []
+        for kind in kinds:
+            table, fts, _, _ = SEARCH_SOURCES[kind]
+            rows = conn.execute(f'''
+                SELECT rowid, score FROM (
+                    SELECT {fts}.rowid AS rowid, bm25({fts}) AS score
+                    FROM {fts}{joins.format(table=table, fts=fts)}
+                    WHERE {fts} MATCH ?{where}
+                    ORDER BY {fts}.rowid DESC LIMIT ?
+                ) ORDER BY score, rowid DESC LIMIT ?
+            ''', [query] + filter_params + [SEARCH_RANK_WINDOW, offset + limit])
+            ranked.extend((row[1], kind, row[0]) for row in rows)
+        # Same order as the SQL above, so every page is a slice of one ranking.
+        ranked.sort(key=lambda hit: (hit[0], kinds.index(hit[1]), -hit[2]))
+        page = ranked[offset:offset + limit]
+
+        hits: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        for kind in kinds:
+            ids = [rowid for _, k, rowid in page if k == kind]
+            if not ids:
+                continue
+            table, fts, columns, role = SEARCH_SOURCES[kind]
+            name = "m.name" if "name" in columns else "NULL"
+            rows = conn.execute(f'''
+                SELECT m.id AS id, m.span_id AS span_id, spans.trace_id AS trace_id, traces.session_id AS session_id,
+                       {role} AS role, {name} AS name,
+                       snippet({fts}, -1, ?, ?, '…', {SNIPPET_TOKENS}) AS snippet
+                FROM {fts} JOIN {table} AS m ON m.id = {fts}.rowid
+                LEFT JOIN spans ON spans.id = m.span_id
+                LEFT JOIN traces ON traces.id = spans.trace_id
+                WHERE {fts} MATCH ? AND {fts}.rowid IN ({", ".join("?" * len(ids))})
+            ''', [SNIPPET_START, SNIPPET_END, query] + ids)
+            for row in rows:
+                hits[(kind, row["id"])] = {"kind": kind, **dict(row)}
+    except sqlite3.OperationalError as e:
+        if "no such table" in str(e) and "_fts" in str(e):
+            raise SearchUnavailable(str(e))
+        raise
+
+    results = []
+    for score, kind, rowid in page:
+        hit = hits.get((kind, rowid))
+        if hit:
+            hit["score"] = score
+            results.append(hit)
+    return results
@@ -3,6 +3,7 @@ import contextvars
 from .config import config
 
 _session_id_var = contextvars.ContextVar("session_id", default=str(uuid.uuid4()))
+_session_details_var = contextvars.ContextVar("session_details", default=None)
 _session_enabled = False
 
 def enable_session_tracking():
@@ -17,3 +18,11 @@ def get_session_id() -> str:
 
 def set_session_id(session_id: str):
     _session_id_var.set(session_id)
+
+def set_session_details(name=None, user_id=None):
+    _session_details_var.set({"session.name": name, "session.user_id": user_id})
+
+def get_session_attributes() -> dict:
+    """Span attributes describing the current session, without unset values."""
+    attributes = {"session.id": get_session_id(), **(_session_details_var.get() or {})}
+    return {key: value for key, value in attributes.items() if value is not None}
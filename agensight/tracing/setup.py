@@ -4,6 +4,7 @@ from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
 from opentelemetry import trace
 from agensight.tracing.token_propagator import TokenPropagator
+from agensight.tracing.trace_propagator import TraceContextPropagator
 
 def setup_tracing(service_name="default", exporter_type=None):
     if exporter_type is None:
@@ -17,6 +18,7 @@ def setup_tracing(service_name="default", exporter_type=None):
 
     processor = BatchSpanProcessor(exporter)
     provider = TracerProvider()
+    provider.add_span_processor(TraceContextPropagator())
     provider.add_span_processor(TokenPropagator())
     provider.add_span_processor(processor)
 
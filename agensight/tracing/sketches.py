@@ -0,0 +1,174 @@
+"""
+Per-bucket quantile sketches of span latency and token usage.
+
+The DB exporter folds every span into a DDSketch keyed by
+``(metric, time bucket, span name, model)`` and merges it into the
+``span_sketches`` table in the same transaction as the span rows. Percentile
+queries then merge the stored sketches for a time range, so their cost
+depends on the number of buckets, span names and models, not on the number
+of spans.
+"""
+import json
+import os
+import sqlite3
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from agensight.utils.ddsketch import DDSketch
+
+SKETCH_BUCKET_SECONDS = int(os.getenv("AGENSIGHT_SKETCH_BUCKET_SECONDS", "300"))
+
+DURATION = "duration"
+TOKEN_METRICS = ("total_tokens", "prompt_tokens", "completion_tokens")
+
+MODEL_KEYS = ("gen_ai.request.model", "gen_ai.response.model", "gen_ai.anthropic.model", "gen_ai.request.model_name")
+
+SketchKey = Tuple[str, float, str, str]  # (metric, bucket_start, span_name, model)
+
+
+def model_from_attrs(attrs: Mapping[str, Any]) -> str:
+    for key in MODEL_KEYS:
+        value = attrs.get(key)
+        if value:
+            return str(value)
+    return ""
+
+
+def bucket_start(timestamp: float, bucket_seconds: int = SKETCH_BUCKET_SECONDS) -> float:
+    return float(int(timestamp // bucket_seconds) * bucket_seconds)
+
+
+class SketchBatch:
+    """Sketches for one export batch, merged into the table by ``flush``."""
+
+    def __init__(self, bucket_seconds: int = SKETCH_BUCKET_SECONDS):
+        self.bucket_seconds = bucket_seconds
+        self.sketches: Dict[SketchKey, DDSketch] = defaultdict(DDSketch)
+
+    def add(self, metric: str, started_at: float, span_name: str, model: str, value):
+        if value is None:
+            return
+        key = (metric, bucket_start(started_at, self.bucket_seconds), span_name or "", model or "")
+        self.sketches[key].add(value)
+
+    def add_span(self, span_name: str, started_at: float, duration: float,
+                 model: str = "", tokens: Optional[Mapping[str, Any]] = None):
+        self.add(DURATION, started_at, span_name, model, duration)
+        if tokens:
+            for kind in ("total", "prompt", "completion"):
+                value = tokens.get(kind)
+                if isinstance(value, (int, float)):
+                    self.add(f"{kind}_tokens", started_at, span_name, model, value)
+
+    def flush(self, conn: sqlite3.Connection):
+        """Merge into ``span_sketches``; call inside the writer transaction."""
+        if not self.sketches:
+            return
+        rows = []
+        for key, sketch in self.sketches.items():
+            existing = conn.execute(
+                "SELECT sketch FROM span_sketches WHERE metric = ? AND bucket_start = ? AND span_name = ? AND model = ?",
+                key
+            ).fetchone()
+            if existing:
+                merged = DDSketch.from_json(existing[0])
+                merged.merge(sketch)
+                sketch = merged
+            rows.append(key + (sketch.count, sketch.to_json()))
+        conn.executemany(
+            "INSERT OR REPLACE INTO span_sketches (metric, bucket_start, span_name, model, count, sketch) VALUES (?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        self.sketches.clear()
+
+
+def query_percentiles(
+    conn: sqlite3.Connection,
+    metrics: Iterable[str],
+    since: float,
+    until: float,
+    quantiles: Iterable[float] = (0.5, 0.9, 0.99),
+    bucket_seconds: Optional[int] = None,
+    span_name: Optional[str] = None,
+    model: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Percentiles per (time bucket, span name, model) for ``since <= t < until``.
+
+    ``bucket_seconds`` is rounded up to a multiple of the stored bucket width;
+    None returns a single bucket covering the whole range.
+    """
+    metrics = list(metrics)
+    quantiles = list(quantiles)
+    query = f'''
+        SELECT metric, bucket_start, span_name, model, sketch FROM span_sketches
+        WHERE metric IN ({", ".join("?" * len(metrics))}) AND bucket_start >= ? AND bucket_start < ?
+    '''
+    params: List[Any] = metrics + [bucket_start(since), until]
+    if span_name is not None:
+        query += " AND span_name = ?"
+        params.append(span_name)
+    if model is not None:
+        query += " AND model = ?"
+        params.append(model)
+
+    if bucket_seconds:
+        width = max(1, -(-bucket_seconds // SKETCH_BUCKET_SECONDS)) * SKETCH_BUCKET_SECONDS
+    else:
+        width = None
+
+    merged: Dict[Tuple[float, str, str], Dict[str, DDSketch]] = defaultdict(dict)
+    for row in conn.execute(query, params):
+        start = bucket_start(row["bucket_start"], width) if width else bucket_start(since)
+        group = merged[(start, row["span_name"], row["model"])]
+        sketch = DDSketch.from_json(row["sketch"])
+        if row["metric"] in group:
+            group[row["metric"]].merge(sketch)
+        else:
+            group[row["metric"]] = sketch
+
+    results = []
+    for (start, name, model_name), by_metric in sorted(merged.items()):
+        entry = {"bucket_start": start, "span_name": name, "model": model_name or None}
+        for metric in metrics:
+            sketch = by_metric.get(metric)
+            stats = {"count": sketch.count if sketch else 0}
+            if sketch and sketch.count:
+                stats["mean"] = sketch.sum / sketch.count
+                stats["min"] = sketch.min
+                stats["max"] = sketch.max
+                for q in quantiles:
+                    stats[f"p{q * 100:g}"] = sketch.quantile(q)
+            entry[metric] = stats
+        results.append(entry)
+    return results
+
+
+def backfill_span_sketches(conn: sqlite3.Connection):
+    """
+    Build sketches for spans stored before the table existed, reading the
+    model and token counts from span attributes as the exporter does.
+    """
+    from agensight.tracing.span_classifier import is_llm_record
+    from agensight.tracing.utils import extract_token_counts_from_attrs
+
+    batch = SketchBatch()
+    rows = conn.execute(
+        "SELECT name, started_at, duration, attributes FROM spans WHERE started_at IS NOT NULL"
+    )
+    seen = 0
+    for row in rows:
+        try:
+            attrs = json.loads(row["attributes"] or "{}")
+        except ValueError:
+            attrs = {}
+        if not isinstance(attrs, dict):
+            attrs = {}
+        batch.add_span(
+            row["name"], row["started_at"], row["duration"], model_from_attrs(attrs),
+            extract_token_counts_from_attrs(attrs) if is_llm_record(row["name"], attrs) else None
+        )
+        seen += 1
+        if seen % 10000 == 0:
+            batch.flush(conn)
+    batch.flush(conn)
@@ -0,0 +1,47 @@
+"""
+Decide whether a span is an LLM call without stringifying its attributes.
+
+The verdict for a given span name and instrumentation scope is cached, so
+spans from LLM instrumentations (``openai.chat``, ``anthropic.completion``,
+…) are recognised with one dictionary lookup. Other spans fall back to a
+scan of attribute *keys*; values, which hold full prompt text, are never
+read.
+"""
+from functools import lru_cache
+from typing import Any, Mapping, Optional
+
+LLM_MARKERS = ("llm", "openai", "gen_ai", "completion", "anthropic")
+
+
+def _scope_name(span) -> str:
+    scope = getattr(span, "instrumentation_scope", None) or getattr(span, "instrumentation_info", None)
+    return getattr(scope, "name", "") or ""
+
+
+@lru_cache(maxsize=4096)
+def _is_llm_name(span_name: str, scope_name: str) -> bool:
+    name = span_name.lower()
+    scope = scope_name.lower()
+    if scope.startswith("opentelemetry.instrumentation.") and any(m in scope for m in LLM_MARKERS):
+        return True
+    return any(m in name for m in LLM_MARKERS)
+
+
+def is_llm_span(span, attrs: Optional[Mapping[str, Any]] = None) -> bool:
+    """True if ``span`` is an LLM request, judged by name, scope and attribute keys."""
+    if attrs is None:
+        attrs = span.attributes or {}
+    if "gen_ai.system" in attrs:
+        return True
+    if _is_llm_name(span.name, _scope_name(span)):
+        return True
+    return any(m in key for key in attrs for m in LLM_MARKERS)
+
+
+def is_llm_record(span_name: str, attrs: Mapping[str, Any]) -> bool:
+    """``is_llm_span`` for a stored span row, which has no instrumentation scope."""
+    if "gen_ai.system" in attrs:
+        return True
+    if _is_llm_name(span_name or "", ""):
+        return True
+    return any(m in key for key in attrs for m in LLM_MARKERS)
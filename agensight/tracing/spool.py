@@ -0,0 +1,148 @@
+"""
+Durable on-disk spool for payloads waiting to be sent to the remote API.
+
+Payloads are stored as opaque blobs (gzip-compressed JSON batches) in a small
+SQLite file, oldest first. A sender *claims* ready payloads by pushing their
+``next_attempt_at`` forward by a lease, so a crash mid-send only delays the
+payload until the lease expires and a restarted process picks it up again.
+Payloads are claimed strictly in order: nothing is handed out while the
+oldest payload is waiting for a retry, so records behind a failed one are
+never sent ahead of it and a down endpoint sees one attempt per backoff.
+When the spool grows past ``max_bytes`` the oldest payloads are evicted.
+The total size lives in a one-row ``spool_size`` table kept up to date by
+triggers, so it is read in the same transaction as the eviction and is right
+for every process sharing the file.
+"""
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from agensight.utils.sqlite_pool import SQLitePool
+
+DEFAULT_SPOOL_FILE = Path(os.getenv("AGENSIGHT_SPOOL_PATH", str(Path(__file__).parent / "spool.db")))
+DEFAULT_SPOOL_MAX_BYTES = int(os.getenv("AGENSIGHT_SPOOL_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+class Spool:
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_SPOOL_FILE, max_bytes: int = DEFAULT_SPOOL_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.evicted = 0
+        # Every operation goes through the single writer connection, which
+        # also lets ":memory:" work as a non-durable fallback.
+        self._pool = SQLitePool(path, size=1)
+        with self._pool.writer() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS spool (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at REAL,
+                    next_attempt_at REAL,
+                    attempts INTEGER DEFAULT 0,
+                    size INTEGER,
+                    body BLOB
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_spool_next_attempt ON spool (next_attempt_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS spool_size (id INTEGER PRIMARY KEY CHECK (id = 1), bytes INTEGER NOT NULL)")
+            conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS spool_size_insert AFTER INSERT ON spool BEGIN
+                    UPDATE spool_size SET bytes = bytes + new.size WHERE id = 1;
+                END
+            ''')
+            conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS spool_size_delete AFTER DELETE ON spool BEGIN
+                    UPDATE spool_size SET bytes = bytes - old.size WHERE id = 1;
+                END
+            ''')
+            # After the triggers, so a payload another process adds meanwhile
+            # is counted exactly once.
+            conn.execute("INSERT OR IGNORE INTO spool_size (id, bytes) SELECT 1, COALESCE(SUM(size), 0) FROM spool")
+
+    def append(self, bodies: List[bytes]):
+        """Persist payloads in one transaction, evicting the oldest past the size cap."""
+        if not bodies:
+            return
+        now = time.time()
+        with self._pool.writer() as conn:
+            conn.executemany(
+                "INSERT INTO spool (created_at, next_attempt_at, size, body) VALUES (?, ?, ?, ?)",
+                [(now, now, len(body), body) for body in bodies]
+            )
+            total = conn.execute("SELECT bytes FROM spool_size").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(conn, total - self.max_bytes)
+
+    def _evict(self, conn, overflow: int):
+        """Delete the oldest payloads holding at least ``overflow`` bytes."""
+        row = conn.execute('''
+            SELECT id, freed FROM (SELECT id, SUM(size) OVER (ORDER BY id) AS freed FROM spool)
+            WHERE freed >= ? ORDER BY id LIMIT 1
+        ''', (overflow,)).fetchone()
+        if row is None:
+            row = conn.execute("SELECT MAX(id) FROM spool").fetchone()
+        self.evicted += conn.execute("DELETE FROM spool WHERE id <= ?", (row[0],)).rowcount
+
+    def claim(self, limit: int, lease: float) -> List[Tuple[int, int, bytes]]:
+        """Reserve up to ``limit`` of the oldest payloads for ``lease`` seconds; returns (id, attempts, body).
+
+        Stops at the first payload that is not due yet, so the result is
+        empty while the oldest one waits out a backoff or another sender's lease.
+        """
+        now = time.time()
+        with self._pool.writer() as conn:
+            rows = []
+            for row in conn.execute(
+                "SELECT id, attempts, next_attempt_at, body FROM spool ORDER BY id LIMIT ?", (limit,)
+            ):
+                if row["next_attempt_at"] > now:
+                    break
+                rows.append(row)
+            conn.executemany(
+                "UPDATE spool SET next_attempt_at = ? WHERE id = ?",
+                [(now + lease, row["id"]) for row in rows]
+            )
+        return [(row["id"], row["attempts"], row["body"]) for row in rows]
+
+    def ack(self, payload_id: int):
+        with self._pool.writer() as conn:
+            conn.execute("DELETE FROM spool WHERE id = ?", (payload_id,))
+
+    def retry_at(self, payload_id: int, next_attempt_at: float):
+        with self._pool.writer() as conn:
+            conn.execute(
+                "UPDATE spool SET attempts = attempts + 1, next_attempt_at = ? WHERE id = ?",
+                (next_attempt_at, payload_id)
+            )
+
+    def reschedule(self, payload_ids: List[int], next_attempt_at: float):
+        """Move payloads back without counting an attempt against them."""
+        with self._pool.writer() as conn:
+            conn.executemany(
+                "UPDATE spool SET next_attempt_at = ? WHERE id = ?",
+                [(next_attempt_at, payload_id) for payload_id in payload_ids]
+            )
+
+    def next_attempt_at(self) -> Optional[float]:
+        """When the oldest payload, and so the next claim, is due."""
+        with self._pool.writer() as conn:
+            row = conn.execute("SELECT next_attempt_at FROM spool ORDER BY id LIMIT 1").fetchone()
+        return row[0] if row is not None else None
+
+    def stats(self) -> Dict[str, int]:
+        with self._pool.writer() as conn:
+            row = conn.execute("SELECT (SELECT COUNT(*) FROM spool), bytes FROM spool_size").fetchone()
+        return {"spooled": row[0], "spooled_bytes": row[1], "evicted": self.evicted}
+
+    def close(self):
+        self._pool.close()
+
+
+def open_spool(path: Union[str, Path] = DEFAULT_SPOOL_FILE, max_bytes: int = DEFAULT_SPOOL_MAX_BYTES) -> Spool:
+    """Open the spool at ``path``, falling back to an in-memory one if the file is unusable."""
+    try:
+        return Spool(path, max_bytes)
+    except Exception as e:
+        print(f"Could not open span spool at {path} ({e}); spooling in memory instead")
+        return Spool(":memory:", max_bytes)
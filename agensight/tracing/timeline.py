@@ -0,0 +1,132 @@
+"""
+Level-of-detail layout of spans (or traces) for timeline charts.
+
+``build_timeline`` lays rows out for a time window drawn ``width`` pixels
+wide. A row narrower than ``min_px`` pixels is too small to draw on its own,
+so runs of such siblings that sit less than a pixel apart and start within
+``min_px`` pixels of each other become one *aggregate* bar with a count,
+total duration and the most common names.
+Descendants of a small row are folded into its bar as well. The number of
+items returned therefore depends on the pixel width and the tree's shape,
+not on how many spans the trace holds; an aggregate's ``expand`` window is
+laid out again at full width to drill into it.
+"""
+from collections import Counter
+from typing import Any, Dict, Hashable, Iterable, List, Optional
+
+from agensight.tracing.trace_tree import TraceTree
+
+DEFAULT_WIDTH = 1000
+# Rows narrower than this many pixels are merged with their neighbours.
+MIN_BAR_PIXELS = 2.0
+# Names listed on an aggregate bar.
+AGGREGATE_NAMES = 3
+
+ERROR_STATUS = "StatusCode.ERROR"
+
+
+def _end(row: Dict[str, Any]) -> float:
+    return row["ended_at"] if row["ended_at"] is not None else row["started_at"]
+
+
+def _subtree_stats(tree: TraceTree) -> Dict[Hashable, List[int]]:
+    """[row count, error count] of each row's subtree, itself included."""
+    stats = {}
+    for row in reversed(tree.topological()):
+        own = stats.setdefault(row["id"], [0, 0])
+        own[0] += 1
+        own[1] += row.get("status") == ERROR_STATUS
+        parent_id = tree.parent_ids[row["id"]]
+        if parent_id is not None and parent_id in tree:
+            parent = stats.setdefault(parent_id, [0, 0])
+            parent[0] += own[0]
+            parent[1] += own[1]
+    return stats
+
+
+def build_timeline(
+    rows: Iterable[Dict[str, Any]],
+    start: float,
+    end: float,
+    width: int = DEFAULT_WIDTH,
+    min_px: float = MIN_BAR_PIXELS,
+    parent_id: Optional[str] = None,
+    item_type: str = "span",
+) -> List[Dict[str, Any]]:
+    """
+    Timeline items for ``rows`` between ``start`` and ``end``, parents before
+    their children, siblings by start time.
+
+    ``rows`` are dicts with ``id``, ``parent_id``, ``name``, ``started_at``,
+    ``ended_at`` and ``status``; rows without a start time are skipped. Rows
+    whose parent is not among them are laid out at depth 0 under
+    ``parent_id``, which is how an aggregate's members are expanded. Items
+    are the rows themselves with ``type``, ``depth`` and
+    ``hidden_descendants`` added, or aggregates::
+
+        {"type": "aggregate", "parent_id", "depth", "started_at", "ended_at",
+         "count", "span_count", "error_count", "total_duration",
+         "names": {name: count}, "expand": {"parent_id", "start", "end"}}
+    """
+    tree = TraceTree.from_rows(row for row in rows if row["started_at"] is not None)
+    resolution = (end - start) / max(1, width)
+    min_duration = resolution * min_px
+    stats = _subtree_stats(tree)
+
+    def by_start(ids):
+        return sorted(ids, key=lambda node_id: (tree.get(node_id)["started_at"], node_id))
+
+    items: List[Dict[str, Any]] = []
+
+    def flush(frame):
+        group = frame[3]
+        frame[3] = None
+        if not group:
+            return
+        members, depth, parent = group["members"], frame[1], frame[2]
+        if len(members) == 1:
+            row = members[0]
+            items.append(dict(row, type=item_type, depth=depth, hidden_descendants=stats[row["id"]][0] - 1))
+            return
+        names = Counter(row["name"] for row in members)
+        started_at = members[0]["started_at"]
+        items.append({
+            "type": "aggregate",
+            "parent_id": parent,
+            "depth": depth,
+            "started_at": started_at,
+            "ended_at": group["ended_at"],
+            "count": len(members),
+            "span_count": sum(stats[row["id"]][0] for row in members),
+            "error_count": sum(stats[row["id"]][1] for row in members),
+            "total_duration": sum(_end(row) - row["started_at"] for row in members),
+            "names": dict(names.most_common(AGGREGATE_NAMES)),
+            "expand": {"parent_id": parent, "start": started_at, "end": group["ended_at"]},
+        })
+
+    # Iterative pre-order walk; a frame is [sibling iterator, depth, parent id, open group].
+    stack = [[iter(by_start(tree.roots)), 0, parent_id, None]]
+    while stack:
+        frame = stack[-1]
+        node_id = next(frame[0], None)
+        if node_id is None:
+            flush(frame)
+            stack.pop()
+            continue
+        row = tree.get(node_id)
+        if _end(row) - row["started_at"] >= min_duration:
+            flush(frame)
+            items.append(dict(row, type=item_type, depth=frame[1], hidden_descendants=0))
+            stack.append([iter(by_start(tree.child_ids(node_id))), frame[1] + 1, node_id, None])
+            continue
+        group = frame[3]
+        # Merge while the gap is under a pixel and the bar has not grown past
+        # min_px, so a row holds at most about width / min_px bars.
+        if (group and row["started_at"] - group["ended_at"] <= resolution
+                and row["started_at"] - group["members"][0]["started_at"] < min_duration):
+            group["members"].append(row)
+            group["ended_at"] = max(group["ended_at"], _end(row))
+        else:
+            flush(frame)
+            frame[3] = {"members": [row], "ended_at": _end(row)}
+    return items
@@ -0,0 +1,36 @@
+# agentsight/tracing/trace_propagator.py
+"""
+TraceContextPropagator — stamp the active ``@trace`` id and name onto every
+span as it starts, including spans opened by third-party instrumentation
+(e.g. `openai.chat`) that know nothing about AgenSight traces. Exporters can
+then file each span under the right trace even when its parent is exported
+in a different batch.
+"""
+
+from __future__ import annotations
+
+from opentelemetry.sdk.trace import SpanProcessor, ReadableSpan
+from opentelemetry.trace import Span
+
+from agensight.tracing.context import current_trace_id, current_trace_name
+
+
+class TraceContextPropagator(SpanProcessor):
+
+    def on_start(self, span: Span, parent_context=None):  # noqa: D401, N802
+        attrs = span.attributes or {}
+        trace_id = current_trace_id.get()
+        if trace_id and "trace_id" not in attrs:
+            span.set_attribute("trace_id", trace_id)
+        trace_name = current_trace_name.get()
+        if trace_name and "trace.name" not in attrs:
+            span.set_attribute("trace.name", trace_name)
+
+    def on_end(self, span: ReadableSpan) -> None:  # noqa: D401, N802
+        return
+
+    def shutdown(self) -> None:  # noqa: D401, N802
+        return
+
+    def force_flush(self, *_, **__) -> bool:  # noqa: D401, N802
+        return True
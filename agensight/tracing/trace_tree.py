@@ -0,0 +1,133 @@
+"""
+Parent/child index over the spans of one or more traces.
+
+``TraceTree`` is built once in O(n) from either OpenTelemetry spans (in the
+exporters) or ``spans`` table rows (in the server) and then answers parent,
+children, depth and ordering questions with dictionary lookups. Span
+attributes are parsed from JSON at most once per span.
+"""
+import json
+from collections import defaultdict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+
+def otel_span_id(span) -> str:
+    return format(span.get_span_context().span_id, "016x")
+
+
+def otel_parent_id(span) -> Optional[str]:
+    return format(span.parent.span_id, "016x") if span.parent else None
+
+
+class TraceTree:
+    """
+    Args:
+        nodes: Spans in any order; the input order is kept among siblings.
+        id_of: Returns a node's id.
+        parent_of: Returns a node's parent id, or None for a root.
+        attributes_of: Returns a node's attributes, as a dict or a JSON string.
+
+    A node whose parent is not in the tree (e.g. the parent was exported in an
+    earlier batch) is an *orphan*: it is listed with the roots but sits one
+    level down, below its missing parent.
+    """
+
+    def __init__(self, nodes: Iterable[Any], id_of: Callable[[Any], Hashable],
+                 parent_of: Callable[[Any], Optional[Hashable]],
+                 attributes_of: Optional[Callable[[Any], Any]] = None):
+        self._attributes_of = attributes_of
+        self._attributes: Dict[Hashable, Dict[str, Any]] = {}
+        self.nodes: Dict[Hashable, Any] = {}
+        self.parent_ids: Dict[Hashable, Optional[Hashable]] = {}
+        for node in nodes:
+            node_id = id_of(node)
+            if node_id in self.nodes:
+                continue
+            self.nodes[node_id] = node
+            self.parent_ids[node_id] = parent_of(node)
+
+        self._children: Dict[Hashable, List[Hashable]] = defaultdict(list)
+        self.roots: List[Hashable] = []
+        for node_id, parent_id in self.parent_ids.items():
+            if parent_id is not None and parent_id in self.nodes and parent_id != node_id:
+                self._children[parent_id].append(node_id)
+            else:
+                self.roots.append(node_id)
+
+        self._depth = self._compute_depths()
+
+    @classmethod
+    def from_otel_spans(cls, spans: Iterable[Any]) -> "TraceTree":
+        """Index exporter spans by their hex OpenTelemetry span ids."""
+        return cls(spans, otel_span_id, otel_parent_id, lambda span: span.attributes or {})
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> "TraceTree":
+        """Index ``spans`` table rows (dicts with ``id``, ``parent_id`` and ``attributes``)."""
+        return cls(rows, lambda row: row["id"], lambda row: row["parent_id"], lambda row: row.get("attributes"))
+
+    def _compute_depths(self) -> Dict[Hashable, int]:
+        depth = {}
+        level = []
+        for root in self.roots:
+            depth[root] = 0 if self.parent_ids[root] is None else 1
+            level.append(root)
+        while level:
+            next_level = []
+            for node_id in level:
+                for child_id in self._children.get(node_id, ()):
+                    if child_id not in depth:
+                        depth[child_id] = depth[node_id] + 1
+                        next_level.append(child_id)
+            level = next_level
+        # Nodes on a parent cycle are unreachable from any root.
+        for node_id in self.nodes:
+            depth.setdefault(node_id, 0)
+        return depth
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __contains__(self, node_id: Hashable) -> bool:
+        return node_id in self.nodes
+
+    def get(self, node_id: Hashable) -> Any:
+        return self.nodes.get(node_id)
+
+    def parent(self, node_id: Hashable) -> Any:
+        """The parent node, or None if it is a root or not in the tree."""
+        parent_id = self.parent_ids.get(node_id)
+        return self.nodes.get(parent_id) if parent_id is not None else None
+
+    def children(self, node_id: Hashable) -> List[Any]:
+        return [self.nodes[child_id] for child_id in self._children.get(node_id, ())]
+
+    def child_ids(self, node_id: Hashable) -> List[Hashable]:
+        return list(self._children.get(node_id, ()))
+
+    def depth(self, node_id: Hashable) -> int:
+        return self._depth[node_id]
+
+    def topological(self) -> List[Any]:
+        """All nodes, parents before children; ties keep the input order."""
+        by_depth: Dict[int, List[Any]] = defaultdict(list)
+        for node_id, node in self.nodes.items():
+            by_depth[self._depth[node_id]].append(node)
+        return [node for level in sorted(by_depth) for node in by_depth[level]]
+
+    def attributes(self, node_id: Hashable) -> Dict[str, Any]:
+        """Parsed attributes of a node, cached; {} if missing or unparsable."""
+        if node_id in self._attributes:
+            return self._attributes[node_id]
+        raw = self._attributes_of(self.nodes[node_id]) if self._attributes_of and node_id in self.nodes else None
+        if isinstance(raw, (str, bytes)):
+            try:
+                parsed = json.loads(raw)
+            except ValueError:
+                parsed = {}
+        else:
+            parsed = dict(raw) if raw else {}
+        if not isinstance(parsed, dict):
+            parsed = {}
+        self._attributes[node_id] = parsed
+        return parsed
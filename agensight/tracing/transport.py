@@ -0,0 +1,233 @@
+"""
+Bulk HTTP transport for the remote (prod) span exporter.
+
+``send()`` packs records into gzip-compressed JSON payloads and appends them
+to a durable on-disk spool (see ``spool.py``); that local write is all the
+export thread ever waits for. A background thread drains the spool over one
+keep-alive ``requests.Session``, retrying failed payloads with exponential
+backoff and jitter. Payloads survive network outages and process restarts.
+
+Wire format::
+
+    POST {url}
+    Content-Type: application/json
+    Content-Encoding: gzip
+
+    {"records": [{"type": "span", "data": {...}}, ...]}
+
+``type`` is the name of the per-record endpoint the record used to be posted
+to (``session``, ``trace``, ``span``, ``prompt``, ``completion``, ``tool``,
+``trace/update``). Records keep the order they were sent in.
+
+The bulk endpoint is opt-in (``AGENSIGHT_EXPORT_BATCH=true``) until every
+backend serves it. By default each record is spooled as its own payload and
+posted uncompressed to ``{url}/{type}`` as ``{"data": {...}}``, the API the
+hosted backend has always had, with the same spooling and retries.
+"""
+import gzip
+import json
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from agensight.tracing.spool import Spool, open_spool
+
+DEFAULT_MAX_PAYLOAD_BYTES = int(os.getenv("AGENSIGHT_EXPORT_MAX_PAYLOAD_BYTES", str(1024 * 1024)))
+DEFAULT_FLUSH_INTERVAL = float(os.getenv("AGENSIGHT_EXPORT_FLUSH_INTERVAL", "2.0"))
+DEFAULT_TIMEOUT = float(os.getenv("AGENSIGHT_EXPORT_TIMEOUT", "10.0"))
+DEFAULT_BACKOFF_BASE = float(os.getenv("AGENSIGHT_EXPORT_BACKOFF_BASE", "1.0"))
+DEFAULT_BACKOFF_MAX = float(os.getenv("AGENSIGHT_EXPORT_BACKOFF_MAX", "300.0"))
+# Post whole batches to ``{url}/batch`` instead of one request per record.
+EXPORT_BATCH = os.getenv("AGENSIGHT_EXPORT_BATCH", "false").lower() == "true"
+
+# Payloads claimed per drain pass.
+DRAIN_BATCH = 16
+
+
+def encode_record(record_type: str, data: dict) -> bytes:
+    return json.dumps({"type": record_type, "data": data}, separators=(",", ":")).encode("utf-8")
+
+
+def pack_payloads(records: List[bytes], max_payload_bytes: int) -> List[List[bytes]]:
+    """Group encoded records into payloads of at most ``max_payload_bytes`` each."""
+    payloads, current, size = [], [], 0
+    for record in records:
+        if current and size + len(record) + 1 > max_payload_bytes:
+            payloads.append(current)
+            current, size = [], 0
+        current.append(record)
+        size += len(record) + 1
+    if current:
+        payloads.append(current)
+    return payloads
+
+
+def build_body(records: List[bytes]) -> bytes:
+    return gzip.compress(b'{"records":[' + b",".join(records) + b"]}", compresslevel=5)
+
+
+def read_body(body: bytes) -> List[dict]:
+    """The records of a payload built by ``build_body``."""
+    return json.loads(gzip.decompress(body))["records"]
+
+
+def backoff_delay(attempts: int, base: float = DEFAULT_BACKOFF_BASE, cap: float = DEFAULT_BACKOFF_MAX) -> float:
+    """Exponential backoff with equal jitter: half fixed, half random."""
+    delay = min(cap, base * (2 ** attempts))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def is_retryable(status_code: Optional[int]) -> bool:
+    # Network errors, throttling and server errors are worth retrying; other
+    # client errors would fail again with the same payload.
+    return status_code is None or status_code in (408, 429) or status_code >= 500
+
+
+class BatchTransport:
+    """
+    Spool span records to disk and ship them in compressed batches.
+
+    Args:
+        url: Base URL of the ingestion API.
+        batch: Post payloads of many records to ``{url}/batch``; otherwise
+            each record goes to its own ``{url}/{type}`` endpoint.
+        headers: Callable returning extra request headers (read at send time,
+            so a project token set after start-up is picked up).
+        max_payload_bytes: Upper bound on the uncompressed JSON of one request.
+        flush_interval: Seconds between background drain passes.
+        timeout: Per-request timeout in seconds.
+        spool: Where payloads wait until they are delivered; defaults to the
+            file at ``AGENSIGHT_SPOOL_PATH``.
+    """
+
+    def __init__(self, url: str, headers: Optional[Callable[[], Dict[str, str]]] = None,
+                 max_payload_bytes: int = DEFAULT_MAX_PAYLOAD_BYTES,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 spool: Optional[Spool] = None, batch: bool = EXPORT_BATCH):
+        self.url = url.rstrip("/")
+        self.batch = batch
+        self.headers = headers or (lambda: {})
+        self.max_payload_bytes = max(1024, max_payload_bytes)
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.spool = spool or open_spool()
+
+        self._session = requests.Session()
+        self._session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self._session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"requests": 0, "failed_requests": 0, "dropped_payloads": 0, "retries": 0, "bytes_sent": 0}
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None and not self._stopped.is_set():
+                    self._thread = threading.Thread(target=self._run, name="agensight-transport", daemon=True)
+                    self._thread.start()
+
+    def send(self, records: Iterable[bytes]):
+        """Compress and spool records; returns once they are on disk."""
+        records = list(records)
+        if not records:
+            return
+        if self.batch:
+            payloads = pack_payloads(records, self.max_payload_bytes)
+        else:
+            # One record per payload, so a retry never posts a record twice.
+            payloads = [[record] for record in records]
+        bodies = [build_body(payload) for payload in payloads]
+        self.spool.append(bodies)
+        self._ensure_thread()
+        self._wakeup.set()
+
+    def _run(self):
+        # Payloads left over from a previous run are picked up straight away.
+        while not self._stopped.is_set():
+            wait = self.flush_interval
+            try:
+                self.flush()
+                next_at = self.spool.next_attempt_at()
+                if next_at is not None:
+                    wait = min(wait, max(0.0, next_at - time.time()))
+            except Exception as e:
+                print(f"Span transport drain failed: {e}")
+            self._wakeup.wait(wait)
+            self._wakeup.clear()
+
+    def flush(self) -> bool:
+        """Send every payload that is due. Returns False if any of them failed."""
+        with self._send_lock:
+            while True:
+                claimed = self.spool.claim(DRAIN_BATCH, lease=self.timeout * 2)
+                if not claimed:
+                    return True
+                for payload_id, attempts, body in claimed:
+                    status = self._post(body)
+                    if status is not None and 200 <= status < 300:
+                        self.spool.ack(payload_id)
+                    elif is_retryable(status):
+                        retry_at = time.time() + backoff_delay(attempts)
+                        self.spool.retry_at(payload_id, retry_at)
+                        # The rest were leased with this one; they are due when it is
+                        # and the spool hands out nothing before then.
+                        self.spool.reschedule([other_id for other_id, _, _ in claimed if other_id > payload_id], retry_at)
+                        with self._lock:
+                            self._stats["retries"] += 1
+                        return False
+                    else:
+                        self.spool.ack(payload_id)
+                        with self._lock:
+                            self._stats["dropped_payloads"] += 1
+
+    def _request(self, body: bytes):
+        """URL, body and headers of the request that delivers a spooled payload."""
+        if self.batch:
+            return f"{self.url}/batch", body, {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        record, = read_body(body)
+        data = json.dumps({"data": record["data"]}).encode("utf-8")
+        return f"{self.url}/{record['type']}", data, {"Content-Type": "application/json"}
+
+    def _post(self, body: bytes) -> Optional[int]:
+        url, data, headers = self._request(body)
+        headers.update(self.headers())
+        try:
+            response = self._session.post(url, data=data, headers=headers, timeout=self.timeout)
+            status = response.status_code
+        except requests.RequestException:
+            status = None
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["bytes_sent"] += len(body)
+            if status is None or not 200 <= status < 300:
+                self._stats["failed_requests"] += 1
+        return status
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(self.spool.stats())
+        return stats
+
+    def shutdown(self, timeout: Optional[float] = None):
+        """Stop the drainer after one last pass; anything undelivered stays spooled."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Span transport final flush failed: {e}")
+        self._session.close()
+        self.spool.close()
@@ -2,22 +2,23 @@ import json
 import re
 from typing import List, Dict, Any
 from agensight.eval.test_case import ModelTestCase
+from agensight.tracing.trace_tree import TraceTree
 
-TOKEN_PATTERNS = [
-    r'"total_tokens":\s*(\d+)',
-    r'"completion_tokens":\s*(\d+)',
-    r'"prompt_tokens":\s*(\d+)',
-    r"'total_tokens':\s*(\d+)",
-    r"'completion_tokens':\s*(\d+)",
-    r"'prompt_tokens':\s*(\d+)"
-]
+def _content_ref(message, kind):
+    """Where to fetch the rest of a message body that was cut to a preview."""
+    if not message.get("truncated"):
+        return None
+    return {"span_id": message["span_id"], "kind": kind, "id": message["id"], "bytes": message.get("content_bytes")}
 
-def transform_trace_to_agent_view(spans, span_details_by_id):
+def transform_trace_to_agent_view(spans, span_details_by_id, tree=None):
     agents = []
-    span_map = {s["id"]: s for s in spans}
+    if tree is None:
+        tree = TraceTree.from_rows(spans)
 
     trace_input = None
     trace_output = None
+    trace_input_ref = None
+    trace_output_ref = None
 
     spans_with_tools = []
     for span_id, details in span_details_by_id.items():
@@ -29,9 +30,10 @@ def transform_trace_to_agent_view(spans, span_details_by_id):
         last_user_message = None
         for p in details.get("prompts", []):
             if p["role"] == "user":
-                last_user_message = p["content"]
+                last_user_message = p
         if last_user_message:
-            trace_input = last_user_message
+            trace_input = last_user_message["content"]
+            trace_input_ref = _content_ref(last_user_message, "prompts")
             break
 
     for s in reversed(spans):
@@ -39,6 +41,7 @@ def transform_trace_to_agent_view(spans, span_details_by_id):
         for c in details.get("completions", []):
             if c["role"] == "assistant":
                 trace_output = c["content"]
+                trace_output_ref = _content_ref(c, "completions")
                 break
         if trace_output:
             break
@@ -47,8 +50,8 @@ def transform_trace_to_agent_view(spans, span_details_by_id):
         if span["kind"] != "SpanKind.INTERNAL":
             continue
 
-        attributes = json.loads(span["attributes"])
-        children = [s for s in spans if s["parent_id"] == span["id"]]
+        attributes = tree.attributes(span["id"])
+        children = tree.children(span["id"])
         has_llm_child = any("openai.chat" in c["name"] for c in children)
         has_io = "gen_ai.normalized_input_output" in attributes
         has_tools = span["id"] in span_details_by_id and span_details_by_id[span["id"]].get("tools", [])
@@ -82,16 +85,18 @@ def transform_trace_to_agent_view(spans, span_details_by_id):
             "end_time": round(span["ended_at"], 2),
             "tools_called": tools_called.copy(),
             "final_completion": None,
+            "final_completion_ref": None,
             "model_used": span.get("model_used", "unknown")
         }
 
         if span["id"] in span_details_by_id and "completions" in span_details_by_id[span["id"]]:
             for comp in span_details_by_id[span["id"]]["completions"]:
                 agent["final_completion"] = comp.get("content")
+                agent["final_completion_ref"] = _content_ref(comp, "completions")
                 break
 
         for child in children:
-            child_attrs = json.loads(child["attributes"])
+            child_attrs = tree.attributes(child["id"])
 
             for i in range(5):
                 tool_name = child_attrs.get(f"gen_ai.completion.0.tool_calls.{i}.name")
@@ -127,61 +132,35 @@ def transform_trace_to_agent_view(spans, span_details_by_id):
                 for comp in span_details_by_id[child["id"]]["completions"]:
                     if agent["final_completion"] is None:
                         agent["final_completion"] = comp.get("content")
+                        agent["final_completion_ref"] = _content_ref(comp, "completions")
 
         agents.append(agent)
 
     return {
         "trace_input": trace_input,
         "trace_output": trace_output,
+        "trace_input_ref": trace_input_ref,
+        "trace_output_ref": trace_output_ref,
         "agents": agents
     }
 
 def ns_to_seconds(nanoseconds: int) -> float:
     return nanoseconds / 1e9
 
-def extract_token_counts_from_attrs(attrs, span_id, span_name):
-    tokens = {
-        "total": attrs.get("llm.usage.total_tokens") or attrs.get("gen_ai.usage.total_tokens"),
-        "prompt": attrs.get("gen_ai.usage.prompt_tokens"),
-        "completion": attrs.get("gen_ai.usage.completion_tokens")
-    }
+# Attributes that carry usage directly, in order of preference.
+_USAGE_KEYS = {
+    "total": ("llm.usage.total_tokens", "gen_ai.usage.total_tokens"),
+    "prompt": ("gen_ai.usage.prompt_tokens", "gen_ai.usage.input_tokens", "llm.usage.prompt_tokens"),
+    "completion": ("gen_ai.usage.completion_tokens", "gen_ai.usage.output_tokens", "llm.usage.completion_tokens"),
+}
 
-    for key, value in attrs.items():
-        if isinstance(value, (int, float)) and 'token' in key.lower():
-            if 'prompt' in key and tokens["prompt"] is None:
-                tokens["prompt"] = value
-            elif 'compl' in key and tokens["completion"] is None:
-                tokens["completion"] = value
-            elif 'total' in key and tokens["total"] is None:
-                tokens["total"] = value
+# Only attributes whose key contains one of these are searched for embedded
+# usage JSON. Prompt text is never scanned.
+_USAGE_PAYLOAD_HINTS = ("usage", "response", "completion", "output", "result")
 
-    for key, value in attrs.items():
-        if isinstance(value, str):
-            try:
-                parsed = json.loads(value) if '{' in value or '[' in value else None
-                if isinstance(parsed, dict):
-                    for k, v in parsed.items():
-                        if 'token' in k.lower() and isinstance(v, (int, float)):
-                            if 'prompt' in k.lower() and tokens["prompt"] is None:
-                                tokens["prompt"] = v
-                            elif 'compl' in k.lower() and tokens["completion"] is None:
-                                tokens["completion"] = v
-                            elif 'total' in k.lower() and tokens["total"] is None:
-                                tokens["total"] = v
-            except Exception:
-                pass
-
-            for pattern in TOKEN_PATTERNS:
-                match = re.search(pattern, value)
-                if match:
-                    val = int(match.group(1))
-                    if 'prompt' in pattern and tokens["prompt"] is None:
-                        tokens["prompt"] = val
-                    elif 'compl' in pattern and tokens["completion"] is None:
-                        tokens["completion"] = val
-                    elif 'total' in pattern and tokens["total"] is None:
-                        tokens["total"] = val
+TOKEN_PATTERN = re.compile(r"""["'](total|prompt|completion)_tokens["']\s*:\s*(\d+)""")
 
+def _fill_missing_total(tokens):
     if tokens["total"] is None and tokens["prompt"] is not None and tokens["completion"] is not None:
         tokens["total"] = tokens["prompt"] + tokens["completion"]
     elif tokens["prompt"] is None and tokens["total"] is not None and tokens["completion"] is not None:
@@ -189,6 +168,52 @@ def extract_token_counts_from_attrs(attrs, span_id, span_name):
     elif tokens["completion"] is None and tokens["total"] is not None and tokens["prompt"] is not None:
         tokens["completion"] = tokens["total"] - tokens["prompt"]
 
+def _complete(tokens):
+    return tokens["total"] is not None and tokens["prompt"] is not None and tokens["completion"] is not None
+
+def extract_token_counts_from_attrs(attrs, span_id=None, span_name=None):
+    """
+    Return ``{"total", "prompt", "completion"}`` token counts for a span.
+
+    Lookups go from cheapest to most expensive and stop as soon as all three
+    counts are known: well-known usage keys, then numeric ``*token*``
+    attributes, then a regex scan of a few response-like string attributes.
+    A missing count is derived from the other two.
+    """
+    tokens = {kind: None for kind in _USAGE_KEYS}
+    for kind, keys in _USAGE_KEYS.items():
+        for key in keys:
+            value = attrs.get(key)
+            if value is not None:
+                tokens[kind] = value
+                break
+    if _complete(tokens):
+        return tokens
+
+    candidates = []
+    for key, value in attrs.items():
+        if isinstance(value, str):
+            if any(hint in key for hint in _USAGE_PAYLOAD_HINTS) and "_tokens" in value:
+                candidates.append(value)
+        elif isinstance(value, (int, float)) and 'token' in key.lower():
+            if 'prompt' in key and tokens["prompt"] is None:
+                tokens["prompt"] = value
+            elif 'compl' in key and tokens["completion"] is None:
+                tokens["completion"] = value
+            elif 'total' in key and tokens["total"] is None:
+                tokens["total"] = value
+
+    for value in candidates:
+        if _complete(tokens):
+            break
+        for match in TOKEN_PATTERN.finditer(value):
+            kind = match.group(1)
+            if tokens[kind] is None:
+                tokens[kind] = int(match.group(2))
+                if _complete(tokens):
+                    break
+
+    _fill_missing_total(tokens)
     return tokens
 
 def _make_io_from_openai_attrs(attrs, span_id, span_name):
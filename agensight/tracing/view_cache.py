@@ -0,0 +1,121 @@
+"""
+Validators and an in-process cache for rendered per-trace API views.
+
+A trace view only changes when spans of that trace are written or deleted,
+so ``trace_version`` reads its span count, the rowid of the last span
+written and whether the trace row has ended, all from the
+``(trace_id, started_at)`` index. ``make_etag`` turns that into a strong
+ETag. This holds when the exporter runs in another process.
+
+``view_cache`` keeps rendered bodies of completed traces in LRU order up to
+``AGENSIGHT_VIEW_CACHE_BYTES``. Entries are only served while their ETag
+still matches. ``DBSpanExporter`` and retention drop a trace's entries as
+soon as they write to it, so stale bodies do not hold memory.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, NamedTuple, Optional, Set, Tuple
+
+VIEW_CACHE_BYTES = int(os.getenv("AGENSIGHT_VIEW_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+# Bump when a cached view's format changes, so clients holding an old body
+# refetch it.
+VIEW_FORMAT = 2
+
+
+class TraceVersion(NamedTuple):
+    completed: bool
+    span_count: int
+    last_rowid: Optional[int]
+
+
+def trace_version(conn: sqlite3.Connection, trace_id: str) -> TraceVersion:
+    row = conn.execute('''
+        SELECT (SELECT ended_at IS NOT NULL FROM traces WHERE id = ?), COUNT(*), MAX(rowid)
+        FROM spans WHERE trace_id = ?
+    ''', (trace_id, trace_id)).fetchone()
+    return TraceVersion(bool(row[0]), row[1], row[2])
+
+
+def make_etag(view: str, key: str, version: TraceVersion) -> str:
+    """Strong ETag (quoted) for ``view`` of ``key`` at ``version``."""
+    raw = f"{VIEW_FORMAT}|{view}|{key}|{int(version.completed)}|{version.span_count}|{version.last_rowid}"
+    return '"' + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+class _Entry(NamedTuple):
+    trace_id: str
+    etag: str
+    body: bytes
+
+
+class ViewCache:
+    """Rendered bodies by key, evicted least recently used first past ``max_bytes``."""
+
+    def __init__(self, max_bytes: int = VIEW_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._keys_by_trace: Dict[str, Set[Hashable]] = {}
+        self._bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key: Hashable, etag: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.etag != etag:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry.body
+
+    def put(self, key: Hashable, trace_id: str, etag: str, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = _Entry(trace_id, etag, body)
+            self._keys_by_trace.setdefault(trace_id, set()).add(key)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def invalidate_traces(self, trace_ids: Iterable[str]):
+        """Drop every entry rendered from any of ``trace_ids``."""
+        with self._lock:
+            if not self._entries:
+                return
+            for trace_id in trace_ids:
+                for key in list(self._keys_by_trace.get(trace_id, ())):
+                    self._remove(key)
+                    self.stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_trace.clear()
+            self._bytes = 0
+
+    def size(self) -> Tuple[int, int]:
+        """(entry count, body bytes)."""
+        with self._lock:
+            return len(self._entries), self._bytes
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= len(entry.body)
+        keys = self._keys_by_trace.get(entry.trace_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_trace[entry.trace_id]
+
+
+view_cache = ViewCache()
@@ -0,0 +1,102 @@
+"""
+Minimal DDSketch: a mergeable quantile sketch with relative-error guarantees.
+
+Values are counted in logarithmic buckets ``ceil(log_gamma(x))`` with
+``gamma = (1 + a) / (1 - a)``, so any quantile is returned within a relative
+error ``a`` of the true value. Two sketches with the same accuracy merge by
+adding bucket counts, which makes them suitable for pre-aggregating per
+time bucket and combining at query time. See Masson et al., "DDSketch: A
+fast and fully-mergeable quantile sketch with relative-error guarantees"
+(VLDB 2019).
+"""
+import json
+import math
+from typing import Dict, Optional
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+# Values at or below this are counted as zero (durations and token counts
+# are never negative).
+MIN_INDEXABLE_VALUE = 1e-9
+
+
+class DDSketch:
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, value: float, count: int = 1):
+        if value is None or count <= 0:
+            return
+        value = float(value)
+        if value <= MIN_INDEXABLE_VALUE:
+            self.zero_count += count
+        else:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.count += count
+        self.sum += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "DDSketch"):
+        if other.count == 0:
+            return
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("cannot merge sketches with different accuracies")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Value at quantile ``q`` (0..1), or None if the sketch is empty."""
+        if self.count == 0 or not 0 <= q <= 1:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                # Midpoint of the bucket (gamma^(key-1), gamma^key] in relative terms.
+                value = 2 * self.gamma ** key / (1 + self.gamma)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "a": self.relative_accuracy,
+            "z": self.zero_count,
+            "n": self.count,
+            "s": self.sum,
+            "lo": self.min,
+            "hi": self.max,
+            "b": {str(key): count for key, count in self.bins.items()},
+        }, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str) -> "DDSketch":
+        raw = json.loads(data)
+        sketch = cls(raw["a"])
+        sketch.zero_count = raw["z"]
+        sketch.count = raw["n"]
+        sketch.sum = raw["s"]
+        sketch.min = raw["lo"]
+        sketch.max = raw["hi"]
+        sketch.bins = {int(key): count for key, count in raw["b"].items()}
+        return sketch
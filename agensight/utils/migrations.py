@@ -0,0 +1,62 @@
+"""
+Versioned schema migrations for the local SQLite stores.
+
+A migration is a ``(version, description, steps)`` tuple where ``steps`` is a
+sequence of SQL statements or a callable taking the connection. Applied
+versions are recorded in a ``schema_version`` table, so every migration runs
+exactly once per database file and existing installs upgrade in place.
+"""
+import sqlite3
+import time
+from typing import Callable, Sequence, Tuple, Union
+
+Migration = Tuple[int, str, Union[Sequence[str], Callable[[sqlite3.Connection], None]]]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, description TEXT, applied_at REAL)"
+    )
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def run_migrations(conn: sqlite3.Connection, migrations: Sequence[Migration]) -> int:
+    """
+    Apply every migration newer than the database's current version.
+
+    Each migration runs in its own ``BEGIN IMMEDIATE`` transaction, which also
+    keeps two processes from applying the same migration concurrently.
+
+    Returns:
+        int: The schema version after migrating.
+    """
+    if conn.in_transaction:
+        conn.commit()
+
+    current = get_schema_version(conn)
+    for version, description, steps in sorted(migrations, key=lambda m: m[0]):
+        if version <= current:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the lock.
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            if callable(steps):
+                steps(conn)
+            else:
+                for statement in steps:
+                    conn.execute(statement)
+            conn.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, time.time())
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        current = version
+    return current
@@ -0,0 +1,175 @@
+"""
+Thread-safe SQLite connection management for the local trace and eval stores.
+
+Each database file gets one long-lived writer connection, serialised behind a
+lock, plus a small pool of reader connections that are handed out and
+returned. Every connection runs in WAL mode so readers never block the writer
+and the writer never blocks readers.
+"""
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Sequence, Union
+
+DEFAULT_POOL_SIZE = int(os.getenv("AGENSIGHT_DB_POOL_SIZE", "4"))
+DEFAULT_BUSY_TIMEOUT = float(os.getenv("AGENSIGHT_DB_BUSY_TIMEOUT", "5.0"))
+# Read-only connections per database for the dashboard API server.
+SERVER_POOL_SIZE = int(os.getenv("AGENSIGHT_SERVER_DB_POOL_SIZE", "8"))
+
+# Applied to every connection right after it is opened.
+PRAGMAS = (
+    # Only takes effect on a new database, before its first table exists;
+    # lets retention hand freed pages back to the filesystem a few at a time.
+    ("auto_vacuum", "INCREMENTAL"),
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),    # durable at checkpoints, no fsync per commit
+    ("cache_size", -16000),       # negative means KiB, so ~16 MB of page cache
+    ("mmap_size", 268435456),     # 256 MB of memory-mapped reads
+    ("temp_store", "MEMORY"),
+)
+
+
+def connect(path: Union[str, Path], timeout: float = DEFAULT_BUSY_TIMEOUT,
+            read_only: bool = False) -> sqlite3.Connection:
+    """Open a tuned connection that may be shared between threads.
+
+    A ``read_only`` connection is opened with ``mode=ro`` and ``query_only``,
+    so any write through it fails instead of taking the database write lock.
+    """
+    if read_only:
+        uri = Path(path).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, timeout=timeout, check_same_thread=False, uri=True)
+    else:
+        conn = sqlite3.connect(str(path), timeout=timeout, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    for name, value in PRAGMAS:
+        # The journal and vacuum modes are properties of the file, set by the writer.
+        if read_only and name in ("journal_mode", "auto_vacuum"):
+            continue
+        # Setting the vacuum mode takes the write lock, so a connection opened
+        # while another one writes would wait out the busy timeout for a
+        # setting that can no longer change anything.
+        if name == "auto_vacuum" and conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone():
+            continue
+        conn.execute(f"PRAGMA {name}={value}")
+    if read_only:
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+# Stay well below SQLITE_MAX_VARIABLE_NUMBER (999 on older builds).
+MAX_QUERY_PARAMS = 500
+
+
+def chunks(values: Sequence, size: int = MAX_QUERY_PARAMS) -> Iterator[Sequence]:
+    """Split ``values`` into slices small enough for one ``IN (?, ...)`` clause."""
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def placeholders(values: Sequence) -> str:
+    return ", ".join("?" * len(values))
+
+
+class SQLitePool:
+    """
+    Single writer plus a bounded pool of readers for one SQLite file.
+
+    Use ``writer()`` for anything that modifies the database; the block runs
+    in one transaction that is committed on exit and rolled back on error.
+    Use ``reader()`` for queries. A ``read_only`` pool has no writer and
+    hands out read-only connections.
+    """
+
+    def __init__(self, path: Union[str, Path], size: int = DEFAULT_POOL_SIZE,
+                 timeout: float = DEFAULT_BUSY_TIMEOUT, read_only: bool = False):
+        self.path = Path(path)
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.read_only = read_only
+        self._write_lock = threading.RLock()
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+
+    def _check_fork(self):
+        # Connections must not cross a fork; the child starts with a fresh pool.
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        if self.read_only:
+            raise sqlite3.OperationalError(f"{self.path} is opened read-only")
+        with self._write_lock:
+            self._check_fork()
+            if self._writer is None:
+                self._writer = connect(self.path, self.timeout)
+            conn = self._writer
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def _acquire(self) -> sqlite3.Connection:
+        self._check_fork()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if not can_create:
+            try:
+                return self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise sqlite3.OperationalError(f"no free connection to {self.path} after {self.timeout}s")
+
+        try:
+            return connect(self.path, self.timeout, self.read_only)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def close(self):
+        """Close every connection owned by this pool."""
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._created = 0
@@ -0,0 +1,46 @@
+"""
+Ingest throughput of ``DBSpanExporter.export``.
+
+    python benchmarks/bench_exporter_db.py --batches 20 --batch-size 512
+
+Reports spans/sec for repeated 512-span batches written to a temporary
+``traces.db``.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import make_spans, use_temp_trace_db  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--prompt-chars", type=int, default=2000)
+    args = parser.parse_args()
+
+    path = use_temp_trace_db()
+    from agensight.tracing.exporter_db import DBSpanExporter
+
+    exporter = DBSpanExporter()
+    batches = [make_spans(args.batch_size, prompt_chars=args.prompt_chars, seed=i) for i in range(args.batches)]
+
+    exporter.export(batches[0])  # warm-up
+    started = time.perf_counter()
+    for batch in batches[1:]:
+        exporter.export(batch)
+    elapsed = time.perf_counter() - started
+
+    n = args.batch_size * (args.batches - 1)
+    print(f"db: {path}")
+    print(f"{n} spans in {elapsed:.3f}s -> {n / elapsed:,.0f} spans/sec "
+          f"({elapsed / (args.batches - 1) * 1000:.1f} ms per {args.batch_size}-span batch)")
+
+
+if __name__ == "__main__":
+    main()
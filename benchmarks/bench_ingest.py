@@ -0,0 +1,104 @@
+"""
+Multi-process write throughput: every process exporting to ``traces.db``
+itself versus all of them sending to the ingest daemon.
+
+    python benchmarks/bench_ingest.py --processes 16 --batches 20 --batch-size 64
+
+Each worker exports ``--batches`` batches. In ``direct`` mode every worker
+has its own ``DBSpanExporter`` and the workers contend for the SQLite write
+lock; in ``daemon`` mode they use ``IngestSpanExporter`` and one
+``IngestDaemon`` writes everything. Reports spans stored per second, the
+slowest single ``export()`` call and how many exports failed.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import make_spans, use_temp_trace_db  # noqa: E402
+
+
+def worker(mode, db_path, socket_path, worker_no, batches, batch_size, barrier, results):
+    use_temp_trace_db(db_path)
+    if mode == "direct":
+        from agensight.tracing.exporter_db import DBSpanExporter
+        exporter = DBSpanExporter()
+    else:
+        from agensight.tracing.ingest import IngestSpanExporter
+        exporter = IngestSpanExporter(socket_path)
+    # Seeds must differ between workers so that span ids do.
+    work = [make_spans(batch_size, prompt_chars=500, seed=worker_no * 100000 + i) for i in range(batches)]
+    failures = 0
+    slowest = 0.0
+    # Start exporting together, once every worker has its spans ready.
+    barrier.wait()
+    for batch in work:
+        started = time.perf_counter()
+        try:
+            exporter.export(batch)
+        except Exception:
+            failures += 1
+        slowest = max(slowest, time.perf_counter() - started)
+    results.put((failures, slowest))
+
+
+def run(mode, args):
+    db_path = use_temp_trace_db()
+    socket_path = os.path.join(tempfile.mkdtemp(prefix="agensight-ingest-"), "ingest.sock")
+    daemon = None
+    if mode == "daemon":
+        import threading
+        from agensight.tracing.ingest import IngestDaemon
+        from agensight.tracing.otlp import SpanIngestor
+        from agensight.tracing.exporter_db import DBSpanExporter
+        daemon = IngestDaemon(socket_path, ingestor=SpanIngestor(DBSpanExporter()))
+        threading.Thread(target=daemon.serve_forever, daemon=True).start()
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    barrier = context.Barrier(args.processes + 1)
+    procs = [
+        context.Process(target=worker,
+                        args=(mode, str(db_path), socket_path, n, args.batches, args.batch_size, barrier, results))
+        for n in range(args.processes)
+    ]
+    for proc in procs:
+        proc.start()
+    barrier.wait()
+    started = time.perf_counter()
+    outcomes = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    if daemon is not None:
+        daemon.ingestor.flush()
+    elapsed = time.perf_counter() - started
+    if daemon is not None:
+        daemon.shutdown()
+
+    import agensight.tracing.db as tdb
+    with tdb.reader() as conn:
+        stored = conn.execute("SELECT COUNT(*) FROM spans").fetchone()[0]
+    failures = sum(f for f, _ in outcomes)
+    slowest = max(s for _, s in outcomes)
+    print(f"{mode:>6}: {stored} spans stored in {elapsed:.1f} s ({stored / elapsed:,.0f} spans/s), "
+          f"slowest export {slowest * 1000:.0f} ms, {failures} failed exports")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--batches", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--mode", choices=("direct", "daemon", "both"), default="both")
+    args = parser.parse_args()
+    for mode in ("direct", "daemon") if args.mode == "both" else (args.mode,):
+        run(mode, args)
+
+
+if __name__ == "__main__":
+    main()
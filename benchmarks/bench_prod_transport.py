@@ -0,0 +1,61 @@
+"""
+Network cost of ``ProdSpanExporter`` against the local collector stand-in.
+
+    python benchmarks/bench_prod_transport.py --batches 5 --batch-size 128
+
+Reports HTTP requests, bytes on the wire and time spent inside ``export()``.
+``--per-record`` posts each record to its own endpoint, the default until
+``AGENSIGHT_EXPORT_BATCH`` is set, instead of batching.
+With ``--fail-requests N`` the collector rejects the first N requests and the
+run only finishes once the spool has delivered everything.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from collector import start_collector  # noqa: E402
+from synthetic import make_spans  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batches", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--prompt-chars", type=int, default=2000)
+    parser.add_argument("--fail-requests", type=int, default=0,
+                        help="answer the first N requests with 503 to simulate an outage")
+    parser.add_argument("--per-record", action="store_true", help="one request per record instead of batches")
+    args = parser.parse_args()
+
+    server, collector, url = start_collector(fail_requests=args.fail_requests)
+    import agensight.tracing.exporter_prod as exporter_prod
+    exporter_prod.BASE_URL = url
+
+    from agensight.tracing.transport import BatchTransport
+    exporter = exporter_prod.ProdSpanExporter(BatchTransport(url, batch=not args.per_record))
+    batches = [make_spans(args.batch_size, prompt_chars=args.prompt_chars, seed=i) for i in range(args.batches)]
+
+    started = time.perf_counter()
+    for batch in batches:
+        exporter.export(batch)
+    export_seconds = time.perf_counter() - started
+    while not exporter.force_flush() or exporter.transport.stats()["spooled"]:
+        time.sleep(0.05)
+    total_seconds = time.perf_counter() - started
+    exporter.shutdown()
+    server.shutdown()
+
+    stats = collector.stats()
+    n = args.batches * args.batch_size
+    print(f"{n} spans: {stats['requests']} requests, {stats['bytes_wire']:,} bytes on the wire "
+          f"({stats['bytes_raw']:,} uncompressed), {stats['records']} records delivered, "
+          f"{stats['rejected']} requests rejected")
+    print(f"export() {export_seconds * 1000:.0f} ms, export + flush {total_seconds * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Size and serialization cost of large API responses.
+
+    python benchmarks/bench_responses.py --spans 20000
+
+Stores one large trace, then requests
+``/api/traces/{id}/spans`` and ``/api/span/{root}/subtree`` through the app
+with each ``Accept-Encoding`` and reports body size and request time. It
+also times rendering the structured trace with the stdlib encoder and with
+the API's own response class.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import make_trace, use_temp_trace_db  # noqa: E402
+
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--spans", type=int, default=20000)
+    parser.add_argument("--prompt-chars", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    use_temp_trace_db()
+    from agensight.tracing.exporter_db import DBSpanExporter
+    DBSpanExporter().export(make_trace(args.spans, prompt_chars=args.prompt_chars))
+
+    from fastapi.responses import JSONResponse
+    from fastapi.testclient import TestClient
+    from agensight._server.app import app
+    import agensight.tracing.db as tdb
+    from agensight.tracing.view_cache import view_cache
+
+    with tdb.reader() as conn:
+        root = conn.execute("SELECT id FROM spans WHERE parent_id IS NULL").fetchone()[0]
+    # Measure encoding every time rather than serving repeats from the cache.
+    view_cache.max_bytes = 0
+    client = TestClient(app)
+    for path in ("/api/traces/trace-0/spans", f"/api/span/{root}/subtree"):
+        for encoding in ("identity", "gzip", "br"):
+            response, seconds = timed(lambda: client.get(path, headers={"Accept-Encoding": encoding}), args.repeat)
+            wire = response.num_bytes_downloaded
+            print(f"{path.split('/')[-1]:>8} {encoding:>8}: {int(wire) / 1e6:6.2f} MB on the wire "
+                  f"({response.headers.get('content-encoding', 'identity')}), {seconds * 1000:6.1f} ms per request")
+
+    structured = client.get("/api/traces/trace-0/spans", headers={"Accept-Encoding": "identity"}).json()
+    _, stdlib = timed(lambda: JSONResponse(structured), args.repeat)
+    print(f"render with JSONResponse: {stdlib * 1000:.1f} ms")
+    try:
+        from agensight._server.utils.responses import FastJSONResponse
+    except ImportError:
+        return
+    _, fast = timed(lambda: FastJSONResponse(structured), args.repeat)
+    print(f"render with FastJSONResponse: {fast * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Full-text search latency against a ``LIKE`` scan of the message tables.
+
+    python benchmarks/bench_search.py --messages 1000000
+
+Fills ``prompts`` with random sentences (the FTS5 triggers index them on
+insert), plants one rare word, then times ``search_messages`` for the rare
+word and for common words next to ``content LIKE '%word%'``.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import use_temp_trace_db  # noqa: E402
+
+WORDS = (
+    "agent tool call weather booking refund invoice flight hotel paris london error timeout retry "
+    "summary context answer question user system model token latency cache database query result"
+).split()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--words", type=int, default=60, help="words per message")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    use_temp_trace_db()
+    import agensight.tracing.db as tdb
+    from agensight.tracing.search import match_expression, search_messages
+
+    rng = random.Random(0)
+    rare = args.messages // 2
+    rows = (
+        (f"span-{i // 4}", "user", " ".join(rng.choice(WORDS) for _ in range(args.words)) + (" zanzibar" if i == rare else ""), i % 4)
+        for i in range(args.messages)
+    )
+    started = time.perf_counter()
+    with tdb.writer() as conn:
+        conn.executemany("INSERT INTO prompts (span_id, role, content, message_index) VALUES (?, ?, ?, ?)", rows)
+    print(f"inserted and indexed {args.messages} messages in {time.perf_counter() - started:.1f} s")
+
+    with tdb.reader() as conn:
+        for text in ("zanzibar", "refund invoice", "weather"):
+            query = match_expression(text)
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                search_messages(conn, query, limit=20)
+            fts = (time.perf_counter() - started) / args.repeat
+            started = time.perf_counter()
+            conn.execute(
+                "SELECT id FROM prompts WHERE " + " AND ".join("content LIKE ?" for _ in text.split()) + " LIMIT 20",
+                [f"%{word}%" for word in text.split()]
+            ).fetchall()
+            like = time.perf_counter() - started
+            print(f"{text!r}: search {fts * 1000:.1f} ms, LIKE {like * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
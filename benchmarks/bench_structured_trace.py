@@ -0,0 +1,80 @@
+"""
+Latency and SQLite statement count of the trace page endpoints.
+
+    python benchmarks/bench_structured_trace.py --spans 1000
+
+Writes one synthetic trace through ``DBSpanExporter``, then times building
+the ``GET /traces/{id}/spans`` and ``GET /span/{id}/details`` bodies and
+counts the SQL statements each one runs. Both endpoints are then requested
+through the app cold, from the view cache, and revalidated with
+``If-None-Match``.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import make_trace, use_temp_trace_db  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--spans", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    use_temp_trace_db()
+    import agensight.tracing.db as tdb
+    from agensight.tracing.exporter_db import DBSpanExporter
+    import agensight._server.routes.trace as routes
+
+    spans = make_trace(args.spans)
+    DBSpanExporter().export(spans)
+    trace_id = spans[-1].attributes["trace_id"]
+    step_id = format(spans[-2].get_span_context().span_id, "016x")
+
+    statements = []
+    conn = tdb.get_db()
+    conn.set_trace_callback(statements.append)
+
+    step = dict(conn.execute("SELECT rowid, * FROM spans WHERE id = ?", (step_id,)).fetchone())
+    for label, call in (
+        (f"/traces/{trace_id}/spans", lambda: routes._structured_trace(conn, trace_id)),
+        (f"/span/{step_id}/details", lambda: routes._span_details(conn, step)),
+    ):
+        call()  # warm-up
+        statements.clear()
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            call()
+        elapsed = (time.perf_counter() - started) / args.repeat
+        print(f"GET {label}: {elapsed * 1000:.1f} ms, {len(statements) // args.repeat} SQL statements")
+
+    from fastapi.testclient import TestClient
+    from agensight._server.app import app
+    from agensight.tracing.view_cache import view_cache
+
+    client = TestClient(app)
+    headers = {"Accept-Encoding": "identity"}
+    for path in (f"/api/traces/{trace_id}/spans", f"/api/span/{step_id}/details"):
+        view_cache.clear()
+        started = time.perf_counter()
+        etag = client.get(path, headers=headers).headers["etag"]
+        cold = time.perf_counter() - started
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            client.get(path, headers=headers)
+        cached = (time.perf_counter() - started) / args.repeat
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            status = client.get(path, headers=dict(headers, **{"If-None-Match": etag})).status_code
+        revalidated = (time.perf_counter() - started) / args.repeat
+        print(f"GET {path}: cold {cold * 1000:.1f} ms, cached {cached * 1000:.1f} ms, "
+              f"If-None-Match {revalidated * 1000:.1f} ms ({status})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Per-span cost of ``extract_token_counts_from_attrs``.
+
+    python benchmarks/bench_token_usage.py --prompt-chars 20000
+
+Runs the extractor over OpenAI and Anthropic style attribute sets: one with
+usage in the standard ``gen_ai.usage.*`` keys, and one where usage is only
+present inside a raw response payload.
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import anthropic_attrs, openai_attrs  # noqa: E402
+
+
+def usage_in_payload_only(attrs):
+    attrs = {k: v for k, v in attrs.items() if "usage" not in k}
+    attrs["gen_ai.response.body"] = json.dumps({
+        "id": "resp_1",
+        "choices": [{"message": {"content": attrs.get("gen_ai.completion.0.content", "")}}],
+        "usage": {"prompt_tokens": 1200, "completion_tokens": 85, "total_tokens": 1285},
+    })
+    return attrs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prompt-chars", type=int, default=20000)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    from agensight.tracing.utils import extract_token_counts_from_attrs
+
+    cases = {
+        "openai": openai_attrs(args.prompt_chars, tool_calls=2),
+        "anthropic": anthropic_attrs(args.prompt_chars),
+        "openai, usage in payload": usage_in_payload_only(openai_attrs(args.prompt_chars, tool_calls=2)),
+        "anthropic, usage in payload": usage_in_payload_only(anthropic_attrs(args.prompt_chars)),
+    }
+    for label, attrs in cases.items():
+        seconds = timeit.timeit(lambda: extract_token_counts_from_attrs(attrs, "span", "openai.chat"),
+                                number=args.number)
+        result = extract_token_counts_from_attrs(attrs, "span", "openai.chat")
+        print(f"{label:<30} {seconds / args.number * 1e6:9.1f} us/span  {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Local stand-in for the remote log ingestion API.
+
+Accepts POSTs on any path (gzip or plain JSON), answers 200, and counts
+requests, wire bytes, decompressed bytes and accepted records. With
+``fail_requests=N`` the first N requests get a 503 instead. Run it on its own::
+
+    python benchmarks/collector.py --port 4318
+
+and point the SDK at it with ``AGENSIGHT_LOGS_URL=http://127.0.0.1:4318``,
+or use ``start_collector()`` from a script.
+"""
+import argparse
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Collector:
+    def __init__(self, fail_requests=0):
+        self.lock = threading.Lock()
+        self.fail_requests = fail_requests
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.bytes_wire = 0
+        self.bytes_raw = 0
+        self.records = 0
+        self.rejected = 0
+        self.paths = {}
+        self.bodies = []
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "bytes_wire": self.bytes_wire,
+                "bytes_raw": self.bytes_raw,
+                "records": self.records,
+                "rejected": self.rejected,
+                "paths": dict(self.paths),
+            }
+
+
+def _handler(collector):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            raw = gzip.decompress(body) if self.headers.get("Content-Encoding") == "gzip" else body
+            try:
+                parsed = json.loads(raw)
+            except ValueError:
+                parsed = {}
+            with collector.lock:
+                collector.requests += 1
+                collector.bytes_wire += len(body)
+                collector.bytes_raw += len(raw)
+                collector.paths[self.path] = collector.paths.get(self.path, 0) + 1
+                failing = collector.fail_requests > 0
+                if failing:
+                    collector.fail_requests -= 1
+                    collector.rejected += 1
+                else:
+                    collector.records += len(parsed.get("records", [])) if "records" in parsed else 1
+                    collector.bodies.append(parsed)
+            self.send_response(503 if failing else 200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start_collector(port=0, fail_requests=0):
+    """Start a collector on a background thread. Returns (server, collector, base_url)."""
+    collector = Collector(fail_requests)
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(collector))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, collector, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=4318)
+    args = parser.parse_args()
+    server, collector, url = start_collector(args.port)
+    print(f"collecting on {url} (Ctrl-C prints totals)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print(collector.stats())
+        server.shutdown()
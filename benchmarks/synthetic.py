@@ -0,0 +1,193 @@
+"""
+Synthetic OpenTelemetry spans shaped like the ones AgenSight records.
+
+Each trace is a ``@span``-decorated agent step (INTERNAL) with a handful of
+``openai.chat`` CLIENT children carrying gen_ai prompt/completion/usage and
+tool-call attributes.
+"""
+import json
+import random
+import tempfile
+from pathlib import Path
+
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.util.instrumentation import InstrumentationScope
+from opentelemetry.trace import SpanContext, SpanKind, TraceFlags
+from opentelemetry.trace.status import Status, StatusCode
+
+LOREM = (
+    "You are a helpful assistant. Answer the question using the supplied context "
+    "and cite the relevant passages where possible. "
+)
+
+
+def _ctx(trace_id, span_id):
+    return SpanContext(trace_id=trace_id, span_id=span_id, is_remote=False,
+                       trace_flags=TraceFlags(TraceFlags.SAMPLED))
+
+
+def openai_attrs(prompt_chars=2000, tool_calls=1, rng=None):
+    rng = rng or random.Random(0)
+    prompt_tokens = rng.randint(100, 4000)
+    completion_tokens = rng.randint(10, 800)
+    attrs = {
+        "gen_ai.system": "openai",
+        "gen_ai.request.model": "gpt-4o-mini",
+        "llm.request.type": "chat",
+        "gen_ai.prompt.0.role": "system",
+        "gen_ai.prompt.0.content": (LOREM * (prompt_chars // len(LOREM) + 1))[:prompt_chars],
+        "gen_ai.prompt.1.role": "user",
+        "gen_ai.prompt.1.content": "What is the capital of France?",
+        "gen_ai.completion.0.role": "assistant",
+        "gen_ai.completion.0.content": "The capital of France is Paris.",
+        "gen_ai.completion.0.finish_reason": "stop",
+        "gen_ai.usage.prompt_tokens": prompt_tokens,
+        "gen_ai.usage.completion_tokens": completion_tokens,
+        "llm.usage.total_tokens": prompt_tokens + completion_tokens,
+    }
+    for i in range(tool_calls):
+        attrs[f"gen_ai.completion.0.tool_calls.{i}.name"] = f"tool_{i}"
+        attrs[f"gen_ai.completion.0.tool_calls.{i}.arguments"] = json.dumps({"query": "paris", "n": i})
+    return attrs
+
+
+def anthropic_attrs(prompt_chars=2000, rng=None):
+    rng = rng or random.Random(0)
+    input_tokens = rng.randint(100, 4000)
+    output_tokens = rng.randint(10, 800)
+    return {
+        "gen_ai.system": "Anthropic",
+        "gen_ai.request.model": "claude-3-5-sonnet",
+        "llm.request.type": "completion",
+        "gen_ai.prompt.0.role": "user",
+        "gen_ai.prompt.0.content": (LOREM * (prompt_chars // len(LOREM) + 1))[:prompt_chars],
+        "gen_ai.completion.0.role": "assistant",
+        "gen_ai.completion.0.content": json.dumps(
+            {"content": "Paris.", "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens}}
+        ),
+        "gen_ai.completion.0.finish_reason": "end_turn",
+        "gen_ai.usage.prompt_tokens": input_tokens,
+        "gen_ai.usage.completion_tokens": output_tokens,
+        "llm.usage.total_tokens": input_tokens + output_tokens,
+    }
+
+
+def make_spans(n_spans=512, children_per_trace=7, prompt_chars=2000, seed=0):
+    """Build ``n_spans`` finished spans grouped into agent-step traces."""
+    rng = random.Random(seed)
+    spans = []
+    t0 = 1_700_000_000 * 10**9
+    trace_no = 0
+    while len(spans) < n_spans:
+        trace_no += 1
+        trace_id = rng.getrandbits(128)
+        root_id = rng.getrandbits(64)
+        root_ctx = _ctx(trace_id, root_id)
+        start = t0 + trace_no * 10**9
+        children = []
+        for c in range(min(children_per_trace, n_spans - len(spans) - 1)):
+            span_id = rng.getrandbits(64)
+            c_start = start + c * 10**7
+            attrs = openai_attrs(prompt_chars, tool_calls=c % 3, rng=rng)
+            children.append(ReadableSpan(
+                name="openai.chat",
+                context=_ctx(trace_id, span_id),
+                parent=root_ctx,
+                attributes=attrs,
+                kind=SpanKind.CLIENT,
+                start_time=c_start,
+                end_time=c_start + 9 * 10**6,
+                status=Status(StatusCode.OK),
+                instrumentation_scope=InstrumentationScope("opentelemetry.instrumentation.openai.v1"),
+            ))
+        root_attrs = {
+            "trace_id": f"trace-{seed}-{trace_no}",
+            "trace.name": "agent_run",
+            "session.id": f"session-{seed}",
+            "gen_ai.normalized_input_output": json.dumps({
+                "prompts": [{"role": "user", "content": "What is the capital of France?"}],
+                "completions": [{"role": "assistant", "content": "Paris."}],
+            }),
+        }
+        root = ReadableSpan(
+            name=f"agent_step_{trace_no % 5}",
+            context=root_ctx,
+            parent=None,
+            attributes=root_attrs,
+            kind=SpanKind.INTERNAL,
+            start_time=start,
+            end_time=start + (len(children) + 1) * 10**7,
+            status=Status(StatusCode.OK),
+            instrumentation_scope=InstrumentationScope("default"),
+        )
+        # Children end before their parent, which is the order the SDK exports in.
+        spans.extend(children)
+        spans.append(root)
+    return spans[:n_spans]
+
+
+def make_trace(n_spans=1000, children_per_step=3, prompt_chars=500, seed=0):
+    """One trace of ``n_spans`` spans: a root, INTERNAL agent steps below it
+    and ``openai.chat`` calls below each step."""
+    rng = random.Random(seed)
+    trace_id = rng.getrandbits(128)
+    root_ctx = _ctx(trace_id, rng.getrandbits(64))
+    start = 1_700_000_000 * 10**9
+    spans = []
+    step_no = 0
+    while len(spans) < n_spans - 1:
+        step_no += 1
+        step_ctx = _ctx(trace_id, rng.getrandbits(64))
+        step_start = start + step_no * 10**8
+        n_children = min(children_per_step, n_spans - len(spans) - 2)
+        for c in range(n_children):
+            c_start = step_start + c * 10**7
+            spans.append(ReadableSpan(
+                name="openai.chat",
+                context=_ctx(trace_id, rng.getrandbits(64)),
+                parent=step_ctx,
+                attributes=openai_attrs(prompt_chars, tool_calls=c % 3, rng=rng),
+                kind=SpanKind.CLIENT,
+                start_time=c_start,
+                end_time=c_start + 9 * 10**6,
+                status=Status(StatusCode.OK),
+                instrumentation_scope=InstrumentationScope("opentelemetry.instrumentation.openai.v1"),
+            ))
+        spans.append(ReadableSpan(
+            name=f"agent_step_{step_no % 5}",
+            context=step_ctx,
+            parent=root_ctx,
+            attributes={"trace_id": f"trace-{seed}", "agent.name": f"agent_{step_no % 5}"},
+            kind=SpanKind.INTERNAL,
+            start_time=step_start,
+            end_time=step_start + (n_children + 1) * 10**7,
+            status=Status(StatusCode.OK),
+            instrumentation_scope=InstrumentationScope("default"),
+        ))
+    spans.append(ReadableSpan(
+        name="agent_run",
+        context=root_ctx,
+        parent=None,
+        attributes={"trace_id": f"trace-{seed}", "trace.name": "agent_run", "session.id": f"session-{seed}"},
+        kind=SpanKind.INTERNAL,
+        start_time=start,
+        end_time=start + (step_no + 1) * 10**8,
+        status=Status(StatusCode.OK),
+        instrumentation_scope=InstrumentationScope("default"),
+    ))
+    return spans
+
+
+def use_temp_trace_db(path=None):
+    """Point ``agensight.tracing.db`` at ``path`` (default a fresh file) and create the schema."""
+    import agensight.tracing.db as tdb
+
+    path = Path(path) if path else Path(tempfile.mkdtemp(prefix="agensight-bench-")) / "traces.db"
+    tdb.DB_FILE = path
+    if hasattr(tdb, "_pool"):
+        from agensight.utils.sqlite_pool import SQLitePool
+        tdb._pool = SQLitePool(path)
+    if hasattr(tdb, "_read_only_pool"):
+        tdb._read_only_pool = SQLitePool(path, size=tdb._read_only_pool.size, read_only=True)
+    tdb.init_schema()
+    return path
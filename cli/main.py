@@ -5,16 +5,104 @@ import webbrowser
 from agensight._server.app import start_server
 
 
+def prune(args):
+    from agensight.tracing import retention
+
+    if args.vacuum:
+        import agensight.eval.storage.db as eval_storage
+        import agensight.tracing.db as trace_storage
+        retention.vacuum(trace_storage.writer)
+        retention.vacuum(eval_storage.writer)
+    policy = retention.RetentionPolicy(
+        max_age_days=args.days if args.days is not None else retention.RETENTION_DAYS,
+        max_traces=args.max_traces if args.max_traces is not None else retention.RETENTION_MAX_TRACES,
+        max_bytes=args.max_bytes if args.max_bytes is not None else retention.RETENTION_MAX_BYTES,
+        archive_dir=args.archive_dir or retention.ARCHIVE_DIR,
+    )
+    if not policy.enabled:
+        print("No retention limit given; set --days, --max-traces or --max-bytes (or AGENSIGHT_RETENTION_*)")
+        return
+    totals = retention.prune(policy)
+    print(f"Removed {totals['traces']} traces, {totals['spans']} spans and {totals['evaluations']} evaluations; "
+          f"freed {totals['freed_pages']} pages")
+
+
+def _timestamp(value):
+    """Unix time from a number or an ISO 8601 date/time (UTC unless it has an offset)."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    from datetime import datetime, timezone
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a Unix time or an ISO 8601 date, got {value!r}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def export(args):
+    from agensight.tracing.columnar_export import EXPORT_TABLES, export_dataset
+
+    counts = export_dataset(
+        args.out_dir,
+        fmt=args.format,
+        since=args.since,
+        until=args.until,
+        tables=args.tables.split(",") if args.tables else EXPORT_TABLES,
+        partition_by_day=not args.no_partition,
+        include_attributes=not args.no_attributes,
+        overwrite=args.overwrite,
+    )
+    for table, rows in counts.items():
+        print(f"{table}: {rows} rows")
+
+
+def ingest(args):
+    from agensight.tracing.ingest import INGEST_SOCKET, run_daemon
+
+    run_daemon(args.socket or INGEST_SOCKET)
+
+
 def main():
-    print("Starting agensight server...")
     parser = argparse.ArgumentParser(prog="agensight")
     subparsers = parser.add_subparsers(dest="command")
 
     view_parser = subparsers.add_parser("view", help="View the agensight project")
 
+    prune_parser = subparsers.add_parser("prune", help="Delete traces beyond the retention limits")
+    prune_parser.add_argument("--days", type=float, help="Keep traces started within this many days")
+    prune_parser.add_argument("--max-traces", type=int, help="Keep at most this many traces")
+    prune_parser.add_argument("--max-bytes", type=int, help="Keep traces.db below this many bytes")
+    prune_parser.add_argument("--archive-dir", help="Write expired data to Parquet files here first")
+    prune_parser.add_argument("--vacuum", action="store_true",
+                              help="Rewrite both databases first so later pruning can shrink the files")
+
+    export_parser = subparsers.add_parser("export", help="Export traces, spans, messages and evaluations to Parquet or Arrow")
+    export_parser.add_argument("out_dir")
+    export_parser.add_argument("--format", choices=("parquet", "arrow"), default="parquet")
+    export_parser.add_argument("--since", type=_timestamp, help="Traces started at or after this Unix time or ISO date")
+    export_parser.add_argument("--until", type=_timestamp, help="Traces started before this Unix time or ISO date")
+    export_parser.add_argument("--tables", help="Comma-separated subset of traces,spans,prompts,completions,tools,evaluations")
+    export_parser.add_argument("--no-partition", action="store_true", help="One file per table instead of one per day")
+    export_parser.add_argument("--no-attributes", action="store_true", help="Leave out the raw span attributes JSON")
+    export_parser.add_argument("--overwrite", action="store_true", help="Replace tables already exported to out_dir")
+
+    ingest_parser = subparsers.add_parser("ingest", help="Write spans sent by local processes to traces.db")
+    ingest_parser.add_argument("--socket", help="Unix socket to listen on (default $AGENSIGHT_INGEST_SOCKET)")
+
     args = parser.parse_args()
     if args.command ==  "view":
+        print("Starting agensight server...")
         start_server()
+    elif args.command == "prune":
+        prune(args)
+    elif args.command == "export":
+        export(args)
+    elif args.command == "ingest":
+        ingest(args)
     else:
         parser.print_help()
 
@@ -0,0 +1,26 @@
+import pytest
+
+import agensight.eval.storage.db as eval_storage
+import agensight.tracing.db as trace_storage
+from agensight.utils.sqlite_pool import SQLitePool
+
+
+def _use_temp_db(monkeypatch, module, path):
+    monkeypatch.setattr(module, "DB_FILE", path)
+    pool = SQLitePool(path)
+    read_only_pool = SQLitePool(path, size=2, read_only=True)
+    monkeypatch.setattr(module, "_pool", pool)
+    monkeypatch.setattr(module, "_read_only_pool", read_only_pool)
+    return pool, read_only_pool
+
+
+@pytest.fixture
+def trace_db(tmp_path, monkeypatch):
+    """``agensight.tracing.db`` and the eval store pointed at fresh files under ``tmp_path``."""
+    pools = _use_temp_db(monkeypatch, trace_storage, tmp_path / "traces.db")
+    pools += _use_temp_db(monkeypatch, eval_storage, tmp_path / "eval.db")
+    trace_storage.init_schema()
+    eval_storage.init_evals_schema()
+    yield trace_storage
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.dataset  # noqa: E402
+
+from agensight.tracing.columnar_export import export_dataset  # noqa: E402
+
+DAY = 86400
+# 2024-05-01T12:00:00Z
+NOON = 1714564800
+
+
+def _store_traces(trace_db, days):
+    with trace_db.writer() as conn:
+        for day in range(days):
+            started = NOON + day * DAY
+            conn.execute(
+                "INSERT INTO traces (id, name, started_at, ended_at, session_id, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                (f"trace-{day}", "run", started, started + 1, "session-0", "{}")
+            )
+            conn.execute(
+                "INSERT INTO spans (id, trace_id, parent_id, name, started_at, ended_at, duration, kind, status, attributes) "
+                "VALUES (?, ?, NULL, ?, ?, ?, 1, 'SpanKind.INTERNAL', 'StatusCode.OK', ?)",
+                (f"span-{day}", f"trace-{day}", "run", started, started + 1, json.dumps({"trace_id": f"trace-{day}"}))
+            )
+
+
+def _read(path, fmt):
+    return pa.dataset.dataset(str(path), format="ipc" if fmt == "arrow" else fmt, partitioning="hive").to_table()
+
+
+@pytest.mark.parametrize("partition_by_day", [True, False])
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_multi_day_export_reads_back_every_row(trace_db, tmp_path, fmt, partition_by_day):
+    _store_traces(trace_db, days=3)
+    out = tmp_path / "export"
+
+    counts = export_dataset(out, fmt=fmt, tables=("traces", "spans"), partition_by_day=partition_by_day)
+
+    assert counts == {"traces": 3, "spans": 3}
+    traces = _read(out / "traces", fmt)
+    spans = _read(out / "spans", fmt)
+    assert sorted(traces.column("id").to_pylist()) == ["trace-0", "trace-1", "trace-2"]
+    assert sorted(spans.column("trace_id").to_pylist()) == ["trace-0", "trace-1", "trace-2"]
+    files = sorted(p.relative_to(out / "spans").as_posix() for p in (out / "spans").rglob("part-*"))
+    suffix = ".parquet" if fmt == "parquet" else ".arrow"
+    if partition_by_day:
+        assert files == [f"date=2024-05-0{day}/part-0{suffix}" for day in (1, 2, 3)]
+    else:
+        assert files == [f"part-0{suffix}"]
+
+
+def test_existing_dataset_needs_overwrite(trace_db, tmp_path):
+    _store_traces(trace_db, days=1)
+    out = tmp_path / "export"
+    export_dataset(out, tables=("traces",))
+
+    with pytest.raises(FileExistsError):
+        export_dataset(out, tables=("traces",))
+    assert export_dataset(out, tables=("traces",), overwrite=True) == {"traces": 1}
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1700000000", 1_700_000_000.0),
+    ("2023-11-14T22:13:20", 1_700_000_000.0),
+    ("2023-11-14T23:13:20+01:00", 1_700_000_000.0),
+])
+def test_since_and_until_accept_unix_times_and_iso_dates(value, expected):
+    from cli.main import _timestamp
+
+    assert _timestamp(value) == expected
+
+
+def test_a_malformed_date_is_a_usage_error():
+    import argparse
+
+    from cli.main import _timestamp
+
+    with pytest.raises(argparse.ArgumentTypeError):
+        _timestamp("yesterday")
@@ -0,0 +1,106 @@
+import asyncio
+import zlib
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import agensight._server.utils.compression as compression
+from agensight._server.utils.compression import CompressionMiddleware, choose_encoding
+
+BIG = {"rows": ["x" * 100] * 50}
+
+
+def _chunks():
+    for i in range(3):
+        yield (f'{{"chunk": {i}}}\n' * 10).encode()
+
+
+def _routes():
+    return [
+        Route("/big", lambda request: JSONResponse(BIG, headers={"ETag": '"v1"'})),
+        Route("/small", lambda request: JSONResponse({"ok": True})),
+        Route("/stream", lambda request: StreamingResponse(_chunks(), media_type="application/json")),
+        Route("/events", lambda request: StreamingResponse(_chunks(), media_type="text/event-stream")),
+        Route("/partial", lambda request: Response(b"x" * 5000, status_code=206, media_type="text/plain")),
+        Route("/image", lambda request: Response(b"x" * 5000, media_type="image/png")),
+    ]
+
+
+@pytest.fixture
+def client():
+    app = Starlette(routes=_routes())
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0.5, gzip;q=0.8", "gzip"),
+    ("*", "br"),
+    ("br;q=0, *;q=0.1", "gzip"),
+    ("identity", None),
+    ("", None),
+])
+def test_encoding_is_negotiated(header, expected):
+    assert choose_encoding(header) == expected
+
+
+def test_gzip_is_used_without_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert choose_encoding("br, gzip") == "gzip"
+    assert choose_encoding("br") is None
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+def test_large_json_is_compressed_and_its_etag_marked(client, encoding):
+    response = client.get("/big", headers={"Accept-Encoding": encoding})
+
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["etag"] == f'"v1-{encoding}"'
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < 5000
+    assert response.json() == BIG
+
+
+def test_small_and_unaccepted_responses_are_sent_as_is(client):
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    plain = client.get("/big", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in plain.headers and plain.headers["etag"] == '"v1"'
+
+
+@pytest.mark.parametrize("path", ["/events", "/partial", "/image"])
+def test_events_partial_and_binary_responses_pass_through(client, path):
+    assert "content-encoding" not in client.get(path, headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_streamed_chunks_can_be_decoded_as_they_arrive():
+    expected = list(_chunks())
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        for chunk in expected:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressionMiddleware(app)(scope, None, send))
+
+    start, *bodies = sent
+    headers = dict(start["headers"])
+    assert headers[b"content-encoding"] == b"gzip" and b"content-length" not in headers
+    # Each chunk is flushed, so it decodes before the next one is sent.
+    decoder = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    assert [decoder.decompress(body["body"]) for body in bodies[:3]] == expected
+    assert decoder.decompress(bodies[-1]["body"]) == b"" and decoder.eof
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+import agensight.eval.storage.db as eval_storage
+from agensight.eval.storage.db_operations import (
+    delete_evaluation, delete_evaluations_for_parents, insert_evaluation, update_evaluation,
+)
+
+
+def _rollups():
+    with eval_storage.reader() as conn:
+        return sorted(tuple(row) for row in conn.execute(
+            "SELECT metricName, source, projectId, parentType, count, scored, scoreSum, minScore, maxScore "
+            "FROM evaluation_rollups"
+        ))
+
+
+def _recomputed():
+    with eval_storage.reader() as conn:
+        return sorted(tuple(row) for row in conn.execute('''
+            SELECT COALESCE(metricName, ''), COALESCE(source, ''), COALESCE(projectId, ''), COALESCE(parentType, ''),
+                   COUNT(*), COUNT(score), COALESCE(SUM(score), 0), MIN(score), MAX(score)
+            FROM evaluations GROUP BY 1, 2, 3, 4
+        '''))
+
+
+@pytest.fixture
+def evaluations(trace_db):
+    rng = random.Random(7)
+    ids = []
+    for i in range(60):
+        ids.append(insert_evaluation(
+            metric_name=rng.choice(["relevance", "faithfulness"]),
+            score=None if i % 10 == 0 else float(rng.randint(0, 10)),
+            reason="",
+            parent_id=f"span-{i % 6}",
+            parent_type="span",
+            source=rng.choice(["auto", "human"]),
+        ))
+    return ids
+
+
+def test_inserts_keep_rollups_in_step(evaluations):
+    assert _rollups() == _recomputed()
+    assert sum(row[4] for row in _rollups()) == 60
+
+
+def test_updates_move_scores_and_groups(evaluations):
+    update_evaluation(evaluations[1], score=100.0)
+    update_evaluation(evaluations[2], metricName="coherence")
+    update_evaluation(evaluations[3], reason="unchanged rollup")
+
+    assert _rollups() == _recomputed()
+
+
+def test_deletes_remove_scores_including_the_min_and_max(evaluations):
+    update_evaluation(evaluations[4], score=-1.0)
+    update_evaluation(evaluations[5], score=99.0)
+    for eval_id in evaluations[4:6] + evaluations[20:25]:
+        assert delete_evaluation(eval_id)
+    assert _rollups() == _recomputed()
+
+    assert delete_evaluations_for_parents(["span-0", "span-1"]) > 0
+    assert _rollups() == _recomputed()
+
+
+def test_deleting_every_evaluation_empties_the_rollups(evaluations):
+    delete_evaluations_for_parents([f"span-{i}" for i in range(6)])
+
+    assert _rollups() == []
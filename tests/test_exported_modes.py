@@ -0,0 +1,51 @@
+import json
+
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+import agensight.tracing.decorators as decorators
+import agensight.tracing.session as session_state
+from agensight.tracing.config import config
+from agensight.tracing.exporter_db import DBSpanExporter
+
+
+def test_ingest_mode_sends_session_and_trace_rows_with_the_spans(trace_db, monkeypatch):
+    finished = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(finished))
+    monkeypatch.setattr(decorators.ot_trace, "get_tracer", provider.get_tracer)
+    monkeypatch.setitem(config, "mode", "ingest")
+    monkeypatch.setattr(session_state, "_session_enabled", False)
+
+    @decorators.span()
+    def step():
+        return "done"
+
+    @decorators.trace("pipeline", session={"id": "session-1", "name": "support", "user_id": "user-7"}, team="search")
+    def pipeline():
+        return step()
+
+    assert pipeline() == "done"
+
+    # Nothing reaches traces.db until the spans are exported.
+    with trace_db.reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM traces").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] == 0
+
+    spans = finished.get_finished_spans()
+    with trace_db.writer() as conn:
+        DBSpanExporter()._export(conn, spans, [])
+
+    root = next(span for span in spans if span.parent is None)
+    with trace_db.reader() as conn:
+        session = conn.execute("SELECT id, session_name, user_id FROM sessions").fetchall()
+        traces = conn.execute("SELECT id, name, started_at, ended_at, session_id, metadata FROM traces").fetchall()
+        span_count = conn.execute("SELECT COUNT(*) FROM spans").fetchone()[0]
+
+    assert [tuple(row) for row in session] == [("session-1", "support", "user-7")]
+    assert len(traces) == 1 and span_count == 2
+    trace_id, name, started_at, ended_at, session_id, metadata = traces[0]
+    assert (trace_id, name, session_id) == (root.attributes["trace_id"], "pipeline", "session-1")
+    assert (started_at, ended_at) == (root.start_time / 1e9, root.end_time / 1e9)
+    assert json.loads(metadata) == {"team": "search"}
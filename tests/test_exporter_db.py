@@ -0,0 +1,40 @@
+import json
+
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.trace import SpanContext, SpanKind, Status, StatusCode, TraceFlags
+
+from agensight.tracing.exporter_db import DBSpanExporter
+
+
+def _span(span_id, name, parent_id=None, **attributes):
+    flags = TraceFlags(TraceFlags.SAMPLED)
+    return ReadableSpan(
+        name=name,
+        context=SpanContext(0x1234, span_id, is_remote=False, trace_flags=flags),
+        parent=SpanContext(0x1234, parent_id, is_remote=True, trace_flags=flags) if parent_id else None,
+        attributes={"trace_id": "trace-1", **attributes},
+        kind=SpanKind.INTERNAL,
+        status=Status(StatusCode.OK),
+        start_time=1_700_000_000_000_000_000,
+        end_time=1_700_000_002_000_000_000,
+    )
+
+
+def test_structured_values_do_not_drop_the_batch(trace_db):
+    io = {
+        "prompts": [{"role": "user", "content": [{"type": "text", "text": "hi"}]}],
+        "completions": [{"role": "assistant", "content": "hello", "total_tokens": "n/a"}],
+    }
+    spans = [
+        _span(1, "pipeline", **{"session.id": "session-1", "session.name": ("a", "b"), "trace.metadata": ("x",)}),
+        _span(2, "step", parent_id=1, **{"gen_ai.normalized_input_output": json.dumps(io)}),
+    ]
+    with trace_db.writer() as conn:
+        DBSpanExporter()._export(conn, spans, [])
+
+    with trace_db.reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM spans").fetchone()[0] == 2
+        assert conn.execute("SELECT session_name FROM sessions").fetchone()[0] == '["a", "b"]'
+        assert conn.execute("SELECT metadata FROM traces").fetchone()[0] == '["x"]'
+        assert json.loads(conn.execute("SELECT content FROM prompts").fetchone()[0]) == [{"type": "text", "text": "hi"}]
+        assert conn.execute("SELECT content, total_tokens FROM completions").fetchone()[:] == ("hello", "n/a")
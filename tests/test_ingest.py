@@ -0,0 +1,160 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+
+import pytest
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.trace import SpanContext, SpanKind, Status, StatusCode, TraceFlags
+
+import agensight.tracing.ingest as ingest
+from agensight.tracing.spool import Spool
+
+
+def _span(span_id, parent_id=None, name="step", **attributes):
+    flags = TraceFlags(TraceFlags.SAMPLED)
+    trace_id = 0x1234
+    return ReadableSpan(
+        name=name,
+        context=SpanContext(trace_id, span_id, is_remote=False, trace_flags=flags),
+        parent=SpanContext(trace_id, parent_id, is_remote=True, trace_flags=flags) if parent_id else None,
+        attributes=attributes,
+        kind=SpanKind.INTERNAL,
+        status=Status(StatusCode.OK),
+        start_time=1_700_000_000_000_000_000,
+        end_time=1_700_000_001_000_000_000,
+    )
+
+
+class _RecordingIngestor:
+    def __init__(self):
+        self.spans = []
+        self.received = threading.Event()
+
+    def submit(self, spans):
+        self.spans.extend(spans)
+        self.received.set()
+
+    def shutdown(self, timeout=None):
+        pass
+
+
+@pytest.fixture
+def daemon():
+    # Unix socket paths are limited to about 100 bytes, too short for tmp_path.
+    directory = tempfile.mkdtemp(prefix="as-")
+    ingestor = _RecordingIngestor()
+    server = ingest.IngestDaemon(os.path.join(directory, "ingest.sock"), ingestor)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join(5)
+    os.rmdir(directory)
+
+
+def test_batches_spooled_by_an_earlier_process_are_sent(daemon, tmp_path, monkeypatch):
+    spool_file = tmp_path / "ingest-spool.db"
+    monkeypatch.setattr(ingest, "INGEST_SPOOL_FILE", spool_file)
+    earlier = Spool(spool_file)
+    earlier.append([ingest.encode_spans([_span(1), _span(2, parent_id=1)])])
+    earlier.close()
+
+    exporter = ingest.IngestSpanExporter(daemon.socket_path, retry_interval=0.05)
+    try:
+        assert daemon.ingestor.received.wait(5)
+        assert exporter.flush_spool()
+        assert sorted(span.get_span_context().span_id for span in daemon.ingestor.spans) == [1, 2]
+        assert exporter.spool.stats()["spooled"] == 0
+    finally:
+        exporter.shutdown()
+
+
+def _spool_from_a_worker(path, count, started):
+    spool = Spool(path, max_bytes=1000)
+    # Both workers have the spool open before either appends.
+    started.wait(10)
+    for _ in range(count):
+        spool.append([b"x" * 30])
+    spool.close()
+
+
+def test_worker_processes_share_the_spool_size_cap(tmp_path):
+    path = tmp_path / "ingest-spool.db"
+    Spool(path, max_bytes=1000).close()
+    context = multiprocessing.get_context("fork")
+    started = context.Barrier(2)
+    workers = [context.Process(target=_spool_from_a_worker, args=(path, 100, started)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+    assert [worker.exitcode for worker in workers] == [0, 0]
+
+    spool = Spool(path, max_bytes=1000)
+    try:
+        stats = spool.stats()
+    finally:
+        spool.close()
+    with sqlite3.connect(path) as conn:
+        stored = conn.execute("SELECT COALESCE(SUM(size), 0) FROM spool").fetchone()[0]
+    assert stats["spooled_bytes"] == stored
+    assert 1000 - 30 < stored <= 1000
+
+
+def test_export_spools_while_the_daemon_is_down(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "INGEST_SPOOL_FILE", tmp_path / "ingest-spool.db")
+    exporter = ingest.IngestSpanExporter(str(tmp_path / "missing.sock"), retry_interval=60)
+    try:
+        exporter.export([_span(1)])
+        exporter.flush_spool()
+        assert exporter.spool.stats()["spooled"] == 1
+    finally:
+        exporter.shutdown()
+
+
+def _fields(span):
+    ctx = span.get_span_context()
+    return (
+        span.name, ctx.trace_id, ctx.span_id, span.parent.span_id if span.parent else None, span.kind,
+        span.status.status_code, span.status.description, span.start_time, span.end_time, dict(span.attributes),
+    )
+
+
+def _payload(frame):
+    magic, version, flags, length = ingest.FRAME_HEADER.unpack_from(frame)
+    assert (magic, version) == (ingest.MAGIC, ingest.VERSION)
+    payload = frame[ingest.FRAME_HEADER.size:]
+    assert len(payload) == length
+    return payload, flags
+
+
+@pytest.mark.parametrize("body", ["short", "x" * 5000])
+def test_encode_decode_round_trip(body):
+    failed = ReadableSpan(
+        name="openai.chat",
+        context=SpanContext(0xABC, 7, is_remote=False, trace_flags=TraceFlags(TraceFlags.SAMPLED)),
+        parent=SpanContext(0xABC, 1, is_remote=True, trace_flags=TraceFlags(TraceFlags.SAMPLED)),
+        attributes={"gen_ai.prompt.0.content": body, "tags": ("a", "b"), "tokens": 12, "ratio": 0.5, "cached": False},
+        kind=SpanKind.CLIENT,
+        status=Status(StatusCode.ERROR, "rate limited"),
+        start_time=1_700_000_000_000_000_001,
+        end_time=1_700_000_000_500_000_002,
+    )
+    spans = [_span(1, name="agent", **{"trace_id": "trace-1"}), failed]
+
+    payload, flags = _payload(ingest.encode_spans(spans))
+
+    assert bool(flags & ingest.FLAG_ZLIB) == (len(body) > ingest.COMPRESS_MIN_BYTES)
+    assert [_fields(span) for span in ingest.decode_spans(payload, flags)] == [_fields(span) for span in spans]
+
+
+@pytest.mark.parametrize("payload, flags", [
+    (b"not json", 0),
+    (b"not zlib", ingest.FLAG_ZLIB),
+    (b'[["too", "short"]]', 0),
+])
+def test_malformed_payloads_are_rejected(payload, flags):
+    with pytest.raises(ValueError):
+        ingest.decode_spans(payload, flags)
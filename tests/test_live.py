@@ -0,0 +1,58 @@
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.trace import SpanContext, SpanKind, Status, StatusCode, TraceFlags
+
+from agensight.tracing.exporter_db import DBSpanExporter
+from agensight.tracing.live import SpanTailer
+
+
+def _span(span_id, parent_id=None, **attributes):
+    flags = TraceFlags(TraceFlags.SAMPLED)
+    return ReadableSpan(
+        name="step",
+        context=SpanContext(0x1234, span_id, is_remote=False, trace_flags=flags),
+        parent=SpanContext(0x1234, parent_id, is_remote=True, trace_flags=flags) if parent_id else None,
+        attributes={"trace_id": "trace-1", **attributes},
+        kind=SpanKind.INTERNAL,
+        status=Status(StatusCode.OK),
+        start_time=1_700_000_000_000_000_000,
+        end_time=1_700_000_001_000_000_000,
+    )
+
+
+class _Recorder:
+    def __init__(self):
+        self.spans = []
+
+    def has_subscribers(self):
+        return True
+
+    def publish(self, spans):
+        self.spans.extend(spans)
+
+
+def test_spans_of_a_running_trace_carry_their_session(trace_db):
+    # The root span has not ended, so there is no traces row yet.
+    spans = [_span(2, parent_id=1, **{"session.id": "session-1"}), _span(3, parent_id=1)]
+    tailer = SpanTailer(trace_db.reader, target=_Recorder())
+    tailer.poll()
+
+    live_spans = []
+    with trace_db.writer() as conn:
+        DBSpanExporter()._export(conn, spans, [], live_spans)
+    tailer.poll()
+
+    assert {span["id"]: span["session_id"] for span in live_spans} == {
+        format(2, "016x"): "session-1", format(3, "016x"): None
+    }
+    assert {span["id"]: span["session_id"] for span in tailer.target.spans} == {
+        format(2, "016x"): "session-1", format(3, "016x"): None
+    }
+
+
+def test_root_span_session_reaches_spans_of_the_same_batch(trace_db):
+    spans = [_span(1, **{"session.id": "session-1"}), _span(2, parent_id=1)]
+    live_spans = []
+    with trace_db.writer() as conn:
+        DBSpanExporter()._export(conn, spans, [], live_spans)
+
+    assert {span["session_id"] for span in live_spans} == {"session-1"}
@@ -0,0 +1,64 @@
+import sqlite3
+
+import pytest
+
+from agensight.tracing.db import MIGRATIONS, init_schema
+from agensight.utils.migrations import get_schema_version, run_migrations
+from agensight.utils.sqlite_pool import connect
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect(tmp_path / "test.db")
+    yield conn
+    conn.close()
+
+
+def test_each_migration_runs_once_and_is_recorded(conn):
+    calls = []
+    migrations = [
+        (1, "table", ("CREATE TABLE items (id INTEGER PRIMARY KEY)",)),
+        (2, "callable", lambda conn: calls.append(2)),
+    ]
+
+    assert run_migrations(conn, migrations) == 2
+    assert run_migrations(conn, migrations) == 2
+
+    assert calls == [2]
+    assert [tuple(row)[:2] for row in conn.execute("SELECT version, description FROM schema_version")] == [
+        (1, "table"), (2, "callable")
+    ]
+
+
+def test_only_newer_migrations_run_on_an_existing_database(conn):
+    run_migrations(conn, [(1, "table", ("CREATE TABLE items (id INTEGER PRIMARY KEY)",))])
+
+    version = run_migrations(conn, [
+        (1, "table", ("CREATE TABLE items (id INTEGER PRIMARY KEY)",)),
+        (2, "column", ("ALTER TABLE items ADD COLUMN name TEXT",)),
+    ])
+
+    assert version == 2
+    assert [row["name"] for row in conn.execute("PRAGMA table_info(items)")] == ["id", "name"]
+
+
+def test_a_failing_migration_is_rolled_back_and_not_recorded(conn):
+    migrations = [
+        (1, "table", ("CREATE TABLE items (id INTEGER PRIMARY KEY)",)),
+        (2, "broken", ("CREATE TABLE other (id INTEGER)", "NOT SQL")),
+    ]
+
+    with pytest.raises(sqlite3.OperationalError):
+        run_migrations(conn, migrations)
+
+    assert get_schema_version(conn) == 1
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'other'").fetchone() is None
+
+
+def test_trace_schema_is_at_the_latest_version(trace_db):
+    assert init_schema() == max(version for version, _, _ in MIGRATIONS)
+
+    with trace_db.reader() as conn:
+        indexes = {row["name"] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_spans_trace_started", "idx_traces_started_id", "idx_sessions_started_id"} <= indexes
+    assert "idx_traces_started" not in indexes
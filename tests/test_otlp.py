@@ -0,0 +1,173 @@
+import gzip
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("opentelemetry.proto")
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import ExportTraceServiceRequest  # noqa: E402
+from opentelemetry.trace import SpanKind, StatusCode  # noqa: E402
+
+import agensight.tracing.otlp as otlp  # noqa: E402
+from agensight.tracing.otlp import IngestQueueFull, SpanIngestor, decode_request  # noqa: E402
+
+TRACE_ID = "5b8efff798038103d269b633813fc60c"
+PARENT_ID = "eee19b7ec3c1b174"
+SPAN_ID = "eee19b7ec3c1b173"
+
+
+def _request_dict():
+    # OTLP/JSON, as the spec writes it: hex ids and enum numbers.
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "agent"}}]},
+        "scopeSpans": [{
+            "scope": {"name": "opentelemetry.instrumentation.openai", "version": "1.0"},
+            "spans": [
+                {
+                    "traceId": TRACE_ID, "spanId": SPAN_ID, "parentSpanId": PARENT_ID,
+                    "name": "openai.chat", "kind": 3,
+                    "startTimeUnixNano": "1700000000000000000", "endTimeUnixNano": "1700000001000000000",
+                    "attributes": [
+                        {"key": "gen_ai.usage.input_tokens", "value": {"intValue": "12"}},
+                        {"key": "gen_ai.request.temperature", "value": {"doubleValue": 0.5}},
+                        {"key": "tags", "value": {"arrayValue": {"values": [{"stringValue": "a"}, {"stringValue": "b"}]}}},
+                    ],
+                    "status": {"code": 2, "message": "rate limited"},
+                },
+                {"traceId": TRACE_ID, "spanId": "", "name": "no id"},
+            ],
+        }],
+    }]}
+
+
+def test_json_requests_are_decoded_with_hex_ids():
+    [span] = decode_request(json.dumps(_request_dict()).encode(), json_body=True)
+
+    assert format(span.context.trace_id, "032x") == TRACE_ID
+    assert format(span.context.span_id, "016x") == SPAN_ID
+    assert format(span.parent.span_id, "016x") == PARENT_ID
+    assert (span.name, span.kind, span.start_time, span.end_time) == (
+        "openai.chat", SpanKind.CLIENT, 1_700_000_000_000_000_000, 1_700_000_001_000_000_000
+    )
+    assert dict(span.attributes) == {"gen_ai.usage.input_tokens": 12, "gen_ai.request.temperature": 0.5, "tags": ("a", "b")}
+    assert (span.status.status_code, span.status.description) == (StatusCode.ERROR, "rate limited")
+    assert span.resource.attributes["service.name"] == "agent"
+    assert span.instrumentation_scope.name == "opentelemetry.instrumentation.openai"
+
+
+def test_protobuf_requests_decode_like_json():
+    from google.protobuf import json_format
+
+    request = json_format.ParseDict(otlp._hex_ids_to_base64(_request_dict()), ExportTraceServiceRequest())
+
+    [from_proto] = decode_request(request.SerializeToString())
+    [from_json] = decode_request(json.dumps(_request_dict()).encode(), json_body=True)
+    assert from_proto.to_json() == from_json.to_json()
+
+
+@pytest.mark.parametrize("body, json_body", [(b"\xff\x00garbage", False), (b"[1, 2]", True), (b"{not json", True)])
+def test_malformed_requests_are_value_errors(body, json_body):
+    with pytest.raises(ValueError):
+        decode_request(body, json_body=json_body)
+
+
+class _Exporter:
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def export(self, spans):
+        self.entered.set()
+        self.release.wait(5)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database is locked")
+        self.batches.append(list(spans))
+
+    def shutdown(self):
+        pass
+
+
+def test_spans_from_many_requests_are_written_in_batches():
+    exporter = _Exporter()
+    exporter.release.clear()
+    ingestor = SpanIngestor(exporter, max_batch=4, max_delay=0)
+    ingestor.submit(["first"])
+    # Held in the exporter so the rest queue up behind it.
+    assert exporter.entered.wait(5)
+    ingestor.max_delay = 60
+    for i in range(9):
+        ingestor.submit([f"span-{i}"])
+    exporter.release.set()
+
+    assert ingestor.flush(timeout=5)
+    assert [len(batch) for batch in exporter.batches[1:]] == [4, 4, 1]
+    assert [span for batch in exporter.batches for span in batch] == ["first"] + [f"span-{i}" for i in range(9)]
+    ingestor.shutdown(5)
+
+
+def test_a_full_queue_is_refused_until_the_writer_catches_up():
+    exporter = _Exporter()
+    exporter.release.clear()
+    ingestor = SpanIngestor(exporter, max_batch=1, max_delay=0, max_queued=3)
+    ingestor.submit(["writing"])
+    assert exporter.entered.wait(5)
+    ingestor.submit(["a", "b", "c"])
+
+    with pytest.raises(IngestQueueFull):
+        ingestor.submit(["d"])
+
+    exporter.release.set()
+    assert ingestor.flush(timeout=5)
+    ingestor.submit(["d"])
+    ingestor.shutdown(5)
+    assert ingestor.stats["written"] == 5
+
+
+def test_failed_writes_are_retried_then_dropped(monkeypatch):
+    monkeypatch.setattr(otlp.time, "sleep", lambda seconds: None)
+    exporter = _Exporter(failures=otlp.INGEST_ATTEMPTS + 1)
+    ingestor = SpanIngestor(exporter, max_batch=10, max_delay=0)
+
+    ingestor.submit(["lost"])
+    assert ingestor.flush(timeout=5)
+    ingestor.submit(["kept"])
+    ingestor.shutdown(5)
+
+    assert exporter.batches == [["kept"]]
+    assert (ingestor.stats["dropped"], ingestor.stats["written"]) == (1, 1)
+
+
+def test_receiver_stores_gzipped_protobuf_exports(trace_db, monkeypatch):
+    from fastapi.testclient import TestClient
+    from google.protobuf import json_format
+
+    from agensight._server.app import app
+
+    ingestor = SpanIngestor(max_delay=0)
+    monkeypatch.setattr(otlp, "_ingestor", ingestor)
+    request = json_format.ParseDict(otlp._hex_ids_to_base64(_request_dict()), ExportTraceServiceRequest())
+
+    response = TestClient(app).post(
+        "/v1/traces", content=gzip.compress(request.SerializeToString()),
+        headers={"Content-Type": "application/x-protobuf", "Content-Encoding": "gzip"},
+    )
+
+    assert response.status_code == 200
+    assert ingestor.flush(timeout=5)
+    with trace_db.reader() as conn:
+        assert conn.execute("SELECT id, name FROM spans").fetchall()[0][:] == (SPAN_ID, "openai.chat")
+    ingestor.shutdown(5)
+
+
+def test_receiver_rejects_bad_bodies_and_content_types(trace_db):
+    from fastapi.testclient import TestClient
+
+    from agensight._server.app import app
+
+    client = TestClient(app)
+    assert client.post("/v1/traces", content=b"{", headers={"Content-Type": "application/json"}).status_code == 400
+    assert client.post("/v1/traces", content=b"x", headers={"Content-Type": "text/plain"}).status_code == 415
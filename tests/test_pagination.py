@@ -0,0 +1,41 @@
+import pytest
+from fastapi import HTTPException
+
+from agensight._server.utils.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(1714564800.25, "trace-1")) == (1714564800.25, "trace-1")
+    assert decode_cursor(encode_cursor(None, "trace-1")) == (None, "trace-1")
+
+
+def test_bad_cursor_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        decode_cursor("not a cursor")
+    assert error.value.status_code == 400
+
+
+def test_following_next_cursor_returns_every_trace_once(trace_db):
+    from fastapi.testclient import TestClient
+    from agensight._server.app import app
+
+    with trace_db.writer() as conn:
+        # Ties on started_at must not be skipped or repeated across pages.
+        conn.executemany(
+            "INSERT INTO traces (id, name, started_at, ended_at) VALUES (?, 'run', ?, ?)",
+            [(f"trace-{i:03d}", 1000 + i // 3, 1001 + i // 3) for i in range(250)]
+        )
+
+    client = TestClient(app)
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 100, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/traces", params=params)
+        assert response.status_code == 200
+        seen.extend(row["id"] for row in response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+
+    assert len(seen) == len(set(seen)) == 250
+    assert seen == sorted(seen, key=lambda trace_id: (1000 + int(trace_id[6:]) // 3, trace_id), reverse=True)
@@ -0,0 +1,50 @@
+import pytest
+from fastapi import HTTPException
+
+from agensight._server.utils.ranges import byte_range, partial_response
+
+
+@pytest.mark.parametrize("offset, length, header, expected", [
+    (None, None, None, None),
+    (10, None, None, (10, 100)),
+    (10, 20, None, (10, 30)),
+    (90, 50, None, (90, 100)),
+    (None, 5, None, (0, 5)),
+    (None, None, "bytes=0-9", (0, 10)),
+    (None, None, "bytes=50-", (50, 100)),
+    (None, None, "bytes=-10", (90, 100)),
+    (None, None, "bytes=-500", (0, 100)),
+    (None, None, "bytes=95-200", (95, 100)),
+    # Query parameters win over the header.
+    (0, 1, "bytes=50-", (0, 1)),
+])
+def test_byte_range(offset, length, header, expected):
+    assert byte_range(100, offset, length, header) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=0-1,5-6", "items=0-9", "bytes=9-2", "bytes=abc", "bytes=-0", "bytes"])
+def test_unsupported_range_headers_send_the_whole_body(header):
+    assert byte_range(100, range_header=header) is None
+
+
+@pytest.mark.parametrize("offset, header", [(100, None), (None, "bytes=100-")])
+def test_range_past_the_end_is_not_satisfiable(offset, header):
+    with pytest.raises(HTTPException) as error:
+        byte_range(100, offset, None, header)
+    assert error.value.status_code == 416
+    assert error.value.headers["Content-Range"] == "bytes */100"
+
+
+def test_empty_body_from_the_start_is_satisfiable():
+    assert byte_range(0, offset=0) == (0, 0)
+
+
+def test_partial_response():
+    whole = partial_response(b"abcdef", 6, None, "text/plain")
+    assert whole.status_code == 200 and whole.headers["Accept-Ranges"] == "bytes"
+    assert partial_response(b"abcdef", 6, (0, 6), "text/plain").status_code == 200
+
+    part = partial_response(b"cd", 6, (2, 4), "text/plain")
+    assert part.status_code == 206
+    assert part.headers["Content-Range"] == "bytes 2-3/6"
+    assert part.body == b"cd"
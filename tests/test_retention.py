@@ -0,0 +1,84 @@
+import sqlite3
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.dataset  # noqa: E402
+
+import agensight.tracing.retention as retention  # noqa: E402
+from agensight.tracing.retention import RetentionPolicy, prune  # noqa: E402
+
+
+def _store_traces(trace_db, count):
+    with trace_db.writer() as conn:
+        for i in range(count):
+            conn.execute(
+                "INSERT INTO traces (id, name, started_at, ended_at) VALUES (?, 'run', ?, ?)",
+                (f"trace-{i}", 1000 + i, 1001 + i)
+            )
+            conn.execute(
+                "INSERT INTO spans (id, trace_id, name, started_at, ended_at, duration) VALUES (?, ?, 'step', ?, ?, 1)",
+                (f"span-{i}", f"trace-{i}", 1000 + i, 1001 + i)
+            )
+            conn.execute(
+                "INSERT INTO prompts (span_id, role, content, message_index) VALUES (?, 'user', 'hi', 0)",
+                (f"span-{i}",)
+            )
+
+
+def test_archive_is_written_without_holding_the_write_lock(trace_db, tmp_path, monkeypatch):
+    _store_traces(trace_db, 3)
+    archive_rows = retention.archive_rows
+    lock_free = []
+
+    def archive_while_checking_the_lock(*args, **kwargs):
+        other = sqlite3.connect(trace_db.DB_FILE, timeout=0)
+        try:
+            other.execute("BEGIN IMMEDIATE")
+            other.rollback()
+            lock_free.append(True)
+        except sqlite3.OperationalError:
+            lock_free.append(False)
+        finally:
+            other.close()
+        return archive_rows(*args, **kwargs)
+
+    monkeypatch.setattr(retention, "archive_rows", archive_while_checking_the_lock)
+    # Sweeps run on migrated stores; start_retention migrates them once.
+    monkeypatch.setattr(trace_db, "init_schema", lambda: pytest.fail("prune migrated the store"))
+
+    totals = prune(RetentionPolicy(max_traces=1, archive_dir=str(tmp_path / "archive")))
+
+    assert (totals["traces"], totals["spans"]) == (2, 2)
+    assert lock_free == [True]
+    with trace_db.reader() as conn:
+        assert [row[0] for row in conn.execute("SELECT id FROM traces")] == ["trace-2"]
+        assert conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0] == 1
+    archived = pa.dataset.dataset(str(tmp_path / "archive" / "spans"), format="parquet").to_table()
+    assert sorted(archived.column("id").to_pylist()) == ["span-0", "span-1"]
+
+
+def test_spans_added_after_the_archive_are_archived_before_deletion(trace_db, tmp_path, monkeypatch):
+    _store_traces(trace_db, 2)
+    archive_rows = retention.archive_rows
+    calls = []
+
+    def archive_then_add_a_late_span(conn, trace_ids, span_ids, directory):
+        calls.append(sorted(span_ids))
+        if len(calls) == 1:
+            with trace_db.writer() as writer:
+                writer.execute(
+                    "INSERT INTO spans (id, trace_id, name, started_at, ended_at, duration) "
+                    "VALUES ('span-late', 'trace-0', 'step', 1000, 1001, 1)"
+                )
+        return archive_rows(conn, trace_ids, span_ids, directory)
+
+    monkeypatch.setattr(retention, "archive_rows", archive_then_add_a_late_span)
+
+    prune(RetentionPolicy(max_traces=1, archive_dir=str(tmp_path / "archive")))
+
+    assert calls == [["span-0"], ["span-late"]]
+    archived = pa.dataset.dataset(str(tmp_path / "archive" / "spans"), format="parquet").to_table()
+    assert sorted(archived.column("id").to_pylist()) == ["span-0", "span-late"]
+    with trace_db.reader() as conn:
+        assert [row[0] for row in conn.execute("SELECT id FROM spans")] == ["span-1"]
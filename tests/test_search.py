@@ -0,0 +1,27 @@
+import pytest
+
+from agensight.tracing.search import SEARCH_SOURCES, SearchUnavailable, has_message_search, match_expression, search_messages
+
+
+def _drop_search(conn):
+    for table, fts, _, _ in SEARCH_SOURCES.values():
+        for event in ("insert", "delete", "update"):
+            conn.execute(f"DROP TRIGGER {fts}_{event}")
+        conn.execute(f"DROP TABLE {fts}")
+
+
+def test_search_is_enabled_on_a_later_start(trace_db):
+    # As left by migration 5 on a SQLite build without FTS5.
+    with trace_db.writer() as conn:
+        _drop_search(conn)
+        conn.execute("INSERT INTO prompts (span_id, role, content, message_index) VALUES ('span-1', 'user', 'refund policy', 0)")
+    with trace_db.reader() as conn:
+        assert not has_message_search(conn)
+        with pytest.raises(SearchUnavailable):
+            search_messages(conn, match_expression("refund"))
+
+    trace_db.init_schema()
+
+    with trace_db.reader() as conn:
+        assert has_message_search(conn)
+        assert [hit["id"] for hit in search_messages(conn, match_expression("refund"))] == [1]
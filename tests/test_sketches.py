@@ -0,0 +1,52 @@
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.trace import SpanContext, SpanKind, Status, StatusCode, TraceFlags
+
+from agensight.tracing.exporter_db import DBSpanExporter
+from agensight.tracing.sketches import backfill_span_sketches
+
+
+def _span(span_id, name, parent_id=None, kind=SpanKind.INTERNAL, **attributes):
+    flags = TraceFlags(TraceFlags.SAMPLED)
+    return ReadableSpan(
+        name=name,
+        context=SpanContext(0x1234, span_id, is_remote=False, trace_flags=flags),
+        parent=SpanContext(0x1234, parent_id, is_remote=True, trace_flags=flags) if parent_id else None,
+        attributes={"trace_id": "trace-1", **attributes},
+        kind=kind,
+        status=Status(StatusCode.OK),
+        start_time=1_700_000_000_000_000_000,
+        end_time=1_700_000_002_000_000_000,
+    )
+
+
+def _sketches(conn):
+    return conn.execute("SELECT metric, bucket_start, span_name, model, count FROM span_sketches ORDER BY 1, 3, 4").fetchall()
+
+
+def test_backfill_matches_the_exporter(trace_db):
+    spans = [
+        _span(1, "lookup"),
+        _span(2, "openai.chat", parent_id=1, kind=SpanKind.CLIENT, **{
+            "gen_ai.system": "openai",
+            "gen_ai.response.model": "gpt-4o-2024-08-06",
+            "llm.usage.total_tokens": 30,
+            "gen_ai.usage.prompt_tokens": 20,
+            "gen_ai.usage.completion_tokens": 10,
+        }),
+    ]
+    with trace_db.writer() as conn:
+        DBSpanExporter()._export(conn, spans, [])
+        # Usage recorded against a span that is not an LLM call.
+        conn.execute(
+            "INSERT INTO completions (span_id, role, content, total_tokens) VALUES (?, 'assistant', 'ok', 99)",
+            (format(1, "016x"),)
+        )
+        exported = [tuple(row) for row in _sketches(conn)]
+
+        conn.execute("DELETE FROM span_sketches")
+        backfill_span_sketches(conn)
+        backfilled = [tuple(row) for row in _sketches(conn)]
+
+    assert backfilled == exported
+    assert ("total_tokens", 1699999800.0, "openai.chat", "gpt-4o-2024-08-06", 1) in backfilled
+    assert not any(metric.endswith("_tokens") and name == "lookup" for metric, _, name, _, _ in backfilled)
@@ -0,0 +1,32 @@
+from types import SimpleNamespace
+
+from agensight.tracing.span_classifier import is_llm_record, is_llm_span
+
+
+def _span(name, scope="", **attributes):
+    return SimpleNamespace(name=name, attributes=attributes, instrumentation_scope=SimpleNamespace(name=scope))
+
+
+def test_llm_spans_are_recognised_by_name():
+    assert is_llm_span(_span("openai.chat"))
+    assert is_llm_span(_span("Anthropic.completion"))
+
+
+def test_llm_spans_are_recognised_by_instrumentation_scope():
+    assert is_llm_span(_span("chat gpt-4o", scope="opentelemetry.instrumentation.openai.v1"))
+    assert not is_llm_span(_span("GET /users", scope="opentelemetry.instrumentation.requests"))
+
+
+def test_llm_spans_are_recognised_by_attribute_keys():
+    assert is_llm_span(_span("call", **{"gen_ai.system": "custom"}))
+    assert is_llm_span(_span("call", **{"llm.request.model": "gpt-4o"}))
+
+
+def test_attribute_values_are_not_read():
+    assert not is_llm_span(_span("summarise", **{"input": "ask the llm via openai"}))
+
+
+def test_stored_rows_are_classified_without_a_scope():
+    assert is_llm_record("openai.chat", {})
+    assert is_llm_record("step", {"gen_ai.usage.total_tokens": 5})
+    assert not is_llm_record("step", {"input": "gen_ai"})
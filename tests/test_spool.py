@@ -0,0 +1,205 @@
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import agensight.tracing.transport as transport_module
+from agensight.tracing.spool import Spool
+from agensight.tracing.transport import BatchTransport, backoff_delay, build_body, encode_record, pack_payloads, read_body
+
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = Spool(tmp_path / "spool.db", max_bytes=250)
+    yield spool
+    spool.close()
+
+
+def test_oldest_payloads_are_evicted_past_the_cap(spool):
+    spool.append([b"a" * 100, b"b" * 100])
+    spool.append([b"c" * 100])
+
+    assert spool.stats() == {"spooled": 2, "spooled_bytes": 200, "evicted": 1}
+    assert [body[:1] for _, _, body in spool.claim(10, lease=60)] == [b"b", b"c"]
+
+
+def test_one_append_can_evict_several_payloads(spool):
+    spool.append([b"a" * 60, b"b" * 60, b"c" * 60])
+    spool.append([b"d" * 200])
+
+    assert spool.stats() == {"spooled": 1, "spooled_bytes": 200, "evicted": 3}
+
+
+def test_acked_payloads_free_their_space(spool):
+    spool.append([b"a" * 100, b"b" * 100])
+    for payload_id, _, _ in spool.claim(1, lease=60):
+        spool.ack(payload_id)
+    spool.append([b"c" * 100])
+
+    assert spool.stats()["evicted"] == 0
+
+
+def test_size_cap_counts_payloads_from_an_earlier_process(tmp_path):
+    earlier = Spool(tmp_path / "spool.db", max_bytes=250)
+    earlier.append([b"a" * 200])
+    earlier.close()
+
+    spool = Spool(tmp_path / "spool.db", max_bytes=250)
+    try:
+        spool.append([b"b" * 100])
+        assert spool.stats() == {"spooled": 1, "spooled_bytes": 100, "evicted": 1}
+    finally:
+        spool.close()
+
+
+def test_concurrent_appends_and_acks_keep_the_size_exact(spool):
+    spool.max_bytes = 10_000
+    appended = threading.Event()
+
+    def append():
+        for _ in range(300):
+            spool.append([b"x" * 10])
+        appended.set()
+
+    def ack():
+        while not (appended.is_set() and spool.stats()["spooled"] == 0):
+            for payload_id, _, _ in spool.claim(5, lease=60):
+                spool.ack(payload_id)
+
+    threads = [threading.Thread(target=append), threading.Thread(target=ack)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+    assert spool.stats() == {"spooled": 0, "spooled_bytes": 0, "evicted": 0}
+
+
+def test_claimed_payloads_wait_out_their_lease(spool):
+    spool.append([b"a", b"b"])
+    claimed = spool.claim(10, lease=60)
+    assert [body for _, _, body in claimed] == [b"a", b"b"]
+    assert spool.claim(10, lease=60) == []
+
+    first, second = claimed[0][0], claimed[1][0]
+    spool.retry_at(first, time.time() - 1)
+    spool.reschedule([second], time.time() - 1)
+    assert [(attempts, body) for _, attempts, body in spool.claim(10, lease=60)] == [(1, b"a"), (0, b"b")]
+
+
+def test_nothing_is_claimed_while_the_oldest_payload_waits(spool):
+    spool.append([b"a", b"b"])
+    first, second = [payload_id for payload_id, _, _ in spool.claim(10, lease=60)]
+    retry = time.time() + 60
+    spool.retry_at(first, retry)
+    spool.reschedule([second], time.time() - 1)
+    spool.append([b"c"])
+
+    assert spool.claim(10, lease=60) == []
+    assert spool.next_attempt_at() == retry
+
+
+def test_payloads_stay_under_the_size_limit_and_keep_record_order():
+    records = [encode_record("span", {"id": f"span-{i}", "name": "x" * 50}) for i in range(40)]
+
+    payloads = pack_payloads(records, max_payload_bytes=1024)
+
+    assert len(payloads) > 1
+    assert all(sum(len(record) + 1 for record in payload) <= 1024 for payload in payloads)
+    assert [record for payload in payloads for record in payload] == records
+    assert read_body(build_body(payloads[0]))[0] == {"type": "span", "data": {"id": "span-0", "name": "x" * 50}}
+
+
+def test_backoff_grows_exponentially_up_to_the_cap():
+    for attempts in range(12):
+        delay = min(300.0, 2 ** attempts)
+        assert delay / 2 <= backoff_delay(attempts, base=1.0, cap=300.0) <= delay
+
+
+class _Backend(BaseHTTPRequestHandler):
+    statuses = []
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        status = self.statuses.pop(0) if self.statuses else 200
+        self.received.append((self.path, status, json.loads(body)))
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def backend():
+    _Backend.statuses, _Backend.received = [], []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Backend)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield _Backend, f"http://127.0.0.1:{server.server_address[1]}/logs"
+    server.shutdown()
+    thread.join(5)
+
+
+def test_drain_retries_server_errors_and_drops_rejected_records(backend, spool, monkeypatch):
+    handler, url = backend
+    # Retry straight away instead of after a backoff.
+    monkeypatch.setattr(transport_module, "backoff_delay", lambda attempts: 0)
+    transport = BatchTransport(url, spool=spool, batch=False)
+    records = [
+        encode_record("session", {"id": "session-1"}),
+        encode_record("trace", {"id": "trace-1"}),
+        encode_record("span", {"id": "span-1"}),
+    ]
+    spool.append([build_body([record]) for record in records])
+    handler.statuses = [503, 200, 400]
+
+    assert transport.flush() is False
+    assert spool.stats()["spooled"] == 3
+
+    assert transport.flush() is True
+    assert [(path, status) for path, status, _ in handler.received] == [
+        ("/logs/session", 503), ("/logs/session", 200), ("/logs/trace", 400), ("/logs/span", 200)
+    ]
+    assert handler.received[-1][2] == {"data": {"id": "span-1"}}
+    stats = transport.stats()
+    assert (stats["spooled"], stats["retries"], stats["dropped_payloads"]) == (0, 1, 1)
+    transport.shutdown()
+
+
+def test_drain_waits_for_the_failed_payload_before_sending_later_ones(backend, spool, monkeypatch):
+    handler, url = backend
+    monkeypatch.setattr(transport_module, "backoff_delay", lambda attempts: 60)
+    transport = BatchTransport(url, spool=spool, batch=False)
+    spool.append([build_body([encode_record("trace", {"id": "trace-1"})])])
+    handler.statuses = [503]
+
+    assert transport.flush() is False
+    spool.append([build_body([encode_record("span", {"id": "span-1"})])])
+    transport.flush()
+    assert [(path, status) for path, status, _ in handler.received] == [("/logs/trace", 503)]
+    assert spool.stats()["spooled"] == 2
+    transport.shutdown()
+
+
+def test_batch_mode_posts_compressed_batches_in_order(backend, spool):
+    handler, url = backend
+    spool.max_bytes = 1_000_000
+    transport = BatchTransport(url, spool=spool, batch=True, max_payload_bytes=1024)
+    records = [encode_record("span", {"id": f"span-{i}", "name": "x" * 50}) for i in range(40)]
+
+    transport.send(records)
+    assert transport.flush() is True
+
+    assert {path for path, _, _ in handler.received} == {"/logs/batch"}
+    assert len(handler.received) > 1
+    sent = [record["data"]["id"] for _, _, body in handler.received for record in body["records"]]
+    assert sent == [f"span-{i}" for i in range(40)]
+    transport.shutdown()
@@ -0,0 +1,86 @@
+import sqlite3
+import threading
+
+import pytest
+
+from agensight.utils.sqlite_pool import SQLitePool, chunks
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = SQLitePool(tmp_path / "test.db", size=2, timeout=0.2)
+    with pool.writer() as conn:
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    yield pool
+    pool.close()
+
+
+def test_connections_run_in_wal_mode(pool):
+    with pool.reader() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_writer_commits_on_exit_and_rolls_back_on_error(pool):
+    with pool.writer() as conn:
+        conn.execute("INSERT INTO items (name) VALUES ('kept')")
+    with pytest.raises(RuntimeError):
+        with pool.writer() as conn:
+            conn.execute("INSERT INTO items (name) VALUES ('lost')")
+            raise RuntimeError("boom")
+
+    with pool.reader() as conn:
+        assert [row["name"] for row in conn.execute("SELECT name FROM items")] == ["kept"]
+
+
+def test_readers_see_committed_rows_while_a_write_is_open(pool):
+    with pool.writer() as conn:
+        conn.execute("INSERT INTO items (name) VALUES ('first')")
+    with pool.writer() as conn:
+        conn.execute("INSERT INTO items (name) VALUES ('second')")
+        with pool.reader() as other:
+            assert other.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 1
+
+
+def test_readers_are_reused_and_bounded(pool):
+    with pool.reader() as first:
+        pass
+    with pool.reader() as again:
+        assert again is first
+
+    with pool.reader(), pool.reader():
+        with pytest.raises(sqlite3.OperationalError, match="no free connection"):
+            with pool.reader():
+                pass
+
+
+def test_concurrent_writers_are_serialised(pool):
+    def insert():
+        for _ in range(50):
+            with pool.writer() as conn:
+                conn.execute("INSERT INTO items (name) VALUES ('x')")
+
+    threads = [threading.Thread(target=insert) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+    with pool.reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 200
+
+
+def test_read_only_pool_refuses_writes(pool):
+    read_only = SQLitePool(pool.path, read_only=True)
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            with read_only.writer():
+                pass
+        with read_only.reader() as conn:
+            with pytest.raises(sqlite3.OperationalError):
+                conn.execute("INSERT INTO items (name) VALUES ('x')")
+    finally:
+        read_only.close()
+
+
+def test_chunks_split_values_for_in_clauses():
+    assert [list(chunk) for chunk in chunks(list(range(5)), size=2)] == [[0, 1], [2, 3], [4]]
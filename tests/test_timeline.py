@@ -0,0 +1,128 @@
+import pytest
+
+from agensight.tracing.timeline import ERROR_STATUS, build_timeline
+
+
+def _row(span_id, start, end, parent_id=None, name="step", status="StatusCode.OK"):
+    return {"id": span_id, "parent_id": parent_id, "name": name, "started_at": start, "ended_at": end, "status": status}
+
+
+def _calls(count, parent_id="root", start=0.0, length=0.001):
+    # Back-to-back calls too short to draw at 1000px over 100s.
+    return [
+        _row(f"call-{i}", start + i * length, start + (i + 1) * length, parent_id, name="fetch" if i % 2 else "parse")
+        for i in range(count)
+    ]
+
+
+def test_wide_spans_are_listed_parents_first_with_their_depth():
+    rows = [_row("child", 10, 60, "root"), _row("root", 0, 100), _row("grandchild", 20, 40, "child")]
+
+    items = build_timeline(rows, 0, 100, width=1000)
+
+    assert [(item["id"], item["type"], item["depth"]) for item in items] == [
+        ("root", "span", 0), ("child", "span", 1), ("grandchild", "span", 2)
+    ]
+
+
+def test_short_siblings_become_one_aggregate():
+    calls = _calls(50)
+    calls[3]["status"] = ERROR_STATUS
+    nested = _row("nested", 0.0031, 0.0032, "call-3")
+
+    items = build_timeline([_row("root", 0, 100)] + calls + [nested], 0, 100, width=1000)
+
+    root, aggregate = items
+    assert root["id"] == "root"
+    assert aggregate["type"] == "aggregate"
+    assert (aggregate["parent_id"], aggregate["depth"], aggregate["count"]) == ("root", 1, 50)
+    assert (aggregate["span_count"], aggregate["error_count"]) == (51, 1)
+    assert aggregate["names"] == {"parse": 25, "fetch": 25}
+    assert aggregate["expand"] == {"parent_id": "root", "start": 0.0, "end": 0.05}
+
+
+def test_a_short_span_keeps_its_descendants_folded_in():
+    rows = [_row("root", 0, 100), _row("blip", 50, 50.01, "root"), _row("inside", 50, 50.005, "blip")]
+
+    items = build_timeline(rows, 0, 100, width=1000)
+
+    assert [(item["id"], item["hidden_descendants"]) for item in items] == [("root", 0), ("blip", 1)]
+
+
+def test_an_expanded_aggregate_lays_out_its_members_at_full_width():
+    calls = _calls(50)
+    aggregate = build_timeline([_row("root", 0, 100)] + calls, 0, 100, width=1000)[1]
+    window = aggregate["expand"]
+
+    items = build_timeline(calls, window["start"], window["end"], width=1000, parent_id=window["parent_id"])
+
+    assert [item["id"] for item in items] == [f"call-{i}" for i in range(50)]
+    assert {item["depth"] for item in items} == {0}
+
+
+def test_bars_per_row_are_bounded_by_width_and_min_px():
+    calls = _calls(10_000, length=0.01)
+
+    for width, min_px in [(1000, 2.0), (500, 2.0), (1000, 10.0)]:
+        items = build_timeline([_row("root", 0, 100)] + calls, 0, 100, width=width, min_px=min_px)
+        assert len(items) - 1 <= width / min_px + 1
+        assert sum(item.get("count", 1) for item in items[1:]) == 10_000
+
+
+def test_rows_without_a_start_are_skipped():
+    items = build_timeline([_row("root", 0, 100), _row("pending", None, None, "root")], 0, 100)
+
+    assert [item["id"] for item in items] == ["root"]
+
+
+@pytest.fixture
+def client(trace_db):
+    from fastapi.testclient import TestClient
+    from agensight._server.app import app
+
+    rows = [_row("root", 0, 100)] + _calls(500) + [_row("late", 60, 90, "root")]
+    with trace_db.writer() as conn:
+        conn.executemany(
+            "INSERT INTO spans (id, trace_id, parent_id, name, started_at, ended_at, duration, status) "
+            "VALUES (?, 'trace-1', ?, ?, ?, ?, ?, ?)",
+            [(r["id"], r["parent_id"], r["name"], r["started_at"], r["ended_at"],
+              r["ended_at"] - r["started_at"], r["status"]) for r in rows]
+        )
+        conn.executemany(
+            "INSERT INTO traces (id, session_id, name, started_at, ended_at) VALUES (?, 'session-1', 'run', ?, ?)",
+            [("trace-1", 0, 100)] + [(f"trace-{i}", 200 + i * 0.001, 200 + (i + 1) * 0.001) for i in range(2, 200)]
+        )
+    return TestClient(app)
+
+
+def test_trace_timeline_aggregates_then_expands(client):
+    timeline = client.get("/api/traces/trace-1/timeline", params={"width": 1000}).json()
+
+    assert timeline["span_count"] == 502
+    aggregates = [item for item in timeline["items"] if item["type"] == "aggregate"]
+    assert 0 < len(aggregates) <= 5
+    assert sum(aggregate["count"] for aggregate in aggregates) == 500
+    assert {item["id"] for item in timeline["items"] if item["type"] == "span"} == {"root", "late"}
+
+    expanded = client.get(
+        "/api/traces/trace-1/timeline/expand", params={**aggregates[0]["expand"], "width": 1000}
+    ).json()
+    assert sum(item.get("count", 1) for item in expanded["items"]) == aggregates[0]["count"]
+    assert any(item["type"] == "span" for item in expanded["items"])
+
+
+def test_trace_timeline_window_and_errors(client):
+    window = client.get("/api/traces/trace-1/timeline", params={"start": 50, "end": 100}).json()
+    assert [item["id"] for item in window["items"]] == ["root", "late"]
+
+    assert client.get("/api/traces/missing/timeline").status_code == 404
+    assert client.get("/api/traces/trace-1/timeline", params={"start": 10, "end": 5}).status_code == 400
+
+
+def test_session_timeline_merges_short_traces(client):
+    timeline = client.get("/api/sessions/session-1/timeline", params={"width": 1000}).json()
+
+    assert timeline["trace_count"] == 199
+    assert sum(item.get("count", 1) for item in timeline["items"]) == 199
+    assert len(timeline["items"]) < 10
+    assert client.get("/api/sessions/missing/timeline").status_code == 404
@@ -0,0 +1,41 @@
+import json
+
+from agensight.tracing.utils import extract_token_counts_from_attrs
+
+
+def test_usage_keys_are_read_in_order_of_preference():
+    attrs = {
+        "gen_ai.usage.input_tokens": 7,
+        "gen_ai.usage.prompt_tokens": 10,
+        "gen_ai.usage.output_tokens": 5,
+        "llm.usage.total_tokens": 15,
+    }
+
+    assert extract_token_counts_from_attrs(attrs) == {"total": 15, "prompt": 10, "completion": 5}
+
+
+def test_a_missing_count_is_derived_from_the_other_two():
+    assert extract_token_counts_from_attrs({"gen_ai.usage.input_tokens": 3, "gen_ai.usage.output_tokens": 4}) == {
+        "total": 7, "prompt": 3, "completion": 4
+    }
+    assert extract_token_counts_from_attrs({"llm.usage.total_tokens": 9, "llm.usage.prompt_tokens": 6}) == {
+        "total": 9, "prompt": 6, "completion": 3
+    }
+
+
+def test_other_numeric_token_attributes_are_used():
+    attrs = {"custom.prompt_tokens": 2, "custom.completion_tokens": 3}
+
+    assert extract_token_counts_from_attrs(attrs) == {"total": 5, "prompt": 2, "completion": 3}
+
+
+def test_usage_json_in_response_attributes_is_scanned():
+    attrs = {"llm.response": json.dumps({"usage": {"prompt_tokens": 11, "completion_tokens": 4, "total_tokens": 15}})}
+
+    assert extract_token_counts_from_attrs(attrs) == {"total": 15, "prompt": 11, "completion": 4}
+
+
+def test_prompt_text_is_never_scanned():
+    attrs = {"gen_ai.prompt.0.content": 'please return {"prompt_tokens": 99}'}
+
+    assert extract_token_counts_from_attrs(attrs) == {"total": None, "prompt": None, "completion": None}
@@ -0,0 +1,47 @@
+from agensight.tracing.trace_tree import TraceTree
+
+
+def _row(span_id, parent_id=None, attributes=None):
+    return {"id": span_id, "parent_id": parent_id, "attributes": attributes}
+
+
+def test_children_depth_and_order():
+    tree = TraceTree.from_rows([
+        _row("grandchild", "child-1"), _row("child-1", "root"), _row("root"), _row("child-2", "root")
+    ])
+
+    assert tree.roots == ["root"]
+    assert tree.child_ids("root") == ["child-1", "child-2"]
+    assert tree.parent("grandchild")["id"] == "child-1"
+    assert [tree.depth(span_id) for span_id in ("root", "child-1", "grandchild")] == [0, 1, 2]
+    assert [row["id"] for row in tree.topological()] == ["root", "child-1", "child-2", "grandchild"]
+
+
+def test_a_span_whose_parent_is_missing_sits_below_the_roots():
+    tree = TraceTree.from_rows([_row("orphan", "exported-earlier"), _row("child", "orphan")])
+
+    assert tree.roots == ["orphan"]
+    assert tree.parent("orphan") is None
+    assert (tree.depth("orphan"), tree.depth("child")) == (1, 2)
+
+
+def test_duplicates_keep_the_first_row_and_cycles_do_not_hang():
+    tree = TraceTree.from_rows([_row("a", "b"), _row("b", "a"), _row("a", None)])
+
+    assert len(tree) == 2
+    assert tree.roots == []
+    assert tree.depth("a") == tree.depth("b") == 0
+
+
+def test_attributes_are_parsed_once_and_bad_json_is_empty():
+    parsed = []
+    tree = TraceTree(
+        [_row("a", attributes='{"k": 1}'), _row("b", attributes="not json"), _row("c", attributes="[1]")],
+        lambda row: row["id"], lambda row: row["parent_id"],
+        lambda row: parsed.append(row["id"]) or row["attributes"],
+    )
+
+    assert tree.attributes("a") == {"k": 1}
+    assert tree.attributes("a") is tree.attributes("a")
+    assert tree.attributes("b") == {} and tree.attributes("c") == {}
+    assert parsed == ["a", "b", "c"]
@@ -0,0 +1,165 @@
+import json
+
+import pytest
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.trace import SpanContext, SpanKind, Status, StatusCode, TraceFlags
+
+from agensight.tracing.exporter_db import DBSpanExporter
+
+SECOND = 1_000_000_000
+START = 1_700_000_000 * SECOND
+
+
+def _span(span_id, parent_id=None, name="agent", kind=SpanKind.INTERNAL, start=0, end=10, **attributes):
+    flags = TraceFlags(TraceFlags.SAMPLED)
+    return ReadableSpan(
+        name=name,
+        context=SpanContext(0x1234, span_id, is_remote=False, trace_flags=flags),
+        parent=SpanContext(0x1234, parent_id, is_remote=True, trace_flags=flags) if parent_id else None,
+        attributes={"trace_id": "trace-1", **attributes},
+        kind=kind,
+        status=Status(StatusCode.OK),
+        start_time=START + start * SECOND,
+        end_time=START + end * SECOND,
+    )
+
+
+def _llm_call(span_id, parent_id, start, end, answer, **attributes):
+    return _span(
+        span_id, parent_id, name="openai.chat", kind=SpanKind.CLIENT, start=start, end=end,
+        **{
+            "gen_ai.system": "openai",
+            "gen_ai.request.model": "gpt-4o",
+            "gen_ai.prompt.0.role": "user",
+            "gen_ai.prompt.0.content": "question",
+            "gen_ai.completion.0.role": "assistant",
+            "gen_ai.completion.0.content": answer,
+            **attributes,
+        }
+    )
+
+
+@pytest.fixture
+def client(trace_db):
+    from fastapi.testclient import TestClient
+    from agensight._server.app import app
+
+    def store(spans):
+        with trace_db.writer() as conn:
+            DBSpanExporter()._export(conn, spans, [])
+
+    test_client = TestClient(app)
+    test_client.store = store
+    return test_client
+
+
+def test_tool_calls_with_long_arguments_are_listed_once(client):
+    arguments = {"query": "x" * 500, "limit": 5}
+    client.store([
+        _span(1),
+        _llm_call(2, 1, 1, 9, "", **{
+            "gen_ai.completion.0.tool_calls.0.name": "search",
+            "gen_ai.completion.0.tool_calls.0.arguments": json.dumps(arguments),
+        }),
+    ])
+
+    response = client.get("/api/traces/trace-1/spans", params={"preview_chars": 10})
+
+    assert response.status_code == 200
+    [agent] = response.json()["agents"]
+    assert [(tool["name"], tool["args"]) for tool in agent["tools_called"]] == [("search", arguments)]
+
+
+def test_agent_messages_come_from_its_llm_call_not_a_later_child(client):
+    client.store([
+        _span(1),
+        _llm_call(2, 1, 1, 5, "answer"),
+        # A tool step that ends after the LLM call.
+        _span(3, 1, name="lookup", start=5, end=9),
+    ])
+
+    [agent] = client.get("/api/traces/trace-1/spans").json()["agents"]
+    assert agent["model_used"] == "gpt-4o"
+    assert agent["final_completion"] == "answer"
+
+    details = client.get(f"/api/span/{format(1, '016x')}/details").json()
+    assert [c["content"] for c in details["completions"]] == ["answer"]
+
+
+def test_each_agent_gets_the_messages_of_its_own_llm_call(client):
+    client.store([
+        _span(1, name="pipeline"),
+        _span(2, 1, start=1, end=4), _llm_call(3, 2, 1, 3, "first"),
+        _span(4, 1, start=5, end=9), _llm_call(5, 4, 5, 8, "second"),
+    ])
+
+    trace = client.get("/api/traces/trace-1/spans").json()
+
+    assert [(agent["span_id"], agent["final_completion"]) for agent in trace["agents"]] == [
+        (format(2, "016x"), "first"), (format(4, "016x"), "second")
+    ]
+    assert (trace["trace_input"], trace["trace_output"]) == ("question", "second")
+
+
+def test_span_details_list_the_spans_own_messages(client):
+    client.store([_span(1), _llm_call(2, 1, 1, 9, "answer")])
+
+    details = client.get(f"/api/span/{format(2, '016x')}/details").json()
+
+    assert [prompt["content"] for prompt in details["prompts"]] == ["question"]
+    assert [completion["content"] for completion in details["completions"]] == ["answer"]
+
+
+def test_details_of_a_missing_span_is_a_404(client):
+    assert client.get("/api/span/missing/details").status_code == 404
+
+
+def test_span_subtree_is_streamed_with_depths(client):
+    client.store([_span(1), _span(2, parent_id=1, start=1), _span(3, parent_id=2, start=2), _span(4, start=3)])
+
+    response = client.get(f"/api/span/{format(2, '016x')}/subtree")
+
+    assert response.status_code == 200
+    assert [(row["id"], row["depth"]) for row in response.json()] == [(format(2, "016x"), 0), (format(3, "016x"), 1)]
+
+
+def test_span_subtree_of_a_missing_span_is_a_404(client):
+    response = client.get("/api/span/missing/subtree")
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Span not found"
+
+
+def test_a_failing_streamed_query_is_an_error_before_the_body(trace_db):
+    import sqlite3
+
+    from agensight._server.utils.responses import stream_rows
+
+    with pytest.raises(sqlite3.OperationalError):
+        stream_rows(trace_db.read_only_reader, "SELECT * FROM no_such_table")
+
+
+def test_request_connections_go_back_to_the_pool(client, trace_db):
+    client.store([_span(1), _span(2, parent_id=1, start=1)])
+
+    # More requests than the pool has connections.
+    for _ in range(5):
+        assert client.get("/api/traces/trace-1").status_code == 200
+        assert len(client.get(f"/api/span/{format(1, '016x')}/children").json()) == 1
+
+    pool = trace_db._read_only_pool
+    assert pool._idle.qsize() == pool._created
+
+
+def test_request_connections_are_read_only(trace_db):
+    import sqlite3
+
+    from agensight._server.dependencies import trace_db as request_connection
+
+    connections = request_connection()
+    conn = next(connections)
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM spans")
+    finally:
+        connections.close()
@@ -0,0 +1,95 @@
+import pytest
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.trace import SpanContext, SpanKind, Status, StatusCode, TraceFlags
+
+from agensight._server.utils.conditional import etag_matches
+from agensight.tracing.exporter_db import DBSpanExporter
+from agensight.tracing.view_cache import ViewCache, view_cache
+
+SECOND = 1_000_000_000
+
+
+def _span(span_id, parent_id=None, end=10):
+    flags = TraceFlags(TraceFlags.SAMPLED)
+    return ReadableSpan(
+        name="agent",
+        context=SpanContext(0x1234, span_id, is_remote=False, trace_flags=flags),
+        parent=SpanContext(0x1234, parent_id, is_remote=True, trace_flags=flags) if parent_id else None,
+        attributes={"trace_id": "trace-1"},
+        kind=SpanKind.INTERNAL,
+        status=Status(StatusCode.OK),
+        start_time=1_700_000_000 * SECOND,
+        end_time=(1_700_000_000 + end) * SECOND,
+    )
+
+
+@pytest.fixture
+def client(trace_db):
+    from fastapi.testclient import TestClient
+    from agensight._server.app import app
+
+    view_cache.clear()
+    yield TestClient(app)
+    view_cache.clear()
+
+
+def test_lru_entries_are_evicted_past_the_byte_limit():
+    cache = ViewCache(max_bytes=10)
+    cache.put("a", "trace-1", '"1"', b"xxxx")
+    cache.put("b", "trace-2", '"1"', b"xxxx")
+    assert cache.get("a", '"1"') == b"xxxx"
+    cache.put("c", "trace-3", '"1"', b"xxxx")
+
+    assert cache.get("b", '"1"') is None
+    assert cache.size() == (2, 8)
+    assert cache.get("a", '"2"') is None
+
+
+def test_invalidation_drops_every_view_of_a_trace():
+    cache = ViewCache()
+    cache.put(("spans", "1"), "trace-1", '"1"', b"x")
+    cache.put(("details", "1"), "trace-1", '"1"', b"x")
+    cache.put(("spans", "2"), "trace-2", '"1"', b"x")
+
+    cache.invalidate_traces(["trace-1"])
+
+    assert cache.size() == (1, 1)
+
+
+@pytest.mark.parametrize("header, matches", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"abc-gzip"', True),
+    ('"abc-br"', True),
+    ('"other", "abc"', True),
+    ("*", True),
+    ('"abcd"', False),
+    (None, False),
+])
+def test_if_none_match_comparison(header, matches):
+    assert etag_matches(header, '"abc"') is matches
+
+
+def test_unchanged_trace_answers_304(client):
+    DBSpanExporter().export([_span(1)])
+
+    first = client.get("/api/traces/trace-1/spans")
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and first.headers["cache-control"] == "no-cache"
+
+    again = client.get("/api/traces/trace-1/spans", headers={"If-None-Match": etag})
+    assert (again.status_code, again.content) == (304, b"")
+    assert client.get("/api/traces/trace-1/spans", headers={"If-None-Match": 'W/"stale"'}).status_code == 200
+
+
+def test_new_spans_change_the_etag_and_drop_cached_views(client):
+    DBSpanExporter().export([_span(1)])
+    etag = client.get("/api/traces/trace-1/spans").headers["etag"]
+    client.get(f"/api/span/{format(1, '016x')}/details")
+    assert view_cache.size()[0] == 2
+
+    DBSpanExporter().export([_span(2, parent_id=1, end=5)])
+
+    assert view_cache.size()[0] == 0
+    response = client.get("/api/traces/trace-1/spans", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+from agensight.eval import worker_pool as worker_pool_module
+from agensight.eval.worker_pool import EvaluationWorkerPool
+from agensight.tracing.exporter_db import DBSpanExporter
+
+
+@pytest.fixture
+def gate():
+    # Holds workers inside their current item until set.
+    gate = threading.Event()
+    yield gate
+    gate.set()
+
+
+def test_drop_policy_discards_work_past_the_queue_size(gate):
+    pool = EvaluationWorkerPool(workers=1, max_queue=2, overflow="drop")
+
+    results = [pool.submit(gate.wait) for _ in range(3)]
+
+    assert results == [True, True, False]
+    assert pool.stats()["dropped"] == 1
+    gate.set()
+    assert pool.join(timeout=5)
+    assert pool.stats()["completed"] == 2
+    pool.shutdown()
+
+
+def test_block_policy_waits_for_a_free_slot(gate):
+    pool = EvaluationWorkerPool(workers=1, max_queue=1, overflow="block", block_timeout=5)
+    pool.submit(gate.wait)
+
+    threading.Timer(0.1, gate.set).start()
+    started = time.monotonic()
+    assert pool.submit(lambda: None) is True
+    assert time.monotonic() - started >= 0.05
+
+    assert pool.join(timeout=5)
+    assert pool.stats()["dropped"] == 0
+    pool.shutdown()
+
+
+def test_block_policy_drops_once_its_timeout_expires(gate):
+    pool = EvaluationWorkerPool(workers=1, max_queue=1, overflow="block", block_timeout=0.05)
+    pool.submit(gate.wait)
+
+    assert pool.submit(lambda: None) is False
+    assert pool.stats()["dropped"] == 1
+    pool.shutdown(wait=False)
+
+
+def test_shutdown_drains_queued_work_then_refuses_more():
+    pool = EvaluationWorkerPool(workers=2, max_queue=100)
+    done = []
+    for i in range(20):
+        pool.submit(lambda i=i: (time.sleep(0.001), done.append(i)))
+
+    pool.shutdown(wait=True, timeout=5)
+
+    assert sorted(done) == list(range(20))
+    assert pool.submit(lambda: None) is False
+
+
+def test_shutdown_timeout_bounds_the_whole_shutdown(gate):
+    pool = EvaluationWorkerPool(workers=4, max_queue=10)
+    for _ in range(4):
+        pool.submit(gate.wait)
+
+    started = time.monotonic()
+    pool.shutdown(wait=True, timeout=0.2)
+
+    assert time.monotonic() - started < 0.6
+
+
+def test_exporter_shutdown_leaves_the_shared_pool_running(monkeypatch):
+    pool = EvaluationWorkerPool(workers=1, max_queue=10)
+    monkeypatch.setattr(worker_pool_module, "_pool", pool)
+    done = []
+    pool.submit(lambda: (time.sleep(0.05), done.append("first")))
+
+    DBSpanExporter().shutdown()
+
+    assert done == ["first"]
+    assert pool.submit(lambda: done.append("second")) is True
+    assert pool.join(timeout=5)
+    assert done == ["first", "second"]
+    pool.shutdown()